@@ -0,0 +1,353 @@
+# benchmarks/bench_core.py
+"""
+核心操作的基准测试：pyavl.AVLTree 对比有序 list + bisect、sortedcontainers.SortedList (如已安装) 与内置 set。
+
+    python benchmarks/bench_core.py --sizes 1000,100000,1000000 --json results.json
+    python benchmarks/bench_core.py --json new.json --compare results.json
+
+覆盖的操作：批量构建、逐个插入、查找 (一半命中)、批量查找、逐个删除、有序遍历、在中位数处分裂再合并。
+键值顺序：random 为随机排列，sorted 为升序，adversarial 为两端交替 (0, n-1, 1, n-2, ...)，
+后者让 AVL 树在两侧反复旋转，也让 list 的插入有一半落在开头。
+每个配置取 --repeat 次中最快的一次，只计被测操作本身，准备数据的时间不计入。
+
+--json 把结果与运行环境写为 JSON；--compare 读取之前的 JSON，逐项给出耗时比例，
+任何 pyavl 的结果变慢超过 --threshold 倍时以非零状态退出，便于发现 C 核心或 cffi 封装的性能回退。
+"""
+import argparse
+import bisect
+import json
+import os
+import platform
+import random
+import sys
+import time
+from array import array
+
+import pyavl
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # 可选依赖，未安装时跳过这一组
+    SortedList = None
+
+
+def make_keys(n, order, rng):
+    """生成 0, 2, ..., 2(n-1) 这 n 个偶数键值，按给定顺序排列；奇数用作查找未命中的探针。"""
+    keys = list(range(0, 2 * n, 2))
+    if order == "random":
+        rng.shuffle(keys)
+    elif order == "adversarial":
+        keys = [keys[i // 2] if i % 2 == 0 else keys[n - 1 - i // 2] for i in range(n)]
+    elif order != "sorted":
+        raise ValueError(f"Unknown key order: {order}")
+    return keys
+
+
+class PyAVLImpl:
+    name = "pyavl"
+    # 各实现中会退化为 O(n^2) 的操作，超过 --quadratic-limit 时跳过
+    quadratic = frozenset()
+
+    def build(self, keys):
+        return pyavl.AVLTree(array("i", keys))
+
+    def insert_each(self, keys):
+        tree = pyavl.AVLTree()
+        insert = tree.insert
+        for k in keys:
+            insert(k)
+        return tree
+
+    def search_each(self, tree, probes):
+        search = tree.search
+        for k in probes:
+            search(k)
+
+    def search_batch(self, tree, probes):
+        tree.contains_many(probes)
+
+    def delete_each(self, tree, keys):
+        delete = tree.delete
+        for k in keys:
+            delete(k)
+
+    def traverse(self, tree):
+        for _ in tree:
+            pass
+
+    def split_merge(self, tree, pivot):
+        small, large = tree.split(pivot)
+        return pyavl.AVLTree.merge(small, large)
+
+    def release(self, tree):
+        tree.close()
+
+
+class BisectImpl:
+    name = "bisect"
+    quadratic = frozenset({"insert", "delete"})
+
+    def build(self, keys):
+        return sorted(keys)
+
+    def insert_each(self, keys):
+        data = []
+        insort = bisect.insort
+        for k in keys:
+            insort(data, k)
+        return data
+
+    def search_each(self, data, probes):
+        bisect_left = bisect.bisect_left
+        n = len(data)
+        for k in probes:
+            i = bisect_left(data, k)
+            i < n and data[i] == k
+
+    search_batch = None
+
+    def delete_each(self, data, keys):
+        bisect_left = bisect.bisect_left
+        for k in keys:
+            del data[bisect_left(data, k)]
+
+    def traverse(self, data):
+        for _ in data:
+            pass
+
+    def split_merge(self, data, pivot):
+        i = bisect.bisect_right(data, pivot)
+        small, large = data[:i], data[i:]
+        return small + large
+
+    def release(self, data):
+        pass
+
+
+class SortedListImpl:
+    name = "sortedcontainers"
+    quadratic = frozenset()
+
+    def build(self, keys):
+        return SortedList(keys)
+
+    def insert_each(self, keys):
+        data = SortedList()
+        add = data.add
+        for k in keys:
+            add(k)
+        return data
+
+    def search_each(self, data, probes):
+        for k in probes:
+            k in data
+
+    search_batch = None
+
+    def delete_each(self, data, keys):
+        remove = data.remove
+        for k in keys:
+            remove(k)
+
+    def traverse(self, data):
+        for _ in data:
+            pass
+
+    def split_merge(self, data, pivot):
+        i = data.bisect_right(pivot)
+        small, large = SortedList(data.islice(0, i)), data.islice(i)
+        small.update(large)
+        return small
+
+    def release(self, data):
+        pass
+
+
+class SetImpl:
+    """无序的基线：只提供哈希查找的速度上限，遍历时需要排序，不支持分裂。"""
+    name = "set"
+    quadratic = frozenset()
+
+    def build(self, keys):
+        return set(keys)
+
+    def insert_each(self, keys):
+        data = set()
+        add = data.add
+        for k in keys:
+            add(k)
+        return data
+
+    def search_each(self, data, probes):
+        for k in probes:
+            k in data
+
+    search_batch = None
+
+    def delete_each(self, data, keys):
+        remove = data.remove
+        for k in keys:
+            remove(k)
+
+    def traverse(self, data):
+        for _ in sorted(data):
+            pass
+
+    split_merge = None
+
+    def release(self, data):
+        pass
+
+
+OPERATIONS = ("build", "insert", "search", "search_batch", "delete", "traverse", "split_merge")
+
+
+def _best_of(repeat, setup, run, teardown):
+    """重复 repeat 次：setup() 的返回值传给 run()，只对 run() 计时，返回最短的秒数。"""
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        result = run(state)
+        elapsed = time.perf_counter() - start
+        teardown(state, result)
+        best = min(best, elapsed)
+    return best
+
+
+def bench_one(impl, op, keys, probes, repeat):
+    """对一个实现的一种操作计时，返回 (秒数, 操作次数)；实现不支持该操作时返回 None。"""
+    n = len(keys)
+    sorted_keys = sorted(keys)
+    pivot = sorted_keys[n // 2] if n else 0
+
+    def release(*objs):
+        for obj in objs:
+            if obj is not None:
+                impl.release(obj)
+
+    if op == "build":
+        return _best_of(repeat, lambda: None, lambda _: impl.build(keys), lambda _, r: release(r)), n
+    if op == "insert":
+        return _best_of(repeat, lambda: None, lambda _: impl.insert_each(keys), lambda _, r: release(r)), n
+    if op == "search":
+        return _best_of(repeat, lambda: impl.build(keys), lambda s: impl.search_each(s, probes),
+                        lambda s, _: release(s)), len(probes)
+    if op == "search_batch":
+        if impl.search_batch is None:
+            return None
+        batch = array("i", probes)
+        return _best_of(repeat, lambda: impl.build(keys), lambda s: impl.search_batch(s, batch),
+                        lambda s, _: release(s)), len(probes)
+    if op == "delete":
+        return _best_of(repeat, lambda: impl.build(keys), lambda s: impl.delete_each(s, keys),
+                        lambda s, _: release(s)), n
+    if op == "traverse":
+        return _best_of(repeat, lambda: impl.build(keys), impl.traverse, lambda s, _: release(s)), n
+    if op == "split_merge":
+        if impl.split_merge is None:
+            return None
+        # pyavl 的 split/merge 会消耗输入树，因此只需释放结果
+        return _best_of(repeat, lambda: impl.build(keys), lambda s: impl.split_merge(s, pivot),
+                        lambda _, r: release(r)), 1
+    raise ValueError(f"Unknown operation: {op}")
+
+
+def _parse_size(text):
+    return int(float(text))
+
+
+def run(args):
+    impls = [PyAVLImpl(), BisectImpl(), SetImpl()]
+    if SortedList is not None:
+        impls.insert(2, SortedListImpl())
+    wanted = set(args.impls.split(",")) if args.impls else None
+    impls = [impl for impl in impls if wanted is None or impl.name in wanted]
+    ops = args.ops.split(",") if args.ops else OPERATIONS
+
+    results = []
+    for n in (_parse_size(s) for s in args.sizes.split(",")):
+        for order in args.orders.split(","):
+            rng = random.Random(args.seed)
+            keys = make_keys(n, order, rng)
+            # 一半命中 (偶数)、一半未命中 (奇数) 的随机探针
+            probes = [rng.randrange(2 * n) if n else 0 for _ in range(min(n, args.probes) or 1)]
+            for op in ops:
+                for impl in impls:
+                    if op in impl.quadratic and n > args.quadratic_limit:
+                        continue
+                    measured = bench_one(impl, op, keys, probes, args.repeat)
+                    if measured is None:
+                        continue
+                    seconds, count = measured
+                    entry = {"impl": impl.name, "op": op, "order": order, "n": n, "seconds": seconds,
+                             "ns_per_op": seconds / max(count, 1) * 1e9}
+                    results.append(entry)
+                    print(f"{impl.name:>16} {op:>12} {order:>11} n={n:<9} {entry['ns_per_op']:>12,.1f} ns/op",
+                          flush=True)
+    return results
+
+
+def environment():
+    try:
+        from importlib.metadata import version
+        pyavl_version = version("pyavl")
+    except Exception:  # 未安装 (例如直接通过 PYTHONPATH 运行) 时没有版本信息
+        pyavl_version = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "pyavl": pyavl_version,
+        "sortedcontainers": SortedList is not None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """与之前的结果逐项比较，返回 pyavl 变慢超过 threshold 倍的项数。"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["impl"], r["op"], r["order"], r["n"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\ncompared with {baseline_path} (ratio = new / old)")
+    for r in results:
+        old = baseline.get((r["impl"], r["op"], r["order"], r["n"]))
+        if old is None or old["ns_per_op"] <= 0:
+            continue
+        ratio = r["ns_per_op"] / old["ns_per_op"]
+        flag = ""
+        if r["impl"] == "pyavl" and ratio > threshold:
+            flag = "  <-- regression"
+            regressions += 1
+        print(f"{r['impl']:>16} {r['op']:>12} {r['order']:>11} n={r['n']:<9} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="逗号分隔的键值个数，可写作 1e7")
+    parser.add_argument("--orders", default="random,sorted,adversarial", help="逗号分隔的键值顺序")
+    parser.add_argument("--ops", default="", help=f"逗号分隔的操作，默认全部：{','.join(OPERATIONS)}")
+    parser.add_argument("--impls", default="", help="逗号分隔的实现：pyavl,bisect,sortedcontainers,set")
+    parser.add_argument("--probes", type=int, default=100_000, help="查找操作使用的探针个数上限")
+    parser.add_argument("--repeat", type=int, default=3, help="每个配置重复的次数，取最快的一次")
+    parser.add_argument("--quadratic-limit", type=int, default=200_000,
+                        help="超过该规模时跳过会退化为 O(n^2) 的操作 (list 的逐个插入与删除)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="把结果写入该 JSON 文件")
+    parser.add_argument("--compare", help="与之前写出的 JSON 文件比较")
+    parser.add_argument("--threshold", type=float, default=1.25, help="判定为性能回退的耗时比例")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "args": vars(args), "results": results}, f, indent=2)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_finger.py
+"""
+指针 (finger) 模式的基准测试：基本递增的键值流上，从根开始查找与从右脊柱开始查找的对比。
+
+    python benchmarks/bench_finger.py --sizes 100000,1000000 --jitter 64
+
+键值流：
+  monotonic  严格递增 (0, 1, 2, ...)，另外测量 append；
+  jittered   第 i 个键值为 4i 加上 [-jitter, jitter] 内的随机偏移，即带少量乱序的时间戳。
+对每个键值流测量逐个 insert、一次 insert_many，以及逐个 search 最近插入的 --window 个键值之一。
+用 PYAVL_STATS=1 编译时同时给出每次操作的平均比较次数。
+"""
+import argparse
+import random
+import time
+from array import array
+
+import pyavl
+
+
+def make_stream(n, kind, jitter, rng):
+    if kind == "monotonic":
+        return list(range(n))
+    if kind == "jittered":
+        return [4 * i + rng.randint(-jitter, jitter) for i in range(n)]
+    raise ValueError(f"Unknown stream: {kind}")
+
+
+def run_insert(keys, finger):
+    tree = pyavl.AVLTree()
+    tree.finger = finger
+    insert = tree.insert
+    start = time.perf_counter()
+    for k in keys:
+        insert(k)
+    return time.perf_counter() - start, tree
+
+
+def run_append(keys, finger):
+    tree = pyavl.AVLTree()
+    append = tree.append
+    start = time.perf_counter()
+    for k in keys:
+        append(k)
+    return time.perf_counter() - start, tree
+
+
+def run_insert_many(keys, finger):
+    # 逐个插入整个数组 (而不是 from_sorted 的线性构建)，因为实际的键值流是分批到达的
+    tree = pyavl.AVLTree()
+    tree.finger = finger
+    batch = array("i", keys)
+    start = time.perf_counter()
+    tree.insert_many(batch)
+    return time.perf_counter() - start, tree
+
+
+def run_search_recent(keys, finger, window, rng):
+    tree = pyavl.AVLTree(keys)
+    tree.finger = finger
+    n = len(keys)
+    probes = [keys[n - 1 - rng.randrange(min(window, n))] for _ in range(n)]
+    search = tree.search
+    start = time.perf_counter()
+    for k in probes:
+        search(k)
+    return time.perf_counter() - start, tree
+
+
+def measure(run, count, repeat):
+    """重复 repeat 次取最快的一次，返回 (每次操作的纳秒数, 每次操作的比较次数或 None)。"""
+    best = float("inf")
+    comparisons = None
+    for _ in range(repeat):
+        pyavl.reset_stats()
+        elapsed, tree = run()
+        if pyavl.stats_enabled():
+            comparisons = tree.stats()["counters"]["comparisons"] / count
+        tree.close()
+        best = min(best, elapsed)
+    return best / count * 1e9, comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000", help="逗号分隔的键值个数")
+    parser.add_argument("--jitter", type=int, default=64, help="jittered 键值流的最大偏移")
+    parser.add_argument("--window", type=int, default=1000, help="search 只查找最近插入的这么多个键值")
+    parser.add_argument("--repeat", type=int, default=3, help="每个配置重复的次数，取最快的一次")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'stream':>10} {'op':>12} {'n':>9} {'root':>12} {'finger':>12} {'speedup':>8}")
+    for n in (int(float(s)) for s in args.sizes.split(",")):
+        for kind in ("monotonic", "jittered"):
+            keys = make_stream(n, kind, args.jitter, random.Random(args.seed))
+            ops = [
+                ("insert", lambda finger: run_insert(keys, finger)),
+                ("insert_many", lambda finger: run_insert_many(keys, finger)),
+                ("search", lambda finger: run_search_recent(keys, finger, args.window, random.Random(args.seed))),
+            ]
+            if kind == "monotonic":
+                # append 没有从根开始的版本，与不启用指针模式的 insert 比较
+                ops.insert(1, ("append", lambda finger: (run_append if finger else run_insert)(keys, False)))
+            for name, run in ops:
+                root_ns, root_cmp = measure(lambda: run(False), n, args.repeat)
+                finger_ns, finger_cmp = measure(lambda: run(True), n, args.repeat)
+                line = (f"{kind:>10} {name:>12} {n:>9} {root_ns:>9.1f} ns {finger_ns:>9.1f} ns "
+                        f"{root_ns / finger_ns:>7.2f}x")
+                if root_cmp is not None:
+                    line += f"   comparisons/op {root_cmp:.1f} -> {finger_cmp:.1f}"
+                print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/bench_queue.py
+"""
+优先队列模式的基准测试：pyavl 的 insert/pop_min 对比 heapq 的 heappush/heappop。
+
+    python benchmarks/bench_queue.py --sizes 1000,100000 --ops 1000000
+
+工作负载：
+  mixed  先放入 n 个键值，之后每次操作以相同的概率入队一个新键值或弹出最小的键值，队列大小在 n 附近波动；
+  peek   与 mixed 相同，但像调度器一样每次操作之前先查看最小的键值 (pyavl 用 min()，heapq 用 heap[0])，
+         每次入队之后再查看 4 次 (检查最早的任务是否到期)；
+  drain  放入 n 个键值后逐个弹出直到为空；
+  batch  放入 n 个键值后每次取出最小的 --batch 个 (pyavl 用 pop_min_many，heapq 用逐个 heappop)。
+键值是随机整数，入队的新键值不小于已经弹出的键值 (调度器中的时间戳就是这样)。
+heapq 只能弹出最小值，也不能删除任意元素或按区间遍历；这里只比较两者都支持的操作。
+"""
+import argparse
+import heapq
+import random
+import time
+
+import pyavl
+
+
+def make_workload(n, ops, rng):
+    """返回初始键值与 ops 个操作 (键值为入队，None 为出队)；队列为空时总是入队。"""
+    initial = [rng.randrange(1 << 30) for _ in range(n)]
+    now, size = 0, n
+    steps = []
+    for _ in range(ops):
+        if size == 0 or rng.random() < 0.5:
+            now += rng.randrange(16)
+            steps.append(now + rng.randrange(1 << 30))
+            size += 1
+        else:
+            steps.append(None)
+            size -= 1
+    return initial, steps
+
+
+def pyavl_mixed(initial, steps):
+    tree = pyavl.AVLTree(initial)
+    insert, pop_min = tree.insert, tree.pop_min
+    start = time.perf_counter()
+    for key in steps:
+        if key is None:
+            pop_min()
+        else:
+            insert(key)
+    elapsed = time.perf_counter() - start
+    tree.close()
+    return elapsed
+
+
+def pyavl_peek(initial, steps):
+    tree = pyavl.AVLTree(initial)
+    insert, pop_min, peek = tree.insert, tree.pop_min, tree.min
+    start = time.perf_counter()
+    for key in steps:
+        if key is None:
+            peek()
+            pop_min()
+        else:
+            insert(key)
+            for _ in range(4):
+                peek()
+    elapsed = time.perf_counter() - start
+    tree.close()
+    return elapsed
+
+
+def heapq_peek(initial, steps):
+    heap = list(initial)
+    heapq.heapify(heap)
+    push, pop = heapq.heappush, heapq.heappop
+    start = time.perf_counter()
+    for key in steps:
+        if key is None:
+            heap[0]
+            pop(heap)
+        else:
+            push(heap, key)
+            for _ in range(4):
+                heap[0]
+    return time.perf_counter() - start
+
+
+def heapq_mixed(initial, steps):
+    heap = list(initial)
+    heapq.heapify(heap)
+    push, pop = heapq.heappush, heapq.heappop
+    start = time.perf_counter()
+    for key in steps:
+        if key is None:
+            pop(heap)
+        else:
+            push(heap, key)
+    return time.perf_counter() - start
+
+
+def pyavl_drain(initial, batch):
+    tree = pyavl.AVLTree(initial)
+    pop_min = tree.pop_min
+    start = time.perf_counter()
+    for _ in range(len(tree)):
+        pop_min()
+    elapsed = time.perf_counter() - start
+    tree.close()
+    return elapsed
+
+
+def heapq_drain(initial, batch):
+    heap = list(initial)
+    heapq.heapify(heap)
+    pop = heapq.heappop
+    start = time.perf_counter()
+    for _ in range(len(heap)):
+        pop(heap)
+    return time.perf_counter() - start
+
+
+def pyavl_batch(initial, batch):
+    tree = pyavl.AVLTree(initial)
+    start = time.perf_counter()
+    while tree.count:
+        tree.pop_min_many(batch)
+    elapsed = time.perf_counter() - start
+    tree.close()
+    return elapsed
+
+
+def heapq_batch(initial, batch):
+    heap = list(initial)
+    heapq.heapify(heap)
+    pop = heapq.heappop
+    start = time.perf_counter()
+    while heap:
+        [pop(heap) for _ in range(min(batch, len(heap)))]
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="逗号分隔的初始队列大小")
+    parser.add_argument("--ops", type=int, default=1_000_000, help="mixed 工作负载的操作次数")
+    parser.add_argument("--batch", type=int, default=64, help="batch 工作负载每次取出的个数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个配置重复的次数，取最快的一次")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'workload':>8} {'n':>9} {'pyavl':>12} {'heapq':>12} {'ratio':>7}")
+    for n in (int(float(s)) for s in args.sizes.split(",")):
+        initial, steps = make_workload(n, args.ops, random.Random(args.seed))
+        workloads = (
+            ("mixed", pyavl_mixed, heapq_mixed, steps, len(steps)),
+            ("peek", pyavl_peek, heapq_peek, steps, len(steps)),
+            ("drain", pyavl_drain, heapq_drain, args.batch, n),
+            ("batch", pyavl_batch, heapq_batch, args.batch, n),
+        )
+        for name, pyavl_run, heapq_run, arg, count in workloads:
+            t_avl = min(pyavl_run(initial, arg) for _ in range(args.repeat))
+            t_heap = min(heapq_run(initial, arg) for _ in range(args.repeat))
+            count = max(count, 1)
+            print(f"{name:>8} {n:>9} {t_avl / count * 1e9:>9.1f} ns {t_heap / count * 1e9:>9.1f} ns "
+                  f"{t_avl / t_heap:>6.2f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_shards.py
+"""
+分片树的批量吞吐量：ShardedAVLTree 的 insert_many / contains_many 随分片 (线程) 数的变化，
+以单棵 AVLTree 作为基准。
+
+    python benchmarks/bench_shards.py --keys 1000000 --batch 100000 --shards 1,2,4,8
+
+insert  从空树开始，把 --keys 个随机键值按每批 --batch 个插入；
+lookup  在装有 --keys 个键值的树中，以每批 --batch 个反复查找 (约一半命中)，运行 --seconds 秒。
+分片数与线程数相同。批量操作的大部分时间花在释放了 GIL 的 C 代码中，
+吞吐量应随分片数 (不超过 CPU 核数) 近似线性增长；分片数超过核数之后不再增长。
+"""
+import argparse
+import os
+import random
+import time
+from array import array
+
+import pyavl
+
+
+def run_insert(make_tree, batches):
+    tree = make_tree()
+    start = time.perf_counter()
+    for batch in batches:
+        tree.insert_many(batch)
+    elapsed = time.perf_counter() - start
+    tree.close()
+    return elapsed
+
+
+def run_lookup(tree, probes, seconds):
+    """在 seconds 秒内反复批量查找，返回 (查找的键值个数, 实际用时)。"""
+    done = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        tree.contains_many(probes)
+        done += len(probes)
+    return done, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000, help="树中的键值个数")
+    parser.add_argument("--batch", type=int, default=100_000, help="每次批量操作的键值个数")
+    parser.add_argument("--shards", default="1,2,4,8", help="逗号分隔的分片 (线程) 数")
+    parser.add_argument("--seconds", type=float, default=1.0, help="每个 lookup 配置的运行时间")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = array("i", (rng.randrange(2 * args.keys) for _ in range(args.keys)))
+    batches = [keys[i:i + args.batch] for i in range(0, len(keys), args.batch)]
+    probes = array("i", (rng.randrange(2 * args.keys) for _ in range(args.batch)))
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'tree':>16} {'insert Mkeys/s':>15} {'lookup Mkeys/s':>15} {'scaling':>8}")
+    configs = [("AVLTree", pyavl.AVLTree, None)]
+    configs += [(f"sharded x{s}", lambda s=s: pyavl.ShardedAVLTree(shards=s), s)
+                for s in (int(x) for x in args.shards.split(","))]
+    baseline = None
+    for name, make_tree, shards in configs:
+        insert_rate = args.keys / run_insert(make_tree, batches) / 1e6
+        with make_tree() as tree:
+            tree.insert_many(keys)
+            done, elapsed = run_lookup(tree, probes, args.seconds)
+        lookup_rate = done / elapsed / 1e6
+        if baseline is None:
+            baseline = lookup_rate
+        print(f"{name:>16} {insert_rate:>15.2f} {lookup_rate:>15.2f} {lookup_rate / baseline:>7.2f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_threads.py
+"""
+多线程查找吞吐量：thread_safe=True 的树 (C 层读写锁，查找期间释放 GIL)
+对比用一把 Python 锁串行化所有访问的普通树。
+
+    python benchmarks/bench_threads.py --keys 1000000 --threads 1,2,4,8
+
+批量查找 (contains_many) 的大部分时间花在释放了 GIL 的 C 代码中，吞吐量应随线程数 (不超过 CPU 核数) 增长；
+单键查找 (search) 每次调用都要在持有 GIL 的 Python 代码中往返，主要用来观察加锁的额外开销。
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from array import array
+
+import pyavl
+
+
+def _run_threads(n_threads, work, seconds):
+    """让 n_threads 个线程在 seconds 秒内反复调用 work()，返回所有线程完成的总查找次数。"""
+    done = [0] * n_threads
+    stop = threading.Event()
+    start = threading.Barrier(n_threads + 1)
+
+    def loop(slot):
+        start.wait()
+        while not stop.is_set():
+            done[slot] += work()
+
+    threads = [threading.Thread(target=loop, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    start.wait()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000, help="树中的键值个数")
+    parser.add_argument("--batch", type=int, default=10_000, help="每次 contains_many 查找的键值个数")
+    parser.add_argument("--threads", default="1,2,4,8", help="逗号分隔的线程数")
+    parser.add_argument("--seconds", type=float, default=1.0, help="每个配置的运行时间")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    keys = array("i", range(0, 2 * args.keys, 2))
+    probes = array("i", (rng.randrange(2 * args.keys) for _ in range(args.batch)))
+
+    locked = pyavl.AVLTree.from_sorted(keys)
+    locked_guard = threading.Lock()
+    shared = pyavl.AVLTree(keys, thread_safe=True)
+
+    def batch_python_lock():
+        with locked_guard:
+            locked.contains_many(probes)
+        return len(probes)
+
+    def batch_rwlock():
+        shared.contains_many(probes)
+        return len(probes)
+
+    def single_python_lock():
+        with locked_guard:
+            locked.search(probes[0])
+        return 1
+
+    def single_rwlock():
+        shared.search(probes[0])
+        return 1
+
+    print(f"keys={args.keys} batch={args.batch} cpus={os.cpu_count()}")
+    print(f"{'threads':>7} {'batch/py-lock':>14} {'batch/rwlock':>14} {'single/py-lock':>15} {'single/rwlock':>14}  (lookups/s)")
+    for n in (int(x) for x in args.threads.split(",")):
+        rates = [_run_threads(n, work, args.seconds) / args.seconds
+                 for work in (batch_python_lock, batch_rwlock, single_python_lock, single_rwlock)]
+        print(f"{n:>7} {rates[0]:>14,.0f} {rates[1]:>14,.0f} {rates[2]:>15,.0f} {rates[3]:>14,.0f}")
+
+    locked.close()
+    shared.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@
 #ifndef AVLTREE_H
 #define AVLTREE_H
 
+#include <stddef.h>
+#include <stdint.h>
+
 /* --- 不透明指针定义 --- */
 
 /**
@@ -36,13 +39,23 @@ void avl_destroy(AVLTree tree);
 AVLTree avl_insert(AVLTree tree, int key);
 
 /**
- * @brief 从AVL树中删除一个键值。
+ * @brief 从AVL树中删除一个键值。不存在的键值会被静默忽略。
  * @param tree 树的句柄。
  * @param key  要删除的键值。
  * @return 返回操作后树的新句柄 (根节点可能会改变)。
  */
 AVLTree avl_delete(AVLTree tree, int key);
 
+/**
+ * @brief 从AVL树中删除一个键值，并通过返回码报告它是否存在。
+ * @param tree    树的句柄。
+ * @param key     要删除的键值。
+ * @param removed (出参) 键值存在并被删除时写入1，不存在时写入0；
+ *                树与快照共享节点且复制路径时内存不足写入-1 (此时树没有被修改)。
+ * @return 返回操作后树的新句柄 (根节点可能会改变)。
+ */
+AVLTree avl_discard(AVLTree tree, int key, int* removed);
+
 /**
  * @brief 在AVL树中查找一个键值是否存在。
  * @param tree 树的句柄。此操作不会修改树，故使用const。
@@ -51,6 +64,88 @@ AVLTree avl_delete(AVLTree tree, int key);
  */
 int avl_search(const AVLTree tree, int key);
 
+/**
+ * @brief 以右脊柱为指针 (finger) 查找：从右脊柱上离 key 最近的节点开始向下查找，而不是从根开始。
+ *        key 与最大键值之间相隔 d 个键值时只需 O(log d) 次比较，适合查找最近插入的递增键值。
+ * @return 与 avl_search 相同。
+ */
+int avl_search_finger(const AVLTree tree, int key);
+
+/* --- 批量操作：一次 C 调用处理整个键值数组 --- */
+
+/**
+ * @brief 将一个连续数组中的所有键值依次插入AVL树。
+ * @param tree 树的句柄。
+ * @param keys 指向键值数组的指针。
+ * @param n    数组中键值的个数。
+ * @return 返回操作后树的新句柄。
+ */
+AVLTree avl_insert_batch(AVLTree tree, const int* keys, int n);
+
+/**
+ * @brief 从AVL树中依次删除一个连续数组中的所有键值。
+ * @note  不存在的键值会被静默忽略，不会打印任何信息。
+ * @param tree 树的句柄。
+ * @param keys 指向键值数组的指针。
+ * @param n    数组中键值的个数。
+ * @return 返回操作后树的新句柄。
+ */
+AVLTree avl_delete_batch(AVLTree tree, const int* keys, int n);
+
+/**
+ * @brief 批量查找一个连续数组中的键值是否存在。
+ * @param tree 树的句柄。
+ * @param keys 指向待查找键值数组的指针。
+ * @param n    数组中键值的个数。
+ * @param out  (出参) 长度至少为 n 的结果数组，out[i] 为 1 表示 keys[i] 存在，否则为 0。
+ */
+void avl_search_batch(const AVLTree tree, const int* keys, int n, unsigned char* out);
+
+/**
+ * @brief 与 avl_search_batch 相同，但把 keys[i] 的结果写到 out[pos[i]]。
+ * 与 avl_partition_batch 配合使用：各分片查找自己的那一段键值，结果直接落在原始输入的位置上。
+ * @param pos 长度为 n 的下标数组。
+ */
+void avl_search_batch_at(const AVLTree tree, const int* keys, int n, const int* pos, unsigned char* out);
+
+/**
+ * @brief 按分割点把一批键值分发到各个分片 (稳定的计数排序，O(n log nbounds))。
+ * 分片 s 包含满足 bounds[s-1] < key <= bounds[s] 的键值 (与 split 的约定一致，分割点属于左侧)，
+ * 第一个与最后一个分片分别不设下界与上界。
+ * @param bounds   严格递增的分割点数组。
+ * @param nbounds  分割点个数，分片个数为 nbounds + 1。
+ * @param out_keys (出参) 长度至少为 n，按分片连续存放的键值，分片内保持输入中的相对顺序。
+ * @param out_pos  (出参，可为 NULL) 长度至少为 n，out_keys[j] 在输入中的下标。
+ * @param counts   (出参) 长度至少为 nbounds + 1，每个分片的键值个数。
+ */
+void avl_partition_batch(const int* bounds, int nbounds, const int* keys, int n,
+                         int* out_keys, int* out_pos, int* counts);
+
+/* --- 批量构建：从有序数组线性时间建树 --- */
+
+/**
+ * @brief 从一个严格递增 (已排序且无重复) 的键值数组以 O(n) 时间构建一棵完全平衡的AVL树。
+ * @前提 keys 必须严格递增，可先用 avl_is_strictly_sorted 检查。
+ * @param keys 指向有序键值数组的指针。
+ * @param n    数组中键值的个数。
+ * @return 返回新树的句柄。n > 0 时返回 NULL 表示内存不足，已分配的节点都已释放。
+ */
+AVLTree avl_build_sorted(const int* keys, int n);
+
+/**
+ * @brief 检查一个键值数组是否严格递增。
+ * @return 严格递增返回1，否则返回0。
+ */
+int avl_is_strictly_sorted(const int* keys, int n);
+
+/**
+ * @brief 对键值数组进行原地排序并去重。
+ * @param keys 指向可写键值数组的指针。
+ * @param n    数组中键值的个数。
+ * @return 返回去重后保留在数组前部的键值个数。
+ */
+int avl_sort_unique(int* keys, int n);
+
 /**
  * @brief 以美观、可视化的方式打印整棵树的结构。
  * @param tree 树的句柄。此操作不会修改树，故使用const。
@@ -63,7 +158,7 @@ void avl_display(const AVLTree tree);
 /* --- 选做内容：公共API函数声明 --- */
 
 /**
- * @brief 合并两棵AVL树 T1 和 T2。
+ * @brief 合并两棵AVL树 T1 和 T2，代价为 O(log n)。
  * @前提 T1 中的所有键值必须都小于 T2 中的所有键值。
  * @param T1 较小的树（所有键值都小于T2）。
  * @param T2 较大的树（所有键值都大于T1）。
@@ -72,7 +167,7 @@ void avl_display(const AVLTree tree);
 AVLTree avl_merge(AVLTree T1, AVLTree T2);
 
 /**
- * @brief 将一棵AVL树 T 按键值 x 分裂成两棵新的AVL树。
+ * @brief 将一棵AVL树 T 按键值 x 分裂成两棵新的AVL树，代价为 O(log n)。
  * @param T         需要被分裂的原始树的句柄。
  * @param x         分裂的基准键值。
  * @param T_small   (出参) 一个指向树句柄的指针，用于接收分裂后包含所有 key <= x 的新树。
@@ -80,19 +175,264 @@ AVLTree avl_merge(AVLTree T1, AVLTree T2);
  */
 void avl_split(AVLTree T, int x, AVLTree* T_small, AVLTree* T_large);
 
+/**
+ * @brief 以 key 为中间键值连接两棵树 (join)，代价为 O(|h(T1) - h(T2)| + 1)。
+ * @前提 T1 中所有键值 < key < T2 中所有键值。
+ * @return 返回连接后的树；为 key 分配节点 (或复制与快照共享的节点) 失败时返回 NULL 且不修改输入。
+ */
+AVLTree avl_join(AVLTree T1, int key, AVLTree T2);
+
+/**
+ * @brief 基于 join 的集合运算，两棵树的键值范围可以任意重叠。
+ * 设两棵树的大小为 m <= n，代价为 O(m log(n/m + 1))。
+ * 两棵输入树都会被消耗：节点被复用到结果中，多余的节点被释放。
+ * @return 返回结果树的句柄。
+ */
+AVLTree avl_union(AVLTree T1, AVLTree T2);
+AVLTree avl_intersection(AVLTree T1, AVLTree T2);
+AVLTree avl_difference(AVLTree T1, AVLTree T2);            /* T1 - T2 */
+AVLTree avl_symmetric_difference(AVLTree T1, AVLTree T2);
+
+/* --- 节点内存池：可选的按树分配器 --- */
+
+/**
+ * @brief 节点内存池的句柄。
+ * 内存池按块批量申请节点内存，并通过空闲链表复用被删除的节点，
+ * 从而避免逐节点 malloc 造成的碎片；整个池可以按块一次性释放。
+ * 下面所有 avl_pool_* 操作函数在 pool 为 NULL 时退化为逐节点 malloc/free，
+ * 与对应的无池版本完全等价。
+ * @warning 同一棵树的所有节点必须来自同一个池 (或全部来自 malloc)。
+ */
+typedef struct AVLPool AVLPool;
+
+/**
+ * @brief 创建一个空的内存池。
+ * @return 返回新内存池；内存分配失败时返回 NULL。
+ */
+AVLPool* avl_pool_create(void);
+
+/**
+ * @brief 按块释放池中的全部内存，池本身保持可用。
+ * @warning 之后所有来自该池的树都将失效，不能再被访问或释放。
+ */
+void avl_pool_clear(AVLPool* pool);
+
+/**
+ * @brief 释放池中的全部内存并销毁池本身。
+ */
+void avl_pool_destroy(AVLPool* pool);
+
+/**
+ * @brief 获取池中正在被树使用的节点数。
+ */
+size_t avl_pool_live_nodes(const AVLPool* pool);
+
+/**
+ * @brief 获取池向系统申请的总字节数 (包括空闲链表中和尚未切分的节点)。
+ */
+size_t avl_pool_reserved_bytes(const AVLPool* pool);
+
+/**
+ * @brief 获取单个节点占用的字节数 (不含 malloc 自身的额外开销)。
+ */
+size_t avl_node_size(void);
+
+/**
+ * @brief 把一棵树的所有节点逐个归还到池的空闲链表中 (pool 为 NULL 时等价于 avl_destroy)。
+ */
+void avl_pool_release(AVLPool* pool, AVLTree tree);
+
+/**
+ * @brief 以下函数与对应的无池版本语义相同，只是新节点从 pool 中分配、被删除的节点归还给 pool。
+ * @note  avl_pool_insert 与 avl_pool_delete 不报告内存分配失败 (此时树保持不变)，
+ *        需要知道结果时请使用 avl_pool_add 与 avl_pool_discard。
+ */
+AVLTree avl_pool_insert(AVLPool* pool, AVLTree tree, int key);
+AVLTree avl_pool_delete(AVLPool* pool, AVLTree tree, int key);
+AVLTree avl_pool_discard(AVLPool* pool, AVLTree tree, int key, int* removed);
+
+/**
+ * @brief 插入一个键值，并通过返回码报告结果。
+ * @param inserted (出参) 插入了新节点写入1，键值已存在写入0，内存分配失败写入-1。
+ * @return 返回操作后树的新句柄。
+ */
+AVLTree avl_pool_add(AVLPool* pool, AVLTree tree, int key, int* inserted);
+
+/**
+ * @brief 与 avl_pool_add 相同，但与 avl_search_finger 一样从右脊柱开始查找插入位置。
+ *        对基本递增 (只有少量抖动) 的键值流，每次插入只需 O(log d) 次比较。
+ */
+AVLTree avl_pool_add_finger(AVLPool* pool, AVLTree tree, int key, int* inserted);
+
+/**
+ * @brief 追加一个大于当前最大键值的键值：沿右脊柱下降，只比较一次。
+ * @param inserted (出参) 插入了新节点写入1，key 不大于最大键值 (树没有被修改) 写入0，内存分配失败写入-1。
+ */
+AVLTree avl_pool_append(AVLPool* pool, AVLTree tree, int key, int* inserted);
+AVLTree avl_pool_insert_batch_finger(AVLPool* pool, AVLTree tree, const int* keys, int n, int* status);
+
+/**
+ * @brief 删除最小 (last 非0时为最大) 的键值，沿脊柱下降一次完成，不需要比较。
+ * @param out_key (出参，可为 NULL) 被删除的键值。
+ * @param removed (出参) 与 avl_discard 相同：删除了写入1，树为空写入0，复制共享路径时内存不足写入-1。
+ * @return 返回操作后树的新句柄。
+ */
+AVLTree avl_pool_pop_extreme(AVLPool* pool, AVLTree tree, int last, int* out_key, int* removed);
+
+/**
+ * @brief 批量插入 (或删除) keys 中的键值，_finger 版本从右脊柱开始查找插入位置。
+ * @param status (出参，可为 NULL) 全部处理完时写入 n；内存不足时在失败的键值处停止，写入 -1 - i，
+ *               其中 i 为此前已处理完的键值个数，keys[i] 及之后的键值都没有被处理。
+ */
+AVLTree avl_pool_insert_batch(AVLPool* pool, AVLTree tree, const int* keys, int n, int* status);
+AVLTree avl_pool_delete_batch(AVLPool* pool, AVLTree tree, const int* keys, int n, int* status);
+AVLTree avl_pool_build_sorted(AVLPool* pool, const int* keys, int n);
+
+/**
+ * @brief merge/split/cut_range 与集合运算的带池版本。
+ * 与快照共享的节点在修改前需要复制，复制可能因内存不足而失败；此时输入树保持不变 (仍归调用者所有)，
+ * 结果与出参树都为 NULL。没有共享节点时这些操作不分配内存，也就不会失败。
+ * @param status (出参，可为 NULL) 成功写入1，内存不足写入-1。无池版本不报告失败，失败时返回 NULL。
+ */
+AVLTree avl_pool_merge(AVLPool* pool, AVLTree T1, AVLTree T2, int* status);
+void avl_pool_split(AVLPool* pool, AVLTree T, int x, AVLTree* T_small, AVLTree* T_large, int* status);
+
+/**
+ * @brief 把键值落在闭区间 [*lo, *hi] 内的全部节点从树中切下，组成一棵新树。
+ * 通过两次分裂与一次 join 完成，代价为 O(log n)，剩余的树与切下的树都保持平衡。
+ * @param lo, hi      区间的两端；为 NULL 表示该侧不设限。
+ * @param out_removed (出参) 切下的树，区间内没有键值 (或区间为空) 时为 NULL。
+ * @param status      (出参，可为 NULL) 同上；内存不足时返回原句柄，树保持不变。
+ * @return 返回剩余部分的新句柄；原句柄 tree 不再有效。
+ */
+AVLTree avl_pool_cut_range(AVLPool* pool, AVLTree tree, const int* lo, const int* hi, AVLTree* out_removed,
+                           int* status);
+AVLTree avl_pool_join(AVLPool* pool, AVLTree T1, int key, AVLTree T2);
+AVLTree avl_pool_union(AVLPool* pool, AVLTree T1, AVLTree T2, int* status);
+AVLTree avl_pool_intersection(AVLPool* pool, AVLTree T1, AVLTree T2, int* status);
+AVLTree avl_pool_difference(AVLPool* pool, AVLTree T1, AVLTree T2, int* status);
+AVLTree avl_pool_symmetric_difference(AVLPool* pool, AVLTree T1, AVLTree T2, int* status);
+
+/**
+ * @brief 创建树的持久化快照，代价为 O(1)。
+ * 快照与原树共享所有节点 (节点带引用计数)；之后任何一方的修改都会先复制共享的路径，
+ * 每次插入/删除只复制 O(log n) 个节点，另一方的内容保持不变。
+ * 快照本身也是一棵树，不再需要时用 avl_pool_release (或 avl_destroy) 释放，
+ * 使用的 pool 必须与原树相同。快照与原树可以在不同线程中分别使用，无需额外同步
+ * (前提是没有共用同一个 pool：池本身不是线程安全的)。
+ * 对共享的树进行 merge/split/join/集合运算时若复制节点失败，操作报告内存不足，输入树保持不变。
+ * @return 快照的句柄 (空树的快照仍是空树)。
+ */
+AVLTree avl_snapshot(AVLTree tree);
+
 // 它接受 key, height 和 balance_factor 作为参数
 typedef void (*avl_traverse_callback)(int key, int height, int bf);
 
 // 声明新的遍历函数
 void avl_in_order_traverse(AVLTree tree, avl_traverse_callback callback);
 
+/* --- 游标：无回调的有序遍历与区间扫描 --- */
+
+/**
+ * @brief 游标的句柄。
+ * 游标在内部保存从根到当前节点的路径，因此无需父指针即可在 O(1) 均摊时间内前进或后退。
+ * @warning 在游标存活期间修改对应的树会使游标失效，此时只能销毁它。
+ */
+typedef struct AVLCursor AVLCursor;
+
+/**
+ * @brief 为一棵树创建游标，创建后游标处于无效位置，需先调用 seek/first/last 定位。
+ * @return 返回新游标；内存分配失败时返回 NULL。
+ */
+AVLCursor* avl_cursor_create(const AVLTree tree);
+
+/**
+ * @brief 销毁游标，释放其占用的内存。
+ */
+void avl_cursor_destroy(AVLCursor* cursor);
+
+/**
+ * @brief 将游标定位到第一个大于等于 key 的键值 (lower bound)。
+ * @return 如果存在这样的键值返回1，否则游标失效并返回0。
+ */
+int avl_cursor_seek(AVLCursor* cursor, int key);
+
+/**
+ * @brief 将游标定位到最后一个小于等于 key 的键值 (floor)。
+ * @return 如果存在这样的键值返回1，否则游标失效并返回0。
+ */
+int avl_cursor_seek_floor(AVLCursor* cursor, int key);
+
+/**
+ * @brief 将游标定位到最小 / 最大的键值。
+ * @return 树非空时返回1，否则返回0。
+ */
+int avl_cursor_first(AVLCursor* cursor);
+int avl_cursor_last(AVLCursor* cursor);
+
+/**
+ * @brief 检查游标当前是否指向一个有效的节点。
+ */
+int avl_cursor_valid(const AVLCursor* cursor);
+
+/**
+ * @brief 读取游标当前指向的键值。
+ * @前提 游标必须有效。
+ */
+int avl_cursor_key(const AVLCursor* cursor);
+
+/**
+ * @brief 将游标移动到中序后继 / 前驱。
+ * @return 移动后游标仍然有效返回1，已越过末端则返回0。
+ */
+int avl_cursor_next(AVLCursor* cursor);
+int avl_cursor_prev(AVLCursor* cursor);
+
+/**
+ * @brief 从游标当前位置开始，把至多 max_n 个键值依次写入 out，并相应地移动游标。
+ * @param cursor  游标。
+ * @param out     (出参) 长度至少为 max_n 的数组。
+ * @param max_n   最多读取的键值个数。
+ * @param limit   闭区间边界：正向时遇到大于 *limit 的键值即停止，反向时遇到小于 *limit 的键值即停止；
+ *                为 NULL 时不设边界，一直读到末端。
+ * @param reverse 为0时按升序读取 (next)，非0时按降序读取 (prev)。
+ * @return 返回实际写入的键值个数。小于 max_n 说明已到达边界或末端。
+ */
+int avl_cursor_fill(AVLCursor* cursor, int* out, int max_n, const int* limit, int reverse);
+
 /**
  * @brief 获取AVL树中的节点总数。
+ * @note  每个节点都维护着子树大小，因此该操作是 O(1) 的。
  * @param tree 树的句柄。
  * @return 返回节点数量。如果树为空，返回0。
  */
 int avl_get_count(const AVLTree tree);
 
+/* --- 顺序统计：基于子树大小的 O(log n) 查询 --- */
+
+/**
+ * @brief 计算树中严格小于 key 的键值个数 (即 key 的排名，从0开始)。
+ * @param tree 树的句柄。
+ * @param key  查询的键值，不要求存在于树中。
+ * @return 返回小于 key 的键值个数。
+ */
+int avl_rank(const AVLTree tree, int key);
+
+/**
+ * @brief 按中序位置选取第 index 个键值 (从0开始)。
+ * @param tree    树的句柄。
+ * @param index   中序位置。
+ * @param out_key (出参) 用于接收选中的键值。
+ * @return 如果 0 <= index < 节点数，返回1并写入 out_key；否则返回0。
+ */
+int avl_select(const AVLTree tree, int index, int* out_key);
+
+/**
+ * @brief 统计落在闭区间 [lo, hi] 内的键值个数。
+ * @return 返回区间内的键值个数；lo > hi 时返回0。
+ */
+int avl_count_range(const AVLTree tree, int lo, int hi);
+
 /**
  * @brief 获取AVL树的高度。
  * @param tree 树的句柄。
@@ -100,4 +440,283 @@ int avl_get_count(const AVLTree tree);
  */
 int avl_get_height(const AVLTree tree);
 
-#endif /* AVLTREE_H */
\ No newline at end of file
+/**
+ * @brief 统计树中每一层的节点数。
+ * @param tree      树的句柄。
+ * @param hist      (出参) hist[d] 为深度 d (根的深度为0) 上的节点数，调用前不必清零。
+ * @param max_depth hist 的长度；更深的节点不计入 hist，但仍计入返回值。
+ * @return 返回所有节点的深度之和，除以节点数即为平均深度。
+ */
+long long avl_depth_histogram(const AVLTree tree, int* hist, int max_depth);
+
+/* --- 读写锁：可选的线程安全模式 --- */
+
+/**
+ * @brief 读写锁的句柄。树本身不做任何同步；需要多线程访问同一棵树时，
+ * 调用方在只读操作 (查找、计数、游标遍历等) 前后加读锁，在修改操作前后加写锁。
+ * 多个读者可以同时持有读锁，写者独占。POSIX 上基于 pthread_rwlock，Windows 上基于 SRWLOCK。
+ * @warning 锁不可重入：同一线程不能重复获取同一把锁，也不能把读锁升级为写锁。
+ */
+typedef struct AVLRWLock AVLRWLock;
+
+/**
+ * @brief 创建一把读写锁。
+ * @return 返回新锁；内存分配或初始化失败时返回 NULL。
+ */
+AVLRWLock* avl_rwlock_create(void);
+
+/**
+ * @brief 销毁一把读写锁，调用时不能有任何线程持有它。
+ */
+void avl_rwlock_destroy(AVLRWLock* lock);
+
+void avl_rwlock_read_lock(AVLRWLock* lock);
+void avl_rwlock_read_unlock(AVLRWLock* lock);
+void avl_rwlock_write_lock(AVLRWLock* lock);
+void avl_rwlock_write_unlock(AVLRWLock* lock);
+
+/* --- 操作计数：可选的性能诊断 --- */
+
+/**
+ * @brief 库内所有树 (所有键值类型) 共用的操作计数。
+ * 只有编译时定义了 AVL_STATS 才会计数；否则计数的代码不会被编译，所有字段始终为0。
+ * 计数用原子操作累加，多个线程同时读写树时依然准确，但会带来一定的额外开销。
+ */
+typedef struct AVLStats {
+    uint64_t comparisons;           // 查找、插入、删除、分裂等沿树下降时的键值比较次数
+    uint64_t single_rotations;      // 单旋转 (左-左、右-右) 次数
+    uint64_t double_rotations;      // 双旋转 (左-右、右-左) 次数
+    uint64_t node_allocs;           // 节点分配次数 (包括快照的写时复制)
+    uint64_t node_frees;            // 节点释放次数 (按块清空内存池时计入池中剩余的节点数)
+    uint64_t rebalance_early_exits; // 插入/删除后的回溯因子树高度不变而在到达根之前停止的次数
+} AVLStats;
+
+/**
+ * @brief 返回编译时是否启用了操作计数 (AVL_STATS)。
+ */
+int avl_stats_enabled(void);
+
+/**
+ * @brief 读取当前的操作计数。
+ */
+void avl_stats_get(AVLStats* out);
+
+/**
+ * @brief 把所有操作计数清零。
+ */
+void avl_stats_reset(void);
+
+/* --- 其它键值类型：由同一份实现模板 (avl_template.h) 生成 --- */
+
+/**
+ * @brief 字节串键值。按 memcmp 的字典序比较，较短的前缀排在前面。
+ * 作为参数传入时只需在调用期间有效，树会复制一份内容；
+ * 从树中读出的键值 (select、游标等) 指向节点内部的内存，在树被修改之前有效。
+ */
+typedef struct AVLBytes {
+    const unsigned char* data;
+    size_t len;
+} AVLBytes;
+
+/**
+ * @brief 为一种键值类型声明整套API，函数与上面的 avl_* 系列一一对应，语义完全相同，
+ * 只是把 int 键值换成了 Key，把前缀 avl 换成了 P。
+ * 内存池的创建、清空与销毁 (avl_pool_create 等) 由所有键值类型共用，
+ * 但一个池在被清空之前只能服务于一种键值类型。
+ */
+#define AVL_DECLARE_TYPED_API(P, Tree, NodeTag, Cursor, Key)                                    \
+    struct NodeTag;                                                                             \
+    typedef struct NodeTag* Tree;                                                               \
+    typedef struct Cursor Cursor;                                                               \
+    typedef void (*P##_traverse_callback)(Key key, int height, int bf);                        \
+    Tree P##_create(void);                                                                      \
+    void P##_destroy(Tree tree);                                                                \
+    Tree P##_insert(Tree tree, Key key);                                                        \
+    Tree P##_delete(Tree tree, Key key);                                                        \
+    Tree P##_discard(Tree tree, Key key, int* removed);                                         \
+    int P##_search(const Tree tree, Key key);                                                   \
+    int P##_search_finger(const Tree tree, Key key);                                            \
+    Tree P##_insert_batch(Tree tree, const Key* keys, int n);                                   \
+    Tree P##_delete_batch(Tree tree, const Key* keys, int n);                                   \
+    void P##_search_batch(const Tree tree, const Key* keys, int n, unsigned char* out);         \
+    void P##_search_batch_at(const Tree tree, const Key* keys, int n, const int* pos,           \
+                             unsigned char* out);                                               \
+    void P##_partition_batch(const Key* bounds, int nbounds, const Key* keys, int n,            \
+                             Key* out_keys, int* out_pos, int* counts);                         \
+    Tree P##_build_sorted(const Key* keys, int n);                                              \
+    int P##_is_strictly_sorted(const Key* keys, int n);                                         \
+    int P##_sort_unique(Key* keys, int n);                                                      \
+    void P##_display_to_buffer(const Tree tree, char* out_buffer, int buffer_size);             \
+    void P##_display(const Tree tree);                                                          \
+    Tree P##_merge(Tree T1, Tree T2);                                                           \
+    void P##_split(Tree T, Key x, Tree* T_small, Tree* T_large);                                \
+    Tree P##_join(Tree T1, Key key, Tree T2);                                                   \
+    Tree P##_union(Tree T1, Tree T2);                                                           \
+    Tree P##_intersection(Tree T1, Tree T2);                                                    \
+    Tree P##_difference(Tree T1, Tree T2);                                                      \
+    Tree P##_symmetric_difference(Tree T1, Tree T2);                                            \
+    size_t P##_node_size(void);                                                                 \
+    void P##_pool_release(AVLPool* pool, Tree tree);                                            \
+    Tree P##_snapshot(Tree tree);                                                               \
+    Tree P##_pool_insert(AVLPool* pool, Tree tree, Key key);                                    \
+    Tree P##_pool_delete(AVLPool* pool, Tree tree, Key key);                                    \
+    Tree P##_pool_discard(AVLPool* pool, Tree tree, Key key, int* removed);                     \
+    Tree P##_pool_pop_extreme(AVLPool* pool, Tree tree, int last, Key* out_key, int* removed);  \
+    Tree P##_pool_add(AVLPool* pool, Tree tree, Key key, int* inserted);                        \
+    Tree P##_pool_add_finger(AVLPool* pool, Tree tree, Key key, int* inserted);                 \
+    Tree P##_pool_append(AVLPool* pool, Tree tree, Key key, int* inserted);                     \
+    Tree P##_pool_insert_batch(AVLPool* pool, Tree tree, const Key* keys, int n, int* status);  \
+    Tree P##_pool_insert_batch_finger(AVLPool* pool, Tree tree, const Key* keys, int n,         \
+                                      int* status);                                             \
+    Tree P##_pool_delete_batch(AVLPool* pool, Tree tree, const Key* keys, int n, int* status);  \
+    Tree P##_pool_build_sorted(AVLPool* pool, const Key* keys, int n);                          \
+    Tree P##_pool_merge(AVLPool* pool, Tree T1, Tree T2, int* status);                          \
+    void P##_pool_split(AVLPool* pool, Tree T, Key x, Tree* T_small, Tree* T_large,             \
+                        int* status);                                                           \
+    Tree P##_pool_cut_range(AVLPool* pool, Tree tree, const Key* lo, const Key* hi,             \
+                            Tree* out_removed, int* status);                                    \
+    Tree P##_pool_join(AVLPool* pool, Tree T1, Key key, Tree T2);                               \
+    Tree P##_pool_union(AVLPool* pool, Tree T1, Tree T2, int* status);                          \
+    Tree P##_pool_intersection(AVLPool* pool, Tree T1, Tree T2, int* status);                   \
+    Tree P##_pool_difference(AVLPool* pool, Tree T1, Tree T2, int* status);                     \
+    Tree P##_pool_symmetric_difference(AVLPool* pool, Tree T1, Tree T2, int* status);           \
+    void P##_in_order_traverse(Tree tree, P##_traverse_callback callback);                      \
+    Cursor* P##_cursor_create(const Tree tree);                                                 \
+    void P##_cursor_destroy(Cursor* cursor);                                                    \
+    int P##_cursor_seek(Cursor* cursor, Key key);                                               \
+    int P##_cursor_seek_floor(Cursor* cursor, Key key);                                         \
+    int P##_cursor_first(Cursor* cursor);                                                       \
+    int P##_cursor_last(Cursor* cursor);                                                        \
+    int P##_cursor_valid(const Cursor* cursor);                                                 \
+    Key P##_cursor_key(const Cursor* cursor);                                                   \
+    int P##_cursor_next(Cursor* cursor);                                                        \
+    int P##_cursor_prev(Cursor* cursor);                                                        \
+    int P##_cursor_fill(Cursor* cursor, Key* out, int max_n, const Key* limit, int reverse);    \
+    int P##_get_count(const Tree tree);                                                         \
+    int P##_rank(const Tree tree, Key key);                                                     \
+    int P##_select(const Tree tree, int index, Key* out_key);                                   \
+    int P##_count_range(const Tree tree, Key lo, Key hi);                                       \
+    int P##_get_height(const Tree tree);                                                        \
+    long long P##_depth_histogram(const Tree tree, int* hist, int max_depth);
+
+AVL_DECLARE_TYPED_API(avl64, AVLTree64, _Node64, AVLCursor64, int64_t)
+AVL_DECLARE_TYPED_API(avlu64, AVLTreeU64, _NodeU64, AVLCursorU64, uint64_t)
+/* double 键值：NaN 不能作为键值，插入时被忽略，查找时视为不存在；-0.0 与 0.0 视为同一个键值 */
+AVL_DECLARE_TYPED_API(avlf64, AVLTreeF64, _NodeF64, AVLCursorF64, double)
+AVL_DECLARE_TYPED_API(avlb, AVLTreeBytes, _NodeBytes, AVLCursorBytes, AVLBytes)
+
+/* --- 有序映射：每个节点在键值之外还带一个 int64_t 值槽 --- */
+
+/**
+ * @brief 声明一种键值类型的映射API。除了与集合完全相同的整套函数 (新节点的值为0) 之外，还有：
+ *   P_pool_put            插入或覆盖键值对。overwrite 为0时保留已有的值 (用于 setdefault)；
+ *                         inserted 报告结果 (1 新插入，0 已存在，-1 内存分配失败)，
+ *                         键值已存在时原来的值写入 old_value (两者都可为 NULL)。
+ *   P_pool_put_batch      按顺序对每一对调用 P_pool_put (覆盖已有的值)，status 与 P_pool_insert_batch 相同。
+ *   P_pool_pop            删除键值并通过 out_value 取回它的值。
+ *   P_pool_pop_extreme_item  与 P_pool_pop_extreme 相同，但同时通过 out_value 取回值。
+ *   P_get                 按键值取值，找到时返回1。
+ *   P_floor_item          取最后一个 <= key 的键值对，不存在时返回0；P_ceiling_item 取第一个 >= key 的。
+ *   P_cursor_fill_items   与 P_cursor_fill 相同，但同时输出键值和值 (out_keys、out_values 均可为 NULL)。
+ * 值槽对C库来说只是不透明的 64 位整数，如何解释 (整数、double 的位模式或对象句柄) 由调用方决定。
+ */
+#define AVL_DECLARE_MAP_API(P, Tree, NodeTag, Cursor, Key)                                      \
+    AVL_DECLARE_TYPED_API(P, Tree, NodeTag, Cursor, Key)                                        \
+    Tree P##_pool_put(AVLPool* pool, Tree tree, Key key, int64_t value,                         \
+                      int overwrite, int* inserted, int64_t* old_value);                        \
+    Tree P##_pool_put_batch(AVLPool* pool, Tree tree, const Key* keys,                          \
+                            const int64_t* values, int n, int* status);                         \
+    Tree P##_pool_pop(AVLPool* pool, Tree tree, Key key, int* removed, int64_t* out_value);     \
+    Tree P##_pool_pop_extreme_item(AVLPool* pool, Tree tree, int last, Key* out_key,            \
+                                   int64_t* out_value, int* removed);                           \
+    int P##_get(const Tree tree, Key key, int64_t* out_value);                                  \
+    int P##_floor_item(const Tree tree, Key key, Key* out_key, int64_t* out_value);             \
+    int P##_ceiling_item(const Tree tree, Key key, Key* out_key, int64_t* out_value);           \
+    int P##_cursor_fill_items(Cursor* cursor, Key* out_keys, int64_t* out_values,               \
+                              int max_n, const Key* limit, int reverse);
+
+AVL_DECLARE_MAP_API(avlm, AVLMap, _MapNode, AVLMapCursor, int)
+AVL_DECLARE_MAP_API(avlm64, AVLMap64, _MapNode64, AVLMapCursor64, int64_t)
+AVL_DECLARE_MAP_API(avlmu64, AVLMapU64, _MapNodeU64, AVLMapCursorU64, uint64_t)
+AVL_DECLARE_MAP_API(avlmf64, AVLMapF64, _MapNodeF64, AVLMapCursorF64, double)
+AVL_DECLARE_MAP_API(avlmb, AVLMapBytes, _MapNodeBytes, AVLMapCursorBytes, AVLBytes)
+
+/* --- 区间聚合：节点额外保存子树的 int64 和/最小值/最大值，只在单独的实例中生成 --- */
+
+/**
+ * @brief 声明区间聚合函数。P_range_aggregate 以 O(log n) 时间统计键值落在闭区间 [lo, hi] 内的节点的权重
+ * (集合实例为键值本身，映射实例为值)：通过出参写入它们的和 (溢出时按 2^64 取模回绕)、最小值与最大值，
+ * 返回节点个数；个数为0时三个出参都写入0。聚合值在插入、删除、旋转、split/join 与集合运算中自动维护。
+ * P_root_aggregate 与之相同，但统计整棵树，直接读取根节点上的聚合值，代价为 O(1)。
+ * 不带聚合的实例节点中没有这些字段，不占用额外内存。
+ */
+#define AVL_DECLARE_AUGMENTED_API(P, Tree, Key)                                                 \
+    int P##_range_aggregate(const Tree tree, Key lo, Key hi,                                    \
+                            int64_t* out_sum, int64_t* out_min, int64_t* out_max);              \
+    int P##_root_aggregate(const Tree tree, int64_t* out_sum, int64_t* out_min, int64_t* out_max);
+
+/**
+ * @brief 声明计数函数 (带聚合的映射实例)：值槽保存键值的重数，每个不同的键值只占一个节点，
+ * 子树的值之和即其中的元素个数。
+ *   P_pool_add_count       把 key 的重数加上 delta。delta > 0 时键值不存在则插入；结果为0时删除节点；
+ *                          delta == 0 只查询。status 写入1表示成功，0表示键值不存在 (delta <= 0) 或不合法，
+ *                          -1表示内存不足，-2表示结果为负或溢出 (树没有被修改)；out_count 写入操作后的重数。
+ *   P_pool_add_count_runs  依次累加 keys 中的键值，连续相等的一段合并为一次 P_pool_add_count；
+ *                          遇到失败时停止，status 与 P_pool_add_count 相同。
+ */
+#define AVL_DECLARE_COUNT_API(P, Tree, Key)                                                     \
+    Tree P##_pool_add_count(AVLPool* pool, Tree tree, Key key, int64_t delta, int* status,      \
+                            int64_t* out_count);                                                \
+    Tree P##_pool_add_count_runs(AVLPool* pool, Tree tree, const Key* keys, int n, int* status);
+
+AVL_DECLARE_TYPED_API(avlsum, AVLTreeSum, _NodeSum, AVLCursorSum, int)
+AVL_DECLARE_AUGMENTED_API(avlsum, AVLTreeSum, int)
+AVL_DECLARE_MAP_API(avlmsum64, AVLMapSum64, _MapNodeSum64, AVLMapCursorSum64, int64_t)
+AVL_DECLARE_AUGMENTED_API(avlmsum64, AVLMapSum64, int64_t)
+AVL_DECLARE_COUNT_API(avlmsum64, AVLMapSum64, int64_t)
+
+/* --- 冻结树：只读的 Eytzinger 布局，只为定长键值生成 --- */
+
+/**
+ * @brief 声明一种定长键值类型的冻结树API。冻结树是一个 Key 数组 a，n 个键值按 Eytzinger 顺序
+ * (完全二叉树的层序，下标 k 的孩子为 2k 与 2k+1，a[k-1] 存放下标 k 的键值) 存放，由调用方分配与持有。
+ *   P_frozen_build         把 n 个严格递增的键值 sorted 排列为 Eytzinger 顺序写入 out。
+ *   P_frozen_is_valid      检查 a 是否为严格递增 (且合法) 的键值排列成的 Eytzinger 数组，O(n)。
+ *   P_frozen_search        无分支、带预取的查找，找到时返回1。
+ *   P_frozen_search_batch  批量查找，多个查询交错推进以重叠缓存未命中；out[i] 为 0 或 1。
+ *   P_frozen_rank          返回小于 key (inclusive 非0时为小于等于) 的键值个数。
+ *   P_frozen_fill          从排名 start 开始依次输出 count 个键值 (reverse 非0时排名递减)，
+ *                          调用方保证所有排名都在 [0, n) 内。
+ */
+#define AVL_DECLARE_FROZEN_API(P, Key)                                                          \
+    void P##_frozen_build(const Key* sorted, Key* out, int n);                                  \
+    int P##_frozen_is_valid(const Key* a, int n);                                               \
+    int P##_frozen_search(const Key* a, int n, Key key);                                        \
+    void P##_frozen_search_batch(const Key* a, int n, const Key* keys, int m, unsigned char* out); \
+    int P##_frozen_rank(const Key* a, int n, Key key, int inclusive);                           \
+    void P##_frozen_fill(const Key* a, int n, int start, int count, Key* out, int reverse);
+
+AVL_DECLARE_FROZEN_API(avl, int)
+AVL_DECLARE_FROZEN_API(avl64, int64_t)
+AVL_DECLARE_FROZEN_API(avlu64, uint64_t)
+AVL_DECLARE_FROZEN_API(avlf64, double)
+
+/* --- 字节串键值的打包格式：每个键值为 4 字节小端长度 + 内容，依次紧密排列 --- */
+
+/**
+ * @brief 计算把整棵树按升序打包所需的字节数。
+ */
+size_t avlb_packed_size(const AVLTreeBytes tree);
+
+/**
+ * @brief 把整棵树的键值按升序打包写入 out，out 的长度至少为 avlb_packed_size(tree)。
+ */
+void avlb_pack(const AVLTreeBytes tree, unsigned char* out);
+
+/**
+ * @brief 解析打包缓冲区中的 n 个键值，把指向缓冲区内部的描述符写入 out (不复制内容)。
+ * @return 缓冲区恰好由 n 个完整的键值组成时返回1，否则返回0。
+ */
+int avlb_unpack(const unsigned char* packed, size_t nbytes, AVLBytes* out, int n);
+
+#endif /* AVLTREE_H */
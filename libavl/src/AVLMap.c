@@ -0,0 +1,15 @@
+/* File: AVLMap.c */
+
+// int 键值的映射实例 (avlm_* 系列函数)，每个节点带一个 int64_t 值槽
+
+#include "AVLTree.h"
+
+#define AVL_KEY_T int
+#define AVL_VALUE_T int64_t
+#define AVL_PREFIX avlm
+#define AVL_TREE_T AVLMap
+#define AVL_NODE_TAG _MapNode
+#define AVL_CURSOR_T AVLMapCursor
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%d", (key))
+
+#include "avl_template.h"
@@ -0,0 +1,17 @@
+/* File: AVLMap64.c */
+
+// int64_t 键值的映射实例 (avlm64_* 系列函数)，每个节点带一个 int64_t 值槽
+
+#include "AVLTree.h"
+
+#include <inttypes.h>
+
+#define AVL_KEY_T int64_t
+#define AVL_VALUE_T int64_t
+#define AVL_PREFIX avlm64
+#define AVL_TREE_T AVLMap64
+#define AVL_NODE_TAG _MapNode64
+#define AVL_CURSOR_T AVLMapCursor64
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%" PRId64, (key))
+
+#include "avl_template.h"
@@ -0,0 +1,13 @@
+/* File: AVLMapBytes.c */
+
+// 字节串键值的映射实例 (avlmb_* 系列函数)，每个节点带一个 int64_t 值槽
+
+#include "avl_bytes_key.h"
+
+#define AVL_VALUE_T int64_t
+#define AVL_PREFIX avlmb
+#define AVL_TREE_T AVLMapBytes
+#define AVL_NODE_TAG _MapNodeBytes
+#define AVL_CURSOR_T AVLMapCursorBytes
+
+#include "avl_template.h"
@@ -0,0 +1,17 @@
+/* File: AVLMapF64.c */
+
+// double 键值的映射实例 (avlmf64_* 系列函数)，每个节点带一个 int64_t 值槽
+
+#include "AVLTree.h"
+
+#define AVL_KEY_T double
+#define AVL_VALUE_T int64_t
+#define AVL_PREFIX avlmf64
+#define AVL_TREE_T AVLMapF64
+#define AVL_NODE_TAG _MapNodeF64
+#define AVL_CURSOR_T AVLMapCursorF64
+// NaN 不允许作为键值，原因同 AVLTreeF64.c
+#define AVL_KEY_VALID(key) ((key) == (key))
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%.17g", (key))
+
+#include "avl_template.h"
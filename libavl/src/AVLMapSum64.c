@@ -0,0 +1,18 @@
+/* File: AVLMapSum64.c */
+
+// 带区间聚合的 int64_t 键值映射实例 (avlmsum64_* 系列函数)：每个节点额外保存子树中值的和/最小值/最大值
+
+#include "AVLTree.h"
+
+#include <inttypes.h>
+
+#define AVL_KEY_T int64_t
+#define AVL_VALUE_T int64_t
+#define AVL_AUGMENT
+#define AVL_PREFIX avlmsum64
+#define AVL_TREE_T AVLMapSum64
+#define AVL_NODE_TAG _MapNodeSum64
+#define AVL_CURSOR_T AVLMapCursorSum64
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%" PRId64, (key))
+
+#include "avl_template.h"
@@ -0,0 +1,17 @@
+/* File: AVLMapU64.c */
+
+// uint64_t 键值的映射实例 (avlmu64_* 系列函数)，每个节点带一个 int64_t 值槽
+
+#include "AVLTree.h"
+
+#include <inttypes.h>
+
+#define AVL_KEY_T uint64_t
+#define AVL_VALUE_T int64_t
+#define AVL_PREFIX avlmu64
+#define AVL_TREE_T AVLMapU64
+#define AVL_NODE_TAG _MapNodeU64
+#define AVL_CURSOR_T AVLMapCursorU64
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%" PRIu64, (key))
+
+#include "avl_template.h"
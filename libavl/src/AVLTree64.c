@@ -0,0 +1,17 @@
+/* File: AVLTree64.c */
+
+// int64_t 键值的实例 (avl64_* 系列函数)，用于 64 位 id、纳秒时间戳等
+
+#include "AVLTree.h"
+
+#include <inttypes.h>
+
+#define AVL_KEY_T int64_t
+#define AVL_PREFIX avl64
+#define AVL_TREE_T AVLTree64
+#define AVL_NODE_TAG _Node64
+#define AVL_CURSOR_T AVLCursor64
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%" PRId64, (key))
+
+#include "avl_template.h"
+#include "avl_frozen.h"
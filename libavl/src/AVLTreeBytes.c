@@ -0,0 +1,59 @@
+/* File: AVLTreeBytes.c */
+
+// 字节串键值的实例 (avlb_* 系列函数)，按 memcmp 的字典序排序，较短的前缀排在前面。
+// 每个节点持有键值内容的一份 malloc 副本；使用内存池时，池只负责节点本身。
+
+#include "avl_bytes_key.h"
+
+#define AVL_PREFIX avlb
+#define AVL_TREE_T AVLTreeBytes
+#define AVL_NODE_TAG _NodeBytes
+#define AVL_CURSOR_T AVLCursorBytes
+
+#include "avl_template.h"
+
+
+/* --- 打包格式：每个键值为 4 字节小端长度 + 内容，依次紧密排列 --- */
+
+static size_t _packed_size_recursive(const _Node* node) {
+    if (node == NULL) return 0;
+    return _packed_size_recursive(node->left) + 4 + node->key.len + _packed_size_recursive(node->right);
+}
+
+static unsigned char* _pack_recursive(const _Node* node, unsigned char* out) {
+    if (node == NULL) return out;
+    out = _pack_recursive(node->left, out);
+    size_t len = node->key.len;
+    out[0] = (unsigned char)(len & 0xff);
+    out[1] = (unsigned char)((len >> 8) & 0xff);
+    out[2] = (unsigned char)((len >> 16) & 0xff);
+    out[3] = (unsigned char)((len >> 24) & 0xff);
+    memcpy(out + 4, node->key.data, len);
+    return _pack_recursive(node->right, out + 4 + len);
+}
+
+size_t avlb_packed_size(const AVLTreeBytes tree) {
+    return _packed_size_recursive(tree);
+}
+
+void avlb_pack(const AVLTreeBytes tree, unsigned char* out) {
+    _pack_recursive(tree, out);
+}
+
+int avlb_unpack(const unsigned char* packed, size_t nbytes, AVLBytes* out, int n) {
+    size_t pos = 0;
+    for (int i = 0; i < n; i++) {
+        if (nbytes - pos < 4) return 0;
+        size_t len = (size_t)packed[pos]
+                   | (size_t)packed[pos + 1] << 8
+                   | (size_t)packed[pos + 2] << 16
+                   | (size_t)packed[pos + 3] << 24;
+        pos += 4;
+        if (nbytes - pos < len) return 0;
+        out[i].data = packed + pos;
+        out[i].len = len;
+        pos += len;
+    }
+    // 必须恰好用完整个缓冲区
+    return pos == nbytes;
+}
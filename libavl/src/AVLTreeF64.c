@@ -0,0 +1,17 @@
+/* File: AVLTreeF64.c */
+
+// double 键值的实例 (avlf64_* 系列函数)
+
+#include "AVLTree.h"
+
+#define AVL_KEY_T double
+#define AVL_PREFIX avlf64
+#define AVL_TREE_T AVLTreeF64
+#define AVL_NODE_TAG _NodeF64
+#define AVL_CURSOR_T AVLCursorF64
+// NaN 与任何值比较都为假，会破坏全序关系，因此不允许作为键值 (插入时被忽略，查找时视为不存在)
+#define AVL_KEY_VALID(key) ((key) == (key))
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%.17g", (key))
+
+#include "avl_template.h"
+#include "avl_frozen.h"
@@ -0,0 +1,15 @@
+/* File: AVLTreeSum.c */
+
+// 带区间聚合的 int 键值实例 (avlsum_* 系列函数)：每个节点额外保存子树中键值的和/最小值/最大值
+
+#include "AVLTree.h"
+
+#define AVL_KEY_T int
+#define AVL_AUGMENT
+#define AVL_PREFIX avlsum
+#define AVL_TREE_T AVLTreeSum
+#define AVL_NODE_TAG _NodeSum
+#define AVL_CURSOR_T AVLCursorSum
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%d", (key))
+
+#include "avl_template.h"
@@ -0,0 +1,17 @@
+/* File: AVLTreeU64.c */
+
+// uint64_t 键值的实例 (avlu64_* 系列函数)，用于 64 位哈希值等无符号键值
+
+#include "AVLTree.h"
+
+#include <inttypes.h>
+
+#define AVL_KEY_T uint64_t
+#define AVL_PREFIX avlu64
+#define AVL_TREE_T AVLTreeU64
+#define AVL_NODE_TAG _NodeU64
+#define AVL_CURSOR_T AVLCursorU64
+#define AVL_KEY_FORMAT(buf, size, key) snprintf((buf), (size), "%" PRIu64, (key))
+
+#include "avl_template.h"
+#include "avl_frozen.h"
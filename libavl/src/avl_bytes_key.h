@@ -0,0 +1,51 @@
+/* File: avl_bytes_key.h */
+
+// 字节串键值的比较、复制与打印，由字节串集合 (AVLTreeBytes.c) 与字节串映射 (AVLMapBytes.c) 两个实例共用。
+// 同时定义了模板中与键值有关的参数，实例文件只需再给出名字相关的参数。
+
+#include "AVLTree.h"
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+/* --- 键值操作 --- */
+
+static int _bytes_cmp(AVLBytes a, AVLBytes b) {
+    size_t n = a.len < b.len ? a.len : b.len;
+    int cmp = n > 0 ? memcmp(a.data, b.data, n) : 0;
+    if (cmp != 0) return cmp;
+    return (a.len > b.len) - (a.len < b.len);
+}
+
+// 把键值内容复制一份存入节点；即使是空串也分配 1 个字节，保证 data 永远不为 NULL
+static int _bytes_copy(AVLBytes* dst, AVLBytes src) {
+    unsigned char* data = (unsigned char*)malloc(src.len > 0 ? src.len : 1);
+    if (data == NULL) return 0;
+    if (src.len > 0) memcpy(data, src.data, src.len);
+    dst->data = data;
+    dst->len = src.len;
+    return 1;
+}
+
+// 以 b'...' 的形式打印，不可打印的字节转义为 \xNN，过长的键值只显示前 32 个字节
+static void _bytes_format(char* buf, size_t size, AVLBytes key) {
+    size_t shown = key.len < 32 ? key.len : 32;
+    size_t pos = 0;
+    pos += snprintf(buf + pos, size - pos, "b'");
+    for (size_t i = 0; i < shown && pos < size; i++) {
+        unsigned char c = key.data[i];
+        if (c >= 0x20 && c < 0x7f && c != '\'' && c != '\\') {
+            pos += snprintf(buf + pos, size - pos, "%c", c);
+        } else {
+            pos += snprintf(buf + pos, size - pos, "\\x%02x", c);
+        }
+    }
+    if (pos < size) snprintf(buf + pos, size - pos, key.len > shown ? "'..." : "'");
+}
+
+#define AVL_KEY_T AVLBytes
+#define AVL_CMP(a, b) _bytes_cmp((a), (b))
+#define AVL_KEY_INIT(dst, src) _bytes_copy(&(dst), (src))
+#define AVL_KEY_DESTROY(key) free((void*)(key).data)
+#define AVL_KEY_FORMAT(buf, size, key) _bytes_format((buf), (size), (key))
@@ -0,0 +1,141 @@
+/* File: avl_frozen.h */
+
+// 冻结树 (只读、Eytzinger 布局的有序数组) 的实现模板。
+// 定长键值的实例在包含 avl_template.h 之后再包含本文件，生成以 AVL_PREFIX 为前缀的 frozen_* 函数。
+//
+// Eytzinger 布局把 n 个键值组成的完全二叉树按层序存放：下标 k (从 1 开始) 的孩子是 2k 与 2k+1，
+// 键值存放在 a[k - 1] 中。查找的每一步只是 k = 2k + (a[k-1] < key)，没有分支，
+// 最上面几层总在缓存中，而几层之后要访问的缓存行可以提前预取。
+// 中序位置 (排名) 与下标之间可以 O(1) 互相换算 (见 _frozen_index 与 _frozen_rank_of)，
+// 因此排名、按位置取值与区间扫描都不需要额外的数组。
+
+// 一个缓存行能容纳的键值个数：下标 k 往下第 log2(_FROZEN_BLOCK) 层的节点恰好落在同一行附近
+#define _FROZEN_BLOCK (64 / sizeof(AVL_KEY_T))
+// 批量查找时交错推进的查询个数，让多次缓存未命中同时进行
+#define _FROZEN_LANES 8
+
+#if defined(__GNUC__) || defined(__clang__)
+#define _FROZEN_PREFETCH(addr) __builtin_prefetch((addr))
+#else
+#define _FROZEN_PREFETCH(addr) ((void)0)
+#endif
+
+// 二进制位数 (x > 0) 与末尾 0 的个数 (x > 0)
+#if defined(__GNUC__) || defined(__clang__)
+static unsigned _frozen_bit_length(unsigned x) { return 32u - (unsigned)__builtin_clz(x); }
+static unsigned _frozen_ctz(unsigned x) { return (unsigned)__builtin_ctz(x); }
+#else
+static unsigned _frozen_bit_length(unsigned x) {
+    unsigned bits = 0;
+    while (x) { bits++; x >>= 1; }
+    return bits;
+}
+static unsigned _frozen_ctz(unsigned x) {
+    unsigned zeros = 0;
+    while (!(x & 1u)) { zeros++; x >>= 1; }
+    return zeros;
+}
+#endif
+
+// 把 n 个节点看作一棵 L 层的满二叉树去掉最底层右侧的若干个叶子：
+// 最底层共有 2^(L-1) 个位置，其中前 leaves 个存在。满二叉树中第 t 个叶子的中序位置是 2t。
+
+// 排名 r (0 <= r < n) 对应的下标
+static unsigned _frozen_index(unsigned n, unsigned r) {
+    unsigned levels = _frozen_bit_length(n);
+    unsigned leaves = n - (1u << (levels - 1)) + 1;
+    // 前 2*leaves 个中序位置都存在；此后只剩内部节点，即满二叉树中的奇数位置
+    unsigned pos = r < 2 * leaves ? r : 2 * r - 2 * leaves + 1;
+    unsigned p1 = pos + 1;
+    unsigned tz = _frozen_ctz(p1);              // 节点离最底层的高度
+    return (1u << (levels - 1 - tz)) + (p1 >> (tz + 1));
+}
+
+// 下标 k (1 <= k <= n) 的排名
+static unsigned _frozen_rank_of(unsigned n, unsigned k) {
+    unsigned levels = _frozen_bit_length(n);
+    unsigned half = 1u << (levels - 1);
+    unsigned leaves = n - half + 1;
+    unsigned depth = _frozen_bit_length(k) - 1;
+    unsigned pos = ((2 * (k - (1u << depth)) + 1) << (levels - 1 - depth)) - 1;
+    // 减去中序位置在它之前、但实际不存在的叶子
+    unsigned before = (pos + 1) / 2;
+    if (before > half) before = half;
+    return before > leaves ? pos - (before - leaves) : pos;
+}
+
+// 返回第一个 > key (inclusive 为假时为 >= key) 的键值的下标，不存在时返回 0。
+// 循环体没有分支：cmp < inclusive 在 inclusive 为 0 时即 a < key，为 1 时即 a <= key。
+static unsigned _frozen_bound(const AVL_KEY_T* a, unsigned n, AVL_KEY_T key, int inclusive) {
+    unsigned k = 1;
+    while (k <= n) {
+        _FROZEN_PREFETCH(a + _FROZEN_BLOCK * k);
+        k = 2 * k + (AVL_CMP(a[k - 1], key) < inclusive);
+    }
+    // 去掉末尾连续的 1 (最后几次向右走) 以及再上一位，剩下的就是最后一次向左走时所在的节点
+    return k >> (_frozen_ctz(~k) + 1);
+}
+
+void AVL_FN(frozen_build)(const AVL_KEY_T* sorted, AVL_KEY_T* out, int n) {
+    for (int r = 0; r < n; r++) {
+        out[_frozen_index((unsigned)n, (unsigned)r) - 1] = sorted[r];
+    }
+}
+
+int AVL_FN(frozen_is_valid)(const AVL_KEY_T* a, int n) {
+    if (n <= 0) return 1;
+    AVL_KEY_T prev = a[_frozen_index((unsigned)n, 0) - 1];
+    if (!AVL_KEY_VALID(prev)) return 0;
+    for (int r = 1; r < n; r++) {
+        AVL_KEY_T key = a[_frozen_index((unsigned)n, (unsigned)r) - 1];
+        if (!AVL_KEY_VALID(key) || AVL_CMP(prev, key) >= 0) return 0;
+        prev = key;
+    }
+    return 1;
+}
+
+int AVL_FN(frozen_search)(const AVL_KEY_T* a, int n, AVL_KEY_T key) {
+    if (n <= 0 || !AVL_KEY_VALID(key)) return 0;
+    unsigned k = _frozen_bound(a, (unsigned)n, key, 0);
+    return k != 0 && AVL_CMP(a[k - 1], key) == 0;
+}
+
+void AVL_FN(frozen_search_batch)(const AVL_KEY_T* a, int n, const AVL_KEY_T* keys, int m, unsigned char* out) {
+    if (n <= 0) {
+        memset(out, 0, (size_t)(m > 0 ? m : 0));
+        return;
+    }
+    unsigned levels = _frozen_bit_length((unsigned)n);
+    for (int i = 0; i < m; i += _FROZEN_LANES) {
+        int lanes = m - i < _FROZEN_LANES ? m - i : _FROZEN_LANES;
+        unsigned k[_FROZEN_LANES];
+        for (int l = 0; l < lanes; l++) k[l] = 1;
+        // 一次推进所有查询的同一层，它们的缓存未命中可以并行；只有最后一层可能有查询提前走出数组
+        for (unsigned level = 0; level < levels; level++) {
+            for (int l = 0; l < lanes; l++) {
+                unsigned j = k[l];
+                if (j <= (unsigned)n) {
+                    _FROZEN_PREFETCH(a + _FROZEN_BLOCK * j);
+                    k[l] = 2 * j + (AVL_CMP(a[j - 1], keys[i + l]) < 0);
+                }
+            }
+        }
+        for (int l = 0; l < lanes; l++) {
+            unsigned j = k[l] >> (_frozen_ctz(~k[l]) + 1);
+            out[i + l] = (unsigned char)(AVL_KEY_VALID(keys[i + l]) && j != 0 && AVL_CMP(a[j - 1], keys[i + l]) == 0);
+        }
+    }
+}
+
+int AVL_FN(frozen_rank)(const AVL_KEY_T* a, int n, AVL_KEY_T key, int inclusive) {
+    if (n <= 0 || !AVL_KEY_VALID(key)) return 0;
+    unsigned k = _frozen_bound(a, (unsigned)n, key, inclusive != 0);
+    return k == 0 ? n : (int)_frozen_rank_of((unsigned)n, k);
+}
+
+void AVL_FN(frozen_fill)(const AVL_KEY_T* a, int n, int start, int count, AVL_KEY_T* out, int reverse) {
+    for (int i = 0; i < count; i++) {
+        int r = reverse ? start - i : start + i;
+        out[i] = a[_frozen_index((unsigned)n, (unsigned)r) - 1];
+    }
+}
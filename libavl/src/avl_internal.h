@@ -0,0 +1,61 @@
+/* File: avl_internal.h */
+
+// 各键值类型的实例共享的内部接口，不对外暴露
+
+#ifndef AVL_INTERNAL_H
+#define AVL_INTERNAL_H
+
+#include "AVLTree.h"
+
+/**
+ * @brief 从内存池中分配一个 node_size 字节的节点。
+ * 一个池在被清空之前只能服务于一种节点布局，node_size 与之前的分配不一致时返回 NULL。
+ * @return 返回未初始化的节点内存；内存分配失败时返回 NULL。
+ */
+void* avl_pool_alloc_raw(AVLPool* pool, size_t node_size);
+
+/**
+ * @brief 把一个节点归还到池的空闲链表中 (借用节点的第一个指针字段作为链接)。
+ */
+void avl_pool_free_raw(AVLPool* pool, void* node);
+
+/* --- 节点引用计数：快照与树共享节点，计数可能在不同线程中同时被修改，因此使用原子操作 --- */
+
+/**
+ * @brief 进程中引用计数大于 1 (与快照共享) 的节点个数，由各实例在计数跨过 1 时维护。
+ * 为 0 时任何修改都不需要复制节点，也就不会因为复制而失败。
+ */
+extern long avl_shared_nodes;
+
+#if defined(_MSC_VER)
+#include <intrin.h>
+#define AVL_REF_INC(p) ((int)_InterlockedIncrement((volatile long*)(p)))
+#define AVL_REF_DEC(p) ((int)_InterlockedDecrement((volatile long*)(p)))
+#define AVL_REF_LOAD(p) (*(volatile int*)(p))
+#define AVL_SHARED_ADD(d) ((void)_InterlockedExchangeAdd(&avl_shared_nodes, (d)))
+#define AVL_SHARED_LOAD() (*(volatile long*)&avl_shared_nodes)
+#else
+#define AVL_REF_INC(p) __atomic_add_fetch((p), 1, __ATOMIC_RELAXED)
+#define AVL_REF_DEC(p) __atomic_sub_fetch((p), 1, __ATOMIC_ACQ_REL)
+#define AVL_REF_LOAD(p) __atomic_load_n((p), __ATOMIC_RELAXED)
+#define AVL_SHARED_ADD(d) ((void)__atomic_add_fetch(&avl_shared_nodes, (d), __ATOMIC_RELAXED))
+#define AVL_SHARED_LOAD() __atomic_load_n(&avl_shared_nodes, __ATOMIC_RELAXED)
+#endif
+
+/* --- 操作计数：只有定义了 AVL_STATS 时 AVL_STAT_INC/AVL_STAT_ADD 才会展开为原子累加，否则没有任何开销 --- */
+
+#ifdef AVL_STATS
+extern AVLStats avl_stats_counters;
+#if defined(_MSC_VER)
+#define AVL_STAT_ADD(field, n) \
+    ((void)_InterlockedExchangeAdd64((volatile long long*)&avl_stats_counters.field, (long long)(n)))
+#else
+#define AVL_STAT_ADD(field, n) ((void)__atomic_add_fetch(&avl_stats_counters.field, (n), __ATOMIC_RELAXED))
+#endif
+#define AVL_STAT_INC(field) AVL_STAT_ADD(field, 1)
+#else
+#define AVL_STAT_ADD(field, n) ((void)0)
+#define AVL_STAT_INC(field) ((void)0)
+#endif
+
+#endif /* AVL_INTERNAL_H */
@@ -0,0 +1,120 @@
+#include "avl_internal.h"
+
+#include <stdlib.h>
+
+/* --- 内部定义 --- */
+
+// 保证块内的节点数组满足任何节点布局的对齐要求
+typedef union _PoolAlign {
+    void* p;
+    long long ll;
+    double d;
+} _PoolAlign;
+
+// 内存池中的一块连续内存，节点从中按顺序切分出来
+typedef struct _PoolChunk {
+    struct _PoolChunk* next;
+    size_t capacity;        // 本块可容纳的节点数
+    _PoolAlign nodes[];     // 实际长度为 capacity * node_size 字节
+} _PoolChunk;
+
+// 节点内存池：按块分配，释放的节点通过其第一个指针字段串成空闲链表以供复用
+struct AVLPool {
+    _PoolChunk* chunks;     // 所有已分配的块，最新的块在表头
+    size_t used;            // 最新的块中已切分出去的节点数
+    void* free_list;        // 已释放、可复用的节点
+    size_t node_size;       // 本池服务的节点大小，0 表示尚未确定
+    size_t live_nodes;      // 当前正在使用的节点数
+    size_t reserved_bytes;  // 所有块占用的总字节数
+};
+
+// 内存池的块从 _POOL_MIN_CHUNK 个节点开始按倍数增长，直到 _POOL_MAX_CHUNK 个节点
+#define _POOL_MIN_CHUNK 64
+#define _POOL_MAX_CHUNK 65536
+
+
+/* --- 供各键值类型实例使用的内部接口 --- */
+
+long avl_shared_nodes = 0;
+
+void* avl_pool_alloc_raw(AVLPool* pool, size_t node_size) {
+    if (pool->node_size == 0) {
+        pool->node_size = node_size;
+    } else if (pool->node_size != node_size) {
+        return NULL;
+    }
+
+    void* node = pool->free_list;
+    if (node != NULL) {
+        pool->free_list = *(void**)node;
+    } else {
+        if (pool->chunks == NULL || pool->used == pool->chunks->capacity) {
+            size_t capacity = pool->chunks ? pool->chunks->capacity * 2 : _POOL_MIN_CHUNK;
+            if (capacity > _POOL_MAX_CHUNK) capacity = _POOL_MAX_CHUNK;
+
+            size_t bytes = sizeof(_PoolChunk) + capacity * node_size;
+            _PoolChunk* chunk = (_PoolChunk*)malloc(bytes);
+            if (chunk == NULL) return NULL;
+            chunk->next = pool->chunks;
+            chunk->capacity = capacity;
+            pool->chunks = chunk;
+            pool->used = 0;
+            pool->reserved_bytes += bytes;
+        }
+        node = (unsigned char*)pool->chunks->nodes + pool->used++ * node_size;
+    }
+    pool->live_nodes++;
+    return node;
+}
+
+void avl_pool_free_raw(AVLPool* pool, void* node) {
+    *(void**)node = pool->free_list;
+    pool->free_list = node;
+    pool->live_nodes--;
+}
+
+
+/* --- 公共API函数的实现 --- */
+
+AVLPool* avl_pool_create(void) {
+    AVLPool* pool = (AVLPool*)malloc(sizeof(AVLPool));
+    if (pool == NULL) return NULL;
+    pool->chunks = NULL;
+    pool->used = 0;
+    pool->free_list = NULL;
+    pool->node_size = 0;
+    pool->live_nodes = 0;
+    pool->reserved_bytes = 0;
+    return pool;
+}
+
+void avl_pool_clear(AVLPool* pool) {
+    // 按块整体释放，代价只与块数有关，与节点数无关；池中仍在使用的节点同样计为被释放
+    AVL_STAT_ADD(node_frees, pool->live_nodes);
+    _PoolChunk* chunk = pool->chunks;
+    while (chunk != NULL) {
+        _PoolChunk* next = chunk->next;
+        free(chunk);
+        chunk = next;
+    }
+    pool->chunks = NULL;
+    pool->used = 0;
+    pool->free_list = NULL;
+    pool->node_size = 0;    // 清空后的池可以改为服务另一种键值类型
+    pool->live_nodes = 0;
+    pool->reserved_bytes = 0;
+}
+
+void avl_pool_destroy(AVLPool* pool) {
+    if (pool == NULL) return;
+    avl_pool_clear(pool);
+    free(pool);
+}
+
+size_t avl_pool_live_nodes(const AVLPool* pool) {
+    return pool->live_nodes;
+}
+
+size_t avl_pool_reserved_bytes(const AVLPool* pool) {
+    return pool->reserved_bytes;
+}
@@ -0,0 +1,88 @@
+/* File: avl_rwlock.c */
+
+// 读写锁的跨平台实现：POSIX 上使用 pthread_rwlock_t，Windows 上使用 SRWLOCK (无需销毁)
+
+#if defined(__linux__) && !defined(_GNU_SOURCE)
+#define _GNU_SOURCE     // pthread_rwlockattr_setkind_np
+#endif
+
+#include "AVLTree.h"
+
+#include <stdlib.h>
+
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <pthread.h>
+#endif
+
+struct AVLRWLock {
+#ifdef _WIN32
+    SRWLOCK lock;
+#else
+    pthread_rwlock_t lock;
+#endif
+};
+
+AVLRWLock* avl_rwlock_create(void) {
+    AVLRWLock* rw = (AVLRWLock*)malloc(sizeof(AVLRWLock));
+    if (rw == NULL) return NULL;
+#ifdef _WIN32
+    InitializeSRWLock(&rw->lock);
+#else
+    pthread_rwlockattr_t attr;
+    pthread_rwlockattr_init(&attr);
+#if defined(__GLIBC__)
+    // glibc 默认读者优先：读者持续重叠时写者会被饿死。改为写者优先；
+    // 这要求同一线程不重复获取读锁，Python 层已经保证了这一点。其他平台的默认实现本身就不会饿死写者。
+    pthread_rwlockattr_setkind_np(&attr, PTHREAD_RWLOCK_PREFER_WRITER_NONRECURSIVE_NP);
+#endif
+    int failed = pthread_rwlock_init(&rw->lock, &attr);
+    pthread_rwlockattr_destroy(&attr);
+    if (failed) {
+        free(rw);
+        return NULL;
+    }
+#endif
+    return rw;
+}
+
+void avl_rwlock_destroy(AVLRWLock* rw) {
+    if (rw == NULL) return;
+#ifndef _WIN32
+    pthread_rwlock_destroy(&rw->lock);
+#endif
+    free(rw);
+}
+
+void avl_rwlock_read_lock(AVLRWLock* rw) {
+#ifdef _WIN32
+    AcquireSRWLockShared(&rw->lock);
+#else
+    pthread_rwlock_rdlock(&rw->lock);
+#endif
+}
+
+void avl_rwlock_read_unlock(AVLRWLock* rw) {
+#ifdef _WIN32
+    ReleaseSRWLockShared(&rw->lock);
+#else
+    pthread_rwlock_unlock(&rw->lock);
+#endif
+}
+
+void avl_rwlock_write_lock(AVLRWLock* rw) {
+#ifdef _WIN32
+    AcquireSRWLockExclusive(&rw->lock);
+#else
+    pthread_rwlock_wrlock(&rw->lock);
+#endif
+}
+
+void avl_rwlock_write_unlock(AVLRWLock* rw) {
+#ifdef _WIN32
+    ReleaseSRWLockExclusive(&rw->lock);
+#else
+    pthread_rwlock_unlock(&rw->lock);
+#endif
+}
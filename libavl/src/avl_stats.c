@@ -0,0 +1,57 @@
+/* File: avl_stats.c */
+
+// 所有键值类型共用的操作计数。只有定义了 AVL_STATS 时各实例才会累加 (见 avl_internal.h 中的 AVL_STAT_INC)。
+
+#include "avl_internal.h"
+
+#include <string.h>
+
+#ifdef AVL_STATS
+
+AVLStats avl_stats_counters;
+
+#if defined(_MSC_VER)
+#define _STAT_LOAD(field) ((uint64_t)_InterlockedOr64((volatile long long*)&avl_stats_counters.field, 0))
+#define _STAT_CLEAR(field) ((void)_InterlockedExchange64((volatile long long*)&avl_stats_counters.field, 0))
+#else
+#define _STAT_LOAD(field) __atomic_load_n(&avl_stats_counters.field, __ATOMIC_RELAXED)
+#define _STAT_CLEAR(field) __atomic_store_n(&avl_stats_counters.field, 0, __ATOMIC_RELAXED)
+#endif
+
+int avl_stats_enabled(void) {
+    return 1;
+}
+
+void avl_stats_get(AVLStats* out) {
+    // 各字段分别读取，其他线程同时在修改树时得到的不是同一时刻的一致快照
+    out->comparisons = _STAT_LOAD(comparisons);
+    out->single_rotations = _STAT_LOAD(single_rotations);
+    out->double_rotations = _STAT_LOAD(double_rotations);
+    out->node_allocs = _STAT_LOAD(node_allocs);
+    out->node_frees = _STAT_LOAD(node_frees);
+    out->rebalance_early_exits = _STAT_LOAD(rebalance_early_exits);
+}
+
+void avl_stats_reset(void) {
+    _STAT_CLEAR(comparisons);
+    _STAT_CLEAR(single_rotations);
+    _STAT_CLEAR(double_rotations);
+    _STAT_CLEAR(node_allocs);
+    _STAT_CLEAR(node_frees);
+    _STAT_CLEAR(rebalance_early_exits);
+}
+
+#else
+
+int avl_stats_enabled(void) {
+    return 0;
+}
+
+void avl_stats_get(AVLStats* out) {
+    memset(out, 0, sizeof(AVLStats));
+}
+
+void avl_stats_reset(void) {
+}
+
+#endif /* AVL_STATS */
@@ -0,0 +1,1830 @@
+/* File: avl_template.h */
+
+// AVL 树的实现模板。每种键值类型对应一个 .c 文件：先定义下面的宏，再包含本文件，
+// 即可生成一整套以 AVL_PREFIX 为前缀的公共函数 (例如 avl_insert、avl64_insert)。
+//
+// 必须定义的宏：
+//   AVL_KEY_T                      键值的 C 类型
+//   AVL_PREFIX                     公共函数名的前缀 (avl、avl64 ...)
+//   AVL_TREE_T                     树句柄类型 (AVLTree、AVLTree64 ...)
+//   AVL_NODE_TAG                   节点结构体的标签，与头文件中的前向声明一致
+//   AVL_CURSOR_T                   游标类型 (AVLCursor、AVLCursor64 ...)
+//   AVL_KEY_FORMAT(buf, size, key) 把键值格式化为可读文本，用于可视化打印
+// 可选的宏：
+//   AVL_CMP(a, b)                  三路比较，返回负数、0 或正数；默认使用 < 与 >
+//   AVL_KEY_VALID(key)             键值是否合法 (例如 double 的 NaN 不合法)；默认恒为真
+//   AVL_KEY_INIT(dst, src)         把键值存入新节点，失败时求值为 0；默认直接赋值
+//   AVL_KEY_DESTROY(key)           释放节点持有的键值资源；默认什么都不做
+//   AVL_VALUE_T                    定义后每个节点额外带一个值槽，并生成有序映射 (map) 的附加函数
+//   AVL_AUGMENT                    定义后每个节点额外保存子树的 int64 和/最小值/最大值，并生成 range_aggregate；
+//                                  聚合的是值槽 (映射实例) 或键值 (集合实例)，两者都必须是整数类型
+
+#include "avl_internal.h"
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define _AVL_CAT2(a, b) a##_##b
+#define _AVL_CAT(a, b) _AVL_CAT2(a, b)
+#define AVL_FN(name) _AVL_CAT(AVL_PREFIX, name)
+
+#ifndef AVL_CMP
+#define AVL_CMP(a, b) (((a) > (b)) - ((a) < (b)))
+#endif
+#ifndef AVL_KEY_VALID
+#define AVL_KEY_VALID(key) 1
+#endif
+#ifndef AVL_KEY_INIT
+#define AVL_KEY_INIT(dst, src) ((dst) = (src), 1)
+#endif
+#ifndef AVL_KEY_DESTROY
+#define AVL_KEY_DESTROY(key) ((void)0)
+#endif
+
+// 沿树下降时的比较都经过 _CMP，以便启用 AVL_STATS 时计数；排序与校验输入等辅助函数直接使用 AVL_CMP
+#define _CMP(a, b) (AVL_STAT_INC(comparisons), AVL_CMP(a, b))
+
+/* --- 内部定义 --- */
+
+// 映射实例的值槽类型
+#ifdef AVL_VALUE_T
+typedef AVL_VALUE_T _Value;
+#else
+typedef int _Value;     // 没有值槽的实例中只用作占位的参数类型
+#endif
+
+// 内部节点结构体定义 (完全隐藏，不对外暴露)
+// 字段按对齐要求从大到小排列，高度只需 1 个字节 (AVL 树高度不超过 AVL_MAX_HEIGHT)，
+// 对于 int 键值，在 64 位平台上整个节点恰好占 32 字节，且还留有空闲的填充字节。
+// left 必须是第一个字段：内存池借用它把空闲节点串成链表。映射实例在孩子指针之后多一个值槽。
+typedef struct AVL_NODE_TAG {
+    struct AVL_NODE_TAG* left;
+    struct AVL_NODE_TAG* right;
+#ifdef AVL_VALUE_T
+    _Value value;
+#endif
+#ifdef AVL_AUGMENT
+    int64_t agg_sum;    // 子树中所有权重之和 (按 2^64 取模回绕)
+    int64_t agg_min;    // 子树中的最小权重
+    int64_t agg_max;    // 子树中的最大权重
+#endif
+    AVL_KEY_T key;
+    int size;   // 以该节点为根的子树中的节点总数，用于 O(1) 计数与 O(log n) 排名/选择
+    int refs;   // 引用计数：指向该节点的父节点与树根 (快照) 的个数，见下面的「持久化快照」
+    unsigned char height;
+} _Node;
+
+// 宏定义
+#define _MAX(a, b) ((a) > (b) ? (a) : (b))
+
+// AVL树的高度不超过 1.44*log2(n+2)，对于 int 能表示的节点数不超过 45，这里留足余量
+#define AVL_MAX_HEIGHT 64
+
+// 可视化打印时单个键值的最大文本长度
+#define _KEY_TEXT_SIZE 160
+
+// 游标结构体：保存从根到当前节点的完整路径，栈顶即当前节点，depth 为 0 表示游标无效
+struct AVL_CURSOR_T {
+    const _Node* root;
+    const _Node* stack[AVL_MAX_HEIGHT];
+    int depth;
+};
+
+
+/* --- 内部(私有)辅助函数声明与实现 --- */
+
+// 所有内部函数都使用 static 修饰，并以 _ 为前缀
+
+/* --- 持久化快照 ---
+ *
+ * 快照与树共享节点，节点通过 refs 计数被多少个父节点或树根引用。
+ * 约定：只有 refs 为 1 且从树根到它的路径上全都是独占节点时，才可以原地修改一个节点；
+ * 修改共享节点之前先用 _own 复制一份 (路径复制)，因此每次插入/删除只会复制 O(log n) 个节点，
+ * 快照能看到的节点永远不会被修改，读取快照不需要任何同步。
+ * 没有快照时所有计数都是 1，修改路径上只多了一次计数检查。
+ */
+
+/* --- 节点的分配与释放 --- */
+
+// pool 为 NULL 时直接使用 malloc/free，否则从内存池中分配
+static _Node* _alloc_node(AVLPool* pool) {
+    _Node* node = pool == NULL ? (_Node*)malloc(sizeof(_Node)) : (_Node*)avl_pool_alloc_raw(pool, sizeof(_Node));
+    if (node != NULL) AVL_STAT_INC(node_allocs);
+    return node;
+}
+
+// 只释放节点本身，不触碰键值 (键值的所有权已经转移给了别的节点)
+static void _release_node(AVLPool* pool, _Node* node) {
+    AVL_STAT_INC(node_frees);
+    if (pool == NULL) {
+        free(node);
+        return;
+    }
+    avl_pool_free_raw(pool, node);
+}
+
+static void _free_node(AVLPool* pool, _Node* node) {
+    AVL_KEY_DESTROY(node->key);
+    _release_node(pool, node);
+}
+
+// 增加一个对节点的引用；计数从 1 变为 2 时节点开始被共享
+static void _acquire(_Node* node) {
+    if (AVL_REF_INC(&node->refs) == 2) AVL_SHARED_ADD(1);
+}
+
+// 放弃对一棵子树的引用：计数归零的节点才会被释放，它的孩子再依次放弃引用
+static void _free_tree(AVLPool* pool, _Node* node) {
+    if (node == NULL) return;
+    int refs = AVL_REF_DEC(&node->refs);
+    if (refs == 1) AVL_SHARED_ADD(-1);
+    if (refs > 0) return;
+    _free_tree(pool, node->left);
+    _free_tree(pool, node->right);
+    _free_node(pool, node);
+}
+
+static int _get_height(_Node* node) {
+    if (node == NULL) return 0;
+    return node->height;
+}
+
+static int _get_size(const _Node* node) {
+    if (node == NULL) return 0;
+    return node->size;
+}
+
+#ifdef AVL_AUGMENT
+// 节点参与聚合的权重：映射实例为值，集合实例为键值
+#ifdef AVL_VALUE_T
+#define _WEIGHT(node) ((int64_t)(node)->value)
+#else
+#define _WEIGHT(node) ((int64_t)(node)->key)
+#endif
+
+// 两个 int64 相加，溢出时按 2^64 取模回绕而不是触发未定义行为
+static int64_t _wrapping_add(int64_t a, int64_t b) {
+    return (int64_t)((uint64_t)a + (uint64_t)b);
+}
+
+static void _aggregate(_Node* node) {
+    int64_t w = _WEIGHT(node);
+    int64_t sum = w, lo = w, hi = w;
+    if (node->left != NULL) {
+        sum = _wrapping_add(sum, node->left->agg_sum);
+        if (node->left->agg_min < lo) lo = node->left->agg_min;
+        if (node->left->agg_max > hi) hi = node->left->agg_max;
+    }
+    if (node->right != NULL) {
+        sum = _wrapping_add(sum, node->right->agg_sum);
+        if (node->right->agg_min < lo) lo = node->right->agg_min;
+        if (node->right->agg_max > hi) hi = node->right->agg_max;
+    }
+    node->agg_sum = sum;
+    node->agg_min = lo;
+    node->agg_max = hi;
+}
+#endif
+
+// 根据左右孩子重新计算节点的高度与子树大小 (以及聚合值)。
+// 旋转、join、split 与批量构建都经由这里，因此聚合值随结构调整自动维护。
+static void _update(_Node* node) {
+    node->height = (unsigned char)(1 + _MAX(_get_height(node->left), _get_height(node->right)));
+    node->size = 1 + _get_size(node->left) + _get_size(node->right);
+#ifdef AVL_AUGMENT
+    _aggregate(node);
+#endif
+}
+
+static int _get_balance_factor(_Node* node) {
+    if (node == NULL) return 0;
+    return _get_height(node->left) - _get_height(node->right);
+}
+
+static _Node* _create_node(AVLPool* pool, AVL_KEY_T key) {
+    _Node* node = _alloc_node(pool);
+    if (node == NULL) return NULL;
+    if (!AVL_KEY_INIT(node->key, key)) {
+        _release_node(pool, node);
+        return NULL;
+    }
+    node->left = NULL;
+    node->right = NULL;
+#ifdef AVL_VALUE_T
+    node->value = 0;
+#endif
+    node->height = 1; // 新节点高度为1
+    node->size = 1;
+    node->refs = 1;
+#ifdef AVL_AUGMENT
+    _aggregate(node);
+#endif
+    return node;
+}
+
+// 使 *link 指向的节点成为独占节点：计数为 1 时什么都不做，否则把它复制一份挂到 *link 上，
+// 副本与原节点的孩子相同 (孩子的计数因此加一)。内存不足时返回 0，此时 *link 保持不变。
+static int _own(AVLPool* pool, _Node** link) {
+    _Node* node = *link;
+    if (AVL_REF_LOAD(&node->refs) == 1) return 1;
+
+    _Node* copy = _alloc_node(pool);
+    if (copy == NULL) return 0;
+    if (!AVL_KEY_INIT(copy->key, node->key)) {
+        _release_node(pool, copy);
+        return 0;
+    }
+    copy->left = node->left;
+    copy->right = node->right;
+#ifdef AVL_VALUE_T
+    copy->value = node->value;
+#endif
+#ifdef AVL_AUGMENT
+    copy->agg_sum = node->agg_sum;
+    copy->agg_min = node->agg_min;
+    copy->agg_max = node->agg_max;
+#endif
+    copy->size = node->size;
+    copy->height = node->height;
+    copy->refs = 1;
+    if (copy->left) _acquire(copy->left);
+    if (copy->right) _acquire(copy->right);
+    *link = copy;
+    // 其他版本可能恰好在此期间放弃了原节点，因此这里也要按引用计数释放
+    _free_tree(pool, node);
+    return 1;
+}
+
+// 结构调整 (旋转、join、split 与集合运算) 中复制失败时使用：置 *oom 为 1，放弃对 L 与 R 两棵子树的引用，
+// 释放孤立的节点 mid (它的孩子指针已经失效，不跟随)，返回 NULL。
+static _Node* _abandon(AVLPool* pool, int* oom, _Node* L, _Node* mid, _Node* R) {
+    *oom = 1;
+    _free_tree(pool, L);
+    if (mid != NULL) _free_node(pool, mid);
+    _free_tree(pool, R);
+    return NULL;
+}
+
+// 沿记录的路径自顶向下把 *links[0..n) 都变为独占节点：links[0] 指向树根变量，
+// 复制会移动节点，因此 links[1..n) 按 dirs 重新计算。失败时返回 0，树的内容不变 (只是部分节点已被复制)。
+static int _own_path(AVLPool* pool, _Node** links[], const signed char dirs[], int n) {
+    for (int i = 0; i < n; i++) {
+        if (!_own(pool, links[i])) return 0;
+        if (i + 1 < n) links[i + 1] = dirs[i] < 0 ? &(*links[i])->left : &(*links[i])->right;
+    }
+    return 1;
+}
+
+// 删除后自底向上的旋转除了路径上的节点，还会修改路径之外的兄弟节点 (双旋转时还有兄弟靠内一侧的孩子)。
+// 只有删除前兄弟一侧更高的节点才可能旋转，这里预先把这些节点变为独占节点，使 _retrace 中的旋转不再需要复制。
+// 路径上的节点必须已经是独占的。失败时返回 0，树的内容不变 (只是部分节点已被复制)。
+static int _own_siblings(AVLPool* pool, _Node** links[], const signed char dirs[], int n) {
+    for (int i = 0; i < n; i++) {
+        _Node* node = *links[i];
+        _Node** sibling = dirs[i] < 0 ? &node->right : &node->left;
+        if (_get_height(*sibling) <= _get_height(dirs[i] < 0 ? node->left : node->right)) continue;
+        if (!_own(pool, sibling)) return 0;
+        int inward = dirs[i] < 0 ? _get_balance_factor(*sibling) > 0 : _get_balance_factor(*sibling) < 0;
+        if (inward && !_own(pool, dirs[i] < 0 ? &(*sibling)->left : &(*sibling)->right)) return 0;
+    }
+    return 1;
+}
+
+static _Node* _right_rotate(_Node* y) {
+    _Node* x = y->left;
+    _Node* T2 = x->right;
+    x->right = y;
+    y->left = T2;
+    _update(y);
+    _update(x);
+    return x;
+}
+
+static _Node* _left_rotate(_Node* x) {
+    _Node* y = x->right;
+    _Node* T2 = y->left;
+    y->left = x;
+    x->right = T2;
+    _update(x);
+    _update(y);
+    return y;
+}
+
+// node 必须是独占节点；旋转会修改的孩子 (可能与快照共享) 在旋转前先复制。
+// 复制失败时不做任何旋转，放弃 node 所在的子树并返回 NULL (见 _abandon)。
+// 插入时会旋转的节点都在已复制的路径上，删除时由 _own_siblings 事先复制，因此 _retrace 中的调用不会失败。
+static _Node* _rebalance(AVLPool* pool, _Node* node, int* oom) {
+    if (node == NULL) return NULL;
+
+    _update(node);
+    int balance = _get_balance_factor(node);
+
+    // 左-左 或 左-右
+    if (balance > 1) {
+        if (!_own(pool, &node->left)) return _abandon(pool, oom, node, NULL, NULL);
+        if (_get_balance_factor(node->left) < 0) { // 左-右
+            if (!_own(pool, &node->left->right)) return _abandon(pool, oom, node, NULL, NULL);
+            AVL_STAT_INC(double_rotations);
+            node->left = _left_rotate(node->left);
+        } else {
+            AVL_STAT_INC(single_rotations);
+        }
+        return _right_rotate(node); // 左-左
+    }
+    // 右-右 或 右-左
+    if (balance < -1) {
+        if (!_own(pool, &node->right)) return _abandon(pool, oom, node, NULL, NULL);
+        if (_get_balance_factor(node->right) > 0) { // 右-左
+            if (!_own(pool, &node->right->left)) return _abandon(pool, oom, node, NULL, NULL);
+            AVL_STAT_INC(double_rotations);
+            node->right = _right_rotate(node->right);
+        } else {
+            AVL_STAT_INC(single_rotations);
+        }
+        return _left_rotate(node); // 右-右
+    }
+    // 无需旋转
+    return node;
+}
+
+
+// 插入/删除后沿记录的路径自底向上修复：links[i] 指向路径上第 i 个节点所在的链接槽。
+// 一旦某棵子树修复后的高度与修改前相同，其祖先的高度和平衡因子都不会再变，
+// 此后只需调整子树大小 (size_delta)，不再重新计算高度或检查旋转。
+// 路径上的节点必须都是独占的；删除时可能被旋转的兄弟节点也必须已由 _own_siblings 复制。
+static void _retrace(AVLPool* pool, _Node** links[], int depth, int size_delta) {
+    int stable = 0;
+    int oom = 0;
+    for (int i = depth - 1; i >= 0; i--) {
+        _Node* node = *links[i];
+        if (stable) {
+#ifdef AVL_AUGMENT
+            // 高度不再变化，但路径上的聚合值 (删除时还可能换成了后继的键值) 仍需向上重新计算
+            (void)size_delta;
+            _update(node);
+#else
+            node->size += size_delta;
+#endif
+            continue;
+        }
+        int old_height = node->height;
+        node = _rebalance(pool, node, &oom);
+        *links[i] = node;
+        if (node->height == old_height) {
+            stable = 1;
+            if (i > 0) AVL_STAT_INC(rebalance_early_exits);
+        }
+    }
+}
+
+// 查找起点：_FROM_ROOT 从根开始；_FROM_FINGER 从右脊柱 (最大键值一侧) 上离 key 最近的节点开始；
+// _APPEND_ONLY 与 _FROM_FINGER 相同，但只接受大于当前最大键值的 key
+enum { _FROM_ROOT, _FROM_FINGER, _APPEND_ONLY };
+
+// 以右脊柱为指针 (finger) 确定查找的起点：先沿右脊柱下降 (只追指针，不比较)，把脊柱记录到 links/dirs 中，
+// 再自底向上找到最深的键值 < key 的脊柱节点，之后只需在它的右子树中查找。
+// 右脊柱上高度为 h 的节点的右子树只有 O(2^h) 个键值，因此 key 与最大键值之间相隔 d 个键值时只需 O(log d) 次比较；
+// key 不大于根时退回从根开始 (多出的比较不超过右脊柱的长度)。
+// 返回继续下降的位置并写入已记录的深度；append_only 且 key 不大于最大键值时返回 NULL。
+static _Node** _finger_start(_Node** root, AVL_KEY_T key, int append_only, _Node*** links, signed char* dirs,
+                             int* depth) {
+    int spine = 0;
+    _Node** link = root;
+    while (*link != NULL) {
+        links[spine] = link;
+        dirs[spine++] = 1;
+        link = &(*link)->right;
+    }
+    int i = spine - 1;
+    int cmp = 1;
+    while (i >= 0 && (cmp = _CMP(key, (*links[i])->key)) <= 0) {
+        if (append_only || cmp == 0) break;
+        i--;
+    }
+    if (i == spine - 1 && cmp > 0) {
+        *depth = spine;
+        return link;
+    }
+    if (append_only) return NULL;
+    if (i < 0) {
+        *depth = 0;
+        return root;
+    }
+    // cmp == 0 时从该脊柱节点本身开始，由调用者按已存在的键值处理
+    *depth = cmp == 0 ? i : i + 1;
+    return cmp == 0 ? links[i] : &(*links[i])->right;
+}
+
+// 内部插入函数的迭代实现：单次下降，并用显式栈记录路径
+// start 为查找起点 (见上面的枚举)，_APPEND_ONLY 时不大于最大键值的 key 与已存在的键值一样报告 0
+// inserted (可为 NULL) 用于报告结果：1 表示插入了新节点，0 表示键值已存在或不合法，-1 表示内存分配失败
+// out_node (可为 NULL) 用于返回新插入的节点或已存在的同键节点，调用者会修改它，因此它总是独占的
+static _Node* _insert_iterative(AVLPool* pool, _Node* root, AVL_KEY_T key, int start, int* inserted,
+                                _Node** out_node) {
+    _Node** links[AVL_MAX_HEIGHT + 1];
+    signed char dirs[AVL_MAX_HEIGHT];
+    int depth = 0;
+    int shared = 0;
+    _Node** link = &root;
+
+    if (!AVL_KEY_VALID(key)) {
+        if (inserted) *inserted = 0;
+        return root;
+    }
+    if (start != _FROM_ROOT) {
+        link = _finger_start(&root, key, start == _APPEND_ONLY, links, dirs, &depth);
+        if (link == NULL) {
+            if (inserted) *inserted = 0;
+            return root;
+        }
+        for (int i = 0; i < depth; i++) {
+            shared |= AVL_REF_LOAD(&(*links[i])->refs) != 1;
+        }
+    }
+    while (*link != NULL) {
+        _Node* node = *link;
+        shared |= AVL_REF_LOAD(&node->refs) != 1;
+        int cmp = _CMP(key, node->key);
+        if (cmp == 0) {
+            // 不允许重复键值
+            if (inserted) *inserted = 0;
+            if (out_node) {
+                links[depth] = link;
+                if (shared && !_own_path(pool, links, dirs, depth + 1)) {
+                    if (inserted) *inserted = -1;
+                    return root;
+                }
+                *out_node = *links[depth];
+            }
+            return root;
+        }
+        links[depth] = link;
+        dirs[depth++] = (signed char)(cmp < 0 ? -1 : 1);
+        link = cmp < 0 ? &node->left : &node->right;
+    }
+
+    // 修改之前先复制与快照共享的路径；复制失败时树的内容没有变化
+    if (shared) {
+        if (!_own_path(pool, links, dirs, depth)) {
+            if (inserted) *inserted = -1;
+            return root;
+        }
+        link = dirs[depth - 1] < 0 ? &(*links[depth - 1])->left : &(*links[depth - 1])->right;
+    }
+    _Node* node = _create_node(pool, key);
+    if (node == NULL) {
+        if (inserted) *inserted = -1;
+        return root;
+    }
+    *link = node;
+    _retrace(pool, links, depth, 1);   // 旋转只改变链接，不会移动节点本身
+    if (inserted) *inserted = 1;
+    if (out_node) *out_node = node;
+    return root;
+}
+
+// 内部删除函数的迭代实现：查找与删除在同一次下降中完成
+// removed (可为 NULL) 用于报告键值是否存在并被删除 (-1 表示复制共享路径时内存不足，树没有被修改)；
+// out_value (可为 NULL) 用于取回被删除键值的值
+static _Node* _delete_iterative(AVLPool* pool, _Node* root, AVL_KEY_T key, int* removed, _Value* out_value) {
+    _Node** links[AVL_MAX_HEIGHT + 1];
+    signed char dirs[AVL_MAX_HEIGHT];
+    int depth = 0;
+    int shared = 0;
+    _Node** link = &root;
+
+    int cmp = 1;
+    if (AVL_KEY_VALID(key)) {
+        while (*link != NULL && (cmp = _CMP(key, (*link)->key)) != 0) {
+            shared |= AVL_REF_LOAD(&(*link)->refs) != 1;
+            links[depth] = link;
+            dirs[depth++] = (signed char)(cmp < 0 ? -1 : 1);
+            link = cmp < 0 ? &(*link)->left : &(*link)->right;
+        }
+    }
+    if (cmp != 0) {
+        // 键值不存在，树没有被修改
+        if (removed) *removed = 0;
+        return root;
+    }
+
+    _Node* target = *link;
+    int target_depth = depth;
+    shared |= AVL_REF_LOAD(&target->refs) != 1;
+    if (target->left != NULL && target->right != NULL) {
+        // 有两个孩子：继续下降到右子树的最小节点 (中序后继)，用它的键值替换目标，再删除后继
+        links[depth] = link;
+        dirs[depth++] = 1;
+        link = &target->right;
+        while ((*link)->left != NULL) {
+            shared |= AVL_REF_LOAD(&(*link)->refs) != 1;
+            links[depth] = link;
+            dirs[depth++] = -1;
+            link = &(*link)->left;
+        }
+        shared |= AVL_REF_LOAD(&(*link)->refs) != 1;
+    }
+    if (shared) {
+        // 修改之前先复制与快照共享的路径 (包括被摘下的节点，它的键值会被移动)
+        links[depth] = link;
+        if (!_own_path(pool, links, dirs, depth + 1)) {
+            if (removed) *removed = -1;
+            return root;
+        }
+        link = links[depth];
+        target = *links[target_depth];
+    }
+    // 与快照共享的兄弟节点同样要在修改之前复制，此后的旋转不会再失败
+    if (AVL_SHARED_LOAD() != 0 && !_own_siblings(pool, links, dirs, depth)) {
+        if (removed) *removed = -1;
+        return root;
+    }
+
+#ifdef AVL_VALUE_T
+    if (out_value) *out_value = target->value;
+#else
+    (void)out_value;
+#endif
+    if (target->left != NULL && target->right != NULL) {
+        // 后继的键值被移动到目标节点中，因此之后只释放后继节点本身
+        AVL_KEY_DESTROY(target->key);
+        target->key = (*link)->key;
+#ifdef AVL_VALUE_T
+        target->value = (*link)->value;
+#endif
+    } else {
+        AVL_KEY_DESTROY(target->key);
+    }
+
+    _Node* victim = *link;
+    *link = victim->left != NULL ? victim->left : victim->right;
+    _release_node(pool, victim);
+    _retrace(pool, links, depth, -1);
+    if (removed) *removed = 1;
+    return root;
+}
+
+// 摘下最小 (last 为真时为最大) 的节点：沿左 (右) 脊柱下降，不需要任何比较，路径与删除一样自底向上修复。
+// 键值与值在节点释放之前写入 out_key/out_value (均可为 NULL)；removed 的含义与 _delete_iterative 相同。
+// 注意键值的资源 (例如字节串的内容) 随节点一起释放，需要保留键值的实例应先读取再删除。
+static _Node* _delete_extreme(AVLPool* pool, _Node* root, int last, AVL_KEY_T* out_key, _Value* out_value,
+                              int* removed) {
+    _Node** links[AVL_MAX_HEIGHT + 1];
+    signed char dirs[AVL_MAX_HEIGHT];
+    int depth = 0;
+    int shared = 0;
+    _Node** link = &root;
+    signed char dir = (signed char)(last ? 1 : -1);
+
+    if (root == NULL) {
+        if (removed) *removed = 0;
+        return root;
+    }
+    for (;;) {
+        _Node* next = last ? (*link)->right : (*link)->left;
+        shared |= AVL_REF_LOAD(&(*link)->refs) != 1;
+        if (next == NULL) break;
+        links[depth] = link;
+        dirs[depth++] = dir;
+        link = last ? &(*link)->right : &(*link)->left;
+    }
+    if (shared) {
+        links[depth] = link;
+        if (!_own_path(pool, links, dirs, depth + 1)) {
+            if (removed) *removed = -1;
+            return root;
+        }
+        link = links[depth];
+    }
+    if (AVL_SHARED_LOAD() != 0 && !_own_siblings(pool, links, dirs, depth)) {
+        if (removed) *removed = -1;
+        return root;
+    }
+
+    _Node* victim = *link;
+    if (out_key) *out_key = victim->key;
+#ifdef AVL_VALUE_T
+    if (out_value) *out_value = victim->value;
+#else
+    (void)out_value;
+#endif
+    *link = last ? victim->left : victim->right;
+    _free_node(pool, victim);
+    _retrace(pool, links, depth, -1);
+    if (removed) *removed = 1;
+    return root;
+}
+
+/* --- 基于 join 的合并、分裂与集合运算 ---
+ *
+ * 下面的函数都会消耗作为输入的子树。与快照共享的节点在修改前复制，复制可能因内存不足而失败：
+ * 此时函数置 *oom 为 1，放弃它持有的全部输入与中间结果，返回 NULL (输出参数也都写入 NULL)。
+ * 调用者检查 *oom 后同样放弃自己持有的部分，逐层返回。*oom 在调用前必须为 0。
+ * 公共函数用 _guard 为输入多持有一个引用，失败时输入因此完好无损 (见下文)。
+ */
+
+// 以节点 mid 连接 L 和 R，前提是 L 中所有键值 < mid->key < R 中所有键值。
+// 沿较高一侧的脊柱下降到高度相差不超过 1 的位置再挂接，然后自底向上再平衡，代价为 O(|h(L) - h(R)| + 1)。
+// mid 必须是独占节点；脊柱上被修改的节点在修改前复制。
+static _Node* _join(AVLPool* pool, _Node* L, _Node* mid, _Node* R, int* oom) {
+    int hl = _get_height(L);
+    int hr = _get_height(R);
+    if (hl > hr + 1) {
+        if (!_own(pool, &L)) return _abandon(pool, oom, L, mid, R);
+        L->right = _join(pool, L->right, mid, R, oom);
+        if (*oom) return _abandon(pool, oom, L, NULL, NULL);
+        return _rebalance(pool, L, oom);
+    }
+    if (hr > hl + 1) {
+        if (!_own(pool, &R)) return _abandon(pool, oom, L, mid, R);
+        R->left = _join(pool, L, mid, R->left, oom);
+        if (*oom) return _abandon(pool, oom, NULL, NULL, R);
+        return _rebalance(pool, R, oom);
+    }
+    mid->left = L;
+    mid->right = R;
+    _update(mid);
+    return mid;
+}
+
+// 从树中摘下最大的节点 (不释放，且是独占节点)，通过 out_max 返回，返回值为剩余的树
+static _Node* _detach_max(AVLPool* pool, _Node* node, _Node** out_max, int* oom) {
+    *out_max = NULL;
+    if (!_own(pool, &node)) return _abandon(pool, oom, node, NULL, NULL);
+    if (node->right == NULL) {
+        *out_max = node;
+        return node->left;
+    }
+    node->right = _detach_max(pool, node->right, out_max, oom);
+    if (*oom) return _abandon(pool, oom, node, NULL, NULL);
+    node = _rebalance(pool, node, oom);
+    if (*oom) {
+        // 最大节点已经摘下，剩余的树由 _rebalance 放弃
+        _free_node(pool, *out_max);
+        *out_max = NULL;
+    }
+    return node;
+}
+
+// 连接两棵没有中间键值的树，前提是 L 中所有键值 < R 中所有键值
+static _Node* _join2(AVLPool* pool, _Node* L, _Node* R, int* oom) {
+    if (L == NULL) return R;
+    if (R == NULL) return L;
+    _Node* max_node;
+    L = _detach_max(pool, L, &max_node, oom);
+    if (*oom) return _abandon(pool, oom, NULL, NULL, R);
+    return _join(pool, L, max_node, R, oom);
+}
+
+// 按 x 把树分成三部分：*L 中键值 < x，*R 中键值 > x，*mid 为键值等于 x 的节点 (不存在时为 NULL)。
+// 沿查找路径向下，回溯时把路径上的每个节点连同其另一侧子树 join 回去，总代价为 O(log n)。
+// 路径上的节点 (包括 *mid) 都会变为独占节点。
+static void _split3(AVLPool* pool, _Node* T, AVL_KEY_T x, _Node** L, _Node** mid, _Node** R, int* oom) {
+    *L = NULL;
+    *mid = NULL;
+    *R = NULL;
+    if (T == NULL) return;
+    if (!_own(pool, &T)) {
+        _abandon(pool, oom, T, NULL, NULL);
+        return;
+    }
+    _Node* left = T->left;
+    _Node* right = T->right;
+    int cmp = _CMP(x, T->key);
+    if (cmp < 0) {
+        _Node* R_part;
+        _split3(pool, left, x, L, mid, &R_part, oom);
+        if (*oom) {
+            _abandon(pool, oom, NULL, T, right);
+            return;
+        }
+        *R = _join(pool, R_part, T, right, oom);
+    } else if (cmp > 0) {
+        _Node* L_part;
+        _split3(pool, right, x, &L_part, mid, R, oom);
+        if (*oom) {
+            _abandon(pool, oom, left, T, NULL);
+            return;
+        }
+        *L = _join(pool, left, T, L_part, oom);
+    } else {
+        *L = left;
+        *R = right;
+        T->left = NULL;
+        T->right = NULL;
+        _update(T);
+        *mid = T;
+    }
+    if (*oom) {
+        // 回溯时的 join 失败：放弃另一侧已经分好的部分
+        _abandon(pool, oom, *L, *mid, *R);
+        *L = NULL;
+        *mid = NULL;
+        *R = NULL;
+    }
+}
+
+// 集合运算把 T1 (差集中为 T2) 的根节点拆开重用，因此先把它变为独占节点
+static _Node* _union(AVLPool* pool, _Node* T1, _Node* T2, int* oom) {
+    if (T1 == NULL) return T2;
+    if (T2 == NULL) return T1;
+
+    if (!_own(pool, &T1)) return _abandon(pool, oom, T1, NULL, T2);
+    _Node *L2, *dup, *R2;
+    _split3(pool, T2, T1->key, &L2, &dup, &R2, oom);
+    if (*oom) return _abandon(pool, oom, T1, NULL, NULL);
+    if (dup != NULL) _free_node(pool, dup);
+
+    _Node* T1_right = T1->right;
+    _Node* left = _union(pool, T1->left, L2, oom);
+    if (*oom) return _abandon(pool, oom, T1_right, T1, R2);
+    _Node* right = _union(pool, T1_right, R2, oom);
+    if (*oom) return _abandon(pool, oom, left, T1, NULL);
+    return _join(pool, left, T1, right, oom);
+}
+
+static _Node* _intersection(AVLPool* pool, _Node* T1, _Node* T2, int* oom) {
+    if (T1 == NULL || T2 == NULL) {
+        _free_tree(pool, T1);
+        _free_tree(pool, T2);
+        return NULL;
+    }
+
+    if (!_own(pool, &T1)) return _abandon(pool, oom, T1, NULL, T2);
+    _Node *L2, *dup, *R2;
+    _split3(pool, T2, T1->key, &L2, &dup, &R2, oom);
+    if (*oom) return _abandon(pool, oom, T1, NULL, NULL);
+    int found = dup != NULL;
+    if (found) _free_node(pool, dup);
+
+    _Node* T1_right = T1->right;
+    _Node* left = _intersection(pool, T1->left, L2, oom);
+    if (*oom) return _abandon(pool, oom, T1_right, T1, R2);
+    _Node* right = _intersection(pool, T1_right, R2, oom);
+    if (*oom) return _abandon(pool, oom, left, T1, NULL);
+    if (found) return _join(pool, left, T1, right, oom);
+    _free_node(pool, T1);
+    return _join2(pool, left, right, oom);
+}
+
+static _Node* _difference(AVLPool* pool, _Node* T1, _Node* T2, int* oom) {
+    if (T1 == NULL || T2 == NULL) {
+        _free_tree(pool, T2);
+        return T1;
+    }
+
+    if (!_own(pool, &T2)) return _abandon(pool, oom, T1, NULL, T2);
+    _Node *L1, *dup, *R1;
+    _split3(pool, T1, T2->key, &L1, &dup, &R1, oom);
+    if (*oom) return _abandon(pool, oom, NULL, NULL, T2);
+    if (dup != NULL) _free_node(pool, dup);
+
+    _Node* T2_right = T2->right;
+    _Node* left = _difference(pool, L1, T2->left, oom);
+    if (*oom) return _abandon(pool, oom, R1, T2, T2_right);
+    _Node* right = _difference(pool, R1, T2_right, oom);
+    if (*oom) return _abandon(pool, oom, left, T2, NULL);
+    _free_node(pool, T2);
+    return _join2(pool, left, right, oom);
+}
+
+static _Node* _symmetric_difference(AVLPool* pool, _Node* T1, _Node* T2, int* oom) {
+    if (T1 == NULL) return T2;
+    if (T2 == NULL) return T1;
+
+    if (!_own(pool, &T1)) return _abandon(pool, oom, T1, NULL, T2);
+    _Node *L2, *dup, *R2;
+    _split3(pool, T2, T1->key, &L2, &dup, &R2, oom);
+    if (*oom) return _abandon(pool, oom, T1, NULL, NULL);
+    int found = dup != NULL;
+    if (found) _free_node(pool, dup);
+
+    _Node* T1_right = T1->right;
+    _Node* left = _symmetric_difference(pool, T1->left, L2, oom);
+    if (*oom) return _abandon(pool, oom, T1_right, T1, R2);
+    _Node* right = _symmetric_difference(pool, T1_right, R2, oom);
+    if (*oom) return _abandon(pool, oom, left, T1, NULL);
+    if (found) {
+        _free_node(pool, T1);
+        return _join2(pool, left, right, oom);
+    }
+    return _join(pool, left, T1, right, oom);
+}
+
+// 复制只发生在与快照共享的节点上，进程中没有任何共享节点时结构调整不会失败。
+// 否则先为每棵输入树的根多持有一个引用 (相当于一个临时快照)：调整过程中被修改的节点都会先复制，
+// 失败时只需放弃中间结果，输入树本身完好无损；成功后再放弃这个引用，只属于旧版本的节点随之释放。
+// 返回是否持有了引用，交给 _unguard。
+static int _guard(_Node* T1, _Node* T2) {
+    if (AVL_SHARED_LOAD() == 0) return 0;
+    if (T1 != NULL) _acquire(T1);
+    if (T2 != NULL) _acquire(T2);
+    return 1;
+}
+
+// 结束 _guard：成功时放弃临时引用；失败时临时引用原样交还给调用者
+static void _unguard(AVLPool* pool, int guarded, int oom, _Node* T1, _Node* T2) {
+    if (guarded && !oom) {
+        _free_tree(pool, T1);
+        _free_tree(pool, T2);
+    }
+}
+
+// 以 keys[lo..hi) 的中位数为根，递归地构建完全平衡的子树，高度直接设置而无需旋转
+static _Node* _build_sorted_recursive(AVLPool* pool, const AVL_KEY_T* keys, int lo, int hi) {
+    if (lo >= hi) return NULL;
+
+    int mid = lo + (hi - lo) / 2;
+    _Node* node = _create_node(pool, keys[mid]);
+    if (node == NULL) return NULL;
+    // 分配失败时释放已经建好的部分，整体返回 NULL
+    node->left = _build_sorted_recursive(pool, keys, lo, mid);
+    if (node->left == NULL && lo < mid) {
+        _free_tree(pool, node);
+        return NULL;
+    }
+    node->right = _build_sorted_recursive(pool, keys, mid + 1, hi);
+    if (node->right == NULL && mid + 1 < hi) {
+        _free_tree(pool, node);
+        return NULL;
+    }
+    _update(node);
+    return node;
+}
+
+static int _compare_keys(const void* a, const void* b) {
+    return AVL_CMP(*(const AVL_KEY_T*)a, *(const AVL_KEY_T*)b);
+}
+
+// 统计树中小于 key (inclusive 为真时为小于等于 key) 的键值个数，沿一条路径下降
+static int _count_below(const _Node* node, AVL_KEY_T key, int inclusive) {
+    int count = 0;
+    while (node != NULL) {
+        int cmp = _CMP(key, node->key);
+        if (cmp > 0 || (inclusive && cmp == 0)) {
+            count += _get_size(node->left) + 1;
+            node = node->right;
+        } else {
+            node = node->left;
+        }
+    }
+    return count;
+}
+
+static void _visual_to_buffer(
+    const _Node* node,
+    const char* prefix,
+    int isTail,
+    // --- 新增的参数 ---
+    char* buffer,       // 目标缓冲区
+    int* offset,        // 当前写入位置的指针
+    int size            // 缓冲区总大小
+) {
+    if (node == NULL) return;
+
+    // 检查缓冲区是否已满 (预留1字节给末尾的'\0')
+    if (*offset >= size - 1) return;
+
+    char key_text[_KEY_TEXT_SIZE];
+    AVL_KEY_FORMAT(key_text, sizeof(key_text), node->key);
+
+    // [核心修改] 不再使用 printf，而是用 snprintf 写入到 buffer
+    int written = snprintf(
+        buffer + *offset,       // 从当前位置开始写
+        size - *offset,         // 缓冲区剩余空间
+        "%s%s%s\n",             // 格式不变
+        prefix,
+        isTail ? "└── " : "├── ",
+        key_text
+    );
+
+    // 更新写入位置 (被截断时 snprintf 返回的是完整长度，这里不能越过缓冲区末尾)
+    *offset += written;
+    if (*offset > size - 1) *offset = size - 1;
+
+    char newPrefix[256];
+    // 这里使用更兼容的四个空格
+    snprintf(newPrefix, sizeof(newPrefix), "%s%s", prefix, isTail ? "    " : "│   ");
+
+    if (node->left != NULL && node->right != NULL) {
+        _visual_to_buffer(node->right, newPrefix, 0, buffer, offset, size); // 递归调用也使用新函数
+        _visual_to_buffer(node->left,  newPrefix, 1, buffer, offset, size);
+    } else if (node->right != NULL) {
+        _visual_to_buffer(node->right, newPrefix, 1, buffer, offset, size);
+    } else if (node->left != NULL) {
+        _visual_to_buffer(node->left,  newPrefix, 1, buffer, offset, size);
+    }
+}
+
+// 返回子树中所有节点的深度之和，并把每个节点计入 hist[depth]
+static long long _depth_histogram(const _Node* node, int depth, int* hist, int max_depth) {
+    if (node == NULL) return 0;
+    if (depth < max_depth) hist[depth]++;
+    return depth + _depth_histogram(node->left, depth + 1, hist, max_depth)
+                 + _depth_histogram(node->right, depth + 1, hist, max_depth);
+}
+
+static void _in_order_recursive(struct AVL_NODE_TAG* node, AVL_FN(traverse_callback) callback) {
+    if (node == NULL || callback == NULL) {
+        return;
+    }
+    // 中序遍历：左 -> 根 -> 右
+    _in_order_recursive(node->left, callback);
+    callback(node->key, node->height, _get_balance_factor(node));
+    _in_order_recursive(node->right, callback);
+}
+
+
+/* --- 公共API函数的实现 --- */
+
+AVL_TREE_T AVL_FN(create)(void) {
+    return NULL;
+}
+
+void AVL_FN(destroy)(AVL_TREE_T tree) {
+    _free_tree(NULL, tree);
+}
+
+AVL_TREE_T AVL_FN(insert)(AVL_TREE_T tree, AVL_KEY_T key) {
+    return AVL_FN(pool_insert)(NULL, tree, key);
+}
+
+AVL_TREE_T AVL_FN(delete)(AVL_TREE_T tree, AVL_KEY_T key) {
+    // 不存在的键值保持静默；需要知道是否删除成功时请使用 discard
+    return _delete_iterative(NULL, tree, key, NULL, NULL);
+}
+
+AVL_TREE_T AVL_FN(discard)(AVL_TREE_T tree, AVL_KEY_T key, int* removed) {
+    return _delete_iterative(NULL, tree, key, removed, NULL);
+}
+
+int AVL_FN(search)(const AVL_TREE_T tree, AVL_KEY_T key) {
+    if (!AVL_KEY_VALID(key)) return 0;
+    const _Node* current = tree;
+    while (current != NULL) {
+        int cmp = _CMP(key, current->key);
+        if (cmp < 0) {
+            current = current->left;
+        } else if (cmp > 0) {
+            current = current->right;
+        } else {
+            return 1; // 找到了
+        }
+    }
+    return 0; // 未找到
+}
+
+int AVL_FN(search_finger)(const AVL_TREE_T tree, AVL_KEY_T key) {
+    // 与 _finger_start 相同：先收集右脊柱，自底向上找到最深的键值 < key 的脊柱节点，再从它的右子树向下查找
+    const _Node* spine[AVL_MAX_HEIGHT];
+    int n = 0;
+    if (!AVL_KEY_VALID(key)) return 0;
+    for (const _Node* node = tree; node != NULL; node = node->right) {
+        spine[n++] = node;
+    }
+    const _Node* current = tree;
+    for (int i = n - 1; i >= 0; i--) {
+        int cmp = _CMP(key, spine[i]->key);
+        if (cmp == 0) return 1;
+        if (cmp > 0) {
+            current = spine[i]->right;
+            break;
+        }
+    }
+    while (current != NULL) {
+        int cmp = _CMP(key, current->key);
+        if (cmp == 0) return 1;
+        current = cmp < 0 ? current->left : current->right;
+    }
+    return 0;
+}
+
+AVL_TREE_T AVL_FN(insert_batch)(AVL_TREE_T tree, const AVL_KEY_T* keys, int n) {
+    return AVL_FN(pool_insert_batch)(NULL, tree, keys, n, NULL);
+}
+
+AVL_TREE_T AVL_FN(delete_batch)(AVL_TREE_T tree, const AVL_KEY_T* keys, int n) {
+    return AVL_FN(pool_delete_batch)(NULL, tree, keys, n, NULL);
+}
+
+void AVL_FN(search_batch)(const AVL_TREE_T tree, const AVL_KEY_T* keys, int n, unsigned char* out) {
+    for (int i = 0; i < n; i++) {
+        out[i] = (unsigned char)AVL_FN(search)(tree, keys[i]);
+    }
+}
+
+void AVL_FN(search_batch_at)(const AVL_TREE_T tree, const AVL_KEY_T* keys, int n, const int* pos,
+                             unsigned char* out) {
+    for (int i = 0; i < n; i++) {
+        out[pos[i]] = (unsigned char)AVL_FN(search)(tree, keys[i]);
+    }
+}
+
+// 键值所属的分片：bounds 中小于 key 的分割点个数 (bounds 严格递增，个数很少，二分即可)
+static int _shard_of(const AVL_KEY_T* bounds, int nbounds, AVL_KEY_T key) {
+    int lo = 0, hi = nbounds;
+    while (lo < hi) {
+        int mid = lo + (hi - lo) / 2;
+        if (AVL_CMP(bounds[mid], key) < 0) lo = mid + 1;
+        else hi = mid;
+    }
+    return lo;
+}
+
+void AVL_FN(partition_batch)(const AVL_KEY_T* bounds, int nbounds, const AVL_KEY_T* keys, int n,
+                             AVL_KEY_T* out_keys, int* out_pos, int* counts) {
+    // 两遍的计数排序：第一遍统计每个分片的键值个数，第二遍按分片稳定地分发。
+    // 分片号在第二遍重新计算，省去一个与输入等长的临时数组；counts 先后用作个数、写入位置与结束位置
+    for (int s = 0; s <= nbounds; s++) counts[s] = 0;
+    for (int i = 0; i < n; i++) counts[_shard_of(bounds, nbounds, keys[i])]++;
+
+    int offset = 0;
+    for (int s = 0; s <= nbounds; s++) {
+        int c = counts[s];
+        counts[s] = offset;
+        offset += c;
+    }
+    for (int i = 0; i < n; i++) {
+        int j = counts[_shard_of(bounds, nbounds, keys[i])]++;
+        out_keys[j] = keys[i];
+        if (out_pos != NULL) out_pos[j] = i;
+    }
+    // 此时 counts[s] 是分片 s 的结束位置，还原为个数
+    for (int s = nbounds; s > 0; s--) counts[s] -= counts[s - 1];
+}
+
+AVL_TREE_T AVL_FN(build_sorted)(const AVL_KEY_T* keys, int n) {
+    return AVL_FN(pool_build_sorted)(NULL, keys, n);
+}
+
+int AVL_FN(is_strictly_sorted)(const AVL_KEY_T* keys, int n) {
+    if (n > 0 && !AVL_KEY_VALID(keys[0])) return 0;
+    for (int i = 1; i < n; i++) {
+        if (!AVL_KEY_VALID(keys[i]) || AVL_CMP(keys[i - 1], keys[i]) >= 0) return 0;
+    }
+    return 1;
+}
+
+int AVL_FN(sort_unique)(AVL_KEY_T* keys, int n) {
+    // 先剔除不合法的键值，否则排序所依赖的全序关系不成立
+    int valid = 0;
+    for (int i = 0; i < n; i++) {
+        if (AVL_KEY_VALID(keys[i])) keys[valid++] = keys[i];
+    }
+    n = valid;
+    if (n <= 1) return n;
+    qsort(keys, (size_t)n, sizeof(AVL_KEY_T), _compare_keys);
+
+    int m = 1;
+    for (int i = 1; i < n; i++) {
+        if (AVL_CMP(keys[i], keys[m - 1]) != 0) keys[m++] = keys[i];
+    }
+    return m;
+}
+
+/**
+ * @brief [改造后的公共API] 将AVL树的视觉表示形式写入用户提供的缓冲区。
+ * * @param tree 指向AVL树的指针 (即根节点)。
+ * @param out_buffer Python提供的用于写入的缓冲区。
+ * @param buffer_size 缓冲区的总大小。
+ */
+void AVL_FN(display_to_buffer)(const AVL_TREE_T tree, char* out_buffer, int buffer_size) {
+    // 1. 安全检查
+    if (out_buffer == NULL || buffer_size <= 0) {
+        return;
+    }
+    // 确保缓冲区在开始时是一个有效的空字符串
+    out_buffer[0] = '\0';
+
+    // 2. 处理空树的情况
+    if (tree == NULL) {
+        snprintf(out_buffer, buffer_size, "树是空的。\n");
+        return;
+    }
+
+    // 3. 初始化写入位置并开始递归
+    int offset = 0;
+    _visual_to_buffer(tree, "", 1, out_buffer, &offset, buffer_size);
+}
+
+void AVL_FN(display)(const AVL_TREE_T tree) {
+    // 创建一个足够大的临时栈缓冲区
+    char buffer[4096];
+
+    // 调用新函数将内容写入缓冲区
+    AVL_FN(display_to_buffer)(tree, buffer, sizeof(buffer));
+
+    // 然后用 printf 打印缓冲区的内容
+    printf("%s", buffer);
+}
+
+int AVL_FN(get_height)(const AVL_TREE_T tree) {
+    // 将公共的、不透明的树句柄转换为内部的 _Node 指针
+    _Node* root = (_Node*)tree;
+
+    if (root == NULL) {
+        return 0;
+    }
+
+    return root->height;
+}
+
+long long AVL_FN(depth_histogram)(const AVL_TREE_T tree, int* hist, int max_depth) {
+    for (int d = 0; d < max_depth; d++) hist[d] = 0;
+    return _depth_histogram((const _Node*)tree, 0, hist, max_depth);
+}
+
+int AVL_FN(get_count)(const AVL_TREE_T tree) {
+    // 根节点的子树大小就是整棵树的节点数
+    return _get_size((const _Node*)tree);
+}
+
+int AVL_FN(rank)(const AVL_TREE_T tree, AVL_KEY_T key) {
+    return _count_below(tree, key, 0);
+}
+
+int AVL_FN(select)(const AVL_TREE_T tree, int index, AVL_KEY_T* out_key) {
+    const _Node* node = tree;
+    if (index < 0 || index >= _get_size(node)) return 0;
+
+    while (node != NULL) {
+        int left_size = _get_size(node->left);
+        if (index < left_size) {
+            node = node->left;
+        } else if (index > left_size) {
+            index -= left_size + 1;
+            node = node->right;
+        } else {
+            *out_key = node->key;
+            return 1;
+        }
+    }
+    return 0;
+}
+
+int AVL_FN(count_range)(const AVL_TREE_T tree, AVL_KEY_T lo, AVL_KEY_T hi) {
+    if (AVL_CMP(lo, hi) > 0) return 0;
+    return _count_below(tree, hi, 1) - _count_below(tree, lo, 0);
+}
+
+/* --- 游标 --- */
+
+AVL_CURSOR_T* AVL_FN(cursor_create)(const AVL_TREE_T tree) {
+    AVL_CURSOR_T* cursor = (AVL_CURSOR_T*)malloc(sizeof(AVL_CURSOR_T));
+    if (cursor == NULL) return NULL;
+    cursor->root = tree;
+    cursor->depth = 0;
+    return cursor;
+}
+
+void AVL_FN(cursor_destroy)(AVL_CURSOR_T* cursor) {
+    free(cursor);
+}
+
+int AVL_FN(cursor_seek)(AVL_CURSOR_T* cursor, AVL_KEY_T key) {
+    // 沿查找路径下降并全部入栈，最后把栈截断到最后一个 >= key 的节点处
+    int found_depth = 0;
+    const _Node* node = cursor->root;
+    cursor->depth = 0;
+    while (node != NULL) {
+        cursor->stack[cursor->depth++] = node;
+        int cmp = _CMP(key, node->key);
+        if (cmp <= 0) {
+            found_depth = cursor->depth;
+            if (cmp == 0) break;
+            node = node->left;
+        } else {
+            node = node->right;
+        }
+    }
+    cursor->depth = found_depth;
+    return found_depth > 0;
+}
+
+int AVL_FN(cursor_seek_floor)(AVL_CURSOR_T* cursor, AVL_KEY_T key) {
+    int found_depth = 0;
+    const _Node* node = cursor->root;
+    cursor->depth = 0;
+    while (node != NULL) {
+        cursor->stack[cursor->depth++] = node;
+        int cmp = _CMP(key, node->key);
+        if (cmp >= 0) {
+            found_depth = cursor->depth;
+            if (cmp == 0) break;
+            node = node->right;
+        } else {
+            node = node->left;
+        }
+    }
+    cursor->depth = found_depth;
+    return found_depth > 0;
+}
+
+int AVL_FN(cursor_first)(AVL_CURSOR_T* cursor) {
+    cursor->depth = 0;
+    for (const _Node* node = cursor->root; node != NULL; node = node->left) {
+        cursor->stack[cursor->depth++] = node;
+    }
+    return cursor->depth > 0;
+}
+
+int AVL_FN(cursor_last)(AVL_CURSOR_T* cursor) {
+    cursor->depth = 0;
+    for (const _Node* node = cursor->root; node != NULL; node = node->right) {
+        cursor->stack[cursor->depth++] = node;
+    }
+    return cursor->depth > 0;
+}
+
+int AVL_FN(cursor_valid)(const AVL_CURSOR_T* cursor) {
+    return cursor->depth > 0;
+}
+
+AVL_KEY_T AVL_FN(cursor_key)(const AVL_CURSOR_T* cursor) {
+    return cursor->stack[cursor->depth - 1]->key;
+}
+
+int AVL_FN(cursor_next)(AVL_CURSOR_T* cursor) {
+    if (cursor->depth == 0) return 0;
+
+    const _Node* node = cursor->stack[cursor->depth - 1];
+    if (node->right != NULL) {
+        // 后继是右子树中最左的节点
+        for (node = node->right; node != NULL; node = node->left) {
+            cursor->stack[cursor->depth++] = node;
+        }
+    } else {
+        // 向上回溯，直到从某个节点的左子树返回
+        const _Node* child;
+        do {
+            child = cursor->stack[--cursor->depth];
+        } while (cursor->depth > 0 && cursor->stack[cursor->depth - 1]->right == child);
+    }
+    return cursor->depth > 0;
+}
+
+int AVL_FN(cursor_prev)(AVL_CURSOR_T* cursor) {
+    if (cursor->depth == 0) return 0;
+
+    const _Node* node = cursor->stack[cursor->depth - 1];
+    if (node->left != NULL) {
+        for (node = node->left; node != NULL; node = node->right) {
+            cursor->stack[cursor->depth++] = node;
+        }
+    } else {
+        const _Node* child;
+        do {
+            child = cursor->stack[--cursor->depth];
+        } while (cursor->depth > 0 && cursor->stack[cursor->depth - 1]->left == child);
+    }
+    return cursor->depth > 0;
+}
+
+int AVL_FN(cursor_fill)(AVL_CURSOR_T* cursor, AVL_KEY_T* out, int max_n, const AVL_KEY_T* limit, int reverse) {
+    int n = 0;
+    while (n < max_n && cursor->depth > 0) {
+        AVL_KEY_T key = cursor->stack[cursor->depth - 1]->key;
+        if (limit != NULL) {
+            int cmp = AVL_CMP(key, *limit);
+            if (reverse ? cmp < 0 : cmp > 0) break;
+        }
+        out[n++] = key;
+        if (reverse) {
+            AVL_FN(cursor_prev)(cursor);
+        } else {
+            AVL_FN(cursor_next)(cursor);
+        }
+    }
+    return n;
+}
+
+/* --- 选做内容：合并与分裂 --- */
+
+AVL_TREE_T AVL_FN(merge)(AVL_TREE_T T1, AVL_TREE_T T2) {
+    return AVL_FN(pool_merge)(NULL, T1, T2, NULL);
+}
+
+void AVL_FN(split)(AVL_TREE_T T, AVL_KEY_T x, AVL_TREE_T* T_small, AVL_TREE_T* T_large) {
+    AVL_FN(pool_split)(NULL, T, x, T_small, T_large, NULL);
+}
+
+AVL_TREE_T AVL_FN(join)(AVL_TREE_T T1, AVL_KEY_T key, AVL_TREE_T T2) {
+    return AVL_FN(pool_join)(NULL, T1, key, T2);
+}
+
+AVL_TREE_T AVL_FN(union)(AVL_TREE_T T1, AVL_TREE_T T2) {
+    return AVL_FN(pool_union)(NULL, T1, T2, NULL);
+}
+
+AVL_TREE_T AVL_FN(intersection)(AVL_TREE_T T1, AVL_TREE_T T2) {
+    return AVL_FN(pool_intersection)(NULL, T1, T2, NULL);
+}
+
+AVL_TREE_T AVL_FN(difference)(AVL_TREE_T T1, AVL_TREE_T T2) {
+    return AVL_FN(pool_difference)(NULL, T1, T2, NULL);
+}
+
+AVL_TREE_T AVL_FN(symmetric_difference)(AVL_TREE_T T1, AVL_TREE_T T2) {
+    return AVL_FN(pool_symmetric_difference)(NULL, T1, T2, NULL);
+}
+
+/* --- 内存池 --- */
+
+size_t AVL_FN(node_size)(void) {
+    return sizeof(_Node);
+}
+
+void AVL_FN(pool_release)(AVLPool* pool, AVL_TREE_T tree) {
+    _free_tree(pool, tree);
+}
+
+AVL_TREE_T AVL_FN(snapshot)(AVL_TREE_T tree) {
+    // 快照就是对根节点的又一个引用；之后任何一方的修改都会先复制共享的路径
+    if (tree != NULL) _acquire(tree);
+    return tree;
+}
+
+AVL_TREE_T AVL_FN(pool_insert)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key) {
+    return _insert_iterative(pool, tree, key, _FROM_ROOT, NULL, NULL);
+}
+
+AVL_TREE_T AVL_FN(pool_add)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key, int* inserted) {
+    return _insert_iterative(pool, tree, key, _FROM_ROOT, inserted, NULL);
+}
+
+AVL_TREE_T AVL_FN(pool_add_finger)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key, int* inserted) {
+    return _insert_iterative(pool, tree, key, _FROM_FINGER, inserted, NULL);
+}
+
+AVL_TREE_T AVL_FN(pool_append)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key, int* inserted) {
+    return _insert_iterative(pool, tree, key, _APPEND_ONLY, inserted, NULL);
+}
+
+AVL_TREE_T AVL_FN(pool_delete)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key) {
+    return _delete_iterative(pool, tree, key, NULL, NULL);
+}
+
+AVL_TREE_T AVL_FN(pool_discard)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key, int* removed) {
+    return _delete_iterative(pool, tree, key, removed, NULL);
+}
+
+AVL_TREE_T AVL_FN(pool_pop_extreme)(AVLPool* pool, AVL_TREE_T tree, int last, AVL_KEY_T* out_key, int* removed) {
+    return _delete_extreme(pool, tree, last, out_key, NULL, removed);
+}
+
+// 批量插入：status (可为 NULL) 写入处理完的键值个数 n；内存不足时在失败的键值处停止，
+// 写入 -1 - i (i 为此前已处理完的键值个数)，keys[i] 及之后的键值都没有被处理
+static _Node* _insert_batch(AVLPool* pool, _Node* tree, const AVL_KEY_T* keys, int n, int start, int* status) {
+    for (int i = 0; i < n; i++) {
+        int inserted;
+        tree = _insert_iterative(pool, tree, keys[i], start, &inserted, NULL);
+        if (inserted < 0) {
+            if (status) *status = -1 - i;
+            return tree;
+        }
+    }
+    if (status) *status = n;
+    return tree;
+}
+
+AVL_TREE_T AVL_FN(pool_insert_batch)(AVLPool* pool, AVL_TREE_T tree, const AVL_KEY_T* keys, int n, int* status) {
+    return _insert_batch(pool, tree, keys, n, _FROM_ROOT, status);
+}
+
+AVL_TREE_T AVL_FN(pool_insert_batch_finger)(AVLPool* pool, AVL_TREE_T tree, const AVL_KEY_T* keys, int n,
+                                            int* status) {
+    return _insert_batch(pool, tree, keys, n, _FROM_FINGER, status);
+}
+
+AVL_TREE_T AVL_FN(pool_delete_batch)(AVLPool* pool, AVL_TREE_T tree, const AVL_KEY_T* keys, int n, int* status) {
+    for (int i = 0; i < n; i++) {
+        // 不存在的键值会被静默忽略；status 的含义与 _insert_batch 相同
+        int removed;
+        tree = _delete_iterative(pool, tree, keys[i], &removed, NULL);
+        if (removed < 0) {
+            if (status) *status = -1 - i;
+            return tree;
+        }
+    }
+    if (status) *status = n;
+    return tree;
+}
+
+AVL_TREE_T AVL_FN(pool_build_sorted)(AVLPool* pool, const AVL_KEY_T* keys, int n) {
+    return _build_sorted_recursive(pool, keys, 0, n);
+}
+
+/* --- 选做内容：合并与分裂 --- */
+
+// 消耗两棵输入树的集合运算与合并共用的外壳：失败时写入 *status = -1 并返回 NULL，两棵输入树保持不变
+static _Node* _combine(AVLPool* pool, _Node* (*op)(AVLPool*, _Node*, _Node*, int*), _Node* T1, _Node* T2,
+                       int* status) {
+    int oom = 0;
+    int guarded = _guard(T1, T2);
+    _Node* result = op(pool, T1, T2, &oom);
+    _unguard(pool, guarded, oom, T1, T2);
+    if (status) *status = oom ? -1 : 1;
+    return result;
+}
+
+AVL_TREE_T AVL_FN(pool_merge)(AVLPool* pool, AVL_TREE_T T1, AVL_TREE_T T2, int* status) {
+    // 基于 join 的合并只会复用已有节点，只有与快照共享的节点才需要复制
+    return _combine(pool, _join2, T1, T2, status);
+}
+
+void AVL_FN(pool_split)(AVLPool* pool, AVL_TREE_T T, AVL_KEY_T x, AVL_TREE_T* T_small, AVL_TREE_T* T_large,
+                        int* status) {
+    int oom = 0;
+    int guarded = _guard(T, NULL);
+    _Node *small, *mid, *large;
+    _split3(pool, T, x, &small, &mid, &large, &oom);
+    // 等于 x 的节点归入 small 树，作为其新的最大值挂接到右脊柱上
+    if (mid != NULL) small = _join(pool, small, mid, NULL, &oom);
+    if (oom) {
+        _free_tree(pool, large);
+        large = NULL;
+    }
+    _unguard(pool, guarded, oom, T, NULL);
+    *T_small = small;
+    *T_large = large;
+    if (status) *status = oom ? -1 : 1;
+}
+
+AVL_TREE_T AVL_FN(pool_cut_range)(AVLPool* pool, AVL_TREE_T tree, const AVL_KEY_T* lo, const AVL_KEY_T* hi,
+                                   AVL_TREE_T* out_removed, int* status) {
+    *out_removed = NULL;
+    if (status) *status = 1;
+    if ((lo != NULL && !AVL_KEY_VALID(*lo)) || (hi != NULL && !AVL_KEY_VALID(*hi))) return tree;
+    if (lo != NULL && hi != NULL && AVL_CMP(*lo, *hi) > 0) return tree;
+    // 区间内没有键值时不做任何结构调整 (也就不会复制与快照共享的节点)
+    int below = lo == NULL ? 0 : _count_below(tree, *lo, 0);
+    int upto = hi == NULL ? _get_size(tree) : _count_below(tree, *hi, 1);
+    if (upto <= below) return tree;
+
+    // 两次分裂得到 左侧 | [lo, hi] | 右侧，等于边界的节点挂回中间部分，左右两侧再用 join 拼接。
+    // 每一步都消耗它的输入 (失败时也是)，因此失败时只需放弃各变量中仍然持有的部分
+    int oom = 0;
+    int guarded = _guard(tree, NULL);
+    _Node *left = NULL, *low = NULL, *middle = tree, *high = NULL, *right = NULL;
+    if (lo != NULL) _split3(pool, tree, *lo, &left, &low, &middle, &oom);
+    if (!oom && hi != NULL) _split3(pool, middle, *hi, &middle, &high, &right, &oom);
+    if (!oom && low != NULL) {
+        middle = _join(pool, NULL, low, middle, &oom);
+        low = NULL;
+    }
+    if (!oom && high != NULL) {
+        middle = _join(pool, middle, high, NULL, &oom);
+        high = NULL;
+    }
+    _Node* rest = NULL;
+    if (!oom) {
+        rest = _join2(pool, left, right, &oom);
+        left = NULL;
+        right = NULL;
+    }
+    if (oom) {
+        _abandon(pool, &oom, left, low, middle);
+        _abandon(pool, &oom, high, NULL, right);
+        if (status) *status = -1;
+    }
+    _unguard(pool, guarded, oom, tree, NULL);
+    if (oom) return guarded ? tree : NULL;
+    *out_removed = middle;
+    return rest;
+}
+
+AVL_TREE_T AVL_FN(pool_join)(AVLPool* pool, AVL_TREE_T T1, AVL_KEY_T key, AVL_TREE_T T2) {
+    _Node* mid = _create_node(pool, key);
+    if (mid == NULL) return NULL;
+    int oom = 0;
+    int guarded = _guard(T1, T2);
+    _Node* result = _join(pool, T1, mid, T2, &oom);
+    _unguard(pool, guarded, oom, T1, T2);
+    return result;
+}
+
+AVL_TREE_T AVL_FN(pool_union)(AVLPool* pool, AVL_TREE_T T1, AVL_TREE_T T2, int* status) {
+    return _combine(pool, _union, T1, T2, status);
+}
+
+AVL_TREE_T AVL_FN(pool_intersection)(AVLPool* pool, AVL_TREE_T T1, AVL_TREE_T T2, int* status) {
+    return _combine(pool, _intersection, T1, T2, status);
+}
+
+AVL_TREE_T AVL_FN(pool_difference)(AVLPool* pool, AVL_TREE_T T1, AVL_TREE_T T2, int* status) {
+    return _combine(pool, _difference, T1, T2, status);
+}
+
+AVL_TREE_T AVL_FN(pool_symmetric_difference)(AVLPool* pool, AVL_TREE_T T1, AVL_TREE_T T2, int* status) {
+    return _combine(pool, _symmetric_difference, T1, T2, status);
+}
+
+
+
+// 这是暴露给外部的公共函数
+void AVL_FN(in_order_traverse)(AVL_TREE_T tree, AVL_FN(traverse_callback) callback) {
+    _in_order_recursive(tree, callback);
+}
+
+
+/* --- 区间聚合：只在定义了 AVL_AUGMENT 的实例中生成 --- */
+
+#ifdef AVL_AUGMENT
+
+typedef struct _Aggregate {
+    int64_t sum;
+    int64_t min;
+    int64_t max;
+    int count;
+} _Aggregate;
+
+// 把一组 (count 个权重的) 聚合值并入 acc
+static void _combine_aggregate(_Aggregate* acc, int64_t sum, int64_t min, int64_t max, int count) {
+    if (count == 0) return;
+    if (acc->count == 0) {
+        acc->min = min;
+        acc->max = max;
+    } else {
+        if (min < acc->min) acc->min = min;
+        if (max > acc->max) acc->max = max;
+    }
+    acc->sum = _wrapping_add(acc->sum, sum);
+    acc->count += count;
+}
+
+static void _add_node(_Aggregate* acc, const _Node* node) {
+    int64_t w = _WEIGHT(node);
+    _combine_aggregate(acc, w, w, w, 1);
+}
+
+static void _add_subtree(_Aggregate* acc, const _Node* node) {
+    if (node != NULL) _combine_aggregate(acc, node->agg_sum, node->agg_min, node->agg_max, node->size);
+}
+
+int AVL_FN(range_aggregate)(const AVL_TREE_T tree, AVL_KEY_T lo, AVL_KEY_T hi,
+                            int64_t* out_sum, int64_t* out_min, int64_t* out_max) {
+    _Aggregate acc = {0, 0, 0, 0};
+    const _Node* node = tree;
+    if (!AVL_KEY_VALID(lo) || !AVL_KEY_VALID(hi) || AVL_CMP(lo, hi) > 0) node = NULL;
+
+    // 先下降到第一个落在 [lo, hi] 内的节点，区间内的其余节点都在它的两棵子树中
+    while (node != NULL) {
+        if (_CMP(node->key, lo) < 0) {
+            node = node->right;
+        } else if (_CMP(node->key, hi) > 0) {
+            node = node->left;
+        } else {
+            break;
+        }
+    }
+    if (node != NULL) {
+        _add_node(&acc, node);
+        // 左子树中 >= lo 的部分：沿边界下降，边界右侧的整棵子树直接使用聚合值
+        for (const _Node* n = node->left; n != NULL;) {
+            if (_CMP(n->key, lo) >= 0) {
+                _add_node(&acc, n);
+                _add_subtree(&acc, n->right);
+                n = n->left;
+            } else {
+                n = n->right;
+            }
+        }
+        // 右子树中 <= hi 的部分，与上面对称
+        for (const _Node* n = node->right; n != NULL;) {
+            if (_CMP(n->key, hi) <= 0) {
+                _add_node(&acc, n);
+                _add_subtree(&acc, n->left);
+                n = n->right;
+            } else {
+                n = n->left;
+            }
+        }
+    }
+    *out_sum = acc.sum;
+    *out_min = acc.min;
+    *out_max = acc.max;
+    return acc.count;
+}
+
+int AVL_FN(root_aggregate)(const AVL_TREE_T tree, int64_t* out_sum, int64_t* out_min, int64_t* out_max) {
+    // 整棵树的聚合值就保存在根节点上
+    _Aggregate acc = {0, 0, 0, 0};
+    _add_subtree(&acc, tree);
+    *out_sum = acc.sum;
+    *out_min = acc.min;
+    *out_max = acc.max;
+    return acc.count;
+}
+
+#endif /* AVL_AUGMENT */
+
+
+/* --- 有序映射：只在定义了 AVL_VALUE_T 的实例中生成 --- */
+
+#ifdef AVL_VALUE_T
+
+#ifdef AVL_AUGMENT
+// 节点的值被修改之后，自底向上重新计算从根到该键值的路径上的聚合值。
+// 插入或覆盖时路径上的节点已经都是独占的。
+static void _refresh_path(_Node* root, AVL_KEY_T key) {
+    _Node* path[AVL_MAX_HEIGHT];
+    int depth = 0;
+    while (root != NULL) {
+        path[depth++] = root;
+        int cmp = _CMP(key, root->key);
+        if (cmp == 0) break;
+        root = cmp < 0 ? root->left : root->right;
+    }
+    while (depth > 0) _aggregate(path[--depth]);
+}
+#endif
+
+// 查找最后一个 <= key (floor) 或第一个 >= key (ceiling) 的节点，不存在时返回 NULL
+static const _Node* _find_bound(const _Node* node, AVL_KEY_T key, int floor) {
+    const _Node* best = NULL;
+    if (!AVL_KEY_VALID(key)) return NULL;
+    while (node != NULL) {
+        int cmp = _CMP(key, node->key);
+        if (cmp == 0) return node;
+        if ((cmp > 0) == (floor != 0)) {
+            best = node;
+        }
+        node = cmp < 0 ? node->left : node->right;
+    }
+    return best;
+}
+
+AVL_TREE_T AVL_FN(pool_put)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key, _Value value,
+                            int overwrite, int* inserted, _Value* old_value) {
+    _Node* node = NULL;
+    int status;
+    tree = _insert_iterative(pool, tree, key, _FROM_ROOT, &status, &node);
+    int changed = 0;
+    if (status == 1) {
+        node->value = value;
+        changed = 1;
+    } else if (status == 0 && node != NULL) {
+        if (old_value) *old_value = node->value;
+        if (overwrite) node->value = value;
+        changed = overwrite;
+    }
+#ifdef AVL_AUGMENT
+    if (changed) _refresh_path(tree, key);
+#else
+    (void)changed;
+#endif
+    if (inserted) *inserted = status;
+    return tree;
+}
+
+AVL_TREE_T AVL_FN(pool_put_batch)(AVLPool* pool, AVL_TREE_T tree, const AVL_KEY_T* keys,
+                                  const _Value* values, int n, int* status) {
+    for (int i = 0; i < n; i++) {
+        int inserted;
+        tree = AVL_FN(pool_put)(pool, tree, keys[i], values[i], 1, &inserted, NULL);
+        if (inserted < 0) {
+            if (status) *status = -1 - i;
+            return tree;
+        }
+    }
+    if (status) *status = n;
+    return tree;
+}
+
+AVL_TREE_T AVL_FN(pool_pop)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key, int* removed, _Value* out_value) {
+    return _delete_iterative(pool, tree, key, removed, out_value);
+}
+
+AVL_TREE_T AVL_FN(pool_pop_extreme_item)(AVLPool* pool, AVL_TREE_T tree, int last, AVL_KEY_T* out_key,
+                                         _Value* out_value, int* removed) {
+    return _delete_extreme(pool, tree, last, out_key, out_value, removed);
+}
+
+int AVL_FN(get)(const AVL_TREE_T tree, AVL_KEY_T key, _Value* out_value) {
+    const _Node* node = _find_bound(tree, key, 1);
+    if (node == NULL || _CMP(key, node->key) != 0) return 0;
+    *out_value = node->value;
+    return 1;
+}
+
+int AVL_FN(floor_item)(const AVL_TREE_T tree, AVL_KEY_T key, AVL_KEY_T* out_key, _Value* out_value) {
+    const _Node* node = _find_bound(tree, key, 1);
+    if (node == NULL) return 0;
+    *out_key = node->key;
+    *out_value = node->value;
+    return 1;
+}
+
+int AVL_FN(ceiling_item)(const AVL_TREE_T tree, AVL_KEY_T key, AVL_KEY_T* out_key, _Value* out_value) {
+    const _Node* node = _find_bound(tree, key, 0);
+    if (node == NULL) return 0;
+    *out_key = node->key;
+    *out_value = node->value;
+    return 1;
+}
+
+int AVL_FN(cursor_fill_items)(AVL_CURSOR_T* cursor, AVL_KEY_T* out_keys, _Value* out_values,
+                              int max_n, const AVL_KEY_T* limit, int reverse) {
+    int n = 0;
+    while (n < max_n && cursor->depth > 0) {
+        const _Node* node = cursor->stack[cursor->depth - 1];
+        if (limit != NULL) {
+            int cmp = AVL_CMP(node->key, *limit);
+            if (reverse ? cmp < 0 : cmp > 0) break;
+        }
+        if (out_keys) out_keys[n] = node->key;
+        if (out_values) out_values[n] = node->value;
+        n++;
+        if (reverse) {
+            AVL_FN(cursor_prev)(cursor);
+        } else {
+            AVL_FN(cursor_next)(cursor);
+        }
+    }
+    return n;
+}
+
+#ifdef AVL_AUGMENT
+/* --- 计数：值槽保存键值的重数 (多重集合)，子树的值之和即子树中的元素个数 --- */
+
+AVL_TREE_T AVL_FN(pool_add_count)(AVLPool* pool, AVL_TREE_T tree, AVL_KEY_T key, int64_t delta, int* status,
+                                  int64_t* out_count) {
+    _Node* node = NULL;
+    int found;
+    int64_t count = 0;
+
+    if (delta > 0) {
+        // 插入与累加在同一次下降中完成；已存在的节点由 _insert_iterative 保证是独占的
+        tree = _insert_iterative(pool, tree, key, _FROM_ROOT, &found, &node);
+        if (found < 0 || node == NULL) {
+            *status = found < 0 ? -1 : 0;
+            *out_count = 0;
+            return tree;
+        }
+        if (found == 0 && node->value > INT64_MAX - delta) {
+            *status = -2;
+            *out_count = node->value;
+            return tree;
+        }
+        node->value = found == 1 ? delta : node->value + delta;
+        _refresh_path(tree, key);
+        *status = 1;
+        *out_count = node->value;
+        return tree;
+    }
+
+    const _Node* existing = _find_bound(tree, key, 1);
+    if (existing == NULL || _CMP(key, existing->key) != 0) {
+        *status = 0;
+        *out_count = 0;
+        return tree;
+    }
+    count = existing->value;
+    if (delta == 0 || count + delta < 0) {
+        // delta == 0 只查询；重数不足时树保持不变，out_count 为当前的重数
+        *status = delta == 0 ? 1 : -2;
+        *out_count = count;
+        return tree;
+    }
+    if (count + delta == 0) {
+        int removed;
+        tree = _delete_iterative(pool, tree, key, &removed, NULL);
+        *status = removed < 0 ? -1 : 1;
+        *out_count = removed < 0 ? count : 0;
+        return tree;
+    }
+    // 先复制与快照共享的路径 (键值已存在，不会插入新节点)，再修改重数
+    tree = _insert_iterative(pool, tree, key, _FROM_ROOT, &found, &node);
+    if (found < 0) {
+        *status = -1;
+        *out_count = count;
+        return tree;
+    }
+    node->value = count + delta;
+    _refresh_path(tree, key);
+    *status = 1;
+    *out_count = node->value;
+    return tree;
+}
+
+AVL_TREE_T AVL_FN(pool_add_count_runs)(AVLPool* pool, AVL_TREE_T tree, const AVL_KEY_T* keys, int n, int* status) {
+    *status = 1;
+    for (int i = 0; i < n;) {
+        // 连续相等的键值合并为一次累加，每段只下降一次
+        int j = i + 1;
+        while (j < n && AVL_CMP(keys[j], keys[i]) == 0) j++;
+        int64_t count;
+        int st;
+        tree = AVL_FN(pool_add_count)(pool, tree, keys[i], j - i, &st, &count);
+        if (st < 0) {
+            *status = st;
+            return tree;
+        }
+        i = j;
+    }
+    return tree;
+}
+#endif /* AVL_AUGMENT */
+
+#endif /* AVL_VALUE_T */
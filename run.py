@@ -1,6 +1,11 @@
+import argparse
+import contextlib
+import json
 import pyavl
 import random
 import sys
+import time
+from array import array
 
 class AVLTreeShell:
     """
@@ -46,14 +51,39 @@ class AVLTreeShell:
         print("  split <key> <t1> <t2> - 将当前树分裂为 t1 和 t2 两棵新树")
         print("  merge <t1> <t2> <res> - 合并 t1 和 t2 到新树 res")
         print("\n--- 文件操作 ---")
-        print("  save <filename>      - 将当前树的键值保存到文件")
-        print("  load <filename>      - 从文件加载键值到当前树 (会先清空)")
+        print("  save <filename> [--text] - 将当前树保存为二进制快照 (--text: 空格分隔的文本)")
+        print("  load <filename> [--text] - 从快照/文本文件加载键值到当前树 (会先清空)")
         print("\n--- 其他 ---")
         print("  h / help             - 显示此帮助菜单")
         print("  q / quit / exit      - 退出程序")
         print("="*50)
 
 
+    # 脚本模式中会被合并为一次批量调用的命令：命令 -> (树的方法, 交互模式下的提示)
+    BATCH_COMMANDS = {'i': ('insert_many', "成功插入"), 'd': ('delete_many', "成功删除"), 's': ('contains_many', None)}
+
+    # 主树 AVLTree 的键值是 C 的 int，与脚本模式批量传参用的 array('i') 的范围相同
+    KEY_MIN, KEY_MAX = -2 ** 31, 2 ** 31 - 1
+
+    @classmethod
+    def parse_keys(cls, args, command):
+        """解析 i / d / s 的键值参数：交互模式与脚本模式共用，两者对同一行给出相同的错误。"""
+        if command == 's' and len(args) != 1: raise ValueError("查找命令仅需一个参数。")
+        if not args: raise ValueError("需要提供至少一个键值。")
+        keys = [int(k) for k in args]
+        for key in keys:
+            if not cls.KEY_MIN <= key <= cls.KEY_MAX:
+                raise ValueError(f"键值 {key} 超出范围 ({cls.KEY_MIN} 到 {cls.KEY_MAX})。")
+        return keys
+
+    @staticmethod
+    def parse_file_args(args, command):
+        """解析 save/load 的参数: <filename> [--text]"""
+        as_text = '--text' in args
+        rest = [a for a in args if a != '--text']
+        if len(rest) != 1: raise ValueError(f"用法: {command} <filename> [--text]")
+        return rest[0], as_text
+
     def run(self):
         """启动主交互循环"""
         self.print_header()
@@ -64,153 +94,7 @@ class AVLTreeShell:
                 if not line: continue
                 
                 command, *args = line
-                active_tree = self.trees.get(self.active_tree_name) # 使用 .get 更安全
-
-                # --- 命令分发 ---
-                if command in ('q', 'quit', 'exit'):
-                    print("正在退出。再见！")
-                    for tree in self.trees.values(): tree.close()
-                    break
-
-                elif command in ('h', 'help'): self.print_help()
-                
-                elif command in ('p', 'display'):
-                    print(f"\n当前树 '{self.active_tree_name}' 的结构:")
-                    print(active_tree) # 修改点: 使用 print()
-
-                elif command == 'clear':
-                    active_tree.close()
-                    self.trees[self.active_tree_name] = pyavl.AVLTree()
-                    print(f"树 '{self.active_tree_name}' 已被清空。")
-
-                elif command == 'i':
-                    if not args: raise ValueError("需要提供至少一个键值。")
-                    keys = [int(k) for k in args]
-                    for key in keys: active_tree.insert(key)
-                    print(f"成功插入: {keys}"); print(active_tree) # 修改点
-
-                elif command == 'd':
-                    if not args: raise ValueError("需要提供至少一个键值。")
-                    keys = [int(k) for k in args]
-                    for key in keys: active_tree.delete(key)
-                    print(f"成功删除: {keys}"); print(active_tree) # 修改点
-
-                elif command == 's':
-                    if len(args) != 1: raise ValueError("查找命令仅需一个参数。")
-                    key = int(args[0])
-                    print(f"✅ 在树 '{self.active_tree_name}' 中找到了键值 {key}。" if key in active_tree 
-                          else f"❌ 在树 '{self.active_tree_name}' 中未找到键值 {key}。")
-                
-                elif command == 'random':
-                    if len(args) != 1: raise ValueError("需要提供随机数的数量。")
-                    n = int(args[0])
-                    nums = [random.randint(0, 999) for _ in range(n)]
-                    for num in nums: active_tree.insert(num)
-                    print(f"成功插入 {n} 个随机数。"); print(active_tree) # 修改点
-
-                elif command == 'traverse':
-                    result = []
-                    def collector(key, height, balance): result.append(key)
-                    active_tree.in_order_traverse(collector)
-                    print(f"中序遍历结果: {result}")
-                
-                elif command == 'info':
-                    print(f"\n--- 树 '{self.active_tree_name}' 的信息 ---")
-                    print(f"  节点总数: {active_tree.count}") # 修改点: 使用 .count 属性
-                    print(f"  树的高度: {active_tree.height}") # 修改点: 使用 .height 属性
-                    print("------------------------")
-
-                elif command == 'new':
-                    if len(args) != 1: raise ValueError("用法: new <tree_name>")
-                    name = args[0]
-                    if name in self.trees: raise NameError(f"树 '{name}' 已存在。")
-                    self.trees[name] = pyavl.AVLTree()
-                    print(f"成功创建新的空树 '{name}'。")
-                
-                elif command == 'use':
-                    if len(args) != 1: raise ValueError("需要提供树的名称。")
-                    name = args[0]
-                    if name not in self.trees: raise NameError(f"树 '{name}' 不存在。")
-                    self.active_tree_name = name
-                    self.update_prompt()
-                    print(f"已切换到树 '{self.active_tree_name}'。")
-
-                elif command == 'list':
-                    print("\n--- 当前存在的所有树 ---")
-                    for name, tree in self.trees.items():
-                        prefix = "-> " if name == self.active_tree_name else "   "
-                        print(f"{prefix}{name} (节点数: {tree.count})") # 修改点
-                    print("------------------------")
-
-                elif command == 'drop':
-                    if len(args) != 1: raise ValueError("需要提供树的名称。")
-                    name = args[0]
-                    if name == 'main': raise ValueError("不能删除主树 'main'，请使用 'clear'。")
-                    if name not in self.trees: raise NameError(f"树 '{name}' 不存在。")
-                    
-                    self.trees[name].close(); del self.trees[name]
-                    
-                    if self.active_tree_name == name:
-                        self.active_tree_name = 'main'
-                        self.update_prompt()
-                        print(f"删除了当前树 '{name}'，已自动切换回 'main'。")
-                    else:
-                        print(f"成功删除树 '{name}'。")
-
-                elif command == 'split':
-                    if len(args) != 3: raise ValueError("用法: split <key> <t1> <t2>")
-                    key, n1, n2 = int(args[0]), args[1], args[2]
-                    if n1 in self.trees or n2 in self.trees: raise NameError("新树名已存在。")
-                    
-                    print(f"正在分裂树 '{self.active_tree_name}'...")
-                    s_tree, l_tree = active_tree.split(key)
-                    self.trees[n1], self.trees[n2] = s_tree, l_tree
-                    
-                    # 优化点: 因为 active_tree 被消耗了，直接从字典中删除它
-                    del self.trees[self.active_tree_name]
-                    print(f"分裂完成！创建了 '{n1}' 和 '{n2}'。原始树 '{self.active_tree_name}' 已被消耗。")
-                    
-                    # 自动切换到 main
-                    self.active_tree_name = 'main'
-                    self.update_prompt()
-                    print(f"已自动切换回 'main'。")
-
-
-                elif command == 'merge':
-                    if len(args) != 3: raise ValueError("用法: merge <t1> <t2> <res>")
-                    n1, n2, res_n = args
-                    if n1 not in self.trees or n2 not in self.trees: raise NameError("要合并的树不存在。")
-                    if res_n in self.trees: raise NameError("结果树名称已存在。")
-
-                    # 优化点: 直接从字典中 pop 出要被消耗的树
-                    t1 = self.trees.pop(n1)
-                    t2 = self.trees.pop(n2)
-                    
-                    self.trees[res_n] = pyavl.AVLTree.merge(t1, t2)
-                    print(f"合并完成！创建了 '{res_n}'。'{n1}' 和 '{n2}' 已被消耗。")
-                    
-                    if self.active_tree_name in (n1, n2):
-                        self.active_tree_name = res_n
-                        self.update_prompt()
-
-                elif command == 'save':
-                    if len(args) != 1: raise ValueError("用法: save <filename>")
-                    keys = []
-                    active_tree.in_order_traverse(lambda k,h,b: keys.append(k))
-                    with open(args[0], 'w') as f:
-                        f.write(' '.join(map(str, keys)))
-                    print(f"树 '{self.active_tree_name}' 已保存到 '{args[0]}'")
-
-                elif command == 'load':
-                    if len(args) != 1: raise ValueError("用法: load <filename>")
-                    with open(args[0], 'r') as f:
-                        keys = [int(k) for k in f.read().strip().split()]
-                    active_tree.close() # 清空当前树
-                    self.trees[self.active_tree_name] = pyavl.AVLTree(keys)
-                    print(f"从 '{args[0]}' 加载了 {len(keys)} 个键值到当前树。"); print(self.trees[self.active_tree_name])
-
-                else:
-                    print(f"错误: 未知命令 '{command}'。输入 'help' 查看帮助。")
+                if not self.execute(command, args): break
 
             except FileNotFoundError:
                 print("错误: 文件未找到。")
@@ -220,7 +104,272 @@ class AVLTreeShell:
                 # 捕获所有其他未知错误
                 print(f"发生未知错误: {e}", file=sys.stderr)
 
+    def execute(self, command, args, quiet=False):
+        """
+        执行一条命令，返回 False 表示应当退出。出错时抛出异常，由调用者报告。
+        quiet 为 True 时不打印任何输出，也不渲染树的结构 (脚本模式计时用)。
+        """
+        say = (lambda *values, **kwargs: None) if quiet else print
+        active_tree = self.trees.get(self.active_tree_name) # 使用 .get 更安全
+
+        if command in ('q', 'quit', 'exit'):
+            say("正在退出。再见！")
+            for tree in self.trees.values(): tree.close()
+            return False
+
+        elif command in ('h', 'help'):
+            if not quiet: self.print_help()
+        
+        elif command in ('p', 'display'):
+            say(f"\n当前树 '{self.active_tree_name}' 的结构:")
+            say(active_tree) # quiet 时 say 不会把树转换成字符串
+
+        elif command == 'clear':
+            active_tree.close()
+            self.trees[self.active_tree_name] = pyavl.AVLTree()
+            say(f"树 '{self.active_tree_name}' 已被清空。")
+
+        elif command == 'i':
+            keys = self.parse_keys(args, command)
+            for key in keys: active_tree.insert(key)
+            say(f"成功插入: {keys}"); say(active_tree) # 修改点
+
+        elif command == 'd':
+            keys = self.parse_keys(args, command)
+            for key in keys: active_tree.delete(key)
+            say(f"成功删除: {keys}"); say(active_tree) # 修改点
+
+        elif command == 's':
+            key, = self.parse_keys(args, command)
+            say(f"✅ 在树 '{self.active_tree_name}' 中找到了键值 {key}。" if key in active_tree 
+                else f"❌ 在树 '{self.active_tree_name}' 中未找到键值 {key}。")
+        
+        elif command == 'random':
+            if len(args) != 1: raise ValueError("需要提供随机数的数量。")
+            n = int(args[0])
+            nums = [random.randint(0, 999) for _ in range(n)]
+            for num in nums: active_tree.insert(num)
+            say(f"成功插入 {n} 个随机数。"); say(active_tree) # 修改点
+
+        elif command == 'traverse':
+            if not quiet: say(f"中序遍历结果: {list(active_tree)}")
+        
+        elif command == 'info':
+            say(f"\n--- 树 '{self.active_tree_name}' 的信息 ---")
+            say(f"  节点总数: {active_tree.count}") # 修改点: 使用 .count 属性
+            say(f"  树的高度: {active_tree.height}") # 修改点: 使用 .height 属性
+            say("------------------------")
+
+        elif command == 'new':
+            if len(args) != 1: raise ValueError("用法: new <tree_name>")
+            name = args[0]
+            if name in self.trees: raise NameError(f"树 '{name}' 已存在。")
+            self.trees[name] = pyavl.AVLTree()
+            say(f"成功创建新的空树 '{name}'。")
+        
+        elif command == 'use':
+            if len(args) != 1: raise ValueError("需要提供树的名称。")
+            name = args[0]
+            if name not in self.trees: raise NameError(f"树 '{name}' 不存在。")
+            self.active_tree_name = name
+            self.update_prompt()
+            say(f"已切换到树 '{self.active_tree_name}'。")
+
+        elif command == 'list':
+            say("\n--- 当前存在的所有树 ---")
+            for name, tree in self.trees.items():
+                prefix = "-> " if name == self.active_tree_name else "   "
+                say(f"{prefix}{name} (节点数: {tree.count})") # 修改点
+            say("------------------------")
+
+        elif command == 'drop':
+            if len(args) != 1: raise ValueError("需要提供树的名称。")
+            name = args[0]
+            if name == 'main': raise ValueError("不能删除主树 'main'，请使用 'clear'。")
+            if name not in self.trees: raise NameError(f"树 '{name}' 不存在。")
+            
+            self.trees[name].close(); del self.trees[name]
+            
+            if self.active_tree_name == name:
+                self.active_tree_name = 'main'
+                self.update_prompt()
+                say(f"删除了当前树 '{name}'，已自动切换回 'main'。")
+            else:
+                say(f"成功删除树 '{name}'。")
+
+        elif command == 'split':
+            if len(args) != 3: raise ValueError("用法: split <key> <t1> <t2>")
+            key, n1, n2 = int(args[0]), args[1], args[2]
+            if n1 in self.trees or n2 in self.trees: raise NameError("新树名已存在。")
+            
+            say(f"正在分裂树 '{self.active_tree_name}'...")
+            s_tree, l_tree = active_tree.split(key)
+            self.trees[n1], self.trees[n2] = s_tree, l_tree
+            
+            # 优化点: 因为 active_tree 被消耗了，直接从字典中删除它
+            del self.trees[self.active_tree_name]
+            say(f"分裂完成！创建了 '{n1}' 和 '{n2}'。原始树 '{self.active_tree_name}' 已被消耗。")
+            
+            # 自动切换到 main
+            self.active_tree_name = 'main'
+            self.update_prompt()
+            say(f"已自动切换回 'main'。")
+
+
+        elif command == 'merge':
+            if len(args) != 3: raise ValueError("用法: merge <t1> <t2> <res>")
+            n1, n2, res_n = args
+            if n1 not in self.trees or n2 not in self.trees: raise NameError("要合并的树不存在。")
+            if res_n in self.trees: raise NameError("结果树名称已存在。")
+
+            # 优化点: 直接从字典中 pop 出要被消耗的树
+            t1 = self.trees.pop(n1)
+            t2 = self.trees.pop(n2)
+            
+            self.trees[res_n] = pyavl.AVLTree.merge(t1, t2)
+            say(f"合并完成！创建了 '{res_n}'。'{n1}' 和 '{n2}' 已被消耗。")
+            
+            if self.active_tree_name in (n1, n2):
+                self.active_tree_name = res_n
+                self.update_prompt()
+
+        elif command == 'save':
+            filename, as_text = self.parse_file_args(args, "save")
+            if as_text:
+                with open(filename, 'w') as f:
+                    f.write(' '.join(map(str, active_tree.keys_array())))
+            else:
+                active_tree.dump(filename)
+            say(f"树 '{self.active_tree_name}' 已保存到 '{filename}'")
+
+        elif command == 'load':
+            filename, as_text = self.parse_file_args(args, "load")
+            if as_text:
+                with open(filename, 'r') as f:
+                    new_tree = pyavl.AVLTree(array('i', map(int, f.read().split())))
+            else:
+                new_tree = pyavl.AVLTree.load(filename)
+            active_tree.close() # 清空当前树
+            self.trees[self.active_tree_name] = new_tree
+            say(f"从 '{filename}' 加载了 {len(new_tree)} 个键值到当前树。"); say(new_tree)
+
+        else:
+            raise ValueError(f"未知命令 '{command}'。输入 'help' 查看帮助。")
+
+        return True
+
+    def run_script(self, lines, echo=False, batch_size=65536):
+        """
+        非交互地执行一系列命令 (脚本文件或标准输入的各行)，返回计时报告 (dict)。
+        连续的、作用于同一棵树的 i / d / s 命令合并为一次 insert_many / delete_many / contains_many，
+        每批最多 batch_size 个键值；其他命令逐条执行，遇到 q 时停止。
+        echo 为 False 时命令以 quiet 方式执行：不打印任何输出，也不渲染树的结构，计时中不含渲染的开销。
+        空行与以 # 开头的行被忽略；出错的行不会中断执行，错误信息连同行号写到标准错误。
+        """
+        stats = {}
+        pending = None      # 尚未执行的批量命令: [命令, 树名, 键值 array, 行数]
+        errors = 0
+
+        def record(command, n_lines, n_keys, seconds, hits=None):
+            entry = stats.setdefault(command, {'lines': 0, 'keys': 0, 'calls': 0, 'seconds': 0.0})
+            entry['lines'] += n_lines
+            entry['keys'] += n_keys
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            if hits is not None:
+                entry['hits'] = entry.get('hits', 0) + hits
+
+        def flush():
+            nonlocal pending
+            if pending is None: return
+            command, name, keys, n_lines = pending
+            pending = None
+            method, message = self.BATCH_COMMANDS[command]
+            tree = self.trees[name]
+            start = time.perf_counter()
+            result = getattr(tree, method)(keys)
+            elapsed = time.perf_counter() - start
+            record(command, n_lines, len(keys), elapsed, sum(result) if command == 's' else None)
+            if echo:
+                if command == 's':
+                    for key, found in zip(keys, result):
+                        print(f"✅ 在树 '{name}' 中找到了键值 {key}。" if found
+                              else f"❌ 在树 '{name}' 中未找到键值 {key}。")
+                else:
+                    print(f"{message}: {keys.tolist()}"); print(tree)
+
+        total_start = time.perf_counter()
+        n_lines = 0
+        for lineno, raw in enumerate(lines, 1):
+            line = raw.strip().lower().split()
+            if not line or line[0].startswith('#'): continue
+            n_lines += 1
+            command, *args = line
+            try:
+                if command in self.BATCH_COMMANDS:
+                    keys = array('i', self.parse_keys(args, command))
+                    if pending is None or pending[:2] != [command, self.active_tree_name] \
+                            or len(pending[2]) + len(keys) > batch_size:
+                        flush()
+                        pending = [command, self.active_tree_name, array('i'), 0]
+                    pending[2].extend(keys)
+                    pending[3] += 1
+                    continue
+
+                # 其他命令之前先执行积攒的批量命令，保持命令的先后顺序
+                flush()
+                if command in ('q', 'quit', 'exit'): break
+                start = time.perf_counter()
+                keep_going = self.execute(command, args, quiet=not echo)
+                record(command, 1, 0, time.perf_counter() - start)
+                if not keep_going: break
+            except Exception as e:
+                # 批量命令在 flush 时才会出错，报告的是触发 flush 的那一行
+                errors += 1
+                print(f"第 {lineno} 行: 错误: {e}", file=sys.stderr)
+        try:
+            flush()
+        except Exception as e:
+            errors += 1
+            print(f"脚本末尾: 错误: {e}", file=sys.stderr)
+        total = time.perf_counter() - total_start
+
+        for entry in stats.values():
+            entry['keys_per_sec'] = entry['keys'] / entry['seconds'] if entry['keys'] and entry['seconds'] else None
+        return {
+            'lines': n_lines,
+            'errors': errors,
+            'seconds': total,
+            'lines_per_sec': n_lines / total if total else None,
+            'commands': stats,
+            'trees': {name: tree.count for name, tree in self.trees.items()},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="交互式 AVL 树演示程序；指定 --script 时非交互地执行命令并输出 JSON 计时报告。")
+    parser.add_argument("--script", metavar="FILE", help="要执行的命令文件，每行一条命令；'-' 表示标准输入")
+    parser.add_argument("--echo", action="store_true", help="脚本模式下仍然打印每条命令的输出 (包括树的结构)")
+    parser.add_argument("--batch-size", type=int, default=65536, help="脚本模式下每次批量调用最多合并的键值个数")
+    parser.add_argument("--report", metavar="FILE", help="把 JSON 报告写入文件，默认写到标准输出")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     shell = AVLTreeShell()
-    shell.run()
\ No newline at end of file
+    if args.script is None:
+        shell.run()
+        return
+
+    with (contextlib.nullcontext(sys.stdin) if args.script == '-' else open(args.script)) as f:
+        report = shell.run_script(f, echo=args.echo, batch_size=args.batch_size)
+    for tree in shell.trees.values(): tree.close()
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.report is None:
+        print(text)
+    else:
+        with open(args.report, 'w') as f:
+            f.write(text + "\n")
+    sys.exit(1 if report['errors'] else 0)
+
+
+if __name__ == "__main__":
+    main()
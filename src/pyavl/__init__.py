@@ -1,8 +1,18 @@
 # src/pyavl/__init__.py
 
 # 从我们的内部封装模块中，只导入我们想让用户看到的 Tree 类
-from ._myclib import AVLTree
+from ._myclib import (AVLSumTree, AVLTree, AVLTree64, AVLTreeBytes, AVLTreeFloat, AVLTreeU64, Arena, reset_stats,
+                      stats_enabled)
+from ._map import AVLMap, AVLMap64, AVLMapBytes, AVLMapFloat, AVLMapU64, AVLSumMap64
+from ._frozen import FrozenAVLTree, FrozenAVLTree64, FrozenAVLTreeFloat, FrozenAVLTreeU64
+from ._multiset import AVLMultiset64
+from ._sharded import ShardedAVLTree
+from ._shared import SharedTreePublisher, SharedTreeReader
 
 # __all__ 是一个列表，定义了 "from pyavl import *" 时会导入哪些名字。
 # 这也是一个最佳实践，明确了包的公共API。
-__all__ = ['AVLTree']
\ No newline at end of file
+__all__ = ['AVLTree', 'AVLTree64', 'AVLTreeU64', 'AVLTreeFloat', 'AVLTreeBytes', 'Arena',
+           'AVLMap', 'AVLMap64', 'AVLMapU64', 'AVLMapFloat', 'AVLMapBytes', 'AVLSumTree', 'AVLSumMap64',
+           'AVLMultiset64', 'ShardedAVLTree', 'SharedTreePublisher', 'SharedTreeReader',
+           'FrozenAVLTree', 'FrozenAVLTree64', 'FrozenAVLTreeU64', 'FrozenAVLTreeFloat',
+           'stats_enabled', 'reset_stats']
\ No newline at end of file
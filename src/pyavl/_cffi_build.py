@@ -1,42 +1,265 @@
+import os
+import sys
+
 from cffi import FFI
 
 ffibuilder = FFI()
 
-# 1. 声明 C 接口
-#    这是从你的 AVLTree.h 精确转换而来的。
-ffibuilder.cdef("""
+# 每种键值类型的 C 接口都由 libavl/src/avl_template.h 从同一份模板生成，
+# 这里同样用一份模板字符串为它们生成声明，字段含义见 AVLTree.h 中的 AVL_DECLARE_TYPED_API。
+#     (函数前缀, 树句柄类型, 游标类型, 键值类型)
+KEY_TYPES = [
+    ("avl", "AVLTree", "AVLCursor", "int"),
+    ("avl64", "AVLTree64", "AVLCursor64", "int64_t"),
+    ("avlu64", "AVLTreeU64", "AVLCursorU64", "uint64_t"),
+    ("avlf64", "AVLTreeF64", "AVLCursorF64", "double"),
+    ("avlb", "AVLTreeBytes", "AVLCursorBytes", "AVLBytes"),
+    ("avlsum", "AVLTreeSum", "AVLCursorSum", "int"),
+]
+
+# 有序映射的实例：整套集合接口，再加上 _MAP_CDEF 中按值槽操作的函数
+MAP_TYPES = [
+    ("avlm", "AVLMap", "AVLMapCursor", "int"),
+    ("avlm64", "AVLMap64", "AVLMapCursor64", "int64_t"),
+    ("avlmu64", "AVLMapU64", "AVLMapCursorU64", "uint64_t"),
+    ("avlmf64", "AVLMapF64", "AVLMapCursorF64", "double"),
+    ("avlmb", "AVLMapBytes", "AVLMapCursorBytes", "AVLBytes"),
+    ("avlmsum64", "AVLMapSum64", "AVLMapCursorSum64", "int64_t"),
+]
+
+_TYPED_CDEF = """
     /* --- 不透明指针声明 --- */
-    // CFFI 通过 "..." 知道这是一个它不需要了解内部细节的结构体
-    typedef void *AVLTree;
+    // CFFI 不需要了解树节点的内部细节，把句柄当作 void* 即可
+    typedef void *{Tree};
 
     /* --- 公共API函数声明 --- */
-    AVLTree avl_create(void);
-    void avl_destroy(AVLTree tree);
-    AVLTree avl_insert(AVLTree tree, int key);
-    AVLTree avl_delete(AVLTree tree, int key);
-    int avl_search(const AVLTree tree, int key);
-    int avl_get_count(const AVLTree tree);
-    int avl_get_height(const AVLTree tree);            
-    void avl_display_to_buffer(const AVLTree tree, char* out_buffer, int buffer_size);
+    {Tree} {P}_create(void);
+    void {P}_destroy({Tree} tree);
+    {Tree} {P}_insert({Tree} tree, {Key} key);
+    {Tree} {P}_delete({Tree} tree, {Key} key);
+    {Tree} {P}_discard({Tree} tree, {Key} key, int* removed);
+    int {P}_search(const {Tree} tree, {Key} key);
+    int {P}_search_finger(const {Tree} tree, {Key} key);
+    int {P}_get_count(const {Tree} tree);
+    int {P}_get_height(const {Tree} tree);
+    long long {P}_depth_histogram(const {Tree} tree, int* hist, int max_depth);
+    int {P}_rank(const {Tree} tree, {Key} key);
+    int {P}_select(const {Tree} tree, int index, {Key}* out_key);
+    int {P}_count_range(const {Tree} tree, {Key} lo, {Key} hi);
+    void {P}_display_to_buffer(const {Tree} tree, char* out_buffer, int buffer_size);
+
+    /* --- 批量操作 --- */
+    {Tree} {P}_insert_batch({Tree} tree, const {Key}* keys, int n);
+    {Tree} {P}_delete_batch({Tree} tree, const {Key}* keys, int n);
+    void {P}_search_batch(const {Tree} tree, const {Key}* keys, int n, unsigned char* out);
+    void {P}_search_batch_at(const {Tree} tree, const {Key}* keys, int n, const int* pos, unsigned char* out);
+    void {P}_partition_batch(const {Key}* bounds, int nbounds, const {Key}* keys, int n,
+                             {Key}* out_keys, int* out_pos, int* counts);
+
+    /* --- 批量构建 --- */
+    {Tree} {P}_build_sorted(const {Key}* keys, int n);
+    int {P}_is_strictly_sorted(const {Key}* keys, int n);
+    int {P}_sort_unique({Key}* keys, int n);
+
+    /* --- 游标 --- */
+    typedef struct {Cursor} {Cursor};
+    {Cursor}* {P}_cursor_create(const {Tree} tree);
+    void {P}_cursor_destroy({Cursor}* cursor);
+    int {P}_cursor_seek({Cursor}* cursor, {Key} key);
+    int {P}_cursor_seek_floor({Cursor}* cursor, {Key} key);
+    int {P}_cursor_first({Cursor}* cursor);
+    int {P}_cursor_last({Cursor}* cursor);
+    int {P}_cursor_valid(const {Cursor}* cursor);
+    {Key} {P}_cursor_key(const {Cursor}* cursor);
+    int {P}_cursor_next({Cursor}* cursor);
+    int {P}_cursor_prev({Cursor}* cursor);
+    int {P}_cursor_fill({Cursor}* cursor, {Key}* out, int max_n, const {Key}* limit, int reverse);
 
     /* --- 选做内容：公共API函数声明 --- */
-    AVLTree avl_merge(AVLTree T1, AVLTree T2);
-    void avl_split(AVLTree T, int x, AVLTree* T_small, AVLTree* T_large);
-    
+    {Tree} {P}_merge({Tree} T1, {Tree} T2);
+    void {P}_split({Tree} T, {Key} x, {Tree}* T_small, {Tree}* T_large);
+    {Tree} {P}_join({Tree} T1, {Key} key, {Tree} T2);
+    {Tree} {P}_union({Tree} T1, {Tree} T2);
+    {Tree} {P}_intersection({Tree} T1, {Tree} T2);
+    {Tree} {P}_difference({Tree} T1, {Tree} T2);
+    {Tree} {P}_symmetric_difference({Tree} T1, {Tree} T2);
+
+    /* --- 节点内存池 --- */
+    size_t {P}_node_size(void);
+    void {P}_pool_release(AVLPool* pool, {Tree} tree);
+    {Tree} {P}_snapshot({Tree} tree);
+    {Tree} {P}_pool_insert(AVLPool* pool, {Tree} tree, {Key} key);
+    {Tree} {P}_pool_delete(AVLPool* pool, {Tree} tree, {Key} key);
+    {Tree} {P}_pool_discard(AVLPool* pool, {Tree} tree, {Key} key, int* removed);
+    {Tree} {P}_pool_pop_extreme(AVLPool* pool, {Tree} tree, int last, {Key}* out_key, int* removed);
+    {Tree} {P}_pool_add(AVLPool* pool, {Tree} tree, {Key} key, int* inserted);
+    {Tree} {P}_pool_add_finger(AVLPool* pool, {Tree} tree, {Key} key, int* inserted);
+    {Tree} {P}_pool_append(AVLPool* pool, {Tree} tree, {Key} key, int* inserted);
+    {Tree} {P}_pool_insert_batch(AVLPool* pool, {Tree} tree, const {Key}* keys, int n, int* status);
+    {Tree} {P}_pool_insert_batch_finger(AVLPool* pool, {Tree} tree, const {Key}* keys, int n, int* status);
+    {Tree} {P}_pool_delete_batch(AVLPool* pool, {Tree} tree, const {Key}* keys, int n, int* status);
+    {Tree} {P}_pool_build_sorted(AVLPool* pool, const {Key}* keys, int n);
+    {Tree} {P}_pool_merge(AVLPool* pool, {Tree} T1, {Tree} T2, int* status);
+    void {P}_pool_split(AVLPool* pool, {Tree} T, {Key} x, {Tree}* T_small, {Tree}* T_large, int* status);
+    {Tree} {P}_pool_cut_range(AVLPool* pool, {Tree} tree, const {Key}* lo, const {Key}* hi, {Tree}* out_removed,
+                              int* status);
+    {Tree} {P}_pool_join(AVLPool* pool, {Tree} T1, {Key} key, {Tree} T2);
+    {Tree} {P}_pool_union(AVLPool* pool, {Tree} T1, {Tree} T2, int* status);
+    {Tree} {P}_pool_intersection(AVLPool* pool, {Tree} T1, {Tree} T2, int* status);
+    {Tree} {P}_pool_difference(AVLPool* pool, {Tree} T1, {Tree} T2, int* status);
+    {Tree} {P}_pool_symmetric_difference(AVLPool* pool, {Tree} T1, {Tree} T2, int* status);
+
     /* --- 回调函数类型和遍历函数 --- */
-    typedef void (*avl_traverse_callback)(int key, int height, int bf);
-    void avl_in_order_traverse(AVLTree tree, avl_traverse_callback callback);
+    typedef void (*{P}_traverse_callback)({Key} key, int height, int bf);
+    void {P}_in_order_traverse({Tree} tree, {P}_traverse_callback callback);
+"""
+
+_MAP_CDEF = """
+    /* --- 有序映射：值槽 --- */
+    {Tree} {P}_pool_put(AVLPool* pool, {Tree} tree, {Key} key, int64_t value,
+                        int overwrite, int* inserted, int64_t* old_value);
+    {Tree} {P}_pool_put_batch(AVLPool* pool, {Tree} tree, const {Key}* keys, const int64_t* values, int n,
+                              int* status);
+    {Tree} {P}_pool_pop(AVLPool* pool, {Tree} tree, {Key} key, int* removed, int64_t* out_value);
+    {Tree} {P}_pool_pop_extreme_item(AVLPool* pool, {Tree} tree, int last, {Key}* out_key,
+                                     int64_t* out_value, int* removed);
+    int {P}_get(const {Tree} tree, {Key} key, int64_t* out_value);
+    int {P}_floor_item(const {Tree} tree, {Key} key, {Key}* out_key, int64_t* out_value);
+    int {P}_ceiling_item(const {Tree} tree, {Key} key, {Key}* out_key, int64_t* out_value);
+    int {P}_cursor_fill_items({Cursor}* cursor, {Key}* out_keys, int64_t* out_values,
+                              int max_n, const {Key}* limit, int reverse);
+"""
+
+# 带区间聚合的实例 (定义了 AVL_AUGMENT)，见 AVLTree.h 中的 AVL_DECLARE_AUGMENTED_API
+AUGMENTED_TYPES = [
+    ("avlsum", "AVLTreeSum", "int"),
+    ("avlmsum64", "AVLMapSum64", "int64_t"),
+]
+
+_AUGMENTED_CDEF = """
+    /* --- 区间聚合 --- */
+    int {P}_range_aggregate(const {Tree} tree, {Key} lo, {Key} hi,
+                            int64_t* out_sum, int64_t* out_min, int64_t* out_max);
+    int {P}_root_aggregate(const {Tree} tree, int64_t* out_sum, int64_t* out_min, int64_t* out_max);
+"""
+
+# 带计数的实例 (带聚合的映射)，见 AVLTree.h 中的 AVL_DECLARE_COUNT_API
+COUNT_TYPES = [
+    ("avlmsum64", "AVLMapSum64", "int64_t"),
+]
+
+_COUNT_CDEF = """
+    /* --- 计数 (多重集合) --- */
+    {Tree} {P}_pool_add_count(AVLPool* pool, {Tree} tree, {Key} key, int64_t delta, int* status,
+                              int64_t* out_count);
+    {Tree} {P}_pool_add_count_runs(AVLPool* pool, {Tree} tree, const {Key}* keys, int n, int* status);
+"""
+
+# 冻结树 (Eytzinger 布局) 只为定长键值生成，见 AVLTree.h 中的 AVL_DECLARE_FROZEN_API
+FROZEN_TYPES = [
+    ("avl", "int"),
+    ("avl64", "int64_t"),
+    ("avlu64", "uint64_t"),
+    ("avlf64", "double"),
+]
+
+_FROZEN_CDEF = """
+    /* --- 冻结树 --- */
+    void {P}_frozen_build(const {Key}* sorted, {Key}* out, int n);
+    int {P}_frozen_is_valid(const {Key}* a, int n);
+    int {P}_frozen_search(const {Key}* a, int n, {Key} key);
+    void {P}_frozen_search_batch(const {Key}* a, int n, const {Key}* keys, int m, unsigned char* out);
+    int {P}_frozen_rank(const {Key}* a, int n, {Key} key, int inclusive);
+    void {P}_frozen_fill(const {Key}* a, int n, int start, int count, {Key}* out, int reverse);
+"""
+
+# 1. 声明 C 接口
+#    这是从你的 AVLTree.h 精确转换而来的。
+ffibuilder.cdef("""
+    /* --- 节点内存池 (所有键值类型共用) --- */
+    typedef struct AVLPool AVLPool;
+    AVLPool* avl_pool_create(void);
+    void avl_pool_clear(AVLPool* pool);
+    void avl_pool_destroy(AVLPool* pool);
+    size_t avl_pool_live_nodes(const AVLPool* pool);
+    size_t avl_pool_reserved_bytes(const AVLPool* pool);
+
+    /* --- 读写锁 (可选的线程安全模式) --- */
+    typedef struct AVLRWLock AVLRWLock;
+    AVLRWLock* avl_rwlock_create(void);
+    void avl_rwlock_destroy(AVLRWLock* lock);
+    void avl_rwlock_read_lock(AVLRWLock* lock);
+    void avl_rwlock_read_unlock(AVLRWLock* lock);
+    void avl_rwlock_write_lock(AVLRWLock* lock);
+    void avl_rwlock_write_unlock(AVLRWLock* lock);
+
+    /* --- 操作计数 (编译时可选) --- */
+    typedef struct AVLStats {
+        uint64_t comparisons;
+        uint64_t single_rotations;
+        uint64_t double_rotations;
+        uint64_t node_allocs;
+        uint64_t node_frees;
+        uint64_t rebalance_early_exits;
+    } AVLStats;
+    int avl_stats_enabled(void);
+    void avl_stats_get(AVLStats* out);
+    void avl_stats_reset(void);
+
+    /* --- 字节串键值 --- */
+    typedef struct AVLBytes {
+        const unsigned char* data;
+        size_t len;
+    } AVLBytes;
+""" + "".join(
+    _TYPED_CDEF.format(P=prefix, Tree=tree, Cursor=cursor, Key=key)
+    for prefix, tree, cursor, key in KEY_TYPES
+) + "".join(
+    (_TYPED_CDEF + _MAP_CDEF).format(P=prefix, Tree=tree, Cursor=cursor, Key=key)
+    for prefix, tree, cursor, key in MAP_TYPES
+) + "".join(
+    _AUGMENTED_CDEF.format(P=prefix, Tree=tree, Key=key)
+    for prefix, tree, key in AUGMENTED_TYPES
+) + "".join(
+    _COUNT_CDEF.format(P=prefix, Tree=tree, Key=key)
+    for prefix, tree, key in COUNT_TYPES
+) + "".join(
+    _FROZEN_CDEF.format(P=prefix, Key=key)
+    for prefix, key in FROZEN_TYPES
+) + """
+    /* --- 字节串键值的打包格式 --- */
+    size_t avlb_packed_size(const AVLTreeBytes tree);
+    void avlb_pack(const AVLTreeBytes tree, unsigned char* out);
+    int avlb_unpack(const unsigned char* packed, size_t nbytes, AVLBytes* out, int n);
 """)
 
 # 2. 配置 C 源码
 ffibuilder.set_source(
     "pyavl._pyavl_c",               # 生成的 Python 扩展模块名
     '#include "AVLTree.h"',         # 编译时包含的头文件
-    sources=['libavl/src/AVLTree.c'],       # C 源文件
+    sources=[                       # C 源文件：共用的内存池 + 每种键值类型一个集合实例
+        'libavl/src/avl_pool.c',
+        'libavl/src/avl_rwlock.c',
+        'libavl/src/avl_stats.c',
+        'libavl/src/AVLTree.c',
+        'libavl/src/AVLTree64.c',
+        'libavl/src/AVLTreeU64.c',
+        'libavl/src/AVLTreeF64.c',
+        'libavl/src/AVLTreeBytes.c',
+        'libavl/src/AVLTreeSum.c',  # 带区间聚合的实例
+        'libavl/src/AVLMap.c',      # 映射实例：每种键值类型一个
+        'libavl/src/AVLMap64.c',
+        'libavl/src/AVLMapU64.c',
+        'libavl/src/AVLMapF64.c',
+        'libavl/src/AVLMapBytes.c',
+        'libavl/src/AVLMapSum64.c',
+    ],
     include_dirs=['libavl/include'],        # C 头文件目录
-    # 如果你的C代码需要链接数学库(-lm)，可以像下面这样添加
-    # libraries=['m'] 
+    # 读写锁在 POSIX 上依赖 pthread (Windows 上的 SRWLOCK 不需要额外的库)
+    libraries=[] if sys.platform == 'win32' else ['pthread'],
+    # 设置环境变量 PYAVL_STATS=1 构建时启用操作计数 (见 AVLTree.h 中的 AVLStats)，默认关闭且没有任何开销
+    define_macros=[('AVL_STATS', '1')] if os.environ.get('PYAVL_STATS') else [],
 )
 
 if __name__ == "__main__":
-    ffibuilder.compile(verbose=True)
\ No newline at end of file
+    ffibuilder.compile(verbose=True)
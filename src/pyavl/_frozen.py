@@ -0,0 +1,299 @@
+# src/pyavl/_frozen.py
+"""
+冻结树：只读的有序键值集合，键值按 Eytzinger 顺序 (完全二叉树的层序) 存放在一块连续内存中。
+
+与指针相连的 AVL 树相比，查找时不需要追逐指针：每一步的下标都由上一步无分支地算出，
+最上面几层常驻缓存，之后要访问的缓存行可以提前预取。批量查找会交错推进多个查询，
+让它们的缓存未命中同时进行。布局本身就是一个 array，可以原样写入文件并通过 mmap 零拷贝地加载，
+也可以放进命名的共享内存，由多个进程同时附加读取。
+"""
+from array import array
+
+from ._myclib import AVLTree, AVLTree64, AVLTreeFloat, AVLTreeU64, _CURSOR_CHUNK
+from ._pyavl_c import ffi
+from ._snapshot import (LAYOUT_EYTZINGER, SharedSnapshotReader, SnapshotReader, create_shared_snapshot,
+                        write_snapshot)
+
+
+class _FrozenAVLTreeBase:
+    """
+    所有定长键值类型共用的冻结树。通过 AVLTree.freeze() 或直接从键值构建，通过 thaw() 转换回可修改的树。
+    冻结树不可修改，因此可以被多个线程同时读取而无需加锁。
+    """
+
+    # 对应的可修改树的类型，由每种键值类型的子类设置；键值检查与 C 函数都取自它
+    _tree_cls = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        tree_cls = cls._tree_cls
+        cls._c = tree_cls._c
+        cls._key_ctype = tree_cls._key_ctype
+        cls._typecode = tree_cls._typecode
+        tree_cls._frozen_cls = cls
+
+    def __init__(self, keys=()):
+        """
+        从任意键值集合构建冻结树，重复的键值只保留一个。
+        :param keys: 支持缓冲区协议的键值数组或可迭代对象；已严格递增的输入不需要排序。
+        """
+        tree_cls = self._tree_cls
+        c_keys = tree_cls._key_array(keys)
+        n = len(c_keys)
+        if not self._c.is_strictly_sorted(c_keys, n):
+            work = bytearray(ffi.buffer(c_keys))
+            c_keys = ffi.from_buffer(f"{self._key_ctype}[]", work, require_writable=True)
+            n = self._c.sort_unique(c_keys, n)
+        self._init_layout(self._build_layout(c_keys, n))
+
+    @classmethod
+    def _build_layout(cls, c_sorted, n):
+        """把 n 个严格递增的 C 键值排列为 Eytzinger 顺序，返回新的 array。"""
+        layout = array(cls._typecode, bytes(array(cls._typecode).itemsize * n))
+        if n:
+            c_out = ffi.from_buffer(f"{cls._key_ctype}[]", layout, require_writable=True)
+            cls._c.frozen_build(c_sorted, c_out, n)
+        return layout
+
+    def _init_layout(self, layout, reader=None):
+        # reader 不为 None 时 layout 是指向 mmap (或共享内存) 的 memoryview，关闭时一并释放
+        self._layout = layout
+        self._reader = reader
+        self._a = ffi.from_buffer(f"{self._key_ctype}[]", layout)
+        self._n = len(self._a)
+        self._closed = False
+
+    @classmethod
+    def _from_layout(cls, layout, reader=None):
+        frozen = cls.__new__(cls)
+        frozen._init_layout(layout, reader)
+        return frozen
+
+    @classmethod
+    def from_tree(cls, tree):
+        """把一棵可修改的树冻结为冻结树，代价为 O(n)。"""
+        keys = tree.keys_array()
+        c_keys = ffi.from_buffer(f"{cls._key_ctype}[]", keys)
+        return cls._from_layout(cls._build_layout(c_keys, len(keys)))
+
+    def thaw(self, arena=None, thread_safe=False):
+        """
+        以 O(n) 时间把冻结树转换回一棵可修改的 (完全平衡的) 树，冻结树本身保持不变。
+        :param arena: 与 AVLTree 构造函数的同名参数含义相同。
+        :param thread_safe: 与 AVLTree 构造函数的同名参数含义相同。
+        """
+        tree_cls = self._tree_cls._variant('thread_safe') if thread_safe else self._tree_cls
+        return tree_cls._build_from_sorted_keys(ffi.from_buffer(f"{self._key_ctype}[]", self.keys_array()), arena)
+
+    def dump(self, path):
+        """
+        把冻结树写成二进制快照文件：头部与 AVLTree.dump 相同 (标志位标明 Eytzinger 布局)，
+        后面是与内存中完全相同的键值数组，load 时可以直接映射使用。
+        """
+        self._check_closed()
+        write_snapshot(path, array(self._typecode, self._layout), LAYOUT_EYTZINGER)
+
+    @classmethod
+    def load(cls, path):
+        """
+        通过 mmap 打开 dump 写出的文件，校验后直接在映射的内存上查找 (小端平台上不复制键值)。
+        文件在冻结树关闭之前保持映射。
+        :raises ValueError: 文件格式、键值类型、长度或校验和不正确，或者不是合法的 Eytzinger 布局。
+        """
+        reader = SnapshotReader(path, cls._typecode, LAYOUT_EYTZINGER)
+        frozen = cls._from_layout(reader.keys, reader)
+        if not cls._c.frozen_is_valid(frozen._a, frozen._n):
+            frozen.close()
+            raise ValueError("Snapshot keys are not a valid Eytzinger layout of increasing keys.")
+        return frozen
+
+    def share(self, name=None):
+        """
+        把冻结树复制到一段新建的命名共享内存中 (字节与 dump 写出的文件相同)，其他进程可以用 attach 读取。
+        这是一次性的副本：共享内存发布之后不会再变。需要反复发布新内容时使用 SharedTreePublisher。
+        键值不含指针，只靠下标定位孩子，因此各进程可以把这段内存映射在不同的地址上。
+        :param name: 共享内存的名字，省略时由系统生成，可通过返回值的 name 属性得到。
+        :return: multiprocessing.shared_memory.SharedMemory 对象。调用者拥有这段共享内存，
+                 不再发布时应调用 close() 与 unlink()；已经附加的读者不受 unlink 影响。
+        """
+        self._check_closed()
+        return create_shared_snapshot(array(self._typecode, self._layout), LAYOUT_EYTZINGER, name)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        按名字附加到 share 创建的共享内存，直接在共享的内存上查找与扫描，不复制、不反序列化。
+        读到的是 share 那一刻的内容，发布者之后发布的新内容要重新 attach 新的名字 (或使用 SharedTreeReader)。
+        校验方式与 load 相同；关闭冻结树时只解除本进程的映射。
+        :raises FileNotFoundError: 不存在该名字的共享内存。
+        :raises ValueError: 内容不是合法的冻结树快照，或键值类型不符。
+        """
+        reader = SharedSnapshotReader(name, cls._typecode, LAYOUT_EYTZINGER)
+        frozen = cls._from_layout(reader.keys, reader)
+        if not cls._c.frozen_is_valid(frozen._a, frozen._n):
+            frozen.close()
+            raise ValueError("Shared memory keys are not a valid Eytzinger layout of increasing keys.")
+        return frozen
+
+    @property
+    def layout(self) -> memoryview:
+        """以只读 memoryview 的形式返回底层的 Eytzinger 键值数组。"""
+        self._check_closed()
+        # 由 load/attach 打开时底层是按字节映射的内存，这里统一转换为按键值类型的视图
+        return memoryview(self._layout).cast('B').cast(self._typecode).toreadonly()
+
+    def _check_closed(self):
+        if self._closed:
+            raise ValueError(f"Cannot perform operation: This {type(self).__name__} instance has been closed.")
+
+    def close(self):
+        """释放键值数组；由 load 打开的冻结树同时解除文件映射，由 attach 得到的冻结树解除共享内存的映射。"""
+        if not self._closed:
+            # 解除映射之前必须释放 cffi 对缓冲区的引用
+            ffi.release(self._a)
+            self._layout = None
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            self._closed = True
+
+    def __del__(self):
+        if hasattr(self, '_closed'):
+            self.close()
+
+    def __enter__(self):
+        self._check_closed()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        self._check_closed()
+        return self._n
+
+    def search(self, key) -> bool:
+        """查找一个键值是否存在。"""
+        self._check_closed()
+        return bool(self._c.frozen_search(self._a, self._n, self._tree_cls._c_key(key)))
+
+    def __contains__(self, key) -> bool:
+        return self.search(key)
+
+    def contains_many(self, keys) -> bytearray:
+        """
+        批量查找键值是否存在，多个查询在 C 层交错推进。
+        :return: 与输入等长的 bytearray，第 i 个字节为 1 表示第 i 个键值存在。
+        """
+        self._check_closed()
+        c_keys = self._tree_cls._key_array(keys)
+        result = bytearray(len(c_keys))
+        c_out = ffi.from_buffer("unsigned char[]", result, require_writable=True)
+        self._c.frozen_search_batch(self._a, self._n, c_keys, len(c_keys), c_out)
+        return result
+
+    def rank(self, key) -> int:
+        """返回严格小于 key 的键值个数，key 不必存在。"""
+        self._check_closed()
+        return self._c.frozen_rank(self._a, self._n, self._tree_cls._c_key(key), 0)
+
+    def lower_bound(self, key):
+        """返回第一个 >= key 的键值，不存在时返回 None。"""
+        r = self.rank(key)
+        return self._select(r) if r < self._n else None
+
+    def count_range(self, lo, hi) -> int:
+        """返回落在闭区间 [lo, hi] 内的键值个数。"""
+        start, stop = self._rank_bounds(lo, hi)
+        return stop - start
+
+    def select(self, index: int):
+        """返回升序第 index 个键值 (从0开始，支持负数下标)。"""
+        self._check_closed()
+        if not isinstance(index, int):
+            raise TypeError("Index must be an integer.")
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError(f"{type(self).__name__} index out of range.")
+        return self._select(index)
+
+    def __getitem__(self, index: int):
+        return self.select(index)
+
+    def _select(self, index):
+        out = ffi.new(f"{self._key_ctype} *")
+        self._c.frozen_fill(self._a, self._n, index, 1, out, 0)
+        return out[0]
+
+    def _rank_bounds(self, lo, hi):
+        """把闭区间 [lo, hi] (None 表示不设限) 换算为排名区间 [start, stop)。"""
+        self._check_closed()
+        bounds = self._tree_cls._clamp_bounds(lo, hi)
+        if bounds is None:
+            return 0, 0
+        lo, hi = bounds
+        start = 0 if lo is None else self._c.frozen_rank(self._a, self._n, self._tree_cls._c_key(lo), 0)
+        stop = self._n if hi is None else self._c.frozen_rank(self._a, self._n, self._tree_cls._c_key(hi), 1)
+        return start, max(start, stop)
+
+    def keys_array(self, lo=None, hi=None) -> array:
+        """以 array 的形式返回闭区间 [lo, hi] 内的全部键值 (升序)。"""
+        start, stop = self._rank_bounds(lo, hi)
+        result = array(self._typecode, bytes(array(self._typecode).itemsize * (stop - start)))
+        if result:
+            c_out = ffi.from_buffer(f"{self._key_ctype}[]", result, require_writable=True)
+            self._c.frozen_fill(self._a, self._n, start, len(result), c_out, 0)
+        return result
+
+    def irange(self, lo=None, hi=None, reverse: bool = False):
+        """按顺序迭代闭区间 [lo, hi] 内的键值，省略的边界表示不设限；reverse 为 True 时降序。"""
+        start, stop = self._rank_bounds(lo, hi)
+        return self._iter_ranks(start, stop, reverse)
+
+    def _iter_ranks(self, start, stop, reverse):
+        chunk = ffi.new(f"{self._key_ctype}[]", _CURSOR_CHUNK)
+        remaining = stop - start
+        next_rank = stop - 1 if reverse else start
+        while remaining > 0:
+            self._check_closed()
+            n = min(remaining, _CURSOR_CHUNK)
+            self._c.frozen_fill(self._a, self._n, next_rank, n, chunk, reverse)
+            yield from ffi.unpack(chunk, n)
+            remaining -= n
+            next_rank += -n if reverse else n
+
+    def __iter__(self):
+        return self.irange()
+
+    def __reversed__(self):
+        return self.irange(reverse=True)
+
+    def __repr__(self):
+        if self._closed:
+            return f"<{type(self).__name__} at {hex(id(self))} (closed)>"
+        return f"<{type(self).__name__} at {hex(id(self))} (n={self._n})>"
+
+
+class FrozenAVLTree(_FrozenAVLTreeBase):
+    """键值为 C int 的冻结树，由 AVLTree.freeze() 得到。"""
+
+    _tree_cls = AVLTree
+
+
+class FrozenAVLTree64(_FrozenAVLTreeBase):
+    """键值为 int64_t 的冻结树，由 AVLTree64.freeze() 得到。"""
+
+    _tree_cls = AVLTree64
+
+
+class FrozenAVLTreeU64(_FrozenAVLTreeBase):
+    """键值为 uint64_t 的冻结树，由 AVLTreeU64.freeze() 得到。"""
+
+    _tree_cls = AVLTreeU64
+
+
+class FrozenAVLTreeFloat(_FrozenAVLTreeBase):
+    """键值为 double 的冻结树，由 AVLTreeFloat.freeze() 得到。"""
+
+    _tree_cls = AVLTreeFloat
@@ -0,0 +1,516 @@
+# src/pyavl/_map.py
+import itertools
+import struct
+from array import array
+
+from ._pyavl_c import ffi
+from ._myclib import (_AVLTreeBase, _BytesKeys, _CFunctions, _CURSOR_CHUNK, _FloatKeys, _INT_MAX, _INT_MIN,
+                      _RangeAggregates, _as_key_buffer)
+
+# pop 未给出 default 时的哨兵，以及“键值不存在”的内部标记
+_MISSING = object()
+_NOT_FOUND = object()
+_DOUBLE = struct.Struct('=d')
+_INT64 = struct.Struct('=q')
+
+
+class _ObjectValues:
+    """
+    任意 Python 对象作为值。C 层的值槽中只保存一个槽位号，对象本身保存在 _objects 中，
+    由它持有对象的强引用；槽位号 0 表示 None，不占用槽位。
+    所有映射共用同一个槽位表，因此 split/merge 移动节点时不需要搬动任何对象。
+    """
+
+    name = 'object'
+    _objects = {}
+    _slot_ids = itertools.count(1)
+
+    @classmethod
+    def encode(cls, value):
+        if value is None:
+            return 0
+        slot = next(cls._slot_ids)
+        cls._objects[slot] = value
+        return slot
+
+    @classmethod
+    def decode(cls, slot):
+        return cls._objects[slot] if slot else None
+
+    @classmethod
+    def release(cls, slot):
+        """值槽所在的节点被删除或者值被覆盖时，放弃对原对象的引用。"""
+        if slot:
+            del cls._objects[slot]
+
+    @classmethod
+    def decode_many(cls, c_values, n):
+        objects = cls._objects
+        return [objects[slot] if slot else None for slot in ffi.unpack(c_values, n)]
+
+
+class _Int64Values:
+    """64 位有符号整数作为值，直接保存在值槽中。"""
+
+    name = 'q'
+
+    @staticmethod
+    def encode(value):
+        if not isinstance(value, int):
+            raise TypeError("Value must be an integer.")
+        if not -(1 << 63) <= value < (1 << 63):
+            raise OverflowError("Value does not fit in int64.")
+        return value
+
+    @staticmethod
+    def decode(bits):
+        return bits
+
+    @staticmethod
+    def release(bits):
+        pass
+
+    @staticmethod
+    def decode_many(c_values, n):
+        return ffi.unpack(c_values, n)
+
+
+class _Float64Values:
+    """双精度浮点数作为值，值槽中保存它的位模式。"""
+
+    name = 'd'
+
+    @staticmethod
+    def encode(value):
+        if not isinstance(value, (int, float)):
+            raise TypeError("Value must be a float or an integer.")
+        return _INT64.unpack(_DOUBLE.pack(value))[0]
+
+    @staticmethod
+    def decode(bits):
+        return _DOUBLE.unpack(_INT64.pack(bits))[0]
+
+    @staticmethod
+    def release(bits):
+        pass
+
+    @staticmethod
+    def decode_many(c_values, n):
+        return ffi.unpack(ffi.cast("double *", c_values), n)
+
+
+_VALUE_TYPES = {codec.name: codec for codec in (_ObjectValues, _Int64Values, _Float64Values)}
+
+
+class _AVLMapBase(_AVLTreeBase):
+    """
+    所有键值类型共用的有序映射：每个节点在键值之外还有一个 64 位的值槽。
+    映射按键值排序，支持集合的全部操作 (键值单独插入时值为 None 或 0)，
+    另外提供 dict 风格的按键取值、floor/ceiling 查询和按键值区间迭代键值对。
+    注意 m[key] 是按键取值，按中序位置取键值请用 select(index)。
+    """
+
+    # 值的类型，由构造函数的 value_type 参数决定；split/merge 得到的映射沿用输入的类型
+    _values = _ObjectValues
+
+    _LOCKED_READS = _AVLTreeBase._LOCKED_READS + ('get', 'floor_item', 'ceiling_item', 'values_array', '_next_items')
+    _LOCKED_WRITES = _AVLTreeBase._LOCKED_WRITES + ('_put', 'pop', 'update')
+
+    def __init__(self, items=None, arena=None, value_type: str = 'object', thread_safe=False):
+        """
+        创建一个新的映射。
+        :param items: 可选的初始内容，可以是 dict 等映射，也可以是 (键值, 值) 对的可迭代对象。
+        :param arena: 与 AVLTree 构造函数的同名参数含义相同。
+        :param value_type: 'object' (默认) 保存任意 Python 对象的引用；
+                           'q' 和 'd' 分别把值作为 int64 和 double 直接保存在节点中，不创建 Python 对象。
+        :param thread_safe: 与 AVLTree 构造函数的同名参数含义相同。
+        """
+        super().__init__(arena=arena)
+        try:
+            self._values = _VALUE_TYPES[value_type]
+        except (KeyError, TypeError):
+            raise ValueError("value_type must be 'object', 'q' or 'd'.") from None
+        if items is not None:
+            self.update(items)
+
+    @property
+    def value_type(self) -> str:
+        """返回值的类型：'object'、'q' 或 'd'。"""
+        return self._values.name
+
+    def _put(self, key, value, overwrite):
+        """插入或覆盖一个键值对，返回 (是否新插入, 原来的值槽)。"""
+        self._check_closed()
+        c_key = self._c_key(key)
+        encoded = self._values.encode(value)
+        inserted = ffi.new("int *")
+        old_value = ffi.new("int64_t *")
+        self._ptr = self._c.pool_put(self._pool, self._ptr, c_key, encoded, overwrite, inserted, old_value)
+        if inserted[0] != 1:
+            # 值没有被存入新节点：键值已存在且不覆盖，或者内存分配失败
+            if inserted[0] < 0 or not overwrite:
+                self._values.release(encoded)
+            if inserted[0] < 0:
+                raise MemoryError("Failed to insert node in C library.")
+            return False, old_value[0]
+        self._version += 1
+        return True, None
+
+    def __setitem__(self, key, value):
+        """实现 m[key] = value，键值已存在时覆盖原来的值。"""
+        inserted, old_value = self._put(key, value, 1)
+        if not inserted:
+            self._values.release(old_value)
+
+    def __getitem__(self, key):
+        """实现 m[key]，键值不存在时抛出 KeyError。"""
+        value = self.get(key, _NOT_FOUND)
+        if value is _NOT_FOUND:
+            raise KeyError(key)
+        return value
+
+    def __delitem__(self, key):
+        """实现 del m[key]，键值不存在时抛出 KeyError。"""
+        self.pop(key)
+
+    def get(self, key, default=None):
+        """返回键值对应的值，键值不存在时返回 default。"""
+        self._check_closed()
+        out_value = ffi.new("int64_t *")
+        if not self._c.get(self._ptr, self._c_key(key), out_value):
+            return default
+        return self._values.decode(out_value[0])
+
+    def pop(self, key, default=_MISSING):
+        """删除键值并返回它的值；键值不存在时返回 default，未给出 default 则抛出 KeyError。"""
+        self._check_closed()
+        removed = ffi.new("int *")
+        out_value = ffi.new("int64_t *")
+        self._ptr = self._c.pool_pop(self._pool, self._ptr, self._c_key(key), removed, out_value)
+        if removed[0] < 0:
+            raise MemoryError("Failed to copy nodes shared with a snapshot.")
+        if not removed[0]:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        self._version += 1
+        value = self._values.decode(out_value[0])
+        self._values.release(out_value[0])
+        return value
+
+    def pop_min(self):
+        """删除并返回键值最小的键值对 (键值, 值)，映射为空时抛出 IndexError。"""
+        return self._pop_extreme(0)
+
+    def pop_max(self):
+        """删除并返回键值最大的键值对 (键值, 值)，映射为空时抛出 IndexError。"""
+        return self._pop_extreme(1)
+
+    def _pop_extreme(self, last):
+        self._check_closed()
+        out_key = ffi.new(f"{self._key_ctype} *")
+        out_value = ffi.new("int64_t *")
+        removed = ffi.new("int *")
+        self._ptr = self._c.pool_pop_extreme_item(self._pool, self._ptr, last, out_key, out_value, removed)
+        self._check_popped(removed[0])
+        value = self._values.decode(out_value[0])
+        self._values.release(out_value[0])
+        return self._from_c_key(out_key[0]), value
+
+    def _pop_key(self, key):
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        """键值存在时返回它的值；否则插入 (key, default) 并返回 default。只下降一次。"""
+        inserted, old_value = self._put(key, default, 0)
+        if inserted:
+            return default
+        return self._values.decode(old_value)
+
+    def floor_item(self, key):
+        """返回键值 <= key 的最后一个键值对 (键值, 值)，不存在时抛出 KeyError。"""
+        return self._bound_item(self._c.floor_item, key)
+
+    def ceiling_item(self, key):
+        """返回键值 >= key 的第一个键值对 (键值, 值)，不存在时抛出 KeyError。"""
+        return self._bound_item(self._c.ceiling_item, key)
+
+    def _bound_item(self, c_func, key):
+        self._check_closed()
+        out_key = ffi.new(f"{self._key_ctype} *")
+        out_value = ffi.new("int64_t *")
+        if not c_func(self._ptr, self._c_key(key), out_key, out_value):
+            raise KeyError(key)
+        return self._from_c_key(out_key[0]), self._values.decode(out_value[0])
+
+    def update(self, items=(), values=None):
+        """
+        批量插入或覆盖键值对。
+        :param items: dict 等映射，或者 (键值, 值) 对的可迭代对象；给出 values 时则是键值序列。
+        :param values: 与 items 等长的值序列。对于 'q' 和 'd' 类型的映射，
+                       两者都可以是支持缓冲区协议的数组 (array、numpy 数组等)，整批在一次 C 调用中完成。
+        :raises MemoryError: 内存不足；此前的键值对已经写入，从失败的键值对起都没有处理。
+        """
+        self._check_closed()
+        if values is None:
+            pairs = items.items() if hasattr(items, 'items') else items
+            for key, value in pairs:
+                self[key] = value
+            return
+
+        if self._values is _ObjectValues:
+            keys, values = list(items), list(values)
+            if len(keys) != len(values):
+                raise ValueError("keys and values must have the same length.")
+            for key, value in zip(keys, values):
+                self[key] = value
+            return
+
+        c_keys = self._key_array(items)
+        # 'd' 类型的值按位模式原样交给 C，与 encode 的结果一致
+        c_values = ffi.from_buffer("int64_t[]", _as_key_buffer(values, self._values.name))
+        if len(c_keys) != len(c_values):
+            raise ValueError("keys and values must have the same length.")
+        status = ffi.new("int *")
+        self._ptr = self._c.pool_put_batch(self._pool, self._ptr, c_keys, c_values, len(c_keys), status)
+        self._finish_batch(status[0], len(c_keys))
+
+    def keys(self, lo=None, hi=None, reverse: bool = False):
+        """按顺序迭代闭区间 [lo, hi] 内的键值，与 irange 相同。"""
+        return self.irange(lo, hi, reverse)
+
+    def values(self, lo=None, hi=None, reverse: bool = False):
+        """按键值顺序迭代闭区间 [lo, hi] 内的值。"""
+        return (value for _, value in self.items(lo, hi, reverse))
+
+    def items(self, lo=None, hi=None, reverse: bool = False):
+        """
+        按键值顺序迭代闭区间 [lo, hi] 内的 (键值, 值) 对，省略的边界表示不设限。
+        与 irange 一样基于 C 层游标按块拉取，代价为 O(log n + k)。
+        """
+        self._check_closed()
+        bounds = self._clamp_bounds(lo, hi)
+        if bounds is None:
+            return iter(())
+        return self._iter_items(*bounds, reverse)
+
+    def _next_items(self, version, cursor, key_chunk, value_chunk, limit, reverse):
+        """从游标拉取下一块键值对，返回 (键值, 值) 的列表。与 _next_keys 一样在同一次加锁内完成转换。"""
+        self._check_version(version)
+        n = self._c.cursor_fill_items(cursor, key_chunk, value_chunk, _CURSOR_CHUNK, limit, reverse)
+        return list(zip(self._unpack_keys(key_chunk, n), self._values.decode_many(value_chunk, n)))
+
+    def _iter_items(self, lo, hi, reverse):
+        cursor, limit, limit_key, version = self._range_cursor(lo, hi, reverse)
+        key_chunk = ffi.new(f"{self._key_ctype}[]", _CURSOR_CHUNK)
+        value_chunk = ffi.new("int64_t[]", _CURSOR_CHUNK)
+        while True:
+            items = self._next_items(version, cursor, key_chunk, value_chunk, limit, reverse)
+            yield from items
+            if len(items) < _CURSOR_CHUNK:
+                return
+
+    def values_array(self, lo=None, hi=None) -> array:
+        """
+        以 array 的形式一次性返回闭区间 [lo, hi] 内的全部值 (按键值升序)，
+        类型码与 value_type 相同。只适用于 'q' 和 'd' 类型的映射。
+        """
+        self._check_closed()
+        if self._values is _ObjectValues:
+            raise TypeError("values_array requires a map with value_type 'q' or 'd'.")
+        bounds = self._clamp_bounds(lo, hi)
+        if bounds is None:
+            return array(self._values.name)
+        lo, hi = bounds
+        result = array(self._values.name, bytes(8 * self._count_between(lo, hi)))
+        if result:
+            cursor = self._range_cursor(lo, None, False)[0]
+            c_out = ffi.from_buffer("int64_t[]", result, require_writable=True)
+            self._c.cursor_fill_items(cursor, ffi.NULL, c_out, len(result), ffi.NULL, 0)
+        return result
+
+    def discard(self, key) -> bool:
+        """删除一个键值 (连同它的值)，返回它是否存在于映射中。"""
+        return self.pop(key, _NOT_FOUND) is not _NOT_FOUND
+
+    def delete(self, key):
+        """从映射中删除一个键值 (连同它的值)。"""
+        self.discard(key)
+
+    def delete_many(self, keys):
+        """删除所有给定的键值，不存在的键值会被忽略。"""
+        if self._values is not _ObjectValues:
+            return super().delete_many(keys)
+        self._check_closed()
+        # 对象值需要逐个放弃引用
+        for key in keys:
+            self.discard(key)
+
+    @classmethod
+    def join(cls, tree1, key, tree2, value=None):
+        """以 (key, value) 为中间键值对连接两个映射，返回一个新映射，两个输入都会被消耗。"""
+        joined = super().join(tree1, key, tree2)
+        if value is not None:
+            joined[key] = value
+        return joined
+
+    @classmethod
+    def union(cls, tree1, tree2):
+        """返回两个映射的并集，同时存在的键值保留 tree1 中的值。只适用于 'q' 和 'd' 类型的映射。"""
+        cls._check_numeric_values(tree1)
+        return super().union(tree1, tree2)
+
+    @classmethod
+    def intersection(cls, tree1, tree2):
+        """返回两个映射的交集，值取自 tree1。只适用于 'q' 和 'd' 类型的映射。"""
+        cls._check_numeric_values(tree1)
+        return super().intersection(tree1, tree2)
+
+    @classmethod
+    def difference(cls, tree1, tree2):
+        """返回 tree1 中键值不在 tree2 中的键值对。只适用于 'q' 和 'd' 类型的映射。"""
+        cls._check_numeric_values(tree1)
+        return super().difference(tree1, tree2)
+
+    @classmethod
+    def symmetric_difference(cls, tree1, tree2):
+        """返回键值只出现在其中一个映射中的键值对。只适用于 'q' 和 'd' 类型的映射。"""
+        cls._check_numeric_values(tree1)
+        return super().symmetric_difference(tree1, tree2)
+
+    @classmethod
+    def _check_numeric_values(cls, tree):
+        # 集合运算会在 C 层直接释放重复的节点，对象值的引用无法随之放弃
+        if isinstance(tree, _AVLMapBase) and tree._values is _ObjectValues:
+            raise TypeError("Set operations require maps with value_type 'q' or 'd'.")
+
+    @classmethod
+    def _check_binary_operands(cls, tree1, tree2):
+        super()._check_binary_operands(tree1, tree2)
+        if tree1._values is not tree2._values:
+            raise ValueError("Cannot combine maps with different value types.")
+
+    @classmethod
+    def _combine(cls, tree1, tree2, result_ptr):
+        result = super()._combine(tree1, tree2, result_ptr)
+        result._values = tree1._values
+        return result
+
+    def split(self, key):
+        """按给定的 key 把映射分裂成两个新映射，值随节点一起转移。"""
+        small, large = super().split(key)
+        small._values = large._values = self._values
+        return small, large
+
+    def pop_range(self, lo=None, hi=None):
+        """把闭区间 [lo, hi] 内的键值对切下，作为一个新映射返回，与 AVLTree.pop_range 相同。"""
+        removed = super().pop_range(lo, hi)
+        removed._values = self._values
+        return removed
+
+    def pop_min_many(self, k: int) -> list:
+        """删除键值最小的 k 个键值对 (不足 k 个时全部删除)，以 (键值, 值) 列表的形式按升序返回。"""
+        return super().pop_min_many(k)
+
+    def _popped_contents(self):
+        return list(self.items())
+
+    def snapshot(self):
+        """返回映射的只读快照，与 AVLTree.snapshot 相同。只适用于 'q' 和 'd' 类型的映射。"""
+        # 快照与映射共享节点，对象值的引用无法在两者之间分别计数
+        if self._values is _ObjectValues:
+            raise TypeError("Snapshots require maps with value_type 'q' or 'd'.")
+        snapshot = super().snapshot()
+        snapshot._values = self._values
+        return snapshot
+
+    def close(self):
+        """释放C语言层面的内存；对象值的引用也会被一并放弃。"""
+        if not self._closed and self._values is _ObjectValues and self._ptr != ffi.NULL:
+            n = self._c.get_count(self._ptr)
+            slots = ffi.new("int64_t[]", n)
+            cursor = self._new_cursor()
+            self._c.cursor_first(cursor)
+            self._c.cursor_fill_items(cursor, ffi.NULL, slots, n, ffi.NULL, 0)
+            for slot in ffi.unpack(slots, n):
+                _ObjectValues.release(slot)
+        super().close()
+
+    def dump(self, path):
+        raise TypeError(f"{type(self).__name__} does not support snapshots.")
+
+    @classmethod
+    def load(cls, path, arena=None):
+        raise TypeError(f"{cls.__name__} does not support snapshots.")
+
+
+class AVLMap(_AVLMapBase):
+    """键值为 C int 的有序映射。"""
+
+    _c = _CFunctions("avlm")
+    _key_ctype = "int"
+    _tree_ctype = "AVLMap"
+    _typecode = 'i'
+    _key_min, _key_max = _INT_MIN, _INT_MAX
+
+
+class AVLMap64(_AVLMapBase):
+    """键值为 64 位有符号整数 (int64_t) 的有序映射。"""
+
+    _c = _CFunctions("avlm64")
+    _key_ctype = "int64_t"
+    _tree_ctype = "AVLMap64"
+    _typecode = 'q'
+    _key_min, _key_max = -(1 << 63), (1 << 63) - 1
+
+
+class AVLMapU64(_AVLMapBase):
+    """键值为 64 位无符号整数 (uint64_t) 的有序映射。"""
+
+    _c = _CFunctions("avlmu64")
+    _key_ctype = "uint64_t"
+    _tree_ctype = "AVLMapU64"
+    _typecode = 'Q'
+    _key_min, _key_max = 0, (1 << 64) - 1
+
+
+class AVLMapFloat(_FloatKeys, _AVLMapBase):
+    """键值为双精度浮点数 (double) 的有序映射，NaN 不能作为键值。"""
+
+    _c = _CFunctions("avlmf64")
+    _key_ctype = "double"
+    _tree_ctype = "AVLMapF64"
+    _typecode = 'd'
+
+
+class AVLMapBytes(_BytesKeys, _AVLMapBase):
+    """键值为字节串的有序映射，排序规则与 AVLTreeBytes 相同。"""
+
+    _c = _CFunctions("avlmb")
+    _key_ctype = "AVLBytes"
+    _tree_ctype = "AVLMapBytes"
+    _typecode = 's'
+
+
+class AVLSumMap64(_RangeAggregates, _AVLMapBase):
+    """
+    键值与值都是 64 位有符号整数、带区间聚合的有序映射：range_sum/range_min/range_max 以 O(log n) 时间
+    统计一段键值区间内值的和、最小值与最大值，适合按时间戳求滑动窗口的总量与极值。
+    值的和按 int64 计算，溢出时按 2^64 取模回绕。每个节点多占 24 字节；不需要聚合时请使用 AVLMap64。
+    """
+
+    _c = _CFunctions("avlmsum64")
+    _key_ctype = "int64_t"
+    _tree_ctype = "AVLMapSum64"
+    _typecode = 'q'
+    _key_min, _key_max = -(1 << 63), (1 << 63) - 1
+    _values = _Int64Values
+    _LOCKED_READS = _AVLMapBase._LOCKED_READS + ('_range_aggregate',)
+
+    def __init__(self, items=None, arena=None, value_type: str = 'q', thread_safe=False):
+        """与 AVLMap 的构造函数相同，但值只能是 int64 ('q')。"""
+        super().__init__(arena=arena, value_type='q', thread_safe=thread_safe)
+        if value_type != 'q':
+            raise ValueError("AVLSumMap64 only supports value_type 'q'.")
+        if items is not None:
+            self.update(items)
@@ -0,0 +1,167 @@
+# src/pyavl/_multiset.py
+"""
+有序多重集合：同一个键值可以出现多次，但每个不同的键值只占一个节点，节点的值槽保存它的重数。
+与把重复编码进复合键值的做法相比，内存与键值的重复次数无关，区间查询也仍然按原来的键值进行。
+"""
+from array import array
+from itertools import groupby
+
+from ._map import AVLSumMap64
+from ._pyavl_c import ffi
+
+
+class AVLMultiset64(AVLSumMap64):
+    """
+    键值为 int64 的有序多重集合。建立在 AVLSumMap64 之上：值槽保存重数，子树的值之和就是子树中的元素个数，
+    因此 total 为 O(1)，range_sum(lo, hi) 以 O(log n) 统计区间内的元素个数。
+    与 collections.Counter 一样，len()、迭代、rank/select 与 count_range 针对不同的键值，
+    elements() 按重数重复每个键值，ms[key] 即 count_of(key)。
+    discard/delete/pop_min/pop_max 移除一个键值的全部出现；集合运算按不同的键值进行，同时存在的键值保留 tree1 的重数。
+    """
+
+    _LOCKED_WRITES = AVLSumMap64._LOCKED_WRITES + ('_add_count', 'add_many')
+
+    def __init__(self, keys=None, arena=None, thread_safe=False):
+        """
+        创建一个新的多重集合。
+        :param keys: 可选的初始元素 (支持缓冲区协议的键值数组或可迭代对象)，重复的键值累加重数。
+        :param arena: 与 AVLTree 构造函数的同名参数含义相同。
+        :param thread_safe: 与 AVLTree 构造函数的同名参数含义相同。
+        """
+        super().__init__(arena=arena, thread_safe=thread_safe)
+        if keys is not None:
+            self.add_many(keys)
+
+    @property
+    def total(self) -> int:
+        """元素的总个数 (各键值的重数之和)，直接读取根节点上的聚合值，代价为 O(1)。"""
+        return self.range_sum()
+
+    def count_of(self, key) -> int:
+        """返回键值 key 的重数，不存在时返回 0。"""
+        return self.get(key, 0)
+
+    def __getitem__(self, key) -> int:
+        return self.count_of(key)
+
+    def __setitem__(self, key, n: int):
+        """把键值 key 的重数设为 n；n 为 0 时删除该键值。"""
+        if not isinstance(n, int) or n < 0:
+            raise ValueError("Multiplicity must be a non-negative integer.")
+        if n == 0:
+            self.discard(key)
+        else:
+            self._put(key, n, 1)
+
+    def add(self, key, n: int = 1) -> int:
+        """把键值 key 加入 n 次，返回加入后的重数。键值不存在时插入新节点，查找与累加在同一次下降中完成。"""
+        return self._add_count(key, self._check_n(n))
+
+    def remove(self, key, n: int = 1) -> int:
+        """
+        移除键值 key 的 n 次出现，返回移除后的重数；重数降为 0 时删除该节点。
+        :raises KeyError: 键值不存在。
+        :raises ValueError: 键值的重数小于 n，多重集合没有被修改。
+        """
+        return self._add_count(key, -self._check_n(n))
+
+    @staticmethod
+    def _check_n(n):
+        if not isinstance(n, int) or n <= 0:
+            raise ValueError("n must be a positive integer.")
+        return n
+
+    def _add_count(self, key, delta):
+        self._check_closed()
+        status = ffi.new("int *")
+        out_count = ffi.new("int64_t *")
+        self._ptr = self._c.pool_add_count(self._pool, self._ptr, self._c_key(key), delta, status, out_count)
+        if status[0] == -1:
+            raise MemoryError("Failed to update node in C library.")
+        if status[0] == 0:
+            raise KeyError(key)
+        if status[0] == -2:
+            if delta > 0:
+                raise OverflowError("Multiplicity does not fit in int64.")
+            raise ValueError(f"Cannot remove {-delta} occurrences of {key!r}: only {out_count[0]} present.")
+        self._version += 1
+        return out_count[0]
+
+    def add_many(self, keys):
+        """
+        在一次 C 调用中加入缓冲区 (或可迭代对象) 中的所有键值。连续相等的键值先合并为一次累加，
+        因此已排序 (或已按键值分组) 的输入中每个不同的键值只下降一次。
+        """
+        self._check_closed()
+        self._add_runs(self._key_array(keys))
+
+    def _add_runs(self, c_keys):
+        status = ffi.new("int *")
+        self._ptr = self._c.pool_add_count_runs(self._pool, self._ptr, c_keys, len(c_keys), status)
+        self._version += 1
+        if status[0] == -1:
+            raise MemoryError("Failed to update node in C library.")
+        if status[0] == -2:
+            raise OverflowError("Multiplicity does not fit in int64.")
+
+    def insert(self, key):
+        """与 add(key) 相同。"""
+        self.add(key)
+
+    def append(self, key):
+        """
+        加入一个不小于当前最大键值的元素：等于最大键值时它的重数加 1，否则插入重数为 1 的新节点。
+        :raises ValueError: key 小于当前最大键值，多重集合没有被修改。
+        """
+        self._check_closed()
+        key = self._check_key(key)
+        if self._c.get_count(self._ptr) and key < self.max():
+            raise ValueError("append() requires a key not less than the current maximum.")
+        self.add(key)
+
+    def setdefault(self, key, n: int = 1) -> int:
+        """键值存在时返回它的重数；否则以重数 n 插入并返回 n。只下降一次。"""
+        return super().setdefault(key, self._check_n(n))
+
+    @classmethod
+    def from_sorted(cls, keys, arena=None):
+        """
+        从已排序 (非降序，可以有重复) 的元素构建多重集合：与 add_many 一样，连续相等的键值合并为一个节点，
+        重数为它出现的次数。
+        :param keys: 任何支持缓冲区协议的键值数组或可迭代对象。
+        :param arena: 与构造函数的同名参数含义相同。
+        :raises ValueError: 如果输入不是非降序的。
+        """
+        c_keys = cls._key_array(keys)
+        # 各段相等键值的代表严格递增，当且仅当输入是非降序的
+        runs = array(cls._typecode, (key for key, _ in groupby(ffi.unpack(c_keys, len(c_keys)))))
+        if not cls._c.is_strictly_sorted(cls._key_array(runs), len(runs)):
+            raise ValueError("Keys must be sorted in non-decreasing order.")
+        multiset = cls(arena=arena)
+        multiset._add_runs(c_keys)
+        return multiset
+
+    def insert_many(self, keys):
+        """与 add_many(keys) 相同。"""
+        self.add_many(keys)
+
+    def update(self, keys=()):
+        """
+        与 collections.Counter.update 相同：keys 为映射时按其中的重数加入，否则逐个加入其中的键值。
+        """
+        if hasattr(keys, 'items'):
+            for key, n in keys.items():
+                self.add(key, n)
+        else:
+            self.add_many(keys)
+
+    def elements(self, lo=None, hi=None, reverse: bool = False):
+        """按顺序迭代闭区间 [lo, hi] 内的元素，每个键值按其重数重复。"""
+        for key, n in self.items(lo, hi, reverse):
+            for _ in range(n):
+                yield key
+
+    @classmethod
+    def join(cls, tree1, key, tree2, value=1):
+        """以重数为 value 的 key 连接两个多重集合，返回一个新的多重集合，两个输入都会被消耗。"""
+        return super().join(tree1, key, tree2, cls._check_n(value))
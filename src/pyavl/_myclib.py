@@ -1,133 +1,1109 @@
 # src/pyavl/_myclib.py (完整修正版)
+import functools
+import mmap
 import os
 import sys
 import tempfile
+import threading
+from array import array
 from typing import Callable
 
 # 导入我们编译好的底层C模块中的 lib 和 ffi 对象
 from ._pyavl_c import lib, ffi
+from ._snapshot import SnapshotReader, write_packed_snapshot, write_snapshot
 
-class AVLTree:
+_INT_SIZE = ffi.sizeof("int")
+# 这些字节串对象 (及其 memoryview) 被视为“原始字节”，按本机字节序直接解释为键值数组；
+# 格式同为 'B' 的类型化缓冲区 (array('B')、np.uint8 数组等) 则按元素的值转换
+_RAW_BYTE_TYPES = (bytes, bytearray, mmap.mmap)
+# 可以被安全转换为整数键值的格式
+_INTEGER_FORMATS = 'bBhHiIlLqQnN'
+# 与各键值类型内存布局相同 (itemsize 也相同时) 的缓冲区格式，可以零拷贝地直接交给 C
+_SAME_LAYOUT_FORMATS = {'i': 'il', 'q': 'qln', 'Q': 'QLN', 'd': 'd'}
+# 可以被转换 (复制) 为各键值类型的缓冲区格式
+_CONVERTIBLE_FORMATS = {'i': _INTEGER_FORMATS, 'q': _INTEGER_FORMATS, 'Q': _INTEGER_FORMATS,
+                        'd': _INTEGER_FORMATS + 'fd'}
+_INT_MIN = -(1 << (8 * _INT_SIZE - 1))
+_INT_MAX = (1 << (8 * _INT_SIZE - 1)) - 1
+# 游标每次从 C 层批量拉取的键值个数
+_CURSOR_CHUNK = 1024
+# 与 avl_template.h 中的 AVL_MAX_HEIGHT 一致：树的深度不会超过它
+_MAX_HEIGHT = 64
+# AVLStats 的字段，见 AVLTree.h
+_STATS_FIELDS = ('comparisons', 'single_rotations', 'double_rotations', 'node_allocs', 'node_frees',
+                 'rebalance_early_exits')
+
+
+def _as_key_buffer(keys, typecode: str):
     """
-    一个面向对象的AVL树Python封装器。
-    它负责管理指向C语言AVLTree结构体的指针
+    将键值集合转换为可以直接交给 C 的、类型码为 typecode 的缓冲区。
+    对于已经是 C-连续且布局相同的缓冲区 (array('i')、bytes、np.int32 数组等)，
+    原样返回以实现零拷贝；其他数值缓冲区和普通可迭代对象会被复制为 array(typecode)。
+    """
+    try:
+        view = memoryview(keys)
+    except TypeError:
+        # 不支持缓冲区协议的普通可迭代对象 (list, range, 生成器...)
+        return array(typecode, keys)
+
+    itemsize = array(typecode).itemsize
+    fmt = view.format.lstrip('@=')
+    base = keys.obj if isinstance(keys, memoryview) else keys
+    if fmt == 'c' or (fmt == 'B' and isinstance(base, _RAW_BYTE_TYPES)):
+        if view.nbytes % itemsize != 0:
+            raise ValueError(f"Byte buffer length must be a multiple of {itemsize}.")
+        return keys if view.c_contiguous else view.tobytes()
+    if fmt in _SAME_LAYOUT_FORMATS[typecode] and view.itemsize == itemsize:
+        return keys if view.c_contiguous else view.tobytes()
+    if len(fmt) == 1 and fmt in _CONVERTIBLE_FORMATS[typecode]:
+        # 宽度或符号不同的缓冲区 (例如把 np.int64 交给 32 位的树): 复制并检查溢出
+        return array(typecode, memoryview(view.tobytes()).cast(fmt))
+    raise TypeError(f"Unsupported buffer format '{view.format}' for '{typecode}' keys.")
+
+
+def _as_bytes_key(key) -> bytes:
+    """把一个字节串键值规范化为 bytes；str 和 int 会被拒绝，以免被隐式编码或当作长度。"""
+    if isinstance(key, bytes):
+        return key
+    if isinstance(key, (str, int)):
+        raise TypeError("Key must be a bytes-like object.")
+    try:
+        return memoryview(key).tobytes()
+    except TypeError:
+        raise TypeError("Key must be a bytes-like object.") from None
+
+
+def _pack_bytes_keys(keys):
+    """
+    把一组字节串键值打包为 (键值个数, 打包缓冲区)。
+    打包格式与 avlb_pack/avlb_unpack 一致：每个键值为 4 字节小端长度 + 内容。
+    """
+    parts = []
+    for key in keys:
+        key = _as_bytes_key(key)
+        if len(key) >= 1 << 32:
+            raise ValueError("Bytes keys must be shorter than 4 GiB.")
+        parts.append(len(key).to_bytes(4, 'little'))
+        parts.append(key)
+    return len(parts) // 2, b"".join(parts)
+
+
+class _CFunctions:
+    """按前缀把 lib 中的一组 C 函数暴露为属性，例如 _CFunctions('avl64').insert 即 lib.avl64_insert。"""
+
+    def __init__(self, prefix: str):
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        # 首次访问后缓存到实例上，之后的查找不再经过 __getattr__
+        func = getattr(lib, f"{self._prefix}_{name}")
+        setattr(self, name, func)
+        return func
+
+
+class Arena:
+    """
+    节点内存池 (arena) 的 Python 封装。
+    使用同一个 Arena 的树从同一组大块内存中切分节点，被删除的节点会进入空闲链表以供复用；
+    当最后一棵使用它的树被关闭时，所有内存块会被按块一次性释放，而不必逐个释放节点。
+    只有共用同一个 Arena 的树之间才能合并 (merge)；同一时刻共用一个 Arena 的树必须是同一种键值类型。
+    """
+
+    def __init__(self):
+        self._pool = None
+        pool = lib.avl_pool_create()
+        if pool == ffi.NULL:
+            raise MemoryError("Failed to create node pool in C library.")
+        self._pool = pool
+        # 当前正在使用该池的、未关闭的树的数量，以及它们的类型
+        self._trees = 0
+        self._tree_type = None
+
+    def __del__(self):
+        # 在解释器退出等循环垃圾回收的场景下，Arena 可能先于使用它的树被析构；
+        # 此时整个池连同其中的所有节点一起释放，之后树的 close() 不再做任何事。
+        if self._pool is not None:
+            lib.avl_pool_destroy(self._pool)
+            self._pool = None
+
+    @property
+    def live_nodes(self) -> int:
+        """返回池中正在被树使用的节点数。"""
+        return lib.avl_pool_live_nodes(self._pool)
+
+    @property
+    def reserved_bytes(self) -> int:
+        """返回池向系统申请的总字节数。"""
+        return lib.avl_pool_reserved_bytes(self._pool)
+
+    def _attach(self, tree_type):
+        if self._trees and tree_type is not self._tree_type:
+            raise TypeError(
+                f"Arena is in use by {self._tree_type.__name__} trees and cannot serve {tree_type.__name__}.")
+        self._trees += 1
+        self._tree_type = tree_type
+
+    def _detach(self, ptr=ffi.NULL, free_nodes=True):
+        """一棵树不再使用该池。free_nodes 为 False 表示节点的所有权已经转移给了别的树。"""
+        self._trees -= 1
+        if not free_nodes or self._pool is None:
+            return
+        if self._trees == 0:
+            # 最后一棵树：按块整体释放，代价只与块数有关
+            lib.avl_pool_clear(self._pool)
+        else:
+            self._tree_type._c.pool_release(self._pool, ptr)
+
+    def __repr__(self):
+        return f"<Arena at {hex(id(self))} (trees={self._trees}, live_nodes={self.live_nodes})>"
+
+
+def _resolve_arena(arena):
+    """把用户传入的 arena 参数规范化：True 表示新建私有 Arena，假值表示不使用内存池。"""
+    if arena is True:
+        return Arena()
+    return arena or None
+
+
+def stats_enabled() -> bool:
+    """返回 C 扩展构建时是否启用了操作计数 (设置环境变量 PYAVL_STATS=1 后重新构建即可启用)。"""
+    return bool(lib.avl_stats_enabled())
+
+
+def reset_stats():
+    """把操作计数清零。计数由进程内所有的树 (所有键值类型) 共用。"""
+    lib.avl_stats_reset()
+
+
+def _read_stats():
+    """以字典的形式读取操作计数；构建时没有启用计数时返回 None。"""
+    if not lib.avl_stats_enabled():
+        return None
+    out = ffi.new("AVLStats *")
+    lib.avl_stats_get(out)
+    return {name: getattr(out, name) for name in _STATS_FIELDS}
+
+
+class _RWLock:
+    """
+    C 读写锁 (AVLRWLock) 的封装，供 thread_safe=True 的树使用。
+    C 层的锁不可重入，这里按线程记录嵌套深度：已经持有锁的线程再次进入时 (例如 merge 内部调用 select)
+    直接放行。与其他 C 调用一样，等待锁时 GIL 是被释放的。
     """
 
-    def __init__(self, keys=None):
+    def __init__(self):
+        lock = lib.avl_rwlock_create()
+        if lock == ffi.NULL:
+            raise MemoryError("Failed to create reader-writer lock in C library.")
+        self._lock = ffi.gc(lock, lib.avl_rwlock_destroy)
+        self._local = threading.local()
+
+    def acquire(self, write: bool):
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if depth:
+            if write and not local.write:
+                raise RuntimeError("Cannot modify a tree while reading it in the same thread.")
+            local.depth = depth + 1
+            return
+        if write:
+            lib.avl_rwlock_write_lock(self._lock)
+        else:
+            lib.avl_rwlock_read_lock(self._lock)
+        local.depth = 1
+        local.write = write
+
+    def release(self):
+        local = self._local
+        local.depth -= 1
+        if local.depth == 0:
+            if local.write:
+                lib.avl_rwlock_write_unlock(self._lock)
+            else:
+                lib.avl_rwlock_read_unlock(self._lock)
+
+
+def _locked(method, write: bool):
+    """把一个实例方法包装为在树的读锁 (或写锁) 下执行。"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self._rwlock
+        lock.acquire(write)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release()
+    return wrapper
+
+
+def _consuming(method):
+    """
+    消耗型二元操作 (merge/join/集合运算) 的装饰器：参数中有线程安全的树时，
+    先按固定顺序获取它们的写锁，以免两个线程以相反的顺序合并同一对树时互相死锁。
+    """
+    @functools.wraps(method)
+    def wrapper(cls, *args, **kwargs):
+        locks = {id(lock): lock for lock in (getattr(arg, '_rwlock', None) for arg in args) if lock is not None}
+        ordered = [locks[key] for key in sorted(locks)]
+        for lock in ordered:
+            lock.acquire(True)
+        try:
+            return method(cls, *args, **kwargs)
+        finally:
+            for lock in reversed(ordered):
+                lock.release()
+    return wrapper
+
+
+def _variant_namespace(cls, **attrs):
+    """变体子类的类字典：名称与文档沿用 cls，并与 cls 视为同一种树。"""
+    return dict(attrs, _public_cls=cls, __doc__=cls.__doc__,
+                __module__=cls.__module__, __qualname__=cls.__qualname__)
+
+
+def _make_thread_safe(cls):
+    """为 cls 生成线程安全的子类：_LOCKED_READS/_LOCKED_WRITES 中的方法在读锁/写锁下执行。"""
+    namespace = _variant_namespace(cls, _thread_safe=True)
+    for names, write in ((cls._LOCKED_READS, False), (cls._LOCKED_WRITES, True)):
+        for name in names:
+            attr = next(klass.__dict__[name] for klass in cls.__mro__ if name in klass.__dict__)
+            if isinstance(attr, property):
+                namespace[name] = property(_locked(attr.fget, write), doc=attr.__doc__)
+            else:
+                namespace[name] = _locked(attr, write)
+    return type(cls.__name__, (cls,), namespace)
+
+
+def _read_only(name):
+    def method(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} snapshots are read-only.")
+    method.__name__ = name
+    return method
+
+
+def _make_snapshot(cls):
+    """
+    为 cls 生成只读快照的子类：_LOCKED_WRITES 中除 close 以外的方法都抛出 TypeError。
+    快照的读取不加锁；与原树共用 Arena 时，关闭快照 (释放节点) 需要在原树的写锁下进行。
+    """
+    namespace = _variant_namespace(cls, _read_only=True)
+    for name in cls._LOCKED_WRITES:
+        if name != 'close':
+            namespace[name] = _read_only(name)
+
+    def close(self):
+        lock = self._pool_lock
+        if lock is None:
+            return cls.close(self)
+        lock.acquire(True)
+        try:
+            cls.close(self)
+        finally:
+            lock.release()
+    close.__doc__ = cls.close.__doc__
+    namespace['close'] = close
+    return type(cls.__name__, (cls,), namespace)
+
+
+_VARIANTS = {'thread_safe': _make_thread_safe, 'snapshot': _make_snapshot}
+
+
+class _AVLTreeBase:
+    """
+    所有键值类型共用的AVL树Python封装器。
+    它负责管理指向C语言树结构体的指针；每个子类通过下面的类属性绑定到一组 C 函数上。
+    """
+
+    # 以下类属性由每种键值类型的子类设置
+    _c = None                       # 该键值类型的 C 函数集合 (_CFunctions)
+    _key_ctype = None               # 键值的 C 类型名
+    _tree_ctype = None              # 树句柄的 C 类型名
+    _typecode = None                # 对应的 array 类型码，也用于二进制快照
+    _key_min = _key_max = None      # 键值的取值范围，用于收紧区间边界；None 表示不需要
+
+    # 线程安全模式：这些方法分别在读锁与写锁下执行 (只列出直接调用 C 的方法，组合方法经由它们加锁)
+    _LOCKED_READS = ('search', 'contains_many', 'rank', 'select', 'count_range', 'keys_array',
+                     'memory_usage', 'in_order_traverse', 'dump', 'count', 'height',
+                     '__len__', '__str__', '_range_cursor', '_next_keys', 'snapshot', 'stats',
+                     '_search_batch_at')
+    _LOCKED_WRITES = ('insert', 'delete', 'discard', 'insert_many', 'delete_many', 'split', 'pop_range',
+                      '_pop_extreme', 'pop_min_many', 'append', 'close')
+    _thread_safe = False
+    _rwlock = None
+    _read_only = False              # 只读快照，见 snapshot()
+    _pool_lock = None               # 快照与线程安全的原树共用 Arena 时，原树的读写锁
+    _frozen_cls = None              # 对应的冻结树类型 (见 _frozen.py)；变长键值与映射没有冻结树
+    _finger = False                 # 指针模式，见 finger 属性
+    _min_cache = None               # min()/max() 的缓存: (版本号, 键值)，版本号不等于 _version 时失效
+    _max_cache = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 线程安全与快照的变体子类 (_VARIANTS) 与原类视为同一种树，可以互相合并
+        if '_public_cls' not in cls.__dict__:
+            cls._public_cls = cls
+
+    def __new__(cls, *args, thread_safe=False, **kwargs):
+        if thread_safe and not cls._thread_safe:
+            cls = cls._variant('thread_safe')
+        tree = super().__new__(cls)
+        if cls._thread_safe:
+            tree._rwlock = _RWLock()
+        return tree
+
+    @classmethod
+    def _variant(cls, kind):
+        """返回 cls 的变体子类 ('thread_safe' 或 'snapshot')，首次使用时生成并缓存。"""
+        variants = cls.__dict__.get('_variants')
+        if variants is None:
+            variants = cls._variants = {}
+        if kind not in variants:
+            variants[kind] = _VARIANTS[kind](cls)
+        return variants[kind]
+
+    def __init__(self, keys=None, arena=None, thread_safe=False):
         """
-        创建一个新的、空的AVLTree实例。
+        创建一个新的、空的树实例。
         :param keys: 一个可选的可迭代对象 (如 list, tuple)，其元素将被插入到树中。
+        :param arena: 可选的节点内存池。传入 True 会为这棵树创建一个私有的 Arena；
+                      传入一个 Arena 对象则与其他树共用该池；默认逐节点 malloc。
+        :param thread_safe: 为 True 时树带有一把 C 层的读写锁，可以被多个线程同时使用：
+                            只读操作 (查找、计数、区间扫描等) 可以并行，修改操作互斥。
+                            split/merge 等操作得到的新树沿用输入树的设置。
         """
-        self._ptr = lib.avl_create()
+        self._ptr = self._c.create()
         # 关键修改 1: 初始化时，明确设置 _closed 状态为 False
         self._closed = False
-        
+        # 每次修改树都会递增该版本号，迭代器据此检测“遍历期间树被修改”
+        self._version = 0
+        self._set_arena(_resolve_arena(arena))
+
         if keys is not None:
-            for key in keys:
-                self.insert(key)
-    
+            # 已有序且无重复的输入直接走 O(n) 构建；否则先在 C 层排序去重，再构建
+            c_keys = self._key_array(keys)
+            n = len(c_keys)
+            build_keys = c_keys
+            if not self._c.is_strictly_sorted(c_keys, n):
+                # 在副本上排序，不修改调用者的缓冲区。字节串键值的描述符指向 c_keys 持有的缓冲区，
+                # 因此构建完成之前 c_keys 必须保持存活
+                work = bytearray(ffi.buffer(c_keys))
+                build_keys = ffi.from_buffer(f"{self._key_ctype}[]", work, require_writable=True)
+                n = self._c.sort_unique(build_keys, n)
+            self._ptr = self._c.pool_build_sorted(self._pool, build_keys, n)
+            if self._ptr == ffi.NULL and n > 0:
+                raise MemoryError("Failed to build tree in C library.")
+
+    @classmethod
+    def _key_array(cls, keys):
+        """把键值集合转换为 C 键值数组，支持缓冲区协议的输入尽量零拷贝。"""
+        return ffi.from_buffer(f"{cls._key_ctype}[]", _as_key_buffer(keys, cls._typecode))
+
+    @classmethod
+    def _check_key(cls, key):
+        """检查键值的类型，返回规范化后的 Python 键值。"""
+        if not isinstance(key, int):
+            raise TypeError("Key must be an integer.")
+        return key
+
+    @classmethod
+    def _c_key(cls, key):
+        """检查键值并返回可以直接传给 C 函数的参数。"""
+        return cls._check_key(key)
+
+    @staticmethod
+    def _from_c_key(c_key):
+        """把 C 层返回的键值转换为 Python 对象。数值类型已由 cffi 自动转换。"""
+        return c_key
+
+    @classmethod
+    def _clamp_bounds(cls, lo, hi):
+        """
+        规范化可选的区间边界：返回 (lo, hi)，其中 None 表示该侧不设限；
+        超出键值取值范围的边界会被收紧，区间必然为空时返回 None。
+        """
+        if lo is not None:
+            lo = cls._check_key(lo)
+            if cls._key_min is not None and lo <= cls._key_min:
+                lo = None
+        if hi is not None:
+            hi = cls._check_key(hi)
+            if cls._key_max is not None and hi >= cls._key_max:
+                hi = None
+        if lo is not None and hi is not None and lo > hi:
+            return None
+        if (lo is not None and cls._key_max is not None and lo > cls._key_max) or \
+                (hi is not None and cls._key_min is not None and hi < cls._key_min):
+            return None
+        return lo, hi
+
+    @classmethod
+    def from_sorted(cls, keys, arena=None):
+        """
+        从严格递增 (已排序且无重复) 的键值序列以 O(n) 时间构建一棵完全平衡的树。
+        :param keys: 任何支持缓冲区协议的键值数组或可迭代对象。
+        :param arena: 与构造函数的同名参数含义相同。
+        :raises ValueError: 如果输入不是严格递增的。
+        """
+        c_keys = cls._key_array(keys)
+        if not cls._c.is_strictly_sorted(c_keys, len(c_keys)):
+            raise ValueError("Keys must be sorted in strictly increasing order.")
+        return cls._build_from_sorted_keys(c_keys, arena)
+
+    @classmethod
+    def _build_from_sorted_keys(cls, c_keys, arena):
+        arena = _resolve_arena(arena)
+        pool = arena._pool if arena is not None else ffi.NULL
+        ptr = cls._c.pool_build_sorted(pool, c_keys, len(c_keys))
+        if ptr == ffi.NULL and len(c_keys) > 0:
+            raise MemoryError("Failed to build tree in C library.")
+        return cls._from_ptr(ptr, arena)
+
+    def dump(self, path):
+        """
+        把树中的全部键值以二进制快照格式写入文件：
+        带版本号、键值类型、个数与 CRC32 校验和的头部，后面是按升序排列的小端键值数组。
+        """
+        self._check_closed()
+        write_snapshot(path, self.keys_array())
+
+    @classmethod
+    def load(cls, path, arena=None):
+        """
+        从 dump 写出的快照文件构建一棵新树。
+        文件通过 mmap 映射后直接交给 C 层以 O(n) 时间建树，中间不经过任何 Python 对象。
+        :raises ValueError: 文件格式、键值类型、长度或校验和不正确，或者键值不是严格递增的。
+        """
+        with SnapshotReader(path, cls._typecode) as reader:
+            c_keys = ffi.from_buffer(f"{cls._key_ctype}[]", reader.keys)
+            try:
+                if not cls._c.is_strictly_sorted(c_keys, len(c_keys)):
+                    raise ValueError("Snapshot keys are not in strictly increasing order.")
+                return cls._build_from_sorted_keys(c_keys, arena)
+            finally:
+                # 关闭 mmap 之前必须释放 cffi 对缓冲区的引用
+                ffi.release(c_keys)
+
+    @property
+    def thread_safe(self) -> bool:
+        """返回这棵树是否带有读写锁。"""
+        return self._thread_safe
+
+    @property
+    def finger(self) -> bool:
+        """
+        是否启用指针 (finger) 模式，默认关闭。启用后 insert、search 与 insert_many 从右脊柱 (最大键值一侧)
+        上离 key 最近的节点开始查找，而不是从根开始：对基本递增的键值流 (例如带少量乱序的时间戳)，
+        与最大键值相隔 d 个键值的操作只需 O(log d) 次比较。远离最大键值的操作最多多出一条右脊柱的比较。
+        """
+        return self._finger
+
+    @finger.setter
+    def finger(self, enabled: bool):
+        self._finger = bool(enabled)
+
+    @property
+    def arena(self):
+        """返回这棵树使用的 Arena；逐节点 malloc 的树返回 None。"""
+        return self._arena
+
+    def memory_usage(self) -> int:
+        """
+        返回节点占用内存的字节数。
+        使用 Arena 时为整个池向系统申请的字节数 (可能被多棵树共用)；
+        否则为 节点数 * 节点大小，不含 malloc 自身的额外开销。
+        """
+        self._check_closed()
+        if self._arena is not None:
+            return self._arena.reserved_bytes
+        return self._c.get_count(self._ptr) * self._c.node_size()
+
     @property
     def count(self) -> int:
-        """返回树中的节点总数。"""
+        """返回树中的节点总数 (O(1))。"""
         self._check_closed()
-        return lib.avl_get_count(self._ptr)
+        return self._c.get_count(self._ptr)
 
     @property
     def height(self) -> int:
         """返回树的高度。"""
         self._check_closed()
-        return lib.avl_get_height(self._ptr)
-    
+        return self._c.get_height(self._ptr)
+
+    def stats(self) -> dict:
+        """
+        返回用于诊断性能问题的结构统计与操作计数：
+        count 与 height；depth_histogram[d] 为深度 d (根为0) 上的节点数；average_depth 为节点的平均深度，
+        即一次命中的查找平均需要的比较次数减一。counters 为进程内所有树共用的操作计数
+        (比较、单/双旋转、节点分配/释放、回溯提前停止的次数)，构建时没有启用计数时为 None，见 reset_stats()。
+        """
+        self._check_closed()
+        hist = ffi.new("int[]", _MAX_HEIGHT)
+        depth_sum = self._c.depth_histogram(self._ptr, hist, _MAX_HEIGHT)
+        count = self._c.get_count(self._ptr)
+        height = self._c.get_height(self._ptr)
+        return {
+            'count': count,
+            'height': height,
+            'depth_histogram': ffi.unpack(hist, height),
+            'average_depth': depth_sum / count if count else 0.0,
+            'counters': _read_stats(),
+        }
+
     def _check_closed(self):
         """一个内部辅助方法，用于检查树是否已被明确关闭。"""
         # 关键修改 2: 现在我们只检查 _closed 标志，而不是 _ptr
         if self._closed:
-            raise ValueError("Cannot perform operation: This AVLTree instance has been closed.")
+            raise ValueError(f"Cannot perform operation: This {type(self).__name__} instance has been closed.")
 
-    def insert(self, key: int):
+    def insert(self, key):
         """向树中插入一个键值。"""
         self._check_closed() # 这个检查现在是正确的
-        if not isinstance(key, int):
-            raise TypeError("Key must be an integer.")
-        
-        new_ptr = lib.avl_insert(self._ptr, key)
-        # 这个错误检查可以保留，用于捕捉C层真正的内存分配失败
-        if new_ptr == ffi.NULL and self._ptr != ffi.NULL:
+        inserted = ffi.new("int *")
+        add = self._c.pool_add_finger if self._finger else self._c.pool_add
+        self._ptr = add(self._pool, self._ptr, self._c_key(key), inserted)
+        if inserted[0] < 0:
+            # 分配新节点或复制与快照共享的路径时内存不足，树没有被修改
             raise MemoryError("Failed to insert node in C library.")
-        self._ptr = new_ptr
+        self._version += 1
 
-    def delete(self, key: int):
+    def append(self, key):
+        """
+        追加一个大于当前最大键值的键值：沿右脊柱下降到最大的节点，只比较一次，不需要从根开始查找。
+        :raises ValueError: key 不大于当前最大键值，树没有被修改。
+        """
+        self._check_closed()
+        inserted = ffi.new("int *")
+        self._ptr = self._c.pool_append(self._pool, self._ptr, self._c_key(key), inserted)
+        if inserted[0] < 0:
+            raise MemoryError("Failed to insert node in C library.")
+        if not inserted[0]:
+            raise ValueError("append() requires a key greater than the current maximum.")
+        self._version += 1
+
+    def delete(self, key):
         """从树中删除一个键值。"""
         self._check_closed()
-        if not isinstance(key, int):
-            raise TypeError("Key must be an integer.")
-        self._ptr = lib.avl_delete(self._ptr, key)
+        removed = ffi.new("int *")
+        self._ptr = self._c.pool_discard(self._pool, self._ptr, self._c_key(key), removed)
+        if removed[0] < 0:
+            raise MemoryError("Failed to copy nodes shared with a snapshot.")
+        self._version += 1
 
-    def search(self, key: int) -> bool:
+    def discard(self, key) -> bool:
+        """删除一个键值，返回它是否存在于树中。查找与删除在同一次下降中完成。"""
+        self._check_closed()
+        removed = ffi.new("int *")
+        self._ptr = self._c.pool_discard(self._pool, self._ptr, self._c_key(key), removed)
+        if removed[0] < 0:
+            raise MemoryError("Failed to copy nodes shared with a snapshot.")
+        if removed[0]:
+            self._version += 1
+        return bool(removed[0])
+
+    def remove(self, key):
+        """删除一个键值，如果它不存在则抛出 KeyError。"""
+        if not self.discard(key):
+            raise KeyError(key)
+
+    def search(self, key) -> bool:
         """查找一个键值是否存在于树中。"""
         self._check_closed()
-        if not isinstance(key, int):
-            raise TypeError("Key must be an integer.")
-        return bool(lib.avl_search(self._ptr, key))
-    
-    def in_order_traverse(self, callback: Callable[[int, int, int], None]):
+        search = self._c.search_finger if self._finger else self._c.search
+        return bool(search(self._ptr, self._c_key(key)))
+
+    def insert_many(self, keys):
+        """
+        在一次 C 调用中插入缓冲区 (或可迭代对象) 中的所有键值。
+        :raises MemoryError: 内存不足；此前的键值已经插入，从失败的键值起都没有处理。
+        """
+        self._check_closed()
+        c_keys = self._key_array(keys)
+        insert_batch = self._c.pool_insert_batch_finger if self._finger else self._c.pool_insert_batch
+        status = ffi.new("int *")
+        self._ptr = insert_batch(self._pool, self._ptr, c_keys, len(c_keys), status)
+        self._finish_batch(status[0], len(c_keys))
+
+    def delete_many(self, keys):
+        """
+        在一次 C 调用中删除所有给定的键值，不存在的键值会被忽略。
+        :raises MemoryError: 复制与快照共享的节点时内存不足；此前的键值已经删除，从失败的键值起都没有处理。
+        """
+        self._check_closed()
+        c_keys = self._key_array(keys)
+        status = ffi.new("int *")
+        self._ptr = self._c.pool_delete_batch(self._pool, self._ptr, c_keys, len(c_keys), status)
+        self._finish_batch(status[0], len(c_keys))
+
+    def _finish_batch(self, status, n):
+        """
+        处理批量函数的 status：非负时为处理完的键值个数；-1 - i 表示处理完 i 个之后内存不足。
+        只有树确实被修改过时才更新版本号。
+        """
+        done = status if status >= 0 else -1 - status
+        if status >= 0 or done:
+            self._version += 1
+        if status < 0:
+            raise MemoryError(f"Out of memory after processing {done} of {n} keys; the rest were not processed.")
+
+    def contains_many(self, keys) -> bytearray:
+        """
+        批量查找键值是否存在。
+        :return: 一个与输入等长的 bytearray，第 i 个字节为 1 表示第 i 个键值存在，否则为 0。
+                 可以用 np.frombuffer(result, dtype=bool) 零拷贝地转换为布尔数组。
+        """
+        self._check_closed()
+        c_keys = self._key_array(keys)
+        result = bytearray(len(c_keys))
+        c_out = ffi.from_buffer("unsigned char[]", result, require_writable=True)
+        self._c.search_batch(self._ptr, c_keys, len(c_keys), c_out)
+        return result
+
+    def _search_batch_at(self, c_keys, n, c_pos, c_out):
+        # 供 ShardedAVLTree 使用：查找已按分片分发的 n 个键值，c_keys[i] 的结果写到 c_out[c_pos[i]]
+        self._check_closed()
+        self._c.search_batch_at(self._ptr, c_keys, n, c_pos, c_out)
+
+    def rank(self, key) -> int:
+        """返回树中严格小于 key 的键值个数，key 不必存在于树中。"""
+        self._check_closed()
+        return self._c.rank(self._ptr, self._c_key(key))
+
+    def select(self, index: int):
+        """返回中序第 index 个键值 (从0开始，支持负数下标)。"""
+        self._check_closed()
+        if not isinstance(index, int):
+            raise TypeError("Index must be an integer.")
+        if index < 0:
+            index += self._c.get_count(self._ptr)
+        out_key = ffi.new(f"{self._key_ctype} *")
+        if index < 0 or not self._c.select(self._ptr, index, out_key):
+            raise IndexError(f"{type(self).__name__} index out of range.")
+        return self._from_c_key(out_key[0])
+
+    def count_range(self, lo, hi) -> int:
+        """返回落在闭区间 [lo, hi] 内的键值个数。"""
+        self._check_closed()
+        return self._c.count_range(self._ptr, self._c_key(lo), self._c_key(hi))
+
+    def _count_between(self, lo, hi) -> int:
+        """统计 _clamp_bounds 规范化后的区间内的键值个数，None 表示该侧不设限。"""
+        n = self._c.get_count(self._ptr)
+        if n == 0:
+            return 0
+        if lo is None:
+            lo = self.select(0)
+        if hi is None:
+            return n - self._c.rank(self._ptr, self._c_key(lo))
+        return self._c.count_range(self._ptr, self._c_key(lo), self._c_key(hi))
+
+    def irange(self, lo=None, hi=None, reverse: bool = False):
+        """
+        按顺序迭代闭区间 [lo, hi] 内的键值，省略的边界表示不设限。
+        基于 C 层游标按块拉取键值，代价为 O(log n + k)，并且可以随时提前停止。
+        :param reverse: 为 True 时按降序迭代。
+        """
+        self._check_closed()
+        bounds = self._clamp_bounds(lo, hi)
+        if bounds is None:
+            return iter(())
+        return self._iter_range(*bounds, reverse)
+
+    def keys_array(self, lo=None, hi=None) -> array:
+        """以 array 的形式一次性返回闭区间 [lo, hi] 内的全部键值 (升序)，类型码与键值类型对应。"""
+        self._check_closed()
+        bounds = self._clamp_bounds(lo, hi)
+        if bounds is None:
+            return array(self._typecode)
+        lo, hi = bounds
+
+        result = array(self._typecode, bytes(array(self._typecode).itemsize * self._count_between(lo, hi)))
+        if result:
+            cursor = self._new_cursor()
+            if lo is None:
+                self._c.cursor_first(cursor)
+            else:
+                self._c.cursor_seek(cursor, self._c_key(lo))
+            c_out = ffi.from_buffer(f"{self._key_ctype}[]", result, require_writable=True)
+            self._c.cursor_fill(cursor, c_out, len(result), ffi.NULL, 0)
+        return result
+
+    def _new_cursor(self):
+        cursor = self._c.cursor_create(self._ptr)
+        if cursor == ffi.NULL:
+            raise MemoryError("Failed to allocate cursor in C library.")
+        return ffi.gc(cursor, self._c.cursor_destroy)
+
+    def _unpack_keys(self, chunk, n):
+        """把游标填充的 C 键值数组的前 n 个元素转换为 Python 对象的列表。"""
+        return ffi.unpack(chunk, n)
+
+    def _range_cursor(self, lo, hi, reverse):
+        """
+        创建一个定位在区间起点的游标，lo/hi 为 None 表示该侧不设限。
+        返回 (游标, 终点边界指针, 终点键值, 版本号)：终点键值必须与游标一起保持存活，
+        因为边界指针 (字节串键值时) 指向它的缓冲区；版本号用于检测之后树是否被修改。
+        """
+        cursor = self._new_cursor()
+        if reverse:
+            if hi is None:
+                self._c.cursor_last(cursor)
+            else:
+                self._c.cursor_seek_floor(cursor, self._c_key(hi))
+        else:
+            if lo is None:
+                self._c.cursor_first(cursor)
+            else:
+                self._c.cursor_seek(cursor, self._c_key(lo))
+
+        bound = lo if reverse else hi
+        limit_key = None if bound is None else self._c_key(bound)
+        limit = ffi.NULL if bound is None else ffi.new(f"{self._key_ctype} *", limit_key)
+        return cursor, limit, limit_key, self._version
+
+    def _check_version(self, version):
+        """游标内部保存着节点指针，树一旦被修改或释放就不能再使用它。"""
+        if self._closed or self._version != version:
+            raise RuntimeError(f"{type(self).__name__} changed during iteration.")
+
+    def _next_keys(self, version, cursor, chunk, limit, reverse):
+        """
+        从游标拉取下一块键值并转换为 Python 对象的列表。
+        转换必须与拉取在同一次加锁内完成：字节串键值指向节点内部的内存。
+        """
+        self._check_version(version)
+        n = self._c.cursor_fill(cursor, chunk, _CURSOR_CHUNK, limit, reverse)
+        return self._unpack_keys(chunk, n)
+
+    def _iter_range(self, lo, hi, reverse):
+        """irange/__iter__/__reversed__ 的生成器实现，lo/hi 为 None 表示该侧不设限。"""
+        # limit_key 在生成器存活期间保持边界键值 (及其缓冲区) 存活
+        cursor, limit, limit_key, version = self._range_cursor(lo, hi, reverse)
+        chunk = ffi.new(f"{self._key_ctype}[]", _CURSOR_CHUNK)
+        while True:
+            keys = self._next_keys(version, cursor, chunk, limit, reverse)
+            yield from keys
+            if len(keys) < _CURSOR_CHUNK:
+                return
+
+    def in_order_traverse(self, callback: Callable[[object, int, int], None]):
         """以中序遍历的方式访问每一个节点。"""
         self._check_closed()
         if not callable(callback):
             raise TypeError("callback must be a callable function.")
         # 显式创建回调对象是好习惯
-        c_callback = ffi.callback("void(int, int, int)", callback)
-        lib.avl_in_order_traverse(self._ptr, c_callback)
+        c_callback = ffi.callback(f"void({self._key_ctype}, int, int)", self._wrap_callback(callback))
+        self._c.in_order_traverse(self._ptr, c_callback)
 
-    def split(self, key: int):
+    def _wrap_callback(self, callback):
+        """把用户的遍历回调包装为接收 C 键值的函数。数值类型无需转换。"""
+        return callback
+
+    def split(self, key):
         """将当前的树按给定的 key 分裂成两棵新树。"""
         self._check_closed()
-        small_ptr_p = ffi.new("AVLTree *")
-        large_ptr_p = ffi.new("AVLTree *")
-        lib.avl_split(self._ptr, key, small_ptr_p, large_ptr_p)
-        
-        small_tree = AVLTree._from_ptr(small_ptr_p[0])
-        large_tree = AVLTree._from_ptr(large_ptr_p[0])
-        
-        self._ptr = ffi.NULL
-        self._closed = True
-        
+        small_ptr_p = ffi.new(f"{self._tree_ctype} *")
+        large_ptr_p = ffi.new(f"{self._tree_ctype} *")
+        status = ffi.new("int *")
+        self._c.pool_split(self._pool, self._ptr, self._c_key(key), small_ptr_p, large_ptr_p, status)
+        if status[0] < 0:
+            raise MemoryError("Failed to copy nodes shared with a snapshot.")
+
+        small_tree = type(self)._from_ptr(small_ptr_p[0], self._arena)
+        large_tree = type(self)._from_ptr(large_ptr_p[0], self._arena)
+
+        self._consume()
+
         return small_tree, large_tree
-    
+
+    def pop_range(self, lo=None, hi=None):
+        """
+        把闭区间 [lo, hi] 内的全部键值从树中切下，作为一棵新树返回 (与原树使用同一个 Arena)，省略的边界表示不设限。
+        通过两次分裂与一次合并完成，代价为 O(log n)，与区间内的键值个数无关；剩余的树保持平衡。
+        """
+        self._check_closed()
+        removed_p = ffi.new(f"{self._tree_ctype} *")
+        bounds = self._clamp_bounds(lo, hi)
+        if bounds is not None:
+            lo, hi = bounds
+            # 边界键值的初始化器 (字节串键值时持有缓冲区) 必须在调用期间保持存活
+            lo_key = None if lo is None else self._c_key(lo)
+            hi_key = None if hi is None else self._c_key(hi)
+            c_lo = ffi.NULL if lo is None else ffi.new(f"{self._key_ctype} *", lo_key)
+            c_hi = ffi.NULL if hi is None else ffi.new(f"{self._key_ctype} *", hi_key)
+            status = ffi.new("int *")
+            self._ptr = self._c.pool_cut_range(self._pool, self._ptr, c_lo, c_hi, removed_p, status)
+            if status[0] < 0:
+                raise MemoryError("Failed to copy nodes shared with a snapshot.")
+            if removed_p[0] != ffi.NULL:
+                self._version += 1
+        return type(self)._from_ptr(removed_p[0], self._arena)
+
+    def delete_range(self, lo=None, hi=None) -> int:
+        """
+        删除闭区间 [lo, hi] 内的全部键值，返回删除的个数。
+        与 pop_range 一样以 O(log n) 切下整个区间，再把切下的节点一次性释放。
+        """
+        with self.pop_range(lo, hi) as removed:
+            return removed.count
+
+    def min(self):
+        """
+        返回最小的键值，树为空时抛出 ValueError。
+        结果按版本号缓存：树修改之后的第一次调用沿左脊柱下降，代价为 O(log n)，之后直到下一次修改都是 O(1)。
+        """
+        cached = self._min_cache
+        if cached is not None and cached[0] == self._version and not self._closed:
+            return cached[1]
+        return self._peek(0, '_min_cache')
+
+    def max(self):
+        """返回最大的键值，树为空时抛出 ValueError。与 min 一样按版本号缓存。"""
+        cached = self._max_cache
+        if cached is not None and cached[0] == self._version and not self._closed:
+            return cached[1]
+        return self._peek(-1, '_max_cache')
+
+    def _peek(self, index, cache_attr):
+        self._check_closed()
+        # 先读版本号再查找：线程安全的树在查找期间被修改时，缓存项带的是旧版本号，不会被再次使用
+        version = self._version
+        try:
+            key = self.select(index)
+        except IndexError:
+            raise ValueError(f"{type(self).__name__} is empty.") from None
+        setattr(self, cache_attr, (version, key))
+        return key
+
+    def pop_min(self):
+        """
+        删除并返回最小的键值，树为空时抛出 IndexError。
+        沿左脊柱一次下降就摘下节点，不需要比较，也不需要先查找再删除。
+        """
+        return self._pop_extreme(0)
+
+    def pop_max(self):
+        """删除并返回最大的键值，树为空时抛出 IndexError。与 pop_min 相同，沿右脊柱下降。"""
+        return self._pop_extreme(1)
+
+    def _pop_extreme(self, last):
+        self._check_closed()
+        out_key = ffi.new(f"{self._key_ctype} *")
+        removed = ffi.new("int *")
+        self._ptr = self._c.pool_pop_extreme(self._pool, self._ptr, last, out_key, removed)
+        self._check_popped(removed[0])
+        return self._from_c_key(out_key[0])
+
+    def _check_popped(self, removed):
+        if removed < 0:
+            raise MemoryError("Failed to copy nodes shared with a snapshot.")
+        if not removed:
+            raise IndexError(f"pop from an empty {type(self).__name__}.")
+        self._version += 1
+
+    def pop_min_many(self, k: int):
+        """
+        删除最小的 k 个键值 (不足 k 个时全部删除)，以 keys_array 的形式按升序返回。
+        通过 select 找到第 k 个键值后用一次 pop_range 整段切下，代价为 O(log n + k)。
+        """
+        self._check_closed()
+        if not isinstance(k, int):
+            raise TypeError("k must be an integer.")
+        if k < 0:
+            raise ValueError("k must be non-negative.")
+        if k == 0:
+            removed = type(self)._from_ptr(ffi.NULL, self._arena)
+        else:
+            removed = self.pop_range(hi=None if k >= self.count else self.select(k - 1))
+        with removed:
+            return removed._popped_contents()
+
+    def _pop_key(self, key):
+        # 按键值删除并返回 pop_min/pop_max 的结果，供需要先复制键值的实例使用
+        self.discard(key)
+        return key
+
+    def _popped_contents(self):
+        return self.keys_array()
+
     @classmethod
+    @_consuming
     def merge(cls, tree1, tree2):
-        """合并两棵AVL树，返回一棵全新的树。"""
-        if not isinstance(tree1, cls) or not isinstance(tree2, cls):
-            raise TypeError("Inputs must be AVLTree objects.")
-        
+        """
+        合并两棵树，返回一棵全新的树。代价为 O(log n)。
+        :raises ValueError: 如果 tree1 中存在不小于 tree2 中最小键值的键值。
+        """
+        cls._check_binary_operands(tree1, tree2)
+        if tree1._ptr != ffi.NULL and tree2._ptr != ffi.NULL and tree1.select(-1) >= tree2.select(0):
+            raise ValueError("All keys of tree1 must be smaller than all keys of tree2.")
+        return cls._apply_binary(cls._c.pool_merge, tree1, tree2)
+
+    @classmethod
+    @_consuming
+    def join(cls, tree1, key, tree2):
+        """
+        以 key 为中间键值连接两棵树，返回一棵全新的树，两棵输入树都会被消耗。
+        代价为 O(|h1 - h2| + 1)。
+        :raises ValueError: 如果不满足 tree1 中所有键值 < key < tree2 中所有键值。
+        """
+        cls._check_binary_operands(tree1, tree2)
+        key = cls._check_key(key)
+        if (tree1._ptr != ffi.NULL and tree1.select(-1) >= key) or (tree2._ptr != ffi.NULL and key >= tree2.select(0)):
+            raise ValueError("join requires max(tree1) < key < min(tree2).")
+        joined_ptr = cls._c.pool_join(tree1._pool, tree1._ptr, cls._c_key(key), tree2._ptr)
+        if joined_ptr == ffi.NULL:
+            raise MemoryError("Failed to allocate node in C library.")
+        return cls._combine(tree1, tree2, joined_ptr)
+
+    @classmethod
+    @_consuming
+    def union(cls, tree1, tree2):
+        """
+        返回两棵树的并集。键值范围可以任意重叠，两棵输入树都会被消耗。
+        设两棵树的大小为 m <= n，代价为 O(m log(n/m + 1))。
+        """
+        cls._check_binary_operands(tree1, tree2)
+        return cls._apply_binary(cls._c.pool_union, tree1, tree2)
+
+    @classmethod
+    @_consuming
+    def intersection(cls, tree1, tree2):
+        """返回两棵树的交集，两棵输入树都会被消耗。代价同 union。"""
+        cls._check_binary_operands(tree1, tree2)
+        return cls._apply_binary(cls._c.pool_intersection, tree1, tree2)
+
+    @classmethod
+    @_consuming
+    def difference(cls, tree1, tree2):
+        """返回 tree1 - tree2，两棵输入树都会被消耗。代价同 union。"""
+        cls._check_binary_operands(tree1, tree2)
+        return cls._apply_binary(cls._c.pool_difference, tree1, tree2)
+
+    @classmethod
+    @_consuming
+    def symmetric_difference(cls, tree1, tree2):
+        """返回只出现在其中一棵树中的键值，两棵输入树都会被消耗。代价同 union。"""
+        cls._check_binary_operands(tree1, tree2)
+        return cls._apply_binary(cls._c.pool_symmetric_difference, tree1, tree2)
+
+    @classmethod
+    def _check_binary_operands(cls, tree1, tree2):
+        """检查两棵树能否作为消耗型二元操作 (merge/join/集合运算) 的输入。"""
+        public = cls._public_cls
+        for tree in (tree1, tree2):
+            if not isinstance(tree, public) or type(tree)._public_cls is not public:
+                raise TypeError(f"Inputs must be {public.__name__} objects.")
+            if tree._read_only:
+                raise TypeError(f"{public.__name__} snapshots are read-only and cannot be consumed.")
         tree1._check_closed()
         tree2._check_closed()
-        
-        merged_ptr = lib.avl_merge(tree1._ptr, tree2._ptr)
-        
-        tree1._ptr = ffi.NULL
-        tree1._closed = True
-        tree2._ptr = ffi.NULL
-        tree2._closed = True
-
-        return cls._from_ptr(merged_ptr)
-            
+        if tree1 is tree2:
+            raise ValueError(f"Cannot combine an {cls.__name__} with itself.")
+        if tree1._arena is not tree2._arena:
+            raise ValueError("Cannot combine trees that use different arenas.")
+
+    @classmethod
+    def _apply_binary(cls, op, tree1, tree2):
+        """
+        执行 C 层的消耗型二元操作 op(pool, T1, T2, status) 并包装结果。
+        复制与快照共享的节点时内存不足会抛出 MemoryError，此时两棵输入树保持不变、没有被消耗。
+        """
+        status = ffi.new("int *")
+        result_ptr = op(tree1._pool, tree1._ptr, tree2._ptr, status)
+        if status[0] < 0:
+            raise MemoryError("Failed to copy nodes shared with a snapshot.")
+        return cls._combine(tree1, tree2, result_ptr)
+
+    @classmethod
+    def _combine(cls, tree1, tree2, result_ptr):
+        """把 C 层二元操作的结果包装成新树 (线程安全与否沿用 tree1)，并标记两棵输入树已被消耗。"""
+        result = type(tree1)._from_ptr(result_ptr, tree1._arena)
+        tree1._consume()
+        tree2._consume()
+        return result
+
+    def freeze(self):
+        """
+        以 O(n) 时间把树的当前内容复制为一棵只读的冻结树 (例如 FrozenAVLTree)：
+        键值按 Eytzinger 顺序存放在连续内存中，查找无分支并带预取，适合读多写少、超出缓存的大树。
+        树本身保持不变；冻结树可以通过 thaw() 转换回可修改的树。
+        """
+        self._check_closed()
+        if self._frozen_cls is None:
+            raise TypeError(f"{type(self).__name__} cannot be frozen; only fixed-size keys are supported.")
+        return self._frozen_cls.from_tree(self)
+
+    def share(self, name=None):
+        """
+        把树的当前内容发布到一段命名的共享内存中，供其他进程通过 attach 零拷贝地读取。
+        内容以冻结树的布局存放 (只用下标定位孩子，不含指针)，与 freeze().share(name) 相同；
+        共享内存中是调用这一刻的副本：之后对树的修改不会反映到其中，读者也不会收到通知，
+        需要时再发布一份新的。按代反复发布、让读者切换到最新一代，见 SharedTreePublisher 与 SharedTreeReader。
+        :return: multiprocessing.shared_memory.SharedMemory 对象，由调用者负责 close() 与 unlink()。
+        """
+        with self.freeze() as frozen:
+            return frozen.share(name)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        按名字附加到另一个进程用 share 发布的共享内存，返回只读的冻结树 (例如 FrozenAVLTree)，
+        search、irange、count_range、len() 等都直接在共享的内存上进行。
+        读到的内容固定为发布者调用 share 那一刻的树，不会随发布者的修改而变化。
+        """
+        if cls._frozen_cls is None:
+            raise TypeError(f"{cls.__name__} cannot be shared; only fixed-size keys are supported.")
+        return cls._frozen_cls.attach(name)
+
+    def snapshot(self):
+        """
+        返回树在当前时刻的只读快照，代价为 O(1)。
+        快照与树共享所有节点；此后对树的插入/删除采用路径复制，每次只复制被修改路径上的 O(log n) 个节点，
+        快照的内容保持不变，直到它被关闭。快照的读取不加锁，可以在其他线程中与树的修改同时进行。
+        快照支持所有只读操作，修改操作会抛出 TypeError。
+        """
+        self._check_closed()
+        snapshot = self._public_cls._variant('snapshot')._from_ptr(self._c.snapshot(self._ptr), self._arena)
+        if self._arena is not None:
+            snapshot._pool_lock = self._rwlock
+        return snapshot
+
     def close(self):
         """显式地释放C语言层面的内存，并标记对象为已关闭。"""
         # 关键修改 5: 检查 _closed 状态，防止重复进入
         if not self._closed:
-            lib.avl_destroy(self._ptr)
+            if self._arena is None:
+                self._c.destroy(self._ptr)
+            else:
+                self._arena._detach(self._ptr)
             self._ptr = ffi.NULL
             self._closed = True # 明确标记为已关闭
-    
+
+    def _consume(self):
+        """标记树已被 split/merge 等操作消耗：节点的所有权已转移，不释放任何内存。"""
+        if self._arena is not None:
+            self._arena._detach(free_nodes=False)
+        self._ptr = ffi.NULL
+        self._closed = True
+
+    def _set_arena(self, arena):
+        self._arena = None
+        if arena is not None and not isinstance(arena, Arena):
+            raise TypeError("arena must be an Arena instance or True.")
+        if arena is not None:
+            arena._attach(self._public_cls)
+        self._arena = arena
+        self._pool = ffi.NULL if arena is None else arena._pool
+
     @classmethod
-    def _from_ptr(cls, ptr):
+    def _from_ptr(cls, ptr, arena=None):
         """一个私有的辅助方法，用于从一个已存在的指针创建Tree对象"""
         new_tree = cls.__new__(cls)
         new_tree._ptr = ptr
         new_tree._closed = False # 新创建的对象总是未关闭状态
+        new_tree._version = 0
+        new_tree._set_arena(arena)
         return new_tree
-    
+
     def __del__(self):
         """析构函数，作为安全网，尝试关闭资源。"""
         self.close()
@@ -140,20 +1116,37 @@ class AVLTree:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """上下文管理器出口，自动关闭资源。"""
         self.close()
-        
-    def __contains__(self, key: int) -> bool:
+
+    def __iter__(self):
+        """按升序迭代所有键值。"""
+        return self.irange()
+
+    def __reversed__(self):
+        """按降序迭代所有键值。"""
+        return self.irange(reverse=True)
+
+    def __len__(self) -> int:
+        """实现 len()，O(1)。"""
+        self._check_closed()
+        return self._c.get_count(self._ptr)
+
+    def __getitem__(self, index: int):
+        """实现 tree[i]，按中序位置取键值。"""
+        return self.select(index)
+
+    def __contains__(self, key) -> bool:
         """实现 'in' 关键字。"""
         return self.search(key)
-    
+
     def __str__(self):
         self._check_closed()
         if self._ptr == ffi.NULL:
-            return "<AVLTree (empty)>"
+            return f"<{type(self).__name__} (empty)>"
 
-        buffer_size = 4096 
+        buffer_size = 4096
         c_buffer = ffi.new(f"char[{buffer_size}]")
 
-        lib.avl_display_to_buffer(self._ptr, c_buffer, buffer_size)
+        self._c.display_to_buffer(self._ptr, c_buffer, buffer_size)
 
         captured_string = ffi.string(c_buffer).decode('utf-8', errors='replace')
 
@@ -163,6 +1156,218 @@ class AVLTree:
         """返回对开发者友好的对象表示。"""
         # 关键修改 6: repr 的判断依据也改为 _closed 标志
         if self._closed:
-            return f"<AVLTree at {hex(id(self))} (closed)>"
+            return f"<{type(self).__name__} at {hex(id(self))} (closed)>"
         else:
-            return f"<AVLTree at {hex(id(self))}>"
\ No newline at end of file
+            return f"<{type(self).__name__} at {hex(id(self))}>"
+
+
+class AVLTree(_AVLTreeBase):
+    """
+    一个面向对象的AVL树Python封装器，键值为 C int。
+    它负责管理指向C语言AVLTree结构体的指针
+    """
+
+    _c = _CFunctions("avl")
+    _key_ctype = "int"
+    _tree_ctype = "AVLTree"
+    _typecode = 'i'
+    _key_min, _key_max = _INT_MIN, _INT_MAX
+
+
+class AVLTree64(_AVLTreeBase):
+    """键值为 64 位有符号整数 (int64_t) 的AVL树，适合 64 位 id 与纳秒时间戳。"""
+
+    _c = _CFunctions("avl64")
+    _key_ctype = "int64_t"
+    _tree_ctype = "AVLTree64"
+    _typecode = 'q'
+    _key_min, _key_max = -(1 << 63), (1 << 63) - 1
+
+
+class AVLTreeU64(_AVLTreeBase):
+    """键值为 64 位无符号整数 (uint64_t) 的AVL树，适合 64 位哈希值。"""
+
+    _c = _CFunctions("avlu64")
+    _key_ctype = "uint64_t"
+    _tree_ctype = "AVLTreeU64"
+    _typecode = 'Q'
+    _key_min, _key_max = 0, (1 << 64) - 1
+
+
+class _RangeAggregates:
+    """
+    区间聚合：节点额外保存子树中权重 (集合为键值，映射为值) 的和、最小值与最大值，
+    在插入、删除、旋转与 split/merge 中自动维护，因此区间上的和/最小值/最大值只需 O(log n)。
+    集合与映射共用；只有带聚合的实例 (AVLSumTree、AVLSumMap64) 使用它。
+    """
+
+    def _range_aggregate(self, lo, hi):
+        """返回闭区间 [lo, hi] (None 表示不设限) 内的 (节点数, 和, 最小值, 最大值)。"""
+        self._check_closed()
+        bounds = self._clamp_bounds(lo, hi)
+        if bounds is None:
+            return 0, 0, 0, 0
+        lo, hi = bounds
+        out = ffi.new("int64_t[3]")
+        if lo is None and hi is None:
+            # 整棵树的聚合值直接取自根节点
+            count = self._c.root_aggregate(self._ptr, out, out + 1, out + 2)
+            return count, out[0], out[1], out[2]
+        count = self._c.range_aggregate(
+            self._ptr, self._c_key(self._key_min if lo is None else lo),
+            self._c_key(self._key_max if hi is None else hi), out, out + 1, out + 2)
+        return count, out[0], out[1], out[2]
+
+    def range_sum(self, lo=None, hi=None) -> int:
+        """返回闭区间 [lo, hi] 内的权重之和 (O(log n))，省略的边界表示不设限；区间为空时返回 0。"""
+        return self._range_aggregate(lo, hi)[1]
+
+    def range_min(self, lo=None, hi=None):
+        """返回闭区间 [lo, hi] 内的最小权重 (O(log n))，区间为空时返回 None。"""
+        count, _, low, _ = self._range_aggregate(lo, hi)
+        return low if count else None
+
+    def range_max(self, lo=None, hi=None):
+        """返回闭区间 [lo, hi] 内的最大权重 (O(log n))，区间为空时返回 None。"""
+        count, _, _, high = self._range_aggregate(lo, hi)
+        return high if count else None
+
+
+class AVLSumTree(_RangeAggregates, _AVLTreeBase):
+    """
+    键值为 C int、带区间聚合的AVL树：range_sum/range_min/range_max 以 O(log n) 时间统计一段键值区间内键值的和、
+    最小值与最大值 (和以 int64 精确计算)。每个节点多占 24 字节；不需要聚合时请使用 AVLTree。
+    """
+
+    _c = _CFunctions("avlsum")
+    _key_ctype = "int"
+    _tree_ctype = "AVLTreeSum"
+    _typecode = 'i'
+    _key_min, _key_max = _INT_MIN, _INT_MAX
+    _LOCKED_READS = _AVLTreeBase._LOCKED_READS + ('_range_aggregate',)
+
+
+class _FloatKeys:
+    """double 键值的检查：集合 (AVLTreeFloat) 与映射 (AVLMapFloat) 共用。"""
+
+    @classmethod
+    def _check_key(cls, key):
+        if not isinstance(key, (int, float)):
+            raise TypeError("Key must be a float or an integer.")
+        if key != key:
+            raise ValueError("NaN cannot be used as a key.")
+        return key
+
+
+class _BytesKeys:
+    """字节串键值与 C 层 AVLBytes 之间的转换：集合 (AVLTreeBytes) 与映射 (AVLMapBytes) 共用。"""
+
+    @classmethod
+    def _check_key(cls, key):
+        return _as_bytes_key(key)
+
+    @classmethod
+    def _c_key(cls, key):
+        # 以列表作为 AVLBytes 结构体的初始化器传参，列表在调用期间保持缓冲区存活
+        key = _as_bytes_key(key)
+        return [ffi.from_buffer(key), len(key)]
+
+    @staticmethod
+    def _from_c_key(c_key):
+        # C 层返回的键值指向节点内部的内存，必须在树被修改之前复制出来
+        return ffi.buffer(c_key.data, c_key.len)[:]
+
+    @classmethod
+    def _key_array(cls, keys):
+        if isinstance(keys, (bytes, bytearray, memoryview, str)):
+            raise TypeError("Expected an iterable of bytes keys, not a single buffer.")
+        n, packed = _pack_bytes_keys(keys)
+        return cls._unpack_to_key_array(packed, n)
+
+    @classmethod
+    def _unpack_to_key_array(cls, packed, n):
+        """
+        把打包缓冲区解析为 AVLBytes 数组，描述符直接指向打包的内容 (不复制)。
+        描述符与内容放在同一个 bytearray 中，由返回的 cdata 保持其存活。
+        """
+        header_size = n * ffi.sizeof("AVLBytes")
+        storage = bytearray(header_size + len(packed))
+        storage[header_size:] = packed
+        c_keys = ffi.from_buffer("AVLBytes[]", memoryview(storage)[:header_size], require_writable=True)
+        c_packed = ffi.from_buffer("unsigned char[]", storage) + header_size
+        if not lib.avlb_unpack(c_packed, len(packed), c_keys, n):
+            raise ValueError("Malformed packed bytes keys.")
+        return c_keys
+
+    def _unpack_keys(self, chunk, n):
+        return [ffi.buffer(key.data, key.len)[:] for key in chunk[0:n]]
+
+    def _wrap_callback(self, callback):
+        return lambda key, height, bf: callback(self._from_c_key(key), height, bf)
+
+    def keys_array(self, lo=None, hi=None) -> list:
+        """以 bytes 列表的形式一次性返回闭区间 [lo, hi] 内的全部键值 (升序)。"""
+        return list(self.irange(lo, hi))
+
+    def _pop_extreme(self, last):
+        # 字节串的内容随节点一起释放，C 层返回的键值在删除之后就失效了，因此先复制出键值，再按键值删除
+        self._check_closed()
+        out_key = ffi.new("AVLBytes *")
+        if not self._c.select(self._ptr, self._c.get_count(self._ptr) - 1 if last else 0, out_key):
+            raise IndexError(f"pop from an empty {type(self).__name__}.")
+        return self._pop_key(self._from_c_key(out_key[0]))
+
+
+class AVLTreeFloat(_FloatKeys, _AVLTreeBase):
+    """
+    键值为双精度浮点数 (double) 的AVL树。
+    NaN 不能作为键值：单个操作会抛出 ValueError，批量插入时会被忽略；-0.0 与 0.0 视为同一个键值。
+    """
+
+    _c = _CFunctions("avlf64")
+    _key_ctype = "double"
+    _tree_ctype = "AVLTreeF64"
+    _typecode = 'd'
+
+
+class AVLTreeBytes(_BytesKeys, _AVLTreeBase):
+    """
+    键值为字节串的AVL树，按 memcmp 的字典序排序 (与 Python 中 bytes 的比较结果一致)。
+    键值可以是任何 bytes-like 对象，树中保存的是它的一份副本，读出时总是返回 bytes。
+    批量操作接受由 bytes-like 对象组成的可迭代对象；keys_array 返回 bytes 的列表。
+    """
+
+    _c = _CFunctions("avlb")
+    _key_ctype = "AVLBytes"
+    _tree_ctype = "AVLTreeBytes"
+    _typecode = 's'
+
+    def dump(self, path):
+        """
+        把树中的全部键值以二进制快照格式写入文件。
+        头部与数值类型相同 (键值类型为 's'，单个键值的字节数记为 0)，
+        后面是按升序排列的键值，每个键值为 4 字节小端长度 + 内容。
+        """
+        self._check_closed()
+        packed = ffi.new("unsigned char[]", lib.avlb_packed_size(self._ptr))
+        lib.avlb_pack(self._ptr, packed)
+        write_packed_snapshot(path, ffi.buffer(packed), self._c.get_count(self._ptr))
+
+    @classmethod
+    def load(cls, path, arena=None):
+        """
+        从 dump 写出的快照文件构建一棵新树。
+        键值描述符直接指向 mmap 映射的内存，只有建树时才把内容复制进节点。
+        :raises ValueError: 文件格式、键值类型、长度或校验和不正确，或者键值不是严格递增的。
+        """
+        with SnapshotReader(path, cls._typecode) as reader:
+            c_keys = ffi.new("AVLBytes[]", reader.count)
+            c_packed = ffi.from_buffer("unsigned char[]", reader.keys)
+            try:
+                if not lib.avlb_unpack(c_packed, len(c_packed), c_keys, reader.count):
+                    raise ValueError("Snapshot is truncated or has trailing data.")
+                if not cls._c.is_strictly_sorted(c_keys, len(c_keys)):
+                    raise ValueError("Snapshot keys are not in strictly increasing order.")
+                return cls._build_from_sorted_keys(c_keys, arena)
+            finally:
+                ffi.release(c_packed)
@@ -0,0 +1,251 @@
+# src/pyavl/_sharded.py
+"""
+按键值区间分片的树：键值空间被分割点切成若干段，每段由一棵独立的 AVL 树保存。
+
+批量操作先在一次 C 调用中按分割点把输入分发到各分片 (稳定的计数排序)，
+再由线程池让各分片同时执行自己的那一段。C 调用期间 GIL 是被释放的，
+不同分片之间没有共享的节点，因此批量吞吐量可以随 CPU 核数增长。
+各分片的大小失衡时，用 merge 把分片拼回一棵树、再用 split 按新的分割点切开，代价为 O(分片数 * log n)。
+"""
+import os
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from ._myclib import AVLSumTree, AVLTree, AVLTree64, AVLTreeFloat, AVLTreeU64
+from ._pyavl_c import ffi
+
+# 可以分片的树类型：定长键值的集合 (映射的批量接口需要值，字节串键值没有定长的 C 数组)
+_SHARDABLE = (AVLTree, AVLTree64, AVLTreeU64, AVLTreeFloat, AVLSumTree)
+
+# 键值少于这个数的批量操作直接在调用线程中逐个分片执行，线程池的调度开销比并行的收益大
+_PARALLEL_MIN = 4096
+
+# 逐个插入或删除这么多次之后检查一次分片是否失衡 (批量操作之后总是检查)
+_CHECK_INTERVAL = 1024
+
+
+class ShardedAVLTree:
+    """
+    由多棵 AVL 树组成的有序键值集合，分片 s 保存满足 split_points[s-1] < key <= split_points[s] 的键值。
+    单键操作用二分查找定位分片；insert_many、delete_many 与 contains_many 在线程池中并行执行。
+    分片之间不加锁，ShardedAVLTree 本身与普通的 AVLTree 一样不能被多个线程同时使用。
+    """
+
+    def __init__(self, keys=None, shards=None, tree_cls=AVLTree, workers=None, rebalance_factor=2.0):
+        """
+        创建一个分片树。
+        :param keys: 可选的初始键值 (支持缓冲区协议的键值数组或可迭代对象)，据此选择分割点。
+        :param shards: 目标分片数，默认为 CPU 核数。键值少于分片数时分片会更少。
+        :param tree_cls: 分片的树类型，AVLTree、AVLTree64、AVLTreeU64、AVLTreeFloat 或 AVLSumTree。
+        :param workers: 线程池的线程数，默认与分片数相同。
+        :param rebalance_factor: 最大的分片超过平均大小的这么多倍时自动重新平衡；None 表示只在调用 rebalance() 时平衡。
+        """
+        if tree_cls not in _SHARDABLE:
+            raise TypeError(f"tree_cls must be one of {', '.join(cls.__name__ for cls in _SHARDABLE)}.")
+        if shards is None:
+            shards = os.cpu_count() or 1
+        if not isinstance(shards, int) or shards < 1:
+            raise ValueError("shards must be a positive integer.")
+        if rebalance_factor is not None and rebalance_factor <= 1:
+            raise ValueError("rebalance_factor must be greater than 1.")
+        self._tree_cls = tree_cls
+        self._target = shards
+        self._workers = workers
+        self._rebalance_factor = rebalance_factor
+        self._executor = None
+        self._pending = 0
+        self._closed = False
+        self._set_shards([tree_cls(keys)], [])
+        if keys is not None:
+            self.rebalance()
+
+    def _set_shards(self, shards, bounds):
+        self._shards = shards
+        self._bounds = bounds
+        self._c_bounds = ffi.new(f"{self._tree_cls._key_ctype}[]", bounds)
+
+    @property
+    def split_points(self) -> list:
+        """分割点：分片 s 中的键值都不大于 split_points[s]，且大于 split_points[s-1]。"""
+        return list(self._bounds)
+
+    def shard_sizes(self) -> list:
+        """返回每个分片中的键值个数。"""
+        self._check_closed()
+        return [shard.count for shard in self._shards]
+
+    @property
+    def count(self) -> int:
+        """键值的总个数。"""
+        return sum(self.shard_sizes())
+
+    def _check_closed(self):
+        if self._closed:
+            raise ValueError(f"Cannot perform operation: This {type(self).__name__} instance has been closed.")
+
+    def _shard_for(self, key):
+        return self._shards[bisect_left(self._bounds, self._tree_cls._check_key(key))]
+
+    def insert(self, key):
+        """插入一个键值。"""
+        self._check_closed()
+        self._shard_for(key).insert(key)
+        self._note_updates(1)
+
+    def delete(self, key):
+        """删除一个键值，不存在时什么也不做。"""
+        self._check_closed()
+        self._shard_for(key).delete(key)
+        self._note_updates(1)
+
+    def discard(self, key) -> bool:
+        """删除一个键值，返回它是否存在。"""
+        self._check_closed()
+        removed = self._shard_for(key).discard(key)
+        self._note_updates(1)
+        return removed
+
+    def search(self, key) -> bool:
+        """查找一个键值是否存在。"""
+        self._check_closed()
+        return self._shard_for(key).search(key)
+
+    def _note_updates(self, n):
+        self._pending += n
+        if self._pending >= _CHECK_INTERVAL:
+            self._maybe_rebalance()
+
+    def _partition(self, keys, with_pos):
+        """
+        按分割点分发一批键值，返回 (分发后的键值 array, 指向它的 C 数组, 对应的原始下标或 NULL, 分组)，
+        分组是 [(分片, 起点, 个数), ...]，只列出分到了键值的分片。
+        """
+        tree_cls = self._tree_cls
+        c_keys = tree_cls._key_array(keys)
+        n = len(c_keys)
+        typecode = tree_cls._typecode
+        routed = array(typecode, bytes(array(typecode).itemsize * n))
+        c_routed = ffi.from_buffer(f"{tree_cls._key_ctype}[]", routed, require_writable=True)
+        c_pos = ffi.new("int[]", n) if with_pos else ffi.NULL
+        counts = ffi.new("int[]", len(self._shards))
+        tree_cls._c.partition_batch(self._c_bounds, len(self._bounds), c_keys, n, c_routed, c_pos, counts)
+        groups = []
+        start = 0
+        for shard, count in zip(self._shards, counts):
+            if count:
+                groups.append((shard, start, count))
+            start += count
+        return routed, c_routed, c_pos, groups
+
+    def _run(self, work, groups, n):
+        """对每个 (分片, 起点, 个数) 执行 work；键值足够多且涉及多个分片时在线程池中并行。"""
+        if len(groups) <= 1 or n < _PARALLEL_MIN:
+            for group in groups:
+                work(*group)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers or self._target,
+                                                thread_name_prefix="pyavl-shard")
+        # list() 等待全部完成，并把工作线程中的异常抛给调用者
+        list(self._executor.map(lambda group: work(*group), groups))
+
+    def insert_many(self, keys):
+        """插入缓冲区 (或可迭代对象) 中的所有键值，各分片并行执行。"""
+        self._check_closed()
+        routed, _, _, groups = self._partition(keys, with_pos=False)
+        view = memoryview(routed)
+        self._run(lambda shard, start, count: shard.insert_many(view[start:start + count]), groups, len(routed))
+        self._maybe_rebalance()
+
+    def delete_many(self, keys):
+        """删除所有给定的键值，不存在的键值会被忽略。各分片并行执行。"""
+        self._check_closed()
+        routed, _, _, groups = self._partition(keys, with_pos=False)
+        view = memoryview(routed)
+        self._run(lambda shard, start, count: shard.delete_many(view[start:start + count]), groups, len(routed))
+        self._maybe_rebalance()
+
+    def contains_many(self, keys) -> bytearray:
+        """
+        批量查找键值是否存在，各分片并行执行。
+        :return: 与 AVLTree.contains_many 相同，一个与输入等长、按输入顺序排列的 bytearray。
+        """
+        self._check_closed()
+        routed, c_routed, c_pos, groups = self._partition(keys, with_pos=True)
+        result = bytearray(len(routed))
+        c_out = ffi.from_buffer("unsigned char[]", result, require_writable=True)
+        self._run(lambda shard, start, count: shard._search_batch_at(c_routed + start, count, c_pos + start, c_out),
+                  groups, len(routed))
+        return result
+
+    def _maybe_rebalance(self):
+        self._pending = 0
+        if self._rebalance_factor is None:
+            return
+        sizes = self.shard_sizes()
+        n = sum(sizes)
+        if len(sizes) != max(1, min(self._target, n)) or max(sizes) > self._rebalance_factor * n / len(sizes):
+            self.rebalance()
+
+    def rebalance(self):
+        """
+        重新选择分割点，使各分片的大小相差不超过 1。
+        先用 merge 按顺序把所有分片拼成一棵树，再按 select 选出的分割点逐个 split 切开，
+        节点原地移动，不复制任何键值。
+        """
+        self._check_closed()
+        tree_cls = self._tree_cls
+        merged = self._shards[0]
+        for shard in self._shards[1:]:
+            merged = tree_cls.merge(merged, shard)
+        n = merged.count
+        parts = max(1, min(self._target, n))
+        bounds = [merged.select(n * i // parts - 1) for i in range(1, parts)]
+        shards = []
+        for key in bounds:
+            small, merged = merged.split(key)
+            shards.append(small)
+        shards.append(merged)
+        self._set_shards(shards, bounds)
+        self._pending = 0
+
+    def keys_array(self) -> array:
+        """以 array 的形式按升序返回全部键值。"""
+        self._check_closed()
+        result = array(self._tree_cls._typecode)
+        for shard in self._shards:
+            result.extend(shard.keys_array())
+        return result
+
+    def close(self):
+        """关闭线程池并释放所有分片。"""
+        if not self._closed:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            for shard in self._shards:
+                shard.close()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        self._check_closed()
+        return chain.from_iterable(self._shards)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key) -> bool:
+        return self.search(key)
+
+    def __repr__(self):
+        if self._closed:
+            return f"<{type(self).__name__} at {hex(id(self))} (closed)>"
+        return f"<{type(self).__name__} of {self._tree_cls.__name__} with {len(self._shards)} shards>"
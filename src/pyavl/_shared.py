@@ -0,0 +1,167 @@
+# src/pyavl/_shared.py
+"""
+按代发布的共享树：让读者在写入者更新之后重新附加到最新的内容。
+
+share/attach 得到的是发布那一刻的副本，之后对树的修改读者看不到。SharedTreePublisher 每次 publish
+都把树复制到一段新的共享内存 (第 g 代名为 f"{name}_{g}")，写完之后才把固定名字的代目录中的代号改为 g，
+再删除上一代。SharedTreeReader 记住自己附加的代号，stale 告诉它是否有了更新的一代，refresh 重新附加。
+"""
+from ._myclib import AVLTree
+from ._snapshot import SharedGenerationReader, create_generation_directory, generation_segment_name, write_generation
+
+
+class SharedTreePublisher:
+    """
+    在固定的名字下反复发布一棵树。读者用 SharedTreeReader(publisher.name, 树的类型) 附加。
+    发布者拥有代目录与最新一代的共享内存，close() 时删除它们；已经附加的读者不受影响，
+    会一直看到自己附加的那一代，直到关闭或 refresh。
+    """
+
+    def __init__(self, name=None):
+        """
+        :param name: 代目录的名字，省略时由系统生成，可通过 name 属性得到。
+        :raises FileExistsError: 已经存在该名字的共享内存。
+        """
+        self._directory = create_generation_directory(name)
+        self._segment = None
+        self._generation = 0
+        self._closed = False
+
+    @property
+    def name(self) -> str:
+        """代目录的名字，读者按这个名字附加。"""
+        return self._directory.name
+
+    @property
+    def generation(self) -> int:
+        """最近一次发布的代号，尚未发布时为 0。"""
+        return self._generation
+
+    def _check_closed(self):
+        if self._closed:
+            raise ValueError(f"Cannot perform operation: This {type(self).__name__} instance has been closed.")
+
+    def publish(self, tree) -> int:
+        """
+        把树 (AVLTree 等定长键值的树，或冻结树) 此刻的内容发布为新的一代，并删除上一代的共享内存。
+        已经附加到上一代的读者仍可继续读取，直到它们 refresh 或关闭。
+        :return: 新的代号。
+        """
+        self._check_closed()
+        generation = self._generation + 1
+        segment = tree.share(generation_segment_name(self.name, generation))
+        # 快照完整写入之后才切换代号，读者不会看到写了一半的一代
+        write_generation(self._directory, generation)
+        previous, self._segment, self._generation = self._segment, segment, generation
+        if previous is not None:
+            previous.close()
+            previous.unlink()
+        return generation
+
+    def close(self):
+        """删除代目录与最新一代的共享内存。"""
+        if not self._closed:
+            for shm in (self._segment, self._directory):
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+            self._segment = None
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        state = "closed" if self._closed else f"generation {self._generation}"
+        return f"<{type(self).__name__} '{self._directory.name}' ({state})>"
+
+
+class SharedTreeReader:
+    """
+    附加到 SharedTreePublisher 发布的最新一代。tree 属性是只读的冻结树 (例如 FrozenAVLTree)，
+    内容固定为附加时的那一代；发布者发布新的一代之后 stale 变为 True，调用 refresh() 切换过去。
+    """
+
+    def __init__(self, name, tree_cls=AVLTree):
+        """
+        :param name: 发布者的 name。
+        :param tree_cls: 发布的树的类型，例如 AVLTree64 或 FrozenAVLTree64，键值类型不符时抛出 ValueError。
+        :raises FileNotFoundError: 不存在该名字的代目录。
+        """
+        self._tree_cls = tree_cls
+        self._name = name
+        self._directory = SharedGenerationReader(name)
+        self._generation = 0
+        self._tree = None
+        self._closed = False
+        try:
+            self.refresh()
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def tree(self):
+        """当前附加的冻结树，发布者尚未发布时为 None。refresh() 切换到新的一代时会关闭旧的冻结树。"""
+        self._check_closed()
+        return self._tree
+
+    @property
+    def generation(self) -> int:
+        """当前附加的代号，尚未附加时为 0。"""
+        return self._generation
+
+    @property
+    def stale(self) -> bool:
+        """发布者是否已经发布了比当前附加的更新的一代。"""
+        self._check_closed()
+        return self._directory.generation != self._generation
+
+    def _check_closed(self):
+        if self._closed:
+            raise ValueError(f"Cannot perform operation: This {type(self).__name__} instance has been closed.")
+
+    def refresh(self) -> bool:
+        """
+        如果有更新的一代，附加到它并关闭旧的冻结树。
+        :return: 是否切换了代。
+        """
+        self._check_closed()
+        generation = self._directory.generation
+        while generation != self._generation:
+            try:
+                tree = self._tree_cls.attach(generation_segment_name(self._name, generation))
+            except FileNotFoundError:
+                # 读到代号之后发布者又发布了一代并删除了这一代，重新读取代号再试
+                latest = self._directory.generation
+                if latest == generation:
+                    raise
+                generation = latest
+                continue
+            if self._tree is not None:
+                self._tree.close()
+            self._tree, self._generation = tree, generation
+            return True
+        return False
+
+    def close(self):
+        """关闭当前的冻结树并解除代目录的映射，不会删除任何共享内存。"""
+        if not self._closed:
+            if self._tree is not None:
+                self._tree.close()
+                self._tree = None
+            self._directory.close()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        state = "closed" if self._closed else f"generation {self._generation}"
+        return f"<{type(self).__name__} of {self._tree_cls.__name__} ({state})>"
@@ -0,0 +1,287 @@
+# src/pyavl/_snapshot.py
+"""
+二进制快照格式的读写。
+
+文件布局 (全部为小端序):
+    偏移  长度  含义
+    0     8     魔数 b"PYAVLBIN"
+    8     2     格式版本号 (当前为 1)
+    10    1     键值类型，使用 struct/array 的类型码 (例如 b'i' 表示 32 位有符号整数)
+    11    1     标志位：LAYOUT_EYTZINGER 表示键值数组按 Eytzinger 顺序排列 (冻结树)，否则为 0
+    12    4     单个键值的字节数
+    16    8     键值个数
+    24    4     键值数组的 CRC32 校验和
+    28    4     保留，当前为 0
+    32    ...   按严格递增顺序 (或 Eytzinger 顺序) 排列的键值数组
+
+字节串键值 (类型码 b's') 是变长的：单个键值的字节数记为 0，
+键值数组改为依次排列的 4 字节小端长度 + 内容，校验和同样覆盖整个键值区。
+
+同样的字节也可以放在一段命名的共享内存 (multiprocessing.shared_memory) 中，
+其他进程按名字附加后直接在共享的内存上读取，见 create_shared_snapshot 与 SharedSnapshotReader。
+共享内存里是写入那一刻的副本，之后不会再变；要让读者看到新的内容，需要发布一段新的共享内存。
+
+代目录是一段固定名字的 16 字节共享内存 (小端序)，用来把读者引向最新发布的快照:
+    偏移  长度  含义
+    0     8     魔数 b"PYAVLGEN"
+    8     8     当前的代号，0 表示尚未发布；第 g 代的快照存放在名为 f"{name}_{g}" 的共享内存中
+"""
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from multiprocessing import shared_memory
+
+try:
+    # CPython 在 POSIX 平台上用来打开共享内存的模块 (SharedMemory 本身也依赖它)，其他平台或实现上可能不存在
+    import _posixshmem
+except ImportError:
+    _posixshmem = None
+
+MAGIC = b"PYAVLBIN"
+VERSION = 1
+_HEADER = struct.Struct("<8sHcBIQII")
+HEADER_SIZE = _HEADER.size
+# 变长字节串键值使用的类型码
+VARIABLE_TYPECODE = 's'
+# 标志位：键值数组是严格递增键值的 Eytzinger 排列 (FrozenAVLTree 等冻结树的内存布局)
+LAYOUT_EYTZINGER = 1
+
+GENERATION_MAGIC = b"PYAVLGEN"
+_GENERATION = struct.Struct("<8sQ")
+
+
+def _pack_header(keys: array, flags: int) -> bytes:
+    """返回 keys 的快照头部。keys 会在大端平台上被原地转换字节序。"""
+    if sys.byteorder != 'little':
+        keys.byteswap()
+    return _HEADER.pack(
+        MAGIC, VERSION, keys.typecode.encode('ascii'), flags,
+        keys.itemsize, len(keys), zlib.crc32(keys), 0,
+    )
+
+
+def write_snapshot(path, keys: array, flags: int = 0):
+    """把一个已排序 (flags 为 LAYOUT_EYTZINGER 时为 Eytzinger 顺序) 的 array 写成快照文件。
+    keys 会在大端平台上被原地转换字节序。"""
+    header = _pack_header(keys, flags)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(keys)
+
+
+def create_shared_snapshot(keys: array, flags: int = 0, name=None) -> shared_memory.SharedMemory:
+    """
+    新建一段命名的共享内存，写入与 write_snapshot 相同的字节，返回 SharedMemory 对象。
+    内容是 keys 此刻的副本，之后不会被更新。调用者拥有这段共享内存：不再需要时应调用 close() 与 unlink()。
+    """
+    header = _pack_header(keys, flags)
+    nbytes = len(keys) * keys.itemsize
+    # 长度为 0 的共享内存无法创建，头部保证了它至少有 HEADER_SIZE 字节
+    shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + nbytes)
+    try:
+        shm.buf[:HEADER_SIZE] = header
+        shm.buf[HEADER_SIZE:HEADER_SIZE + nbytes] = memoryview(keys).cast('B')
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm
+
+
+def generation_segment_name(name, generation: int) -> str:
+    """返回代目录 name 的第 generation 代快照所在的共享内存的名字。"""
+    return f"{name}_{generation}"
+
+
+def create_generation_directory(name=None) -> shared_memory.SharedMemory:
+    """新建一个代号为 0 的代目录，返回 SharedMemory 对象，由调用者负责 close() 与 unlink()。"""
+    directory = shared_memory.SharedMemory(name=name, create=True, size=_GENERATION.size)
+    write_generation(directory, 0)
+    return directory
+
+
+def write_generation(directory: shared_memory.SharedMemory, generation: int):
+    """把代目录的代号改为 generation。调用之前对应的快照必须已经完整写入。"""
+    _GENERATION.pack_into(directory.buf, 0, GENERATION_MAGIC, generation)
+
+
+def write_packed_snapshot(path, packed, count: int):
+    """把按升序打包好的变长字节串键值 (4 字节小端长度 + 内容) 写成快照文件。"""
+    header = _HEADER.pack(MAGIC, VERSION, VARIABLE_TYPECODE.encode('ascii'), 0, 0, count, zlib.crc32(packed), 0)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(packed)
+
+
+class SnapshotReader:
+    """
+    以只读 mmap 的方式打开快照文件，并校验其头部与校验和。
+    作为上下文管理器使用；keys 属性是直接指向映射内存的 memoryview (小端平台上零拷贝)，
+    count 属性是键值个数。对于变长的字节串键值，keys 是未经解析的打包数据。
+    flags 为期望的键值布局，与文件不符时抛出 ValueError。
+    """
+
+    def __init__(self, path, typecode: str, flags: int = 0):
+        self._file = open(path, 'rb')
+        self._mmap = None
+        self.keys = None
+        self.count = 0
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.keys = self._parse(typecode, flags)
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self, typecode, expected_flags):
+        return self._parse_buffer(self._mmap, typecode, expected_flags, exact=True)
+
+    def _parse_buffer(self, buffer, typecode, expected_flags, exact):
+        """校验 buffer 中的快照并返回键值区的 memoryview；exact 为假时允许键值区之后有多余的字节。"""
+        if len(buffer) < HEADER_SIZE:
+            raise ValueError("Not a pyavl snapshot: file is too short.")
+        magic, version, key_type, flags, itemsize, count, checksum, _ = \
+            _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a pyavl snapshot: bad magic number.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}.")
+        expected_itemsize = 0 if typecode == VARIABLE_TYPECODE else array(typecode).itemsize
+        if key_type.decode('ascii') != typecode or itemsize != expected_itemsize:
+            raise ValueError(
+                f"Snapshot key type '{key_type.decode('ascii')}' does not match expected '{typecode}'.")
+        if flags != expected_flags:
+            layout = "an Eytzinger (frozen tree)" if flags == LAYOUT_EYTZINGER else "a sorted"
+            raise ValueError(f"Snapshot stores keys in {layout} layout, which this class cannot load.")
+        # 变长键值的总长度只能在解析时检查
+        size = HEADER_SIZE + count * itemsize
+        if itemsize and (len(buffer) < size or (exact and len(buffer) != size)):
+            raise ValueError("Snapshot is truncated or has trailing data.")
+        self.count = count
+
+        payload = memoryview(buffer)[HEADER_SIZE:size if itemsize else None]
+        if zlib.crc32(payload) != checksum:
+            payload.release()
+            raise ValueError("Snapshot checksum mismatch.")
+        if sys.byteorder != 'little' and itemsize > 1:
+            swapped = array(typecode, payload)
+            payload.release()
+            swapped.byteswap()
+            return memoryview(swapped)
+        return payload
+
+    def close(self):
+        if self.keys is not None:
+            self.keys.release()
+            self.keys = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SharedSnapshotReader(SnapshotReader):
+    """
+    按名字附加到 create_shared_snapshot 创建的共享内存上，校验方式与 SnapshotReader 相同，
+    keys 直接指向共享内存 (小端平台上零拷贝)。关闭时只解除本进程的映射，不会删除共享内存。
+    """
+
+    def __init__(self, name, typecode: str, flags: int = 0):
+        self._handle = None
+        self.keys = None
+        self.count = 0
+        try:
+            self._handle, buffer = _open_shared(name)
+            # 某些平台会把共享内存的大小向上取整到页大小，因此允许多余的字节
+            self.keys = self._parse_buffer(buffer, typecode, flags, exact=False)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self.keys is not None:
+            self.keys.release()
+            self.keys = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class SharedGenerationReader:
+    """
+    按名字只读地附加到 create_generation_directory 创建的代目录。
+    generation 属性每次都从共享内存中读取，因此总是发布者当前的代号。
+    """
+
+    def __init__(self, name):
+        self._handle = None
+        self._buffer = None
+        try:
+            self._handle, self._buffer = _open_shared(name)
+            if len(self._buffer) < _GENERATION.size or _GENERATION.unpack_from(self._buffer, 0)[0] != GENERATION_MAGIC:
+                raise ValueError("Not a pyavl generation directory.")
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def generation(self) -> int:
+        return _GENERATION.unpack_from(self._buffer, 0)[1]
+
+    def close(self):
+        self._buffer = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _open_shared(name):
+    """只读地打开一段命名的共享内存，返回 (关闭时要调用 close() 的对象, 可以读取的缓冲区)。"""
+    if _posixshmem is not None:
+        mapped = _map_shared_memory(name)
+        return mapped, mapped
+    shm = _attach_untracked(name)
+    return shm, shm.buf
+
+
+def _map_shared_memory(name) -> mmap.mmap:
+    """
+    以只读方式映射 POSIX 共享内存。不经过 SharedMemory：在 Python 3.13 之前，它会把附加的共享内存
+    也登记到 resource_tracker，与创建者共用的登记在读者取消或退出时被一并清除；读者并不拥有这段共享内存。
+    """
+    path = name if name.startswith('/') else '/' + name
+    fd = _posixshmem.shm_open(path, os.O_RDONLY, mode=0o600)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+def _attach_untracked(name) -> shared_memory.SharedMemory:
+    """
+    没有 _posixshmem 时的退路：通过 SharedMemory 附加 (映射是可写的)，同样不让 resource_tracker 接管。
+    Python 3.13 起可以直接传入 track=False，更早的版本在附加之后取消登记。
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name != 'nt':
+        # Windows 上没有 resource_tracker，共享内存在最后一个句柄关闭时自动释放
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
@@ -1,5 +1,7 @@
 # tests/test_tree.py
 
+import sys
+
 import pytest
 import pyavl  # 导入你的库
 
@@ -125,4 +127,1320 @@ def test_merge():
     with merged:
         for k in [1, 2, 3, 10, 20, 30]:
             assert k in merged
-        assert 99 not in merged
\ No newline at end of file
+        assert 99 not in merged
+
+def test_batch_operations():
+    """测试基于缓冲区的批量插入、删除与查找。"""
+    from array import array
+
+    with pyavl.AVLTree() as tree:
+        tree.insert_many(array('i', [5, 3, 8, 1, 4]))
+        tree.insert_many([7, 9])  # 普通可迭代对象也可以
+        tree.insert_many(array('i', [10, 11]).tobytes())  # 原始字节按本机 int 解释
+        tree.insert_many(array('B', [12, 13]))  # 类型化的 uint8 缓冲区按元素的值转换，而不是当作原始字节
+
+        result = tree.contains_many(array('i', [1, 2, 3, 9, 11, 42]))
+        assert isinstance(result, bytearray)
+        assert list(result) == [1, 0, 1, 1, 1, 0]
+
+        # 不存在的键值 (42) 会被静默忽略
+        tree.delete_many(array('i', [3, 4, 42]))
+        assert list(tree.contains_many([3, 4, 5, 12, 13])) == [0, 0, 1, 1, 1]
+        assert tree.count == 9
+
+        assert tree.contains_many([]) == bytearray()
+
+def test_batch_rejects_invalid_buffers(empty_tree):
+    """测试批量操作对非法缓冲区的处理。"""
+    from array import array
+
+    with pytest.raises(TypeError):
+        empty_tree.insert_many(array('d', [1.0, 2.0]))
+    with pytest.raises(ValueError):
+        empty_tree.insert_many(b"\x01\x02\x03")
+    with pytest.raises(OverflowError):
+        empty_tree.insert_many(array('q', [2**40]))
+
+def test_from_sorted_builds_balanced_tree():
+    """测试从有序输入线性构建的树是完全平衡的。"""
+    from array import array
+
+    with pyavl.AVLTree.from_sorted(array('i', range(1023))) as tree:
+        assert tree.count == 1023
+        assert tree.height == 10  # 2^10 - 1 个节点恰好组成一棵满二叉树
+        assert 0 in tree and 1022 in tree and 1023 not in tree
+
+    with pytest.raises(ValueError):
+        pyavl.AVLTree.from_sorted([1, 3, 2])
+    with pytest.raises(ValueError):
+        pyavl.AVLTree.from_sorted([1, 2, 2])
+
+def test_init_sorts_and_deduplicates():
+    """测试构造函数会自动排序并去重无序输入。"""
+    with pyavl.AVLTree([5, 1, 5, 3, 1, 9]) as tree:
+        keys = []
+        tree.in_order_traverse(lambda k, h, b: keys.append(k))
+        assert keys == [1, 3, 5, 9]
+        assert tree.count == 4
+
+def test_len_rank_select(populated_tree):
+    """测试基于子树大小的 len、rank 与 select。"""
+    # 原始树的键: [10, 25, 30, 50, 60, 75, 80]
+    assert len(populated_tree) == 7
+    assert populated_tree.rank(10) == 0
+    assert populated_tree.rank(50) == 3
+    assert populated_tree.rank(55) == 4  # 不存在的键值也有排名
+    assert populated_tree.rank(100) == 7
+
+    assert populated_tree.select(0) == 10
+    assert populated_tree[3] == 50
+    assert populated_tree[-1] == 80
+    with pytest.raises(IndexError):
+        populated_tree[7]
+    with pytest.raises(IndexError):
+        populated_tree[-8]
+
+    assert populated_tree.count_range(25, 60) == 4
+    assert populated_tree.count_range(26, 59) == 2
+    assert populated_tree.count_range(60, 25) == 0
+
+def test_sizes_survive_rebalancing_split_and_merge():
+    """测试子树大小在插入、删除、分裂与合并后依然正确。"""
+    import random
+
+    rng = random.Random(42)
+    keys = rng.sample(range(10_000), 2_000)
+    tree = pyavl.AVLTree()
+    for k in keys:
+        tree.insert(k)
+    for k in keys[:500]:
+        tree.delete(k)
+
+    expected = sorted(keys[500:])
+    assert len(tree) == len(expected)
+    assert [tree[i] for i in range(0, len(expected), 97)] == expected[::97]
+
+    small, large = tree.split(5_000)
+    assert len(small) + len(large) == len(expected)
+    assert len(small) == sum(1 for k in expected if k <= 5_000)
+
+    merged = pyavl.AVLTree.merge(small, large)
+    with merged:
+        assert len(merged) == len(expected)
+        assert merged.rank(5_001) == sum(1 for k in expected if k < 5_001)
+
+def test_iteration_and_range_scans(populated_tree):
+    """测试基于游标的迭代、区间扫描与 keys_array。"""
+    # 原始树的键: [10, 25, 30, 50, 60, 75, 80]
+    assert list(populated_tree) == [10, 25, 30, 50, 60, 75, 80]
+    assert list(reversed(populated_tree)) == [80, 75, 60, 50, 30, 25, 10]
+
+    assert list(populated_tree.irange(25, 60)) == [25, 30, 50, 60]
+    assert list(populated_tree.irange(26, 59)) == [30, 50]
+    assert list(populated_tree.irange(26, 59, reverse=True)) == [50, 30]
+    assert list(populated_tree.irange(lo=70)) == [75, 80]
+    assert list(populated_tree.irange(hi=10, reverse=True)) == [10]
+    assert list(populated_tree.irange(90, 100)) == []
+    assert list(populated_tree.irange(60, 25)) == []
+    assert list(populated_tree.irange(-2**40, 2**40)) == list(populated_tree)
+
+    assert populated_tree.keys_array(25, 60).tolist() == [25, 30, 50, 60]
+    assert populated_tree.keys_array().tolist() == [10, 25, 30, 50, 60, 75, 80]
+
+def test_iteration_over_many_chunks():
+    """测试跨越多个拉取块的迭代，以及提前停止。"""
+    with pyavl.AVLTree(range(5000)) as tree:
+        assert list(tree) == list(range(5000))
+        assert list(reversed(tree)) == list(range(4999, -1, -1))
+        assert list(tree.irange(1000, 3999)) == list(range(1000, 4000))
+
+        it = iter(tree)
+        assert [next(it) for _ in range(3)] == [0, 1, 2]
+
+def test_modification_during_iteration_raises():
+    """测试在迭代过程中修改树会抛出 RuntimeError，而不是访问失效的节点。"""
+    with pyavl.AVLTree(range(5000)) as tree:
+        it = iter(tree)
+        next(it)
+        tree.insert(10_000)
+        with pytest.raises(RuntimeError):
+            list(it)
+
+def test_arena_allocator_reuses_and_releases_nodes():
+    """测试使用 Arena 的树：节点复用、分裂合并后的所有权以及整体释放。"""
+    arena = pyavl.Arena()
+    tree = pyavl.AVLTree(range(1000), arena=arena)
+    assert tree.arena is arena
+    assert arena.live_nodes == 1000
+    reserved = arena.reserved_bytes
+
+    # 删除后再插入同样数量的键值，节点应从空闲链表中复用而不申请新内存
+    tree.delete_many(range(0, 1000, 2))
+    assert arena.live_nodes == 500
+    tree.insert_many(range(1000, 1500))
+    assert arena.live_nodes == 1000
+    assert arena.reserved_bytes == reserved
+
+    small, large = tree.split(999)
+    other = pyavl.AVLTree([5000], arena=arena)
+    merged = pyavl.AVLTree.merge(large, other)
+    assert list(merged) == list(range(1000, 1500)) + [5000]
+
+    # 仍有其它树在使用该池时，关闭只会把节点归还到空闲链表
+    merged.close()
+    assert arena.live_nodes == 500
+    assert list(small) == list(range(1, 1000, 2))
+
+    # 最后一棵树关闭后，整个池按块释放
+    small.close()
+    assert arena.live_nodes == 0
+    assert arena.reserved_bytes == 0
+
+def test_arena_mismatch_and_private_arena():
+    """测试不同 Arena 的树不能合并，以及 arena=True 创建私有池。"""
+    t1 = pyavl.AVLTree([1, 2], arena=True)
+    t2 = pyavl.AVLTree([10, 20])
+    with pytest.raises(ValueError):
+        pyavl.AVLTree.merge(t1, t2)
+    assert t1.memory_usage() > 0 and t2.memory_usage() > 0
+    with pytest.raises(TypeError):
+        pyavl.AVLTree(arena="yes")
+    t1.close(); t2.close()
+
+def test_discard_and_remove(populated_tree, capfd):
+    """测试 discard/remove 通过返回值报告结果，且 C 层不再向 stdout 打印。"""
+    assert populated_tree.discard(25) is True
+    assert populated_tree.discard(25) is False
+    populated_tree.delete(12345)  # 不存在的键值: 静默忽略
+    with pytest.raises(KeyError):
+        populated_tree.remove(25)
+    populated_tree.remove(30)
+    assert list(populated_tree) == [10, 50, 60, 75, 80]
+    assert capfd.readouterr().out == ""
+
+def test_random_operations_keep_tree_balanced():
+    """随机插入/删除后，树的内容、大小与高度都应保持 AVL 的性质。"""
+    import math
+    import random
+
+    rng = random.Random(7)
+    reference = set()
+    with pyavl.AVLTree() as tree:
+        for _ in range(20_000):
+            key = rng.randrange(3_000)
+            if rng.random() < 0.55:
+                tree.insert(key)
+                reference.add(key)
+            else:
+                assert tree.discard(key) == (key in reference)
+                reference.discard(key)
+
+        assert list(tree) == sorted(reference)
+        assert len(tree) == len(reference)
+        assert tree.height <= 1.45 * math.log2(len(reference) + 2)
+
+        balance_factors = []
+        tree.in_order_traverse(lambda k, h, bf: balance_factors.append(bf))
+        assert len(balance_factors) == len(reference)
+        assert all(abs(bf) <= 1 for bf in balance_factors)
+
+def test_merge_and_join_stay_balanced_with_uneven_heights():
+    """测试 merge/join 在两棵树高度相差很大时依然得到平衡的树。"""
+    import math
+
+    big = pyavl.AVLTree(range(100_000))
+    small = pyavl.AVLTree([200_000, 200_001])
+    with pyavl.AVLTree.merge(big, small) as merged:
+        assert len(merged) == 100_002
+        assert merged.height <= 1.45 * math.log2(len(merged) + 2)
+        assert merged[-1] == 200_001
+
+    left = pyavl.AVLTree([1, 2])
+    right = pyavl.AVLTree(range(10, 50_000))
+    with pyavl.AVLTree.join(left, 5, right) as joined:
+        assert [joined[i] for i in range(4)] == [1, 2, 5, 10]
+        assert joined.height <= 1.45 * math.log2(len(joined) + 2)
+
+    with pytest.raises(ValueError):
+        pyavl.AVLTree.merge(pyavl.AVLTree([5]), pyavl.AVLTree([1]))
+    with pytest.raises(ValueError):
+        pyavl.AVLTree.join(pyavl.AVLTree([5]), 3, pyavl.AVLTree([10]))
+
+@pytest.mark.parametrize("operation, expected", [
+    ("union", lambda a, b: a | b),
+    ("intersection", lambda a, b: a & b),
+    ("difference", lambda a, b: a - b),
+    ("symmetric_difference", lambda a, b: a ^ b),
+])
+def test_set_operations(operation, expected):
+    """测试基于 join 的集合运算与 Python set 的结果一致。"""
+    import random
+
+    rng = random.Random(operation)
+    for size_a, size_b in [(0, 50), (50, 0), (1000, 30), (30, 1000), (2000, 2000)]:
+        a = set(rng.sample(range(5000), size_a))
+        b = set(rng.sample(range(5000), size_b))
+        result = getattr(pyavl.AVLTree, operation)(pyavl.AVLTree(a), pyavl.AVLTree(b))
+        with result:
+            assert list(result) == sorted(expected(a, b))
+            assert len(result) == len(expected(a, b))
+
+def test_binary_snapshot_roundtrip(tmp_path, populated_tree):
+    """测试二进制快照的写入与基于 mmap 的加载。"""
+    path = tmp_path / "tree.avl"
+    populated_tree.dump(path)
+    assert path.stat().st_size == 32 + 4 * len(populated_tree)
+
+    with pyavl.AVLTree.load(path) as loaded:
+        assert list(loaded) == [10, 25, 30, 50, 60, 75, 80]
+        assert loaded.height == 3
+
+    empty_path = tmp_path / "empty.avl"
+    with pyavl.AVLTree() as empty:
+        empty.dump(empty_path)
+    with pyavl.AVLTree.load(empty_path, arena=True) as loaded:
+        assert len(loaded) == 0
+
+def test_binary_snapshot_rejects_corrupt_files(tmp_path, populated_tree):
+    """测试损坏或格式不正确的快照文件会被拒绝。"""
+    path = tmp_path / "tree.avl"
+    populated_tree.dump(path)
+    data = bytearray(path.read_bytes())
+
+    corrupt = tmp_path / "corrupt.avl"
+    corrupt.write_bytes(data[:-1] + bytes([data[-1] ^ 0xFF]))
+    with pytest.raises(ValueError, match="checksum"):
+        pyavl.AVLTree.load(corrupt)
+
+    truncated = tmp_path / "truncated.avl"
+    truncated.write_bytes(data[:-4])
+    with pytest.raises(ValueError, match="truncated"):
+        pyavl.AVLTree.load(truncated)
+
+    text = tmp_path / "keys.txt"
+    text.write_text("10 25 30 50 60 75 80 90 100 110 120 130")
+    with pytest.raises(ValueError, match="magic"):
+        pyavl.AVLTree.load(text)
+
+TYPED_KEYS = [
+    (pyavl.AVLTree64, [2**62, -2**63, 1_700_000_000_000_000_000, 0, -5]),
+    (pyavl.AVLTreeU64, [2**64 - 1, 0, 2**63, 12345]),
+    (pyavl.AVLTreeFloat, [1.5, -1e300, 0.0, 2.25, 1e-9]),
+    (pyavl.AVLTreeBytes, [b"beta", b"", b"alpha", b"al", b"\xff\x00"]),
+]
+
+@pytest.mark.parametrize("cls, keys", TYPED_KEYS)
+def test_typed_key_trees_support_the_full_api(tmp_path, cls, keys):
+    """测试由同一份 C 模板生成的各键值类型都支持完整的 API，包括分裂、合并与快照。"""
+    ordered = sorted(keys)
+    with cls(keys) as tree:
+        assert list(tree) == ordered
+        assert list(reversed(tree)) == ordered[::-1]
+        assert [tree[i] for i in range(len(tree))] == ordered
+        assert tree.rank(ordered[2]) == 2
+        assert list(tree.irange(ordered[1], ordered[3])) == ordered[1:4]
+        assert tree.count_range(ordered[1], ordered[3]) == 3
+        assert bytes(tree.contains_many(ordered)) == b"\x01" * len(ordered)
+        assert tree.discard(ordered[0]) and ordered[0] not in tree
+        tree.insert(ordered[0])
+
+        path = tmp_path / "typed.avl"
+        tree.dump(path)
+        with cls.load(path) as loaded:
+            assert list(loaded) == ordered
+
+    small, large = cls(keys).split(ordered[1])
+    assert list(small) == ordered[:2] and list(large) == ordered[2:]
+    with cls.merge(small, large) as merged:
+        assert list(merged) == ordered
+
+    left, right = cls(keys, arena=True).split(ordered[1])
+    left.delete(ordered[1])
+    with cls.join(left, ordered[1], right) as joined:
+        assert list(joined) == ordered
+
+
+def test_bytes_tree_from_unsorted_keys():
+    """从未排序的字节串键值构建：排序后的描述符指向打包的键值缓冲区，构建完成之前缓冲区不能被释放。"""
+    import random
+
+    for n in list(range(20, 300, 20)) + [6000]:
+        for seed in range(5):
+            keys = [(b"%06d-" % i) * (i % 9 + 1) for i in range(n)]
+            random.Random(seed).shuffle(keys)
+            with pyavl.AVLTreeBytes(keys) as tree:
+                assert tree.count == n and list(tree) == sorted(keys)
+
+def test_typed_key_validation():
+    """测试各键值类型对非法键值的处理：溢出、NaN 以及错误的类型。"""
+    with pyavl.AVLTree64() as tree:
+        with pytest.raises(OverflowError):
+            tree.insert(2**63)
+        assert list(tree.irange(-2**80, 2**80)) == []
+
+    with pyavl.AVLTreeFloat([3.0, float("nan"), 1, -0.0, 0.0]) as tree:
+        assert list(tree) == [-0.0, 1.0, 3.0]  # NaN 被忽略，-0.0 与 0.0 是同一个键值
+        with pytest.raises(ValueError):
+            tree.insert(float("nan"))
+
+    with pyavl.AVLTreeBytes([bytearray(b"b"), memoryview(b"a")]) as tree:
+        assert list(tree) == [b"a", b"b"]
+        with pytest.raises(TypeError):
+            tree.insert("text")
+        with pytest.raises(TypeError):
+            tree.insert_many(b"not-an-iterable-of-keys")
+
+    # 同一时刻共用一个 Arena 的树必须是同一种键值类型
+    arena = pyavl.Arena()
+    t1 = pyavl.AVLTree([1], arena=arena)
+    with pytest.raises(TypeError):
+        pyavl.AVLTreeBytes([b"x"], arena=arena)
+    with pytest.raises(TypeError):
+        pyavl.AVLTree64.merge(pyavl.AVLTree64([1]), pyavl.AVLTree([2]))
+    t1.close()
+
+
+def test_map_dict_api():
+    """测试 AVLMap 的 dict 风格接口，以及对象值的引用在删除、覆盖和关闭时被放弃。"""
+    from pyavl._map import _ObjectValues
+    live_slots = len(_ObjectValues._objects)
+
+    m = pyavl.AVLMap({5: "five", 3: "three", 9: ["nine"]})
+    assert m[5] == "five" and m.get(4) is None and m.get(4, "x") == "x"
+    assert list(m.items()) == [(3, "three"), (5, "five"), (9, ["nine"])]
+    assert m.floor_item(4) == (3, "three") and m.ceiling_item(6) == (9, ["nine"])
+    with pytest.raises(KeyError):
+        m.floor_item(2)
+
+    m[5] = "FIVE"
+    assert m.setdefault(5, "ignored") == "FIVE" and m.setdefault(7, None) is None
+    assert m.pop(3) == "three" and m.pop(3, "gone") == "gone"
+    del m[9]
+    with pytest.raises(KeyError):
+        m[9]
+    m.insert(1)  # 单独插入的键值对应的值为 None
+    assert list(m.items(reverse=True)) == [(7, None), (5, "FIVE"), (1, None)]
+    assert list(m.values(lo=2)) == ["FIVE", None] and m.select(0) == 1
+
+    # split/join 只移动节点，值随节点一起转移
+    small, large = m.split(5)
+    joined = pyavl.AVLMap.join(small, 6, large, value="six")
+    assert list(joined.items()) == [(1, None), (5, "FIVE"), (6, "six"), (7, None)]
+    with pytest.raises(TypeError):
+        pyavl.AVLMap.union(joined, pyavl.AVLMap())
+    with pytest.raises(TypeError):
+        joined.dump("unused.avl")
+    with pytest.raises(TypeError):
+        pyavl.AVLMap.load("unused.avl")
+    joined.close()
+    assert len(_ObjectValues._objects) == live_slots
+
+
+def test_map_numeric_values_and_bulk_update():
+    """测试 'q'/'d' 类型的映射：成对缓冲区的批量更新、values_array 与集合运算。"""
+    from array import array
+    ints = pyavl.AVLMap64(value_type="q")
+    ints.update(array("q", [3, 1, 2]), array("q", [30, 10, 20]))
+    ints[2] += 1
+    assert ints.values_array() == array("q", [10, 21, 30])
+    assert ints.values_array(2, 2) == array("q", [21])
+    with pytest.raises(ValueError):
+        ints.update([1, 2], [1])
+
+    floats = pyavl.AVLMapFloat({1.5: -2.25}, value_type="d")
+    floats.update([0.5], [float("inf")])
+    assert list(floats.items()) == [(0.5, float("inf")), (1.5, -2.25)]
+    assert floats.value_type == "d" and floats.values_array().typecode == "d"
+
+    other = pyavl.AVLMap64({2: 99, 4: 40}, value_type="q")
+    union = pyavl.AVLMap64.union(ints, other)
+    assert list(union.items()) == [(1, 10), (2, 21), (3, 30), (4, 40)]  # 重复的键值保留 tree1 的值
+    with pytest.raises(ValueError):
+        pyavl.AVLMap64.merge(union, pyavl.AVLMap64({9: 1}))  # 值的类型不同
+
+    words = pyavl.AVLMapBytes([(b"pear", 2), (b"apple", 1)], arena=True)
+    assert words.floor_item(b"b") == (b"apple", 1) and list(words.keys()) == [b"apple", b"pear"]
+    with pytest.raises(ValueError):
+        pyavl.AVLMap(value_type="i")
+
+
+
+def test_thread_safe_mode_under_concurrent_readers_and_writer():
+    """多个读线程与一个写线程同时访问 thread_safe=True 的树：读者看到的永远是一致的树。"""
+    import threading
+    from array import array
+
+    stable = array("i", range(0, 20000, 2))   # 始终存在的偶数键值
+    churn = array("i", range(1, 20000, 2))    # 写线程反复插入、删除的奇数键值
+    tree = pyavl.AVLTree(stable, thread_safe=True)
+    assert tree.thread_safe and not pyavl.AVLTree().thread_safe
+    stop = threading.Event()
+    errors = []
+
+    def reader():
+        try:
+            while not stop.is_set():
+                assert all(tree.contains_many(stable))
+                keys = tree.keys_array(1000, 3000)   # 一次加锁内完成计数与扫描，结果必然自洽
+                assert list(keys) == sorted(set(keys)) and set(stable[500:1501]) <= set(keys)
+                assert len(stable) <= len(tree) <= len(stable) + len(churn)
+        except Exception as exc:  # 把线程中的失败带回主线程
+            errors.append(exc)
+
+    def writer():
+        try:
+            for i in range(50):
+                tree.insert_many(churn)
+                tree.delete_many(churn)
+                tree.insert(churn[i])
+                tree.remove(churn[i])
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            stop.set()
+
+    threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert list(tree) == list(stable)
+
+    # split/merge 得到的树沿用线程安全的设置，并且可以与同类的普通树合并
+    small, large = tree.split(10000)
+    merged = pyavl.AVLTree.merge(small, large)
+    assert merged.thread_safe and len(merged) == len(stable)
+    union = pyavl.AVLTree.union(merged, pyavl.AVLTree([1]))
+    assert union.thread_safe and 1 in union
+
+    def modify_while_reading(key, height, bf):
+        # 同一线程在读的同时修改会被拒绝 (C 层的锁不可升级)；cffi 回调中的异常不会向外传播
+        try:
+            union.insert(-1)
+        except RuntimeError as exc:
+            errors.append(exc)
+    union.in_order_traverse(modify_while_reading)
+    assert len(errors) == len(union) and -1 not in union
+    union.close()
+
+
+@pytest.mark.parametrize("arena", [None, True])
+def test_snapshot_is_isolated_from_later_writes(arena):
+    """快照在之后的插入、删除、split/merge 与集合运算中保持不变，关闭后节点被完整回收。"""
+    import random
+
+    rng = random.Random(3)
+    tree = pyavl.AVLTree(range(0, 3000, 3), arena=arena)
+    expected = list(tree)
+    snap = tree.snapshot()
+    assert type(snap).__name__ == "AVLTree" and isinstance(snap, pyavl.AVLTree)
+
+    for _ in range(2000):
+        key = rng.randrange(3000)
+        if rng.random() < 0.5:
+            tree.insert(key)
+        else:
+            tree.discard(key)
+    small, large = tree.split(1500)
+    tree = pyavl.AVLTree.union(pyavl.AVLTree.merge(small, large), pyavl.AVLTree(range(1, 3000, 7), arena=tree.arena))
+    assert list(snap) == expected and len(snap) == len(expected)
+    assert snap.select(-1) == expected[-1] and snap.count_range(0, 300) == 101
+
+    # 快照只读，也不能被消耗型操作使用；快照的快照同样有效
+    with pytest.raises(TypeError):
+        snap.insert(1)
+    with pytest.raises(TypeError):
+        snap.split(10)
+    with pytest.raises(TypeError):
+        pyavl.AVLTree.merge(snap, pyavl.AVLTree([10**6], arena=tree.arena))
+    inner = snap.snapshot()
+    snap.close()
+    assert list(inner) == expected
+    inner.close()
+
+    if arena:
+        assert tree.arena.live_nodes == len(tree)
+    tree.close()
+
+
+def test_snapshot_reads_while_writer_runs():
+    """线程安全的树一边被修改，另一个线程一边无锁地读取它的快照。"""
+    import threading
+
+    tree = pyavl.AVLTree(range(0, 20000, 2), thread_safe=True)
+    snap = tree.snapshot()
+    assert not snap.thread_safe
+    errors = []
+
+    def writer():
+        try:
+            for key in range(1, 20000, 2):
+                tree.insert(key)
+                tree.discard(key - 1)
+        except Exception as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    for _ in range(20):
+        assert len(snap) == 10000 and snap.keys_array(100, 199).tolist() == list(range(100, 200, 2))
+    thread.join()
+    assert errors == [] and list(snap) == list(range(0, 20000, 2))
+    assert list(tree) == list(range(1, 20000, 2))
+    snap.close()
+    tree.close()
+
+
+_OOM_SCRIPT = """
+import resource
+import pyavl
+
+cls = pyavl.AVLTree64
+# 64 + 128 + ... + 65536 个节点恰好填满池的前 11 块内存；限制地址空间后无法再申请新的一块，
+# 池中空闲节点的个数就是之后还能成功的分配次数
+capacity = 131008
+_, hard = resource.getrlimit(resource.RLIMIT_AS)
+
+def fill(make):
+    # 一个池只能服务一种树，每种树类型各用一个填满的池；make(arena) 创建一棵空树
+    global arena, filler, spare
+    arena = pyavl.Arena()
+    filler = make(arena)
+    filler.insert_many(range(10**6, 10**6 + capacity))
+    spare = iter(range(2 * 10**6, 3 * 10**6))
+    with open("/proc/self/statm") as f:
+        vm = int(f.read().split()[0]) * resource.getpagesize()
+    resource.setrlimit(resource.RLIMIT_AS, (vm + (2 << 20), hard))
+
+def unfill():
+    resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
+    filler.close()
+    assert arena.live_nodes == 0
+
+def leave_free(k):
+    while capacity - arena.live_nodes > k:
+        filler.insert(next(spare))
+    while capacity - arena.live_nodes < k:
+        filler.pop_max()
+
+def contents(result):
+    trees = result if isinstance(result, tuple) else (result,)
+    out = [list(t) for t in trees]
+    for t in trees:
+        t.close()
+    return out
+
+def check(make, op, expected):
+    # 依次只留 0, 1, 2 ... 个空闲节点，让复制在操作的每一步上失败，直到操作成功
+    for k in range(200):
+        leave_free(600)
+        trees = make()
+        before = [list(t) for t in trees]
+        versions = [t._version for t in trees]
+        snaps = [t.snapshot() for t in trees]
+        leave_free(k)
+        try:
+            result = op(*trees)
+        except MemoryError:
+            assert [list(t) for t in trees] == before and [list(s) for s in snaps] == before
+            assert [t._version for t in trees] == versions
+            continue
+        finally:
+            for t in trees + snaps:
+                t.close()
+        assert result == expected
+        return
+    raise AssertionError("operation never succeeded")
+
+def check_batch(make, op, keys, apply):
+    # 批量操作在失败的键值处停止：树中是之前的键值都处理完的结果，快照保持不变
+    for k in range(200):
+        leave_free(600)
+        tree = make()
+        before = list(tree)
+        snap = tree.snapshot()
+        leave_free(k)
+        try:
+            op(tree, keys)
+            failed = False
+        except MemoryError:
+            failed = True
+        state = list(tree)
+        assert list(snap) == before
+        tree.close()
+        snap.close()
+        prefixes = [apply(before, keys[:i]) for i in range(len(keys) + 1)]
+        if not failed:
+            assert state == prefixes[-1]
+            return
+        assert state in prefixes[:-1]
+    raise AssertionError("operation never succeeded")
+
+fill(lambda arena: cls(arena=arena))
+evens, threes = set(range(0, 60, 2)), set(range(0, 60, 3))
+pair = lambda: [cls(evens, arena=arena), cls(threes, arena=arena)]
+one = lambda: [cls(range(300), arena=arena)]
+check(pair, lambda x, y: contents(cls.union(x, y)), [sorted(evens | threes)])
+check(pair, lambda x, y: contents(cls.intersection(x, y)), [sorted(evens & threes)])
+check(pair, lambda x, y: contents(cls.difference(x, y)), [sorted(evens - threes)])
+check(pair, lambda x, y: contents(cls.symmetric_difference(x, y)), [sorted(evens ^ threes)])
+check(lambda: [cls(range(300), arena=arena), cls([300], arena=arena)],
+      lambda x, y: contents(cls.merge(x, y)), [list(range(301))])
+check(lambda: [cls(range(200), arena=arena), cls([201, 202], arena=arena)],
+      lambda x, y: contents(cls.join(x, 200, y)), [list(range(203))])
+check(one, lambda x: contents(x.split(123)), [list(range(124)), list(range(124, 300))])
+check(one, lambda x: contents(x.pop_range(100, 199)) + [list(x)],
+      [list(range(100, 200)), list(range(100)) + list(range(200, 300))])
+check(one, lambda x: (x.discard(150), list(x)), (True, list(range(150)) + list(range(151, 300))))
+check(one, lambda x: (x.pop_min(), list(x)), (0, list(range(1, 300))))
+check(one, lambda x: (x.insert(1000), list(x)), (None, list(range(300)) + [1000]))
+check(one, lambda x: (x.delete(150), list(x)), (None, list(range(150)) + list(range(151, 300))))
+
+batch = [1000, 7, 2000, 150, 3000, 299]
+inserted = lambda before, keys: sorted(set(before) | set(keys))
+deleted = lambda before, keys: sorted(set(before) - set(keys))
+check_batch(lambda: cls(range(300), arena=arena), cls.insert_many, batch, inserted)
+check_batch(lambda: cls(range(300), arena=arena), cls.delete_many, batch, deleted)
+
+def fingered():
+    tree = cls(range(300), arena=arena)
+    tree.finger = True
+    return tree
+
+check(lambda: [fingered()], lambda x: (x.insert(1000), list(x)), (None, list(range(300)) + [1000]))
+check_batch(fingered, cls.insert_many, batch, inserted)
+unfill()
+
+fill(lambda arena: pyavl.AVLMap64(value_type='q', arena=arena))
+check_batch(lambda: pyavl.AVLMap64(dict.fromkeys(range(300), 1), value_type='q', arena=arena),
+            lambda m, keys: m.update(keys, [5] * len(keys)), batch, inserted)
+unfill()
+"""
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="需要 RLIMIT_AS 与 /proc/self/statm")
+def test_structural_operations_survive_out_of_memory():
+    """与快照共享节点时，复制在任何一步失败都抛出 MemoryError，输入树与快照保持不变，也没有泄漏节点。"""
+    import os
+    import subprocess
+
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(pyavl.__file__)))
+    proc = subprocess.run([sys.executable, "-c", _OOM_SCRIPT], env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+
+
+def test_map_snapshot():
+    m = pyavl.AVLMap64({1: 10, 2: 20}, value_type='q')
+    snap = m.snapshot()
+    m[1] = 11
+    del m[2]
+    assert dict(snap.items()) == {1: 10, 2: 20} and snap[2] == 20
+    with pytest.raises(TypeError):
+        snap[3] = 30
+    with pytest.raises(TypeError):
+        pyavl.AVLMap({1: "a"}).snapshot()
+    snap.close()
+    m.close()
+
+
+@pytest.mark.parametrize("cls, keys", [
+    (pyavl.AVLTree, list(range(-500, 1500, 3))),
+    (pyavl.AVLTreeU64, [2**64 - 2, 0, 2**40, 7]),
+    (pyavl.AVLTreeFloat, [0.5, -1e300, 2.25, 1e-9, 3.0]),
+])
+def test_freeze_and_thaw(tmp_path, cls, keys):
+    """冻结树与原树内容一致：查找、排名、lower_bound、区间扫描，以及 dump/load 与 thaw。"""
+    import bisect
+
+    tree = cls(keys)
+    frozen = tree.freeze()
+    expected = sorted(keys)
+    assert len(frozen) == len(expected) and list(frozen) == expected
+    assert list(reversed(frozen)) == expected[::-1] and frozen[-1] == expected[-1]
+
+    probes = expected + [k + 1 for k in expected]
+    assert list(frozen.contains_many(probes)) == [int(tree.search(k)) for k in probes]
+    for probe in probes:
+        i = bisect.bisect_left(expected, probe)
+        assert frozen.rank(probe) == tree.rank(probe) == i
+        assert frozen.lower_bound(probe) == (expected[i] if i < len(expected) else None)
+    lo, hi = expected[1], expected[-2]
+    assert list(frozen.irange(lo, hi, reverse=True)) == expected[-2:0:-1]
+    assert frozen.keys_array(lo, hi).tolist() == expected[1:-1] and frozen.count_range(lo, hi) == len(expected) - 2
+
+    path = tmp_path / "frozen.avl"
+    frozen.dump(path)
+    with pytest.raises(ValueError):
+        cls.load(path)  # 可修改的树只接受按升序排列的快照
+    loaded = type(frozen).load(path)
+    assert list(loaded) == expected and all(loaded.contains_many(expected))
+    thawed = loaded.thaw(arena=True)
+    loaded.close()
+    thawed.insert(expected[0])
+    assert list(thawed) == expected and thawed.arena is not None
+    with pytest.raises(ValueError):
+        len(loaded)
+    tree.close()
+    thawed.close()
+
+
+def test_frozen_tree_edge_cases(tmp_path):
+    frozen = pyavl.FrozenAVLTree([5, 3, 5, 1])
+    assert list(frozen) == [1, 3, 5] and 4 not in frozen and frozen.lower_bound(6) is None
+    empty = pyavl.FrozenAVLTree()
+    assert len(empty) == 0 and list(empty) == [] and empty.rank(3) == 0 and empty.contains_many([1]) == bytearray(1)
+    with pytest.raises(IndexError):
+        empty[0]
+    with pytest.raises(TypeError):
+        pyavl.AVLTreeBytes([b"a"]).freeze()
+
+    # 损坏的布局 (顺序不合法) 在加载时被拒绝
+    path = tmp_path / "bad.avl"
+    frozen.dump(path)
+    data = bytearray(path.read_bytes())
+    import zlib
+    from pyavl._snapshot import HEADER_SIZE
+    data[HEADER_SIZE:HEADER_SIZE + 4], data[HEADER_SIZE + 4:HEADER_SIZE + 8] = \
+        data[HEADER_SIZE + 4:HEADER_SIZE + 8], data[HEADER_SIZE:HEADER_SIZE + 4]
+    data[24:28] = zlib.crc32(bytes(data[HEADER_SIZE:])).to_bytes(4, 'little')
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        pyavl.FrozenAVLTree.load(path)
+
+
+def test_tree_stats():
+    """stats() 的结构统计总是可用；操作计数只在构建时启用了 AVL_STATS 时才有。"""
+    with pyavl.AVLTree(range(7)) as tree:
+        stats = tree.stats()
+        assert stats['count'] == 7 and stats['height'] == 3
+        assert stats['depth_histogram'] == [1, 2, 4]
+        assert stats['average_depth'] == (0 + 2 * 1 + 4 * 2) / 7
+    assert pyavl.AVLMap().stats()['depth_histogram'] == []
+
+    if not pyavl.stats_enabled():
+        assert stats['counters'] is None
+        return
+    import gc
+    gc.collect()    # 避免之前的测试中遗留的树在计数期间被回收
+    pyavl.reset_stats()
+    with pyavl.AVLTree() as tree:
+        for key in (1, 2, 3, 0, 4, 5):  # 插入 3 与 5 各触发一次单旋转，后者旋转后子树高度不变，回溯在根之前停止
+            tree.insert(key)
+        counters = tree.stats()['counters']
+    assert counters['node_allocs'] == 6 and counters['node_frees'] == 0
+    # 关闭树时逐个释放节点
+    assert pyavl.AVLTree().stats()['counters']['node_frees'] == 6
+    assert counters['single_rotations'] == 2 and counters['double_rotations'] == 0
+    assert counters['rebalance_early_exits'] == 1 and counters['comparisons'] > 0
+    # 关闭 Arena 中的最后一棵树时按块清空，剩余的节点同样计为释放
+    pyavl.reset_stats()
+    with pyavl.AVLTree(range(10), arena=True) as tree:
+        tree.delete(3)
+    counters = pyavl.AVLTree().stats()['counters']
+    assert counters['node_allocs'] == counters['node_frees'] == 10
+    pyavl.reset_stats()
+    assert not any(pyavl.AVLTree().stats()['counters'].values())
+
+
+def test_range_aggregates():
+    """AVLSumTree/AVLSumMap64 的区间和/最小值/最大值在修改、split/merge 与集合运算之后都与逐个统计的结果一致。"""
+    import random
+
+    rng = random.Random(11)
+    keys = rng.sample(range(-1000, 1000), 600)
+    tree = pyavl.AVLSumTree(keys)
+    values = {k: rng.randrange(-10**12, 10**12) for k in keys}
+    sums = pyavl.AVLSumMap64(values)
+    for k in keys[:200]:
+        tree.delete(k)
+        del values[k]
+        sums.pop(k)
+    for k in keys[200:260]:
+        values[k] = -values[k]
+        sums[k] = values[k]     # 覆盖已有键值的值也要更新路径上的聚合值
+    remaining = sorted(keys[200:])
+
+    for lo, hi in [(-100, 100), (None, 0), (5, None), (None, None), (3, 2), (2000, 3000)]:
+        in_range = [k for k in remaining if (lo is None or k >= lo) and (hi is None or k <= hi)]
+        assert tree.range_sum(lo, hi) == sum(in_range)
+        assert tree.range_min(lo, hi) == (in_range[0] if in_range else None)
+        assert tree.range_max(lo, hi) == (in_range[-1] if in_range else None)
+        vals = [values[k] for k in in_range]
+        assert sums.range_sum(lo, hi) == sum(vals)
+        assert sums.range_min(lo, hi) == (min(vals) if vals else None)
+        assert sums.range_max(lo, hi) == (max(vals) if vals else None)
+
+    small, large = tree.split(0)
+    assert small.range_sum() == sum(k for k in remaining if k <= 0)
+    merged = pyavl.AVLSumTree.union(small, pyavl.AVLSumTree([5000]))
+    merged = pyavl.AVLSumTree.merge(merged, pyavl.AVLSumTree([6000]))
+    assert merged.range_sum() == sum(k for k in remaining if k <= 0) + 11000
+    assert large.snapshot().range_max() == remaining[-1]
+    with pytest.raises(ValueError):
+        pyavl.AVLSumMap64(value_type='d')
+
+
+@pytest.mark.parametrize("arena", [None, True])
+def test_delete_range_and_pop_range(arena):
+    """pop_range/delete_range 切下整个闭区间，剩余的树与切下的树都保持平衡。"""
+    tree = pyavl.AVLTree(range(0, 1000, 3), arena=arena)
+    snapshot = tree.snapshot()
+    removed = tree.pop_range(100, 200)
+    assert list(removed) == list(range(102, 201, 3)) and removed.arena is tree.arena
+    assert list(tree) == [k for k in range(0, 1000, 3) if not 100 <= k <= 200]
+    assert list(snapshot) == list(range(0, 1000, 3))   # 快照不受影响
+    assert tree.delete_range(hi=50) == 17 and tree.delete_range(lo=900) == 34
+    assert tree.delete_range(500, 400) == 0 and tree.delete_range(301, 302) == 0
+    for t in (tree, removed):
+        balance_factors = []
+        t.in_order_traverse(lambda k, h, bf: balance_factors.append(bf))
+        assert all(abs(bf) <= 1 for bf in balance_factors)
+    with tree.pop_range() as rest:
+        assert len(rest) == 250 and len(tree) == 0
+    for t in (tree, removed, snapshot):
+        t.close()
+
+    # 字节串键值与映射：值随节点一起转移
+    words = pyavl.AVLTreeBytes([b"pear", b"apple", b"fig", b"kiwi"])
+    assert list(words.pop_range(b"b", b"kz")) == [b"fig", b"kiwi"] and list(words) == [b"apple", b"pear"]
+    m = pyavl.AVLMap({k: str(k) for k in range(10)})
+    assert dict(m.pop_range(3, 5).items()) == {3: "3", 4: "4", 5: "5"}
+    assert m.delete_range(hi=1) == 2 and list(m.items()) == [(k, str(k)) for k in (2, 6, 7, 8, 9)]
+
+
+@pytest.mark.parametrize("arena", [None, True])
+def test_priority_queue_operations(arena):
+    """min/max 与 pop_min/pop_max/pop_min_many 按优先队列的方式使用树，快照不受影响。"""
+    import heapq
+    import random
+
+    rng = random.Random(7)
+    tree = pyavl.AVLTree(arena=arena)
+    heap = []
+    for _ in range(2000):
+        if heap and rng.random() < 0.4:
+            assert tree.min() == heap[0]
+            assert tree.pop_min() == heapq.heappop(heap)
+        else:
+            key = rng.randrange(10 ** 6)
+            if key not in tree:
+                tree.insert(key)
+                heapq.heappush(heap, key)
+    assert tree.max() == max(heap)
+    snapshot = tree.snapshot()
+    assert tree.pop_max() == max(heap)
+    heap.remove(max(heap))
+    assert list(tree.pop_min_many(5)) == [heapq.heappop(heap) for _ in range(5)]
+    assert len(tree.pop_min_many(0)) == 0 and list(tree) == sorted(heap)
+    assert len(snapshot) == len(heap) + 6
+    assert list(tree.pop_min_many(len(heap) + 1)) == sorted(heap) and len(tree) == 0
+    with pytest.raises(IndexError):
+        tree.pop_min()
+    with pytest.raises(ValueError):
+        tree.max()
+    for t in (tree, snapshot):
+        t.close()
+
+    # min/max 的缓存在每一种修改之后失效，关闭之后不再返回缓存的结果
+    tree = pyavl.AVLTree([5, 3, 8], arena=arena)
+    assert (tree.min(), tree.max()) == (3, 8)
+    tree.insert(1)
+    tree.insert(9)
+    assert (tree.min(), tree.max()) == (1, 9)
+    tree.delete(1)
+    assert tree.min() == 3
+    tree.insert_many([0, 10])
+    assert (tree.min(), tree.max()) == (0, 10)
+    tree.delete_many([0, 10])
+    assert (tree.min(), tree.max()) == (3, 9)
+    assert tree.pop_min() == 3 and tree.min() == 5
+    assert tree.pop_max() == 9 and tree.max() == 8
+    tree.delete_range(hi=5)
+    assert tree.min() == 8
+    assert list(tree.pop_min_many(5)) == [8]
+    with pytest.raises(ValueError):
+        tree.min()
+    tree.insert(4)
+    assert (tree.min(), tree.max()) == (4, 4)
+    tree.close()
+    with pytest.raises(ValueError, match="closed"):
+        tree.min()
+
+    # 字节串键值与映射：映射弹出 (键值, 值) 对，对象值的引用随之交还
+    words = pyavl.AVLTreeBytes([b"pear", b"apple", b"fig"])
+    assert words.pop_min() == b"apple" and words.pop_max() == b"pear" and list(words) == [b"fig"]
+    m = pyavl.AVLMap({k: str(k) for k in range(10)})
+    assert m.pop_min() == (0, "0") and m.pop_max() == (9, "9")
+    assert m.pop_min_many(3) == [(1, "1"), (2, "2"), (3, "3")] and m.min() == 4
+    sums = pyavl.AVLSumTree([5, 1, 9])
+    assert sums.pop_max() == 9 and sums.range_sum() == 6
+    for t in (words, m, sums):
+        t.close()
+
+
+def test_finger_mode_and_append():
+    """指针模式下的插入与查找结果与普通模式相同；append 只接受大于最大键值的键值。"""
+    import random
+
+    rng = random.Random(11)
+    # 带少量乱序的递增键值流，偶尔夹杂远离最大键值的键值
+    keys = [4 * i + rng.randint(-20, 20) if rng.random() < 0.95 else rng.randrange(4 * i + 1) for i in range(3000)]
+    plain = pyavl.AVLTree()
+    tree = pyavl.AVLTree()
+    tree.finger = True
+    assert tree.finger and not plain.finger
+    for k in keys[:2000]:
+        plain.insert(k)
+        tree.insert(k)
+    snapshot = tree.snapshot()
+    tree.insert_many(keys[2000:])
+    plain.insert_many(keys[2000:])
+    assert list(tree) == list(plain) == sorted(set(keys))
+    probes = range(-10, 4 * 3000 + 30)
+    assert [tree.search(k) for k in probes] == [plain.search(k) for k in probes]
+    assert len(snapshot) == len(set(keys[:2000]))
+    balance_factors = []
+    tree.in_order_traverse(lambda k, h, bf: balance_factors.append(bf))
+    assert all(abs(bf) <= 1 for bf in balance_factors)
+
+    top = tree.max()
+    tree.append(top + 1)
+    with pytest.raises(ValueError):
+        tree.append(top + 1)
+    with pytest.raises(ValueError):
+        tree.append(top - 5)
+    assert tree.max() == top + 1 and len(tree) == len(plain) + 1
+    for t in (tree, plain, snapshot):
+        t.close()
+
+    words = pyavl.AVLTreeBytes()
+    for w in (b"a", b"b", b"c"):
+        words.append(w)
+    words.finger = True
+    words.insert(b"bb")
+    assert list(words) == [b"a", b"b", b"bb", b"c"] and words.search(b"bb")
+    words.close()
+
+
+def test_multiset_counts():
+    """AVLMultiset64 每个不同的键值只占一个节点，重数随 add/remove 增减，total 为各重数之和。"""
+    from collections import Counter
+
+    keys = [5, 1, 5, 5, 3, 1, 9]
+    ms = pyavl.AVLMultiset64(sorted(keys))
+    assert len(ms) == 4 and ms.total == 7
+    assert ms.memory_usage() == 4 * pyavl.AVLMultiset64()._c.node_size()
+    assert list(ms.elements()) == sorted(keys) and dict(ms.items()) == Counter(keys)
+    assert ms.add(5, 2) == 5 and ms.add(7) == 1 and ms.count_of(7) == 1 and ms[4] == 0
+    assert ms.remove(5, 4) == 1 and ms.remove(7) == 0 and 7 not in ms
+    with pytest.raises(KeyError):
+        ms.remove(8)
+    with pytest.raises(ValueError):
+        ms.remove(1, 3)
+    assert ms.count_of(1) == 2 and ms.total == 5
+    assert ms.range_sum(1, 5) == 4 and list(ms.elements(2, 9, reverse=True)) == [9, 5, 3]
+
+    # 未排序的输入同样正确，只是相等的键值不相邻时不会合并
+    ms.add_many([9, 1, 9])
+    ms[3] = 0
+    assert dict(ms.items()) == {1: 3, 5: 1, 9: 3} and ms.total == 7
+    snapshot = ms.snapshot()
+    with pytest.raises(TypeError):
+        snapshot.add(1)
+    assert ms.pop_min() == (1, 3) and ms.total == 4 and snapshot.total == 7
+    for t in (ms, snapshot):
+        t.close()
+
+
+def test_multiset_builders_keep_positive_counts(tmp_path):
+    """继承来的构建与追加方法同样保证每个键值的重数为正、total 等于各重数之和。"""
+    def check(ms, expected):
+        counts = dict(ms.items())
+        assert counts == expected and all(n > 0 for n in counts.values())
+        assert ms.total == sum(counts.values()) == len(list(ms.elements())) and len(ms) == len(counts)
+
+    ms = pyavl.AVLMultiset64.from_sorted([1, 1, 2, 3, 3, 3])
+    check(ms, {1: 2, 2: 1, 3: 3})
+    with pytest.raises(ValueError):
+        pyavl.AVLMultiset64.from_sorted([1, 3, 2])
+
+    ms.append(3)
+    ms.append(7)
+    check(ms, {1: 2, 2: 1, 3: 4, 7: 1})
+    with pytest.raises(ValueError):
+        ms.append(5)
+    check(ms, {1: 2, 2: 1, 3: 4, 7: 1})
+
+    assert ms.setdefault(9) == 1 and ms.setdefault(1) == 2
+    with pytest.raises(ValueError):
+        ms.setdefault(10, 0)
+    check(ms, {1: 2, 2: 1, 3: 4, 7: 1, 9: 1})
+
+    empty = pyavl.AVLMultiset64(thread_safe=True)
+    empty.append(4)
+    empty.append(4)
+    check(empty, {4: 2})
+
+    left, right = pyavl.AVLMultiset64([1, 1]), pyavl.AVLMultiset64([8])
+    with pytest.raises(ValueError):
+        pyavl.AVLMultiset64.join(left, 5, right, 0)
+    joined = pyavl.AVLMultiset64.join(left, 5, right)
+    check(joined, {1: 2, 5: 1, 8: 1})
+
+    with pytest.raises(TypeError):
+        ms.dump(tmp_path / "ms.avl")
+    with pytest.raises(TypeError):
+        pyavl.AVLMultiset64.load(tmp_path / "ms.avl")
+    with pytest.raises(TypeError):
+        ms.freeze()
+    for t in (ms, empty, joined):
+        t.close()
+
+
+def test_share_and_attach_shared_memory():
+    """share 把树发布到共享内存，attach 直接在共享的内存上读取；发布之后对树的修改不影响读者。"""
+    tree = pyavl.AVLTree64(range(0, 1000, 5))
+    shm = tree.share()
+    try:
+        tree.insert(1)
+        with pyavl.AVLTree64.attach(shm.name) as shared:
+            assert isinstance(shared, pyavl.FrozenAVLTree64)
+            assert len(shared) == 200 and 995 in shared and 1 not in shared
+            assert shared.count_range(10, 30) == 5 and list(shared.irange(980)) == [980, 985, 990, 995]
+            assert shared.layout.readonly
+            with pytest.raises(ValueError):
+                pyavl.AVLTreeFloat.attach(shm.name)    # 键值类型不符
+    finally:
+        shm.close()
+        shm.unlink()
+    with pytest.raises(FileNotFoundError):
+        pyavl.AVLTree64.attach(shm.name)
+    with pytest.raises(TypeError):
+        pyavl.AVLTreeBytes([b"a"]).share()
+    tree.close()
+
+
+_ATTACH_SCRIPT = """
+import sys
+import pyavl
+from pyavl import _snapshot
+
+if sys.argv[2] == "fallback":
+    _snapshot._posixshmem = None    # 模拟没有 _posixshmem 的平台
+with pyavl.AVLTree64.attach(sys.argv[1]) as shared:
+    assert len(shared) == 200 and 995 in shared and shared.keys_array(0, 20).tolist() == [0, 5, 10, 15, 20]
+"""
+
+
+@pytest.mark.parametrize("mode", ["posixshmem", "fallback"])
+def test_attach_in_spawned_process(mode):
+    """
+    独立的进程附加并退出之后，共享内存仍然存在：读者不会把它登记到自己的 resource_tracker，
+    否则 tracker 会在读者退出时把它当作泄漏的资源删除。
+    """
+    import os
+    import subprocess
+
+    tree = pyavl.AVLTree64(range(0, 1000, 5))
+    shm = tree.share()
+    try:
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(pyavl.__file__)))
+        # 捕获输出时 run 会等到继承了管道的 resource_tracker 也退出，它的清理 (如果有) 已经完成
+        proc = subprocess.run([sys.executable, "-c", _ATTACH_SCRIPT, shm.name, mode],
+                              env=env, capture_output=True, text=True)
+        assert proc.returncode == 0 and "leaked" not in proc.stderr, proc.stderr
+        with pyavl.AVLTree64.attach(shm.name) as shared:
+            assert len(shared) == 200
+    finally:
+        shm.close()
+        shm.unlink()
+    tree.close()
+
+
+def test_shared_tree_publisher_generations():
+    """读者固定看到附加时的那一代；发布者发布新的一代之后 stale 变为真，refresh 切换到最新一代。"""
+    tree = pyavl.AVLTree64([1, 2, 3])
+    with pyavl.SharedTreePublisher() as publisher:
+        with pyavl.SharedTreeReader(publisher.name, pyavl.AVLTree64) as reader:
+            assert reader.tree is None and reader.generation == 0 and not reader.stale
+            assert publisher.publish(tree) == 1
+            assert reader.stale and reader.refresh() and not reader.refresh()
+            first = reader.tree
+            assert list(first) == [1, 2, 3] and reader.generation == 1
+
+            tree.insert(4)
+            assert list(first) == [1, 2, 3]        # 修改树不会改变已发布的一代
+            publisher.publish(tree)
+            tree.insert(5)
+            publisher.publish(pyavl.FrozenAVLTree64(tree.keys_array()))
+            assert list(first) == [1, 2, 3]        # 第 1 代已被删除，但附加的读者仍可读取
+            assert reader.refresh() and reader.generation == 3 and list(reader.tree) == [1, 2, 3, 4, 5]
+            with pytest.raises(ValueError):
+                first.search(1)                    # refresh 关闭了旧的冻结树
+
+        with pytest.raises(ValueError):
+            pyavl.SharedTreeReader(publisher.name, pyavl.AVLTreeFloat)   # 键值类型不符
+        with pytest.raises(ValueError):
+            pyavl.SharedTreeReader(f"{publisher.name}_3", pyavl.AVLTree64)   # 不是代目录
+
+        # 读到的代号在附加之前就被删除时，重新读取代号再试
+        reader = pyavl.SharedTreeReader(publisher.name, pyavl.AVLTree64)
+        directory, generations = reader._directory, iter([2, 3])
+
+        class Racing:
+            @property
+            def generation(self):
+                return next(generations)
+
+        reader._directory, reader._generation = Racing(), 0
+        assert reader.refresh() and reader.generation == 3
+        reader._directory = directory
+        reader.close()
+        name = publisher.name
+    with pytest.raises(FileNotFoundError):
+        pyavl.SharedTreeReader(name, pyavl.AVLTree64)
+    tree.close()
+
+
+def test_sharded_tree_batches_and_rebalance():
+    """ShardedAVLTree 按分割点把批量操作分发到各分片并行执行，结果与单棵树相同；失衡时自动重新划分。"""
+    import random
+    from array import array
+
+    rng = random.Random(7)
+    keys = array("q", (rng.randrange(100_000) for _ in range(20_000)))
+    with pyavl.ShardedAVLTree(keys, shards=4, tree_cls=pyavl.AVLTree64) as sharded, pyavl.AVLTree64(keys) as tree:
+        sizes = sharded.shard_sizes()
+        assert len(sizes) == 4 and max(sizes) - min(sizes) <= 1
+        assert sharded.split_points == sorted(sharded.split_points)
+
+        probes = array("q", (rng.randrange(100_000) for _ in range(10_000)))
+        assert sharded.contains_many(probes) == tree.contains_many(probes)
+        sharded.delete_many(probes[:5000])
+        tree.delete_many(probes[:5000])
+        assert sharded.keys_array() == tree.keys_array() and len(sharded) == len(tree)
+
+        # 全部落在最后一个分片的键值使它失衡，插入之后重新划分，各分片再次接近等大
+        tail = range(200_000, 260_000)
+        sharded.insert_many(tail)
+        tree.insert_many(tail)
+        sizes = sharded.shard_sizes()
+        assert max(sizes) - min(sizes) <= 1 and list(sharded) == list(tree)
+        assert sharded.discard(200_000) and 200_000 not in sharded and not sharded.discard(200_000)
+
+    with pytest.raises(TypeError):
+        pyavl.ShardedAVLTree(tree_cls=pyavl.AVLTreeBytes)
+    with pyavl.ShardedAVLTree(shards=8) as small:
+        small.insert_many([3, 1, 2])
+        assert small.shard_sizes() == [1, 1, 1] and small.split_points == [1, 2]
+
+
+# --- run.py 的脚本模式 ---
+
+@pytest.fixture
+def shell():
+    """从仓库根目录加载 run.py，提供一个 AVLTreeShell，结束时关闭它的所有树。"""
+    import importlib.util
+    import os
+
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run.py")
+    spec = importlib.util.spec_from_file_location("run", path)
+    run = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(run)
+    shell = run.AVLTreeShell()
+    yield shell
+    for tree in shell.trees.values():
+        tree.close()
+
+
+@pytest.fixture
+def batch_calls(monkeypatch):
+    """记录每次 insert_many / delete_many / contains_many 调用的 (方法名, 键值列表)。"""
+    calls = []
+    for method in ("insert_many", "delete_many", "contains_many"):
+        original = getattr(pyavl.AVLTree, method)
+
+        def wrapper(self, keys, method=method, original=original):
+            calls.append((method, list(keys)))
+            return original(self, keys)
+
+        monkeypatch.setattr(pyavl.AVLTree, method, wrapper)
+    return calls
+
+
+def test_run_script_coalesces_batch_commands(shell, batch_calls):
+    """连续的、作用于同一棵树的 i / d / s 行合并为一次批量调用；其他命令或切换树会先执行积攒的批量。"""
+    lines = ["i 1 2", "", "# 注释", "i 3", "d 2", "d 3 4", "s 1", "s 2", "s 3",
+             "new t", "use t", "i 7", "use main", "i 8"]
+    report = shell.run_script(lines)
+    assert batch_calls == [("insert_many", [1, 2, 3]), ("delete_many", [2, 3, 4]), ("contains_many", [1, 2, 3]),
+                           ("insert_many", [7]), ("insert_many", [8])]
+    i = report["commands"]["i"]
+    assert (i["lines"], i["keys"], i["calls"]) == (4, 5, 3)
+    assert report["commands"]["d"]["lines"] == 2 and report["commands"]["d"]["calls"] == 1
+    assert report["commands"]["s"]["hits"] == 1
+    assert report["trees"] == {"main": 2, "t": 1} and report["lines"] == 12
+
+
+def test_run_script_splits_batches_at_batch_size(shell, batch_calls):
+    """一批的键值数超过 batch_size 之前就执行，单行本身不会被拆开。"""
+    report = shell.run_script(["i 1 2 3", "i 4 5", "i 6", "i 7 8 9 10 11"], batch_size=4)
+    assert [keys for _, keys in batch_calls] == [[1, 2, 3], [4, 5, 6], [7, 8, 9, 10, 11]]
+    assert report["commands"]["i"]["calls"] == 3 and report["trees"] == {"main": 11}
+
+
+def test_run_script_counts_errors_and_continues(shell, capsys):
+    """出错的行计入 errors 并连同行号写到标准错误，之后的行照常执行。"""
+    report = shell.run_script(["i 1", "i x", "frobnicate", "use nope", "s", "i 2"])
+    assert report["errors"] == 4 and report["trees"] == {"main": 2}
+    err = capsys.readouterr().err
+    assert all(f"第 {lineno} 行" in err for lineno in (2, 3, 4, 5))
+
+
+def test_run_script_validates_lines_like_interactive_mode(shell, capsys):
+    """脚本中的每一行与交互模式下输入同一行的结果相同：s 只接受一个键值，超出范围的键值给出相同的错误。"""
+    bad_lines = ["s 1 2", "i 99999999999", "d -2147483649", "s 2147483648", "i 1 x"]
+    for line in bad_lines:
+        command, *args = line.split()
+        with pytest.raises(ValueError) as info:
+            shell.execute(command, args, quiet=True)
+        report = shell.run_script([line])
+        assert report["errors"] == 1
+        assert capsys.readouterr().err.strip() == f"第 1 行: 错误: {info.value}"
+    with pytest.raises(ValueError, match="超出范围"):
+        shell.execute("i", ["99999999999"], quiet=True)
+    report = shell.run_script(["i -2147483648 2147483647", "s 2147483647", "i 2147483648 5"])
+    assert report["errors"] == 1 and report["commands"]["s"]["hits"] == 1
+    # 出错的行整行都不执行，与交互模式相同
+    assert list(shell.trees["main"]) == [-2147483648, 2147483647]
+
+
+def test_run_script_stops_at_quit(shell):
+    """q 之前积攒的批量照常执行，之后的行不再执行；树不会被 q 关闭。"""
+    report = shell.run_script(["i 1 2", "q", "i 3", "frobnicate"])
+    assert report["trees"] == {"main": 2} and report["lines"] == 2 and report["errors"] == 0
+    assert list(shell.trees["main"]) == [1, 2]
+
+
+def test_run_script_report_and_quiet_output(shell, capsys, monkeypatch):
+    """报告可以序列化为 JSON；不 echo 时不打印任何输出，也不渲染树的结构。"""
+    import json
+
+    def no_render(self):
+        raise AssertionError("tree rendered in quiet mode")
+
+    monkeypatch.setattr(pyavl.AVLTree, "__str__", no_render)
+    report = json.loads(json.dumps(shell.run_script(["i 5 3 8", "p", "random 3", "info", "s 5", "s 6"])))
+    assert set(report) == {"lines", "errors", "seconds", "lines_per_sec", "commands", "trees"}
+    assert report["lines"] == 6 and report["errors"] == 0 and report["seconds"] > 0 and report["lines_per_sec"] > 0
+    assert set(report["commands"]) == {"i", "p", "random", "info", "s"}
+    assert set(report["commands"]["s"]) == {"lines", "keys", "calls", "seconds", "hits", "keys_per_sec"}
+    assert report["commands"]["s"]["keys"] == 2 and report["commands"]["s"]["hits"] == 1
+    assert report["commands"]["p"]["keys"] == 0 and report["commands"]["p"]["keys_per_sec"] is None
+    assert capsys.readouterr().out == ""
+
+    monkeypatch.undo()
+    shell.run_script(["i 1", "p"], echo=True)
+    out = capsys.readouterr().out
+    assert "成功插入: [1]" in out and "当前树 'main' 的结构" in out